@@ -77,112 +77,77 @@ static inline void decodeSzFromPages(
   const uint8_t* cd, size_t cdLen,
   SzData& out
 ) {
-// Généré par tools/sz_decode_from_ocr_jsonl.py à partir de sz_sync_ocr.jsonl
+// Généré par tools/sz_fixed_point.py (fixed_point_body) à partir de tools/sz_decode_mapping.json
 // Coller le contenu de decodeSzFromPages (remplacer l’existant) ou appliquer manuellement.
 
-  // desired_idle_speed_rpm (mae=7.71 n=510)
-  if (a0Len > 45) {
-    uint16_t raw = (a0[44] << 8) | a0[45];
-    out.desired_idle_speed_rpm = (float)raw * 0.06220588595295306f + 844.9560488396442f;
-  }
-
-  // accelerator_pct (mae=2.61 n=510)
-  if (a2Len > 5) {
-    uint16_t raw = (a2[4] << 8) | a2[5];
-    out.accelerator_pct = (float)raw * 0.26064220780047914f + -16.498404044868188f;
-  }
-
-  // intake_c (mae=0.00 n=510)
-  if (a0Len > 5) {
-    uint16_t raw = (a0[4] << 8) | a0[5];
-    out.intake_c = (float)raw * 0.0f + -50.0f;
-  }
-
-  // battery_v (mae=0.03 n=510)
-  if (a2Len > 27) {
-    uint16_t raw = (a2[26] << 8) | a2[27];
-    out.battery_v = (float)raw * 0.040871480833465604f + -110.9969629393979f;
-  }
-
-  // fuel_temp_c (mae=0.01 n=510)
-  if (a0Len > 41) {
-    uint16_t raw = (a0[40] << 8) | a0[41];
-    out.fuel_temp_c = (float)raw * -0.049803335431089446f + 35.89450912523603f;
-  }
-
-  // bar_pressure_kpa (mae=0.00 n=510)
-  if (a0Len > 7) {
-    uint16_t raw = (a0[6] << 8) | a0[7];
-    out.bar_pressure_kpa = (float)raw * 0.0f + 102.5f;
-  }
-
-  // bar_pressure_mmhg (mae=0.00 n=510)
-  if (a0Len > 13) {
-    uint16_t raw = (a0[12] << 8) | a0[13];
-    out.bar_pressure_mmhg = (float)raw * 0.0f + 768.813f;
+  // Virgule fixe (tools/sz_fixed_point.py): valeur = (raw * mul + add) * 2^-S, tout sur 32 bits.
+  // Tolérance par champ: une fraction de son pas d'affichage OCR.
+  struct SzFixedField {
+    uint8_t page;    // 0 = 21A0, 1 = 21A2, 2 = 21A5, 3 = 21CD
+    uint8_t offset;  // octet de poids fort (trame complète, 0 = 61)
+    int32_t mul;
+    int32_t add;
+    float scale;     // 2^-S, exact
+    float SzData::*dst;
+  };
+  static const SzFixedField kFields[] = {
+    {0, 44, 16307, 221500158, 3.814697265625e-06f, &SzData::desired_idle_speed_rpm},  // desired_idle_speed_rpm: linear (raw*0.062205886 +844.956049) S=18 err≤2.5e-02 (tol 0.5)
+    {0, 4, 0, -50, 1.0f, &SzData::intake_c},  // intake_c: linear (raw*0 -50) S=0 err≤0.0e+00 (tol 0.5)
+    {0, 14, 26282, 105287861, 2.9802322387695312e-08f, &SzData::battery_v},  // battery_v: linear (raw*0.000783260588 +3.13782278) S=25 err≤2.7e-04 (tol 0.0005)
+    {3, 6, 27443, 285074198, 1.1920928955078125e-07f, &SzData::fuel_temp_c},  // fuel_temp_c: linear (raw*0.003271431 +33.9834926) S=23 err≤1.9e-03 (tol 0.05)
+    {0, 6, 0, 205, 0.5f, &SzData::bar_pressure_kpa},  // bar_pressure_kpa: linear (raw*0 +102.5) S=1 err≤0.0e+00 (tol 0.05)
+    {0, 12, 0, 1612317721, 4.76837158203125e-07f, &SzData::bar_pressure_mmhg},  // bar_pressure_mmhg: linear (raw*0 +768.813) S=21 err≤2.0e-07 (tol 0.0005)
+    {0, 18, 28721, 4124480, 3.0517578125e-05f, &SzData::abs_pressure_mbar},  // abs_pressure_mbar: linear (raw*0.87648833 +125.86914) S=15 err≤4.6e-01 (tol 0.5)
+    {1, 16, 25025, 30253002, 7.62939453125e-06f, &SzData::air_flow_estimate_mgcp},  // air_flow_estimate_mgcp: linear (raw*0.19092495 +230.812087) S=17 err≤4.2e-02 (tol 0.05)
+    {0, 38, 13831, 175356624, 5.960464477539063e-08f, &SzData::desired_egr_position_pct},  // desired_egr_position_pct: linear (raw*0.000824384424 +10.4520693) S=24 err≤4.9e-04 (tol 0.0005)
+    {1, 34, 20338, -101844421, 1.52587890625e-05f, &SzData::gear_ratio},  // gear_ratio: linear (raw*0.310328963 -1554.02254) S=16 err≤2.8e-01 (tol 0.5)
+    {1, 20, 25065, -68257711, 3.814697265625e-06f, &SzData::air_temp_c},  // air_temp_c: linear (raw*0.095615605 -260.382505) S=18 err≤1.4e-02 (tol 0.05)
+    {2, 54, 31595, 33879298, 3.0517578125e-05f, &SzData::requested_in_pressure_mbar},  // requested_in_pressure_mbar: linear (raw*0.964199233 +1033.91413) S=15 err≤2.4e-01 (tol 0.5)
+  };
+  const uint8_t* const bufs[4] = {a0, a2, a5, cd};
+  const size_t lens[4] = {a0Len, a2Len, a5Len, cdLen};
+  for (const SzFixedField& f : kFields) {
+    if (lens[f.page] <= (size_t)f.offset + 1) continue;
+    const int32_t raw = ((int32_t)bufs[f.page][f.offset] << 8) | bufs[f.page][f.offset + 1];
+    out.*f.dst = (float)(raw * f.mul + f.add) * f.scale;
   }
 
-  // abs_pressure_mbar (mae=2.87 n=510)
-  if (a0Len > 19) {
-    uint16_t raw = (a0[18] << 8) | a0[19];
-    out.abs_pressure_mbar = (float)raw;
+  if (a0Len > 31) {  // accelerator_pct: pas de virgule fixe 32 bits sous 0.0005
+    uint16_t raw = (a0[30] << 8) | a0[31];
+    out.accelerator_pct = (float)raw * 0.017175313731705624f + -0.9207522541483826f;
   }
-
-  // air_flow_estimate_mgcp (mae=5.32 n=509)
-  if (a0Len > 21) {
-    uint16_t raw = (a0[20] << 8) | a0[21];
-    out.air_flow_estimate_mgcp = (float)raw / 10.0f;
+  if (a0Len > 23) {  // air_flow_request_mgcp: pas de virgule fixe 32 bits sous 0.5
+    uint16_t raw = (a0[22] << 8) | a0[23];
+    out.air_flow_request_mgcp = (float)raw * 1.1960259168227778f + -74.44171829109968f;
   }
-
-  // speed_kmh (mae=0.78 n=510)
-  if (a0Len > 25) {
+  if (a0Len > 25) {  // speed_kmh: pas de virgule fixe 32 bits sous 0.0005
     uint16_t raw = (a0[24] << 8) | a0[25];
     out.speed_kmh = (float)raw * 0.0076758257804214565f + 0.5328163584628314f;
   }
-
-  // rail_pressure_bar (mae=18.99 n=510)
-  if (a0Len > 27) {
+  if (a0Len > 27) {  // rail_pressure_bar: pas de virgule fixe 32 bits sous 0.05
     uint16_t raw = (a0[26] << 8) | a0[27];
-    out.rail_pressure_bar = (float)raw / 10.0f;
-  }
-
-  // rail_pressure_control_bar (mae=0.01 n=400)
-  if (a0Len > 15) {
-    uint16_t raw = (a0[14] << 8) | a0[15];
-    out.rail_pressure_control_bar = (float)raw / 1000.0f;
+    out.rail_pressure_bar = (float)raw * 0.09610612095902707f + 22.245939586268832f;
   }
-
-  // desired_egr_position_pct (mae=0.01 n=510)
-  if (a5Len > 7) {
-    uint16_t raw = (a5[6] << 8) | a5[7];
-    out.desired_egr_position_pct = (float)raw * -4.2779983956687014e-05f + 35.34682533998348f;
+  if (a0Len > 29) {  // rail_pressure_control_bar: pas de virgule fixe 32 bits sous 0.05
+    uint16_t raw = (a0[28] << 8) | a0[29];
+    out.rail_pressure_control_bar = (float)raw * 0.09623894267952157f + 19.68475517680929f;
   }
-
-  // egr_position_pct (mae=0.83 n=510)
-  if (a0Len > 37) {
+  if (a0Len > 37) {  // egr_position_pct: pas de virgule fixe 32 bits sous 0.0005
     uint16_t raw = (a0[36] << 8) | a0[37];
     out.egr_position_pct = (float)raw * 0.09544619466159861f + 26.493944429533997f;
   }
-
-  // engine_temp_c (mae=0.88 n=510)
-  if (a2Len > 25) {
+  if (a2Len > 25) {  // engine_temp_c: pas de virgule fixe 32 bits sous 0.05
     uint16_t raw = (a2[24] << 8) | a2[25];
     out.engine_temp_c = (float)raw * 0.07335171995784256f + -183.22408684236524f;
   }
-
-  // air_temp_c (mae=0.04 n=510)
-  if (a2Len > 21) {
-    uint16_t raw = (a2[20] << 8) | a2[21];
-    out.air_temp_c = (float)raw * 0.09561560498782616f + -260.3825049781947f;
+  if (a0Len > 35) {  // engine_rpm: pas de virgule fixe 32 bits sous 0.5
+    uint16_t raw = (a0[34] << 8) | a0[35];
+    out.engine_rpm = (float)raw * 2.2884172135642378f + -1186.340664743358f;
   }
 
-  // engine_rpm (mae=inf n=0)
-  if (a2Len > 13) {
-    uint16_t raw = (a2[12] << 8) | a2[13];
-    out.engine_rpm = (float)raw * 8.0f;
   }
 
-  }
+
 
 
 
@@ -23,8 +23,12 @@
 //
 //  MODE EMBARQUÉ (sans SPIFFS):
 //  - Définis USE_EMBEDDED_DATA pour utiliser les données compilées dans le sketch.
-//  - Génère le tableau avec: python3 tools/sz_embed.py medias/sz_sync_ocr.jsonl
+//  - Génère le tableau avec: python3 tools/sz_embed.py medias/sz_sync_ocr.jsonl [--raw]
 //  - Copie-colle le résultat dans sz_data.h (ou inclus-le ici).
+//  - Par défaut sz_data.h est une table binaire (SZ_DATA_FORMAT_BINARY):
+//    enregistrements de taille fixe (valeurs float + bitmap + pages brutes
+//    optionnelles), lus par memcpy sans parser de JSON. L'ancien format
+//    (chaînes JSON, --format json) reste supporté.
 // ============================================================
 
 // Active le mode embarqué (désactive SPIFFS)
@@ -37,7 +41,7 @@
 
 // --- Identité ---
 static const char* app_name = "SZ Replay MQTT";
-static const char* version  = "0.3.0";
+static const char* version  = "0.4.0";
 
 // --- WiFi/MQTT ---
 WiFiMulti wifiMulti;
@@ -173,6 +177,93 @@ static bool replaySyncOcrLine(const String& line) {
   return true;
 }
 
+#if defined(USE_EMBEDDED_DATA) && defined(SZ_DATA_FORMAT_BINARY)
+// --- MODE 1 bis : enregistrement binaire de sz_data.h (pas de JSON à parser) ---
+#if SZ_DATA_RAW_PAGES
+static void appendHex(String& out, const uint8_t* b, uint8_t n) {
+  static const char* HEX_DIGITS = "0123456789ABCDEF";
+  out.reserve(out.length() + 2 * n);
+  for (uint8_t i = 0; i < n; i++) {
+    out += HEX_DIGITS[b[i] >> 4];
+    out += HEX_DIGITS[b[i] & 0x0F];
+  }
+}
+#endif
+
+static bool replayBinaryRecord(uint16_t idx) {
+  SzDataRecord rec;
+  szDataRead(idx, rec);
+
+  StaticJsonDocument<1536> out;
+  out["app"] = app_name;
+  out["ver"] = version;
+  out["mode"] = "replay";
+  out["ts_ms"] = (uint32_t)millis();
+  out["t_ms"] = rec.t_ms;
+  out["frame_idx"] = idx + 1;
+
+  // 20 champs SZ Viewer: seulement ceux présents (bit à 1 dans `valid`)
+  JsonObject valuesOut = out.createNestedObject("values");
+  for (uint8_t i = 0; i < SZ_DATA_FIELD_COUNT; i++) {
+    if (rec.valid & (1UL << i)) valuesOut[SZ_DATA_FIELDS[i]] = rec.values[i];
+    else valuesOut[SZ_DATA_FIELDS[i]] = nullptr;
+  }
+
+#if SZ_DATA_RAW_PAGES
+  // Page absente de la capture (SZ_DATA_<page>_MAX = 0): pas de champ dans SzDataRecord, chaîne vide
+  String a0, a2, a5, cd;
+#if SZ_DATA_21A0_MAX
+  appendHex(a0, rec.raw21A0, rec.len21A0);
+#endif
+#if SZ_DATA_21A2_MAX
+  appendHex(a2, rec.raw21A2, rec.len21A2);
+#endif
+#if SZ_DATA_21A5_MAX
+  appendHex(a5, rec.raw21A5, rec.len21A5);
+#endif
+#if SZ_DATA_21CD_MAX
+  appendHex(cd, rec.raw21CD, rec.len21CD);
+#endif
+  JsonObject rawOut = out.createNestedObject("raw");
+  rawOut["21A0"] = a0;
+  rawOut["21A2"] = a2;
+  rawOut["21A5"] = a5;
+  rawOut["21CD"] = cd;
+#endif
+
+  char payload[1536];
+  size_t n = serializeJson(out, payload, sizeof(payload));
+  if (n >= sizeof(payload)) {
+    Serial.printf("[PUB] ERREUR: JSON trop gros (%d >= %d)\n", n, sizeof(payload));
+    return false;
+  }
+  if (!mqtt.connected()) {
+    Serial.println("[PUB] ERREUR: MQTT non connecté");
+    return false;
+  }
+  bool pub1 = mqtt.publish(topic_sz, (uint8_t*)payload, n, false); // QoS 0, no retain
+  Serial.printf("[PUB] %s: %s (%d bytes, rec %u)\n", topic_sz, pub1 ? "OK" : "FAIL", n, idx);
+
+#if SZ_DATA_RAW_PAGES
+  // Optionnel: raw-only debug
+  StaticJsonDocument<768> dbg;
+  dbg["ts_ms"] = (uint32_t)millis();
+  dbg["t_ms"] = rec.t_ms;
+  dbg["21A0"] = a0;
+  dbg["21A2"] = a2;
+  dbg["21A5"] = a5;
+  dbg["21CD"] = cd;
+  char payload2[1024];
+  size_t n2 = serializeJson(dbg, payload2, sizeof(payload2));
+  if (n2 < sizeof(payload2)) {
+    bool pub2 = mqtt.publish(topic_debug, (uint8_t*)payload2, n2, false);
+    Serial.printf("[PUB] %s: %s (%d bytes)\n", topic_debug, pub2 ? "OK" : "FAIL", n2);
+  }
+#endif
+  return true;
+}
+#endif
+
 // --- MODE 2 : parsing minimal `trames.log` (raw-only) ---
 // Objectif: regrouper les dernières réponses 21A0/21A2/21A5/21CD par seconde HH:MM:SS
 static bool parseTramesAndPublishChunk(File& f) {
@@ -405,9 +496,17 @@ void loop() {
       lastPublishMs = millis();
 
       if (replayMode == MODE_SYNC_OCR) {
+#if defined(USE_EMBEDDED_DATA) && defined(SZ_DATA_FORMAT_BINARY)
+        // Mode embarqué binaire: un enregistrement de taille fixe, sans JSON à parser
+        if (embeddedLineIdx >= embeddedLineCount) {
+          embeddedLineIdx = 0; // reboucle
+        }
+        replayBinaryRecord(embeddedLineIdx);
+        embeddedLineIdx++;
+#else
         String line;
 #ifdef USE_EMBEDDED_DATA
-        // Mode embarqué: lit depuis le tableau
+        // Mode embarqué (chaînes JSON): lit depuis le tableau
         if (embeddedLineIdx >= embeddedLineCount) {
           embeddedLineIdx = 0; // reboucle
         }
@@ -425,6 +524,7 @@ void loop() {
           // si ligne illisible, on saute
           break;
         }
+#endif
       } else if (replayMode == MODE_TRAMES_RAW) {
         if (!parseTramesAndPublishChunk(replayFile)) {
           replayFile.close();
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Parse un log Car Scanner (medias/car-scanner-log.txt) en flux et exporte les
+réponses OBD2 mode 01 en séries par PID (CSV colonne par PID).
+
+Le log mélange init ELM, tentatives de reconnexion, annotations `[...]`
+(dont `[cmd_reply=]` qui répète une réponse: ignorée) et des échanges
+`<requête><réponse>>` collés, ex: `010C184F17A410C00003C>`.
+
+Trames KWP (cf. docs/OBD2_PIDS_K9K.md):
+  84 F1 7A 41 0C 00 00 3C
+  │  │  │  └──────────┴─ 4 octets de données (format & 0x3F): 41 = mode 01, 0C = PID, A B
+  │  │  └─ source (ECU)            dernier octet = checksum (somme des octets précédents & 0xFF)
+  │  └─ cible (testeur F1)
+  └─ format (0x80 | longueur)
+Seules les trames dont le checksum est bon sont gardées; le PID vient de la
+réponse (l'ELM renvoie parfois la réponse d'une requête précédente).
+
+Sessions: découpées sur `LOG STARTED` / `DISCONNECTED`. Le log n'a pas d'horodatage
+par réponse: chaque série porte (session, seq) où seq est l'index de l'échange dans
+la session; sessions.csv donne début/fin de chaque session pour interpoler un temps.
+
+Mémoire constante: lecture par blocs, découpe sur `>` et fin de ligne, un fichier
+CSV ouvert par PID (écrit au fil de l'eau).
+
+Sortie (--out-dir):
+  sessions.csv              session,start,end,exchanges,mode01,bad_checksum,negative
+  pid_0C_engine_rpm.csv     session,seq,value,raw
+  atrv_battery_v.csv        tension ATRV (pas un PID, même format)
+
+Usage:
+  python3 tools/obd2_carscanner_parse.py medias/car-scanner-log.txt --out-dir /tmp/carscanner
+  python3 tools/obd2_carscanner_parse.py medias/car-scanner-log.txt   # résumé seul
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import re
+import sys
+from pathlib import Path
+from typing import IO, Callable, Dict, Generator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+
+# PID → (nom, unité, octets de données, formule SAE J1979, champ SZ correspondant ou "")
+Formula = Callable[[bytes], float]
+PIDS: Dict[int, Tuple[str, str, int, Formula, str]] = {
+    0x04: ("engine_load", "%", 1, lambda d: d[0] * 100.0 / 255.0, ""),
+    0x05: ("coolant_temp", "°C", 1, lambda d: d[0] - 40.0, "engine_temp_c"),
+    0x0B: ("map", "kPa", 1, lambda d: float(d[0]), "bar_pressure_kpa"),
+    0x0C: ("engine_rpm", "tr/min", 2, lambda d: (d[0] * 256 + d[1]) / 4.0, "engine_rpm"),
+    0x0D: ("speed", "km/h", 1, lambda d: float(d[0]), "speed_kmh"),
+    0x0F: ("intake_temp", "°C", 1, lambda d: d[0] - 40.0, "intake_c"),
+    0x10: ("maf", "g/s", 2, lambda d: (d[0] * 256 + d[1]) / 100.0, "air_flow_estimate_mgcp"),
+    0x11: ("throttle", "%", 1, lambda d: d[0] * 100.0 / 255.0, "accelerator_pct"),
+    0x1C: ("obd_std", "", 1, lambda d: float(d[0]), ""),
+    0x21: ("distance_mil", "km", 2, lambda d: float(d[0] * 256 + d[1]), ""),
+    0x23: ("rail_pressure", "kPa", 2, lambda d: (d[0] * 256 + d[1]) * 10.0, "rail_pressure_bar"),
+    0x33: ("baro", "kPa", 1, lambda d: float(d[0]), ""),
+    0x42: ("module_voltage", "V", 2, lambda d: (d[0] * 256 + d[1]) / 1000.0, "battery_v"),
+    0x46: ("ambient_temp", "°C", 1, lambda d: d[0] - 40.0, ""),
+}
+# PIDs bitmap / statut: gardés en brut (value vide)
+RAW_PIDS = {0x00: "supported_01_20", 0x01: "monitor_status", 0x20: "supported_21_40", 0x40: "supported_41_60"}
+
+FRAME_START_RE = re.compile(r"[89AB][0-9A-F]F1[0-9A-F]{2}")
+ATRV_RE = re.compile(r"^ATRV\s*(\d+(?:\.\d+)?)\s*V")
+SESSION_START_RE = re.compile(r"LOG STARTED:\s*([0-9.]+\s+[0-9:]+)")
+SESSION_END_RE = re.compile(r"DISCONNECTED AT:\s*([0-9.]+\s+[0-9:]+)")
+MAX_TOKEN = 1 << 20  # garde-fou: un jeton sans `>` ni fin de ligne n'est jamais gardé au-delà
+
+
+def iter_tokens(f: IO[str], chunk_size: int = 65536) -> Generator[str, None, None]:
+    """Découpe le flux sur `>` et fin de ligne, sans jamais charger plus d'un bloc."""
+    carry = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        parts = re.split(r"[>\n]", carry + chunk)
+        carry = parts.pop()
+        if len(carry) > MAX_TOKEN:
+            carry = carry[-MAX_TOKEN:]
+        for p in parts:
+            if p:
+                yield p
+    if carry:
+        yield carry
+
+
+def iter_kwp_frames(token: str) -> Generator[bytes, None, None]:
+    """Trames KWP (en-tête format/cible/source … checksum) trouvées dans un jeton hex, checksum vérifié."""
+    pos = 0
+    while True:
+        m = FRAME_START_RE.search(token, pos)
+        if not m:
+            return
+        start = m.start()
+        n = int(token[start : start + 2], 16) & 0x3F
+        end = start + 2 * (3 + n + 1)
+        try:
+            frame = bytes.fromhex(token[start:end]) if end <= len(token) else b""
+        except ValueError:
+            frame = b""
+        if len(frame) == 3 + n + 1 and (sum(frame[:-1]) & 0xFF) == frame[-1]:
+            yield frame
+            pos = end
+        else:
+            pos = start + 1
+
+
+class SessionStats:
+    def __init__(self, index: int, start: str) -> None:
+        self.index = index
+        self.start = start
+        self.end = ""
+        self.exchanges = 0
+        self.mode01 = 0
+        self.bad_checksum = 0
+        self.negative = 0
+
+    def row(self) -> List[object]:
+        return [self.index, self.start, self.end, self.exchanges, self.mode01, self.bad_checksum, self.negative]
+
+
+class ColumnWriter:
+    """Un CSV par série (PID ou ATRV), ouvert à la première valeur."""
+
+    def __init__(self, out_dir: Optional[Path]) -> None:
+        self.out_dir = out_dir
+        self.files: Dict[str, Tuple[IO[str], "csv._writer"]] = {}
+        self.counts: Dict[str, int] = {}
+        self.last: Dict[str, object] = {}
+
+    def write(self, series: str, session: int, seq: int, value: Optional[float], raw: str) -> None:
+        self.counts[series] = self.counts.get(series, 0) + 1
+        self.last[series] = value if value is not None else raw
+        if self.out_dir is None:
+            return
+        entry = self.files.get(series)
+        if entry is None:
+            fh = (self.out_dir / f"{series}.csv").open("w", encoding="utf-8", newline="")
+            w = csv.writer(fh)
+            w.writerow(["session", "seq", "value", "raw"])
+            entry = self.files[series] = (fh, w)
+        entry[1].writerow([session, seq, "" if value is None else round(value, 4), raw])
+
+    def close(self) -> None:
+        for fh, _ in self.files.values():
+            fh.close()
+
+
+def series_name(pid: int) -> str:
+    name = PIDS[pid][0] if pid in PIDS else RAW_PIDS.get(pid, "unknown")
+    return f"pid_{pid:02X}_{name}"
+
+
+def parse_log(f: IO[str], writer: ColumnWriter) -> List[SessionStats]:
+    sessions: List[SessionStats] = []
+    cur: Optional[SessionStats] = None
+    seq = 0
+    for token in iter_tokens(f):
+        token = token.strip()
+        if not token:
+            continue
+        m = SESSION_START_RE.search(token)
+        if m:
+            cur = SessionStats(len(sessions) + 1, m.group(1))
+            sessions.append(cur)
+            seq = 0
+            continue
+        m = SESSION_END_RE.search(token)
+        if m:
+            if cur is not None:
+                cur.end = m.group(1)
+            cur = None
+            continue
+        if cur is None or token.startswith("["):
+            continue  # hors session, ou annotation ([cmd_reply=] répète la réponse)
+        m = ATRV_RE.match(token)
+        if m:
+            seq += 1
+            cur.exchanges += 1
+            writer.write("atrv_battery_v", cur.index, seq, float(m.group(1)), token[4:].strip())
+            continue
+        if not token.startswith("01") and "F1" not in token:
+            continue
+        seq += 1
+        cur.exchanges += 1
+        hex_only = re.sub(r"[^0-9A-F]", "", token.upper())
+        found = False
+        for frame in iter_kwp_frames(hex_only):
+            found = True
+            data = frame[3:-1]
+            if data[:1] == b"\x7F":
+                cur.negative += 1
+                continue
+            if len(data) < 2 or data[0] != 0x41:
+                continue  # autres modes (09, 03...): hors périmètre
+            cur.mode01 += 1
+            pid, payload = data[1], data[2:]
+            value = None
+            if pid in PIDS:
+                _, _, nbytes, formula, _ = PIDS[pid]
+                if len(payload) >= nbytes:
+                    value = formula(payload)
+            writer.write(series_name(pid), cur.index, seq, value, payload.hex().upper())
+        if not found and FRAME_START_RE.search(hex_only):
+            cur.bad_checksum += 1
+    return sessions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Log Car Scanner → séries OBD2 mode 01 par PID (CSV), en flux")
+    ap.add_argument("log", nargs="?", default="medias/car-scanner-log.txt", help="Log Car Scanner")
+    ap.add_argument("--out-dir", type=Path, default=None, help="Dossier de sortie (un CSV par PID + sessions.csv); sans: résumé seul")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    log_path = Path(args.log)
+    if not log_path.exists():
+        print(f"Fichier introuvable: {log_path}", file=sys.stderr)
+        return 1
+    if args.out_dir:
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+    writer = ColumnWriter(args.out_dir)
+    try:
+        # newline="": garder les \r tels quels (ils séparent requête et réponse)
+        with stage("parse log"), log_path.open("r", encoding="utf-8", errors="replace", newline="") as f:
+            sessions = parse_log(f, writer)
+    finally:
+        writer.close()
+    if args.out_dir:
+        with (args.out_dir / "sessions.csv").open("w", encoding="utf-8", newline="") as fh:
+            w = csv.writer(fh)
+            w.writerow(["session", "start", "end", "exchanges", "mode01", "bad_checksum", "negative"])
+            for s in sessions:
+                w.writerow(s.row())
+
+    active = [s for s in sessions if s.mode01]
+    print(f"# {len(sessions)} sessions ({len(active)} avec données mode 01)", file=sys.stderr)
+    for s in active:
+        print(f"#   session {s.index}: {s.start} → {s.end or '?'} · {s.exchanges} échanges, {s.mode01} réponses 01, "
+              f"{s.bad_checksum} checksum KO, {s.negative} négatives", file=sys.stderr)
+    print(f"{'série':32s} {'n':>6s}  {'dernière':>12s}  champ SZ")
+    for series in sorted(writer.counts):
+        pid = int(series[4:6], 16) if series.startswith("pid_") else None
+        sz = PIDS[pid][4] if pid in PIDS else ("battery_v" if series.startswith("atrv") else "")
+        last = writer.last[series]
+        last_s = f"{last:.2f}" if isinstance(last, float) else str(last)
+        print(f"{series:32s} {writer.counts[series]:6d}  {last_s:>12s}  {sz}")
+    total = sum(writer.counts.values())
+    dest = f" → {args.out_dir}" if args.out_dir else ""
+    print(f"OK: {total} valeurs, {len(writer.counts)} séries{dest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Planificateur de requêtes OBD2 mode 01 groupées (jusqu'à 6 PIDs par requête).
+
+1. PIDs supportés: bitmaps 0100 / 0120 / 0140 lus dans le log Car Scanner
+   (ou passés en hex: --bitmap 00:98398011 --bitmap 20:A0000000).
+2. Plan: les PIDs voulus (défaut: ceux de pollObd2AndCollect) non supportés sont
+   écartés, les autres regroupés par requêtes de --max-per-request PIDs (max 6),
+   avec le nombre de réponses attendues en suffixe (`010C0D111` = 1 trame): l'ELM
+   rend la main dès la réponse reçue au lieu d'attendre son timeout.
+3. Mesure: un émulateur ELM327 local (TCP, comme un vLinker WiFi) répond avec le
+   timing K-line calibré sur recording/jimny_capture.log (AT ≈ 10 ms, requête ECU
+   ≈ latence fixe + ~2 ms/octet). On compare le temps de cycle:
+     - baseline : une requête par PID, sans suffixe (firmware actuel)
+     - suffixe  : une requête par PID, avec suffixe de nombre de réponses
+     - groupé   : le plan
+   pour chaque comportement ECU simulé (--ecu-multi):
+     combined  une trame 41 PID A.. PID A.. (CAN / ECU tolérant)
+     per-pid   une trame par PID
+     first-only seul le premier PID répond (K-line strict: SAE J1979 ne garantit
+                les requêtes multi-PID que sur CAN; le K9K est en KWP) → le plan
+                retombe sur le mode "suffixe"
+4. Sortie: plan JSON (--out) + extrait C à coller dans le firmware (--c-out), pour le
+   comportement ECU retenu (--ecu-multi, ou --plan-ecu quand --ecu-multi all): suffixe
+   de chaque requête groupée (1 trame en combined, une par PID en per-pid), table de
+   repli une requête par PID (OBD2_POLL_FALLBACK) et OBD2_POLL_PLAN_NEEDS_FALLBACK = 1
+   si le plan groupé perd des PIDs avec cette ECU (first-only). --plan-ecu vaut first-only
+   par défaut: tant que le multi-PID n'est pas validé sur le K9K, l'extrait C part sur le
+   repli; combined / per-pid sont à demander explicitement.
+
+Usage:
+  python3 tools/obd2_poll_planner.py
+  python3 tools/obd2_poll_planner.py --pids 0C,0D,11,05,0B,10,23 --cycles 10 --out /tmp/plan.json --c-out /tmp/obd2_poll_plan.h
+  python3 tools/obd2_poll_planner.py --ecu-multi first-only --time-scale 1
+  python3 tools/obd2_poll_planner.py --plan-ecu combined --c-out /tmp/obd2_poll_plan.h   # ECU validée multi-PID
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from obd2_carscanner_parse import PIDS, RAW_PIDS, ColumnWriter, iter_kwp_frames, parse_log, series_name
+from sz_parse_ms_log import LOG_LINE_RE, hhmmss_ms_to_sec
+
+# PIDs lus par pollObd2AndCollect (esp32/sz-mqtt), dans cet ordre
+FIRMWARE_PIDS = [0x05, 0x0B, 0x0C, 0x0D, 0x10, 0x11, 0x23]
+MAX_PIDS_PER_REQUEST = 6  # SAE J1979 / ISO 15031-5
+KWP_MAX_DATA = 63  # octets de données d'une trame KWP (format & 0x3F)
+ECU_HEADER = bytes([0xF1, 0x7A])  # cible testeur, source ECU (comme dans le log Car Scanner)
+ECU_MULTI_MODES = ("combined", "per-pid", "first-only")
+
+
+def pid_data_len(pid: int) -> Optional[int]:
+    """Octets de données d'un PID mode 01 (None si inconnu)."""
+    if pid in PIDS:
+        return PIDS[pid][2]
+    if pid in RAW_PIDS:
+        return 4
+    return None
+
+
+def decode_supported(base: int, bitmap: bytes) -> List[int]:
+    """Bitmap 4 octets de 01<base> → PIDs supportés (base+1 .. base+32)."""
+    bits = int.from_bytes(bitmap[:4], "big")
+    return [base + i + 1 for i in range(32) if bits & (1 << (31 - i))]
+
+
+def supported_from_log(path: Path) -> Dict[int, bytes]:
+    """Dernier bitmap 0100/0120/0140 vu dans un log Car Scanner."""
+    writer = ColumnWriter(None)
+    with path.open("r", encoding="utf-8", errors="replace", newline="") as f:
+        parse_log(f, writer)
+    out: Dict[int, bytes] = {}
+    for base in (0x00, 0x20, 0x40):
+        raw = writer.last.get(series_name(base))
+        if isinstance(raw, str) and len(raw) >= 8:
+            out[base] = bytes.fromhex(raw[:8])
+    return out
+
+
+def build_plan(wanted: Sequence[int], supported: Sequence[int], max_per_request: int) -> Tuple[List[List[int]], List[int]]:
+    """Regroupe les PIDs voulus et supportés; retourne (groupes, PIDs écartés)."""
+    groups: List[List[int]] = []
+    dropped: List[int] = []
+    cur: List[int] = []
+    cur_bytes = 1  # octet de service 0x41
+    for pid in wanted:
+        n = pid_data_len(pid)
+        if pid not in supported or n is None:
+            dropped.append(pid)
+            continue
+        if cur and (len(cur) >= max_per_request or cur_bytes + 1 + n > KWP_MAX_DATA):
+            groups.append(cur)
+            cur, cur_bytes = [], 1
+        cur.append(pid)
+        cur_bytes += 1 + n
+    if cur:
+        groups.append(cur)
+    return groups, dropped
+
+
+def request_cmd(pids: Sequence[int], responses: Optional[int]) -> str:
+    """`01` + PIDs (+ nombre de réponses attendues, 1 chiffre hex, pour que l'ELM n'attende pas son timeout)."""
+    cmd = "01" + "".join(f"{p:02X}" for p in pids)
+    return cmd + (f"{responses:X}" if responses else "")
+
+
+def expected_responses(pids: Sequence[int], ecu_multi: str) -> int:
+    """Trames rendues par l'ECU pour une requête groupée: une par PID en per-pid, sinon une."""
+    return len(pids) if ecu_multi == "per-pid" else 1
+
+
+def kwp_frame(data: bytes) -> bytes:
+    body = bytes([0x80 | len(data)]) + ECU_HEADER + data
+    return body + bytes([sum(body) & 0xFF])
+
+
+def parse_mode01_response(text: str) -> Dict[int, bytes]:
+    """Réponse ELM (une ou plusieurs trames KWP) → {PID: données}; gère les trames 41 combinées."""
+    hex_only = "".join(c for c in text.upper() if c in "0123456789ABCDEF")
+    out: Dict[int, bytes] = {}
+    for frame in iter_kwp_frames(hex_only):
+        data = frame[3:-1]
+        if not data or data[0] != 0x41:
+            continue
+        pos = 1
+        while pos < len(data):
+            pid = data[pos]
+            n = pid_data_len(pid)
+            if n is None or pos + 1 + n > len(data):
+                break
+            out[pid] = data[pos + 1 : pos + 1 + n]
+            pos += 1 + n
+    return out
+
+
+# --- Calibration du timing sur une capture réelle ---
+
+def calibrate_from_capture(log_path: Path) -> Dict[str, float]:
+    """
+    Temps aller-retour (SEND → RECV contenant 0D0D3E) de la capture ms:
+      - at_ms: médiane des commandes AT (lien BLE + ELM)
+      - ecu_ms / per_byte_ms: moindres carrés rtt = ecu_ms + per_byte_ms × octets ECU
+    """
+    at_rtts: List[float] = []
+    ecu: List[Tuple[float, float]] = []
+    send: Optional[Tuple[float, str]] = None
+    buf = ""
+    with log_path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            m = LOG_LINE_RE.match(line.strip())
+            if not m:
+                continue
+            t = hhmmss_ms_to_sec(m.group(1))
+            if m.group(2) == "SEND":
+                send, buf = (t, m.group(3).strip().upper()), ""
+                continue
+            if send is None:
+                continue
+            buf += (m.group(3) or "").replace(" ", "").upper()
+            if "0D0D3E" not in buf:
+                continue
+            rtt_ms = (t - send[0]) * 1000.0
+            cmd = send[1]
+            send = None
+            if cmd.startswith("AT"):
+                if not cmd.startswith(("ATZ", "ATFI", "ATSI")):  # reset / init lente
+                    at_rtts.append(rtt_ms)
+            elif "4E4F2044415441" not in buf:  # "NO DATA" en hex ASCII
+                ascii_len = len(buf) // 2
+                ecu.append(((ascii_len - 3) / 2.0, rtt_ms))  # ~2 caractères par octet ECU
+    out = {"at_ms": 10.0, "ecu_ms": 120.0, "per_byte_ms": 2.0, "samples": float(len(ecu))}
+    if at_rtts:
+        out["at_ms"] = statistics.median(at_rtts)
+    if len(ecu) >= 2:
+        xs = [x for x, _ in ecu]
+        ys = [y for _, y in ecu]
+        mx, my = statistics.fmean(xs), statistics.fmean(ys)
+        sxx = sum((x - mx) ** 2 for x in xs)
+        if sxx > 0:
+            slope = sum((x - mx) * (y - my) for x, y in ecu) / sxx
+            out["per_byte_ms"] = max(0.0, slope)
+            out["ecu_ms"] = max(0.0, my - slope * mx)
+    return out
+
+
+# --- Émulateur ELM327 (TCP) ---
+
+class ElmEmulator:
+    """
+    ELM327 + ECU KWP simulés. Timing d'une requête mode 01:
+      link_ms + p2_ms + per_byte_ms × octets des trames + (wait_ms si pas de suffixe)
+    (wait_ms = attente de l'ELM d'éventuelles réponses supplémentaires avant `>`).
+    Les délais sont multipliés par time_scale (0.1 = 10× plus rapide que le réel).
+    """
+
+    def __init__(self, timing: Dict[str, float], supported: Sequence[int], values: Dict[int, bytes], ecu_multi: str, time_scale: float) -> None:
+        self.timing = timing
+        self.supported = set(supported)
+        self.values = values
+        self.ecu_multi = ecu_multi
+        self.time_scale = time_scale
+        emulator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                self.wfile.write(b"ELM327 v2.2\r\r>")
+                buf = b""
+                while True:
+                    ch = self.rfile.read(1)
+                    if not ch:
+                        return
+                    if ch != b"\r":
+                        buf += ch
+                        continue
+                    reply = emulator.answer(buf.decode("ascii", errors="replace").strip().upper())
+                    buf = b""
+                    self.wfile.write(reply.encode("ascii") + b"\r\r>")
+                    self.wfile.flush()
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> "ElmEmulator":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _sleep(self, ms: float) -> None:
+        if ms > 0:
+            time.sleep(ms * self.time_scale / 1000.0)
+
+    def answer(self, cmd: str) -> str:
+        t = self.timing
+        if not cmd.startswith("01"):
+            self._sleep(t["link_ms"])
+            if cmd == "ATRV":
+                return "12.6V"
+            return "OK" if cmd.startswith("AT") else "?"
+        body = cmd[2:]
+        count = None
+        if len(body) % 2 == 1:  # suffixe: nombre de réponses attendues
+            count = int(body[-1], 16)
+            body = body[:-1]
+        pids = [int(body[i : i + 2], 16) for i in range(0, len(body), 2)]
+        pids = [p for p in pids if p in self.supported and p in self.values]
+        if self.ecu_multi == "first-only":
+            pids = pids[:1]
+        if not pids:
+            self._sleep(t["link_ms"] + t["p2_ms"] + t["wait_ms"])
+            return "NO DATA"
+        if self.ecu_multi == "combined" or len(pids) == 1:
+            frames = [kwp_frame(bytes([0x41]) + b"".join(bytes([p]) + self.values[p] for p in pids))]
+        else:
+            frames = [kwp_frame(bytes([0x41, p]) + self.values[p]) for p in pids]
+        n_bytes = sum(len(f) for f in frames)
+        waits = count is None or count > len(frames)
+        self._sleep(t["link_ms"] + t["p2_ms"] + t["per_byte_ms"] * n_bytes + (t["wait_ms"] if waits else 0.0))
+        return "\r".join(f.hex().upper() for f in frames)
+
+
+class ElmClient:
+    def __init__(self, port: int) -> None:
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buf = b""
+        self._read_prompt()
+
+    def _read_prompt(self) -> str:
+        while b">" not in self._buf:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("émulateur ELM fermé")
+            self._buf += chunk
+        out, _, self._buf = self._buf.partition(b">")
+        return out.decode("ascii", errors="replace")
+
+    def query(self, cmd: str) -> str:
+        self.sock.sendall(cmd.encode("ascii") + b"\r")
+        return self._read_prompt()
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def run_cycles(client: ElmClient, requests: Sequence[Tuple[str, List[int]]], cycles: int) -> Tuple[float, int, int]:
+    """Temps moyen d'un cycle (s, temps mur), PIDs obtenus / attendus sur le dernier cycle."""
+    got: Dict[int, bytes] = {}
+    t0 = time.perf_counter()
+    for _ in range(cycles):
+        got = {}
+        for cmd, _ in requests:
+            got.update(parse_mode01_response(client.query(cmd)))
+        client.query("ATRV")
+    dt = (time.perf_counter() - t0) / max(1, cycles)
+    expected = {p for _, pids in requests for p in pids}
+    return dt, len(expected & set(got)), len(expected)
+
+
+def default_values() -> Dict[int, bytes]:
+    """Valeurs plausibles (moteur tournant) pour l'émulateur."""
+    vals = {0x04: "40", 0x05: "70", 0x0B: "65", 0x0C: "0C80", 0x0D: "2A", 0x0F: "32", 0x10: "0470", 0x11: "25",
+            0x1C: "06", 0x21: "0000", 0x23: "0D60", 0x33: "64", 0x42: "3138", 0x46: "28"}
+    return {p: bytes.fromhex(v) for p, v in vals.items()}
+
+
+def c_snippet(groups: Sequence[Sequence[int]], fallback: bool, ecu_multi: str) -> str:
+    kept = [p for g in groups for p in g]
+    lines = [
+        "// Plan de requêtes OBD2 mode 01 — généré par tools/obd2_poll_planner.py",
+        "// Chaque requête: commande ELM (suffixe = nb de réponses attendues), PIDs et octets de données",
+        "// dans l'ordre de la réponse (41 PID A [B..] PID A [B..] ...).",
+        f"// Comportement ECU retenu: {ecu_multi}.",
+        "struct Obd2PollRequest {",
+        "  const char* cmd;",
+        "  uint8_t pidCount;",
+        "  uint8_t pids[6];",
+        "  uint8_t lens[6];",
+        "};",
+        "",
+        "static const Obd2PollRequest OBD2_POLL_PLAN[] = {",
+    ]
+    for g in groups:
+        pids = ", ".join(f"0x{p:02X}" for p in g)
+        lens = ", ".join(str(pid_data_len(p)) for p in g)
+        lines.append(f'  {{ "{request_cmd(g, expected_responses(g, ecu_multi))}", {len(g)}, {{ {pids} }}, {{ {lens} }} }},')
+    lines += [
+        "};",
+        "static const uint8_t OBD2_POLL_PLAN_COUNT = sizeof(OBD2_POLL_PLAN) / sizeof(OBD2_POLL_PLAN[0]);",
+        "",
+        "// Repli si l'ECU ne répond qu'au premier PID (K-line): une requête par PID avec suffixe \"1\".",
+        "static const Obd2PollRequest OBD2_POLL_FALLBACK[] = {",
+    ]
+    for p in kept:
+        lines.append(f'  {{ "{request_cmd([p], 1)}", 1, {{ 0x{p:02X} }}, {{ {pid_data_len(p)} }} }},')
+    lines += [
+        "};",
+        "static const uint8_t OBD2_POLL_FALLBACK_COUNT = sizeof(OBD2_POLL_FALLBACK) / sizeof(OBD2_POLL_FALLBACK[0]);",
+        "// 1 = le plan groupé perd des PIDs avec cette ECU (mesuré sur l'émulateur): utiliser OBD2_POLL_FALLBACK.",
+        f"#define OBD2_POLL_PLAN_NEEDS_FALLBACK {1 if fallback else 0}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def parse_pid_list(s: str) -> List[int]:
+    out = []
+    for tok in s.split(","):
+        tok = tok.strip().upper()
+        if tok.startswith("01") and len(tok) == 4:
+            tok = tok[2:]
+        if tok:
+            out.append(int(tok, 16))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Plan de requêtes OBD2 multi-PID + mesure du temps de cycle sur émulateur ELM")
+    ap.add_argument("--log", default="medias/car-scanner-log.txt", help="Log Car Scanner (bitmaps 0100/0120)")
+    ap.add_argument("--bitmap", action="append", default=[], metavar="BASE:HEX", help="Bitmap explicite, ex: 00:98398011 (remplace le log)")
+    ap.add_argument("--pids", default=",".join(f"{p:02X}" for p in FIRMWARE_PIDS), help="PIDs voulus, dans l'ordre de priorité")
+    ap.add_argument("--max-per-request", type=int, default=MAX_PIDS_PER_REQUEST, help="PIDs max par requête (1..6)")
+    ap.add_argument("--capture", default="recording/jimny_capture.log", help="Capture ms pour calibrer le timing")
+    ap.add_argument("--wait-ms", type=float, default=50.0, help="Attente ELM sans suffixe (part de la latence ECU mesurée)")
+    ap.add_argument("--ecu-multi", choices=ECU_MULTI_MODES + ("all",), default="all", help="Comportement ECU simulé face au multi-PID")
+    ap.add_argument("--plan-ecu", choices=ECU_MULTI_MODES, default="first-only",
+                    help="Comportement ECU pour lequel le plan est écrit quand --ecu-multi all (suffixes, repli);"
+                         " défaut first-only (K-line: repli une requête par PID), combined / per-pid à valider sur véhicule")
+    ap.add_argument("--cycles", type=int, default=5, help="Cycles mesurés par scénario")
+    ap.add_argument("--time-scale", type=float, default=0.1, help="Facteur appliqué aux délais simulés (résultats ramenés au réel)")
+    ap.add_argument("--out", type=Path, default=None, help="Écrire le plan JSON")
+    ap.add_argument("--c-out", type=Path, default=None, help="Écrire l'extrait C (struct + tableau)")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    if args.bitmap:
+        bitmaps = {int(b.split(":")[0], 16): bytes.fromhex(b.split(":")[1]) for b in args.bitmap}
+    else:
+        log_path = Path(args.log)
+        if not log_path.exists():
+            print(f"Fichier introuvable: {log_path}", file=sys.stderr)
+            return 1
+        bitmaps = supported_from_log(log_path)
+    if not bitmaps:
+        print("Aucun bitmap 0100/0120 trouvé", file=sys.stderr)
+        return 1
+    supported = sorted(p for base, bm in bitmaps.items() for p in decode_supported(base, bm))
+    print(f"# PIDs supportés: {' '.join(f'{p:02X}' for p in supported)}", file=sys.stderr)
+
+    wanted = parse_pid_list(args.pids)
+    groups, dropped = build_plan(wanted, supported, max(1, min(MAX_PIDS_PER_REQUEST, args.max_per_request)))
+    if dropped:
+        print(f"# PIDs écartés (non supportés ou longueur inconnue): {' '.join(f'{p:02X}' for p in dropped)}", file=sys.stderr)
+    if not groups:
+        print("Aucun PID à interroger", file=sys.stderr)
+        return 1
+    kept = [p for g in groups for p in g]
+
+    capture = Path(args.capture)
+    cal = calibrate_from_capture(capture) if capture.exists() else {"at_ms": 10.0, "ecu_ms": 120.0, "per_byte_ms": 2.0, "samples": 0.0}
+    timing = {
+        "link_ms": cal["at_ms"],
+        "p2_ms": max(0.0, cal["ecu_ms"] - cal["at_ms"] - args.wait_ms),
+        "per_byte_ms": cal["per_byte_ms"],
+        "wait_ms": args.wait_ms,
+    }
+    print(f"# timing ({int(cal['samples'])} réponses ECU calibrées): AT {cal['at_ms']:.1f} ms, ECU {cal['ecu_ms']:.1f} ms "
+          f"+ {cal['per_byte_ms']:.2f} ms/octet (dont attente ELM {args.wait_ms:.0f} ms sans suffixe)", file=sys.stderr)
+
+    modes = ECU_MULTI_MODES if args.ecu_multi == "all" else (args.ecu_multi,)
+    plan_ecu = args.plan_ecu if args.ecu_multi == "all" else args.ecu_multi
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    values = default_values()
+    for mode in modes:
+        # per-pid: l'ECU renvoie une trame par PID → suffixe = nombre de PIDs du groupe
+        scen = [
+            ("baseline", [(request_cmd([p], None), [p]) for p in kept]),
+            ("suffixe", [(request_cmd([p], 1), [p]) for p in kept]),
+            ("groupé", [(request_cmd(g, expected_responses(g, mode)), g) for g in groups]),
+        ]
+        emu = ElmEmulator(timing, supported, values, mode, args.time_scale).start()
+        client = ElmClient(emu.port)
+        results[mode] = {}
+        try:
+            for name, reqs in scen:
+                with sz_profile.stage(f"{mode} {name}"):
+                    dt, got, expected = run_cycles(client, reqs, args.cycles)
+                results[mode][name] = {"cycle_ms": dt * 1000.0 / args.time_scale, "pids_ok": got, "pids": expected}
+        finally:
+            client.close()
+            emu.stop()
+
+    print(f"{'ECU':11s} {'scénario':9s} {'cycle (ms)':>10s} {'gain':>6s}  PIDs")
+    for mode, res in results.items():
+        base = res["baseline"]["cycle_ms"]
+        for name, r in res.items():
+            gain = base / r["cycle_ms"] if r["cycle_ms"] > 0 else 0.0
+            warn = "" if r["pids_ok"] == r["pids"] else "  ← données manquantes"
+            print(f"{mode:11s} {name:9s} {r['cycle_ms']:10.0f} {gain:5.2f}×  {r['pids_ok']}/{r['pids']}{warn}")
+
+    # Repli nécessaire si l'ECU retenue perd des PIDs avec le plan groupé (first-only)
+    grouped = results[plan_ecu]["groupé"]
+    fallback = grouped["pids_ok"] < grouped["pids"]
+    plan = {
+        "supported": [f"{p:02X}" for p in supported],
+        "dropped": [f"{p:02X}" for p in dropped],
+        "ecu_multi": plan_ecu,
+        "needs_fallback": fallback,
+        "requests": [
+            {"cmd": request_cmd(g, expected_responses(g, plan_ecu)), "pids": [f"{p:02X}" for p in g], "lens": [pid_data_len(p) for p in g]}
+            for g in groups
+        ],
+        "fallback_requests": [request_cmd([p], 1) for p in kept] + ["ATRV"],
+        "timing": timing,
+        "results": results,
+    }
+    if args.out:
+        args.out.write_text(json.dumps(plan, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    if args.c_out:
+        args.c_out.write_text(c_snippet(groups, fallback, plan_ecu), encoding="utf-8")
+    if fallback:
+        cmds = " ".join(plan["fallback_requests"][:-1])
+        print(f"OK: ECU {plan_ecu}: le plan groupé perd des PIDs → repli, {len(kept)} requête(s): {cmds} + ATRV")
+    else:
+        cmds = " ".join(r["cmd"] for r in plan["requests"])
+        print(f"OK: ECU {plan_ecu}: {len(kept)} PIDs en {len(groups)} requête(s): {cmds} + ATRV")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure de la chaîne capture → synchro → OCR → décodage, sur les fixtures du repo
+et sur des versions agrandies (10×, 100×) générées à la volée.
+
+Étapes (--stages):
+  parse        parse_ms_log sur le log de capture (réponses/s)
+  sync         build_events + latest_raw_per_page_at (sz_sync_ms.py) pour --sync-frames
+               frames réparties sur tout le log (frames/s)
+  ocr_parse    extract_values (sz_ocr.py) sur le texte OCR reconstitué des valeurs du JSONL
+               de synchro (lignes/s) — ffmpeg/tesseract ne sont pas mesurés ici
+  decode       page_bytes + decode_from_mapping sur le NDJSON gateway (lignes/s)
+  search       find_all_candidates(engine_rpm) sur les --search-rows premières trames × échelle
+  cv           sz_decode_cv.run_cv (5 plis, numpy) sur le JSONL de synchro
+Fixtures: recording/jimny_capture.log, recording/sz_sync_ms_window_ocr.jsonl,
+medias/jimny-2026-02-19-decheterrie-jard.json. Version N×: fixture répétée N fois,
+horodatages décalés d'une durée de capture à chaque copie (cache dans --cache-dir).
+
+Chaque (étape, échelle) tourne dans un processus neuf: temps mur, pic RSS (ru_maxrss)
+et lignes/s sont propres à l'étape. Les étapes à coût quadratique (sync) ou très lentes
+(search) ont une échelle max; au-delà, ou après --timeout s, le résultat est noté
+skipped / timeout.
+
+Résultats: --out (JSON). Comparaison avec --baseline (même format) si le fichier existe:
+régression si temps > baseline × (1 + --threshold) et écart > 50 ms; code retour 1.
+--save-baseline écrit les résultats comme nouvelle référence (propre à la machine).
+
+Usage:
+  python3 tools/sz_bench.py                                  # échelles 1, 10, 100
+  python3 tools/sz_bench.py --scales 1,10 --stages parse,decode
+  python3 tools/sz_bench.py --save-baseline                  # avant une modification
+  python3 tools/sz_bench.py --threshold 0.15                 # après: compare et échoue si régression
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TOOLS = Path(__file__).resolve().parent
+REPO = TOOLS.parent
+sys.path.insert(0, str(TOOLS))
+
+FIXTURES = {
+    "log": REPO / "recording" / "jimny_capture.log",
+    "sync": REPO / "recording" / "sz_sync_ms_window_ocr.jsonl",
+    "gateway": REPO / "medias" / "jimny-2026-02-19-decheterrie-jard.json",
+}
+DEFAULT_OUT = TOOLS / "sz_bench_results.json"
+DEFAULT_BASELINE = TOOLS / "sz_bench_baseline.json"
+LOG_TS_RE = re.compile(r"^\[(\d{2}):(\d{2}):(\d{2})\.(\d{3})\]")
+NOISE_FLOOR_S = 0.05
+
+
+def fmt_hhmmss_ms(sec: float) -> str:
+    ms = int(round(sec * 1000)) % 86400000
+    h, rem = divmod(ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+# --- Fixtures agrandies ---------------------------------------------------------------
+
+
+def log_span_s(path: Path) -> float:
+    first = last = None
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            m = LOG_TS_RE.match(line)
+            if m:
+                t = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3)) + int(m.group(4)) / 1000.0
+                first = t if first is None else first
+                last = t
+    return (last - first + 1.0) if first is not None else 0.0
+
+
+def tile_log(src: Path, dst: Path, factor: int) -> None:
+    span = log_span_s(src)
+    with dst.open("w", encoding="utf-8") as out:
+        for k in range(factor):
+            shift = k * span
+            with src.open("r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    m = LOG_TS_RE.match(line)
+                    if m and shift:
+                        t = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3)) + int(m.group(4)) / 1000.0
+                        line = f"[{fmt_hhmmss_ms(t + shift)}]" + line[m.end():]
+                    out.write(line)
+
+
+def tile_jsonl(src: Path, dst: Path, factor: int) -> None:
+    rows = [json.loads(l) for l in src.open("r", encoding="utf-8") if l.strip()]
+    t_key = "ts_ms" if rows and "ts_ms" in rows[0] else "t_offset_s"
+    t_vals = [r.get(t_key) for r in rows if isinstance(r.get(t_key), (int, float))]
+    span = (max(t_vals) - min(t_vals)) if t_vals else 0
+    span += 1000 if t_key == "ts_ms" else 1.0
+    with dst.open("w", encoding="utf-8") as out:
+        for k in range(factor):
+            for i, r in enumerate(rows):
+                if k:
+                    r = dict(r)
+                    if isinstance(r.get(t_key), (int, float)):
+                        r[t_key] = r[t_key] + k * span
+                    if "frame_idx" in r:
+                        r["frame_idx"] = k * len(rows) + i + 1
+                    if isinstance(r.get("log_ts_sec"), (int, float)):
+                        r["log_ts_sec"] = round((r["log_ts_sec"] + k * span) % 86400.0, 3)
+                out.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def scaled_fixture(kind: str, factor: int, cache_dir: Path) -> Path:
+    src = FIXTURES[kind]
+    if factor == 1:
+        return src
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    st = src.stat()
+    dst = cache_dir / f"{src.stem}.x{factor}.{st.st_size}.{int(st.st_mtime)}{src.suffix}"
+    if not dst.exists():
+        tmp = dst.with_suffix(dst.suffix + ".tmp")
+        (tile_log if kind == "log" else tile_jsonl)(src, tmp, factor)
+        tmp.replace(dst)
+    return dst
+
+
+# --- Étapes (exécutées dans le processus enfant) ---------------------------------------
+
+
+def stage_parse(fixtures: Dict[str, Path], args: argparse.Namespace, scale: int) -> int:
+    from sz_parse_ms_log import parse_ms_log
+
+    return sum(1 for _ in parse_ms_log(fixtures["log"]))
+
+
+def stage_sync(fixtures: Dict[str, Path], args: argparse.Namespace, scale: int) -> int:
+    from sz_sync_ms import build_events, latest_raw_per_page_at
+
+    events = build_events(fixtures["log"])
+    if not events:
+        return 0
+    t0, t1 = events[0][0], events[-1][0]
+    n = args.sync_frames
+    for i in range(n):
+        latest_raw_per_page_at(events, t0 + (t1 - t0) * i / max(1, n - 1))
+    return n
+
+
+def ocr_text_from_values(values: Dict[str, Any]) -> str:
+    """Texte au format de l'écran SZ Viewer, reconstitué depuis les valeurs (entrée de extract_values)."""
+    from sz_ocr import LABEL_MAP
+
+    lines = []
+    for label, mapped in LABEL_MAP.items():
+        for f in (mapped if isinstance(mapped, tuple) else (mapped,)):
+            v = values.get(f)
+            if v is not None:
+                lines.append(f"{label}: {v} {'mmHg' if f.endswith('mmhg') else 'kPa' if f.endswith('kpa') else ''}".rstrip())
+    return "\n".join(lines)
+
+
+def stage_ocr_parse(fixtures: Dict[str, Path], args: argparse.Namespace, scale: int) -> int:
+    from sz_ocr import extract_values
+
+    n = 0
+    with fixtures["sync"].open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            extract_values(ocr_text_from_values(rec.get("values") or {}))
+            n += 1
+    return n
+
+
+def stage_decode(fixtures: Dict[str, Path], args: argparse.Namespace, scale: int) -> int:
+    from sz_compare_decode_vs_ocr import decode_from_mapping, load_mapping, page_bytes
+
+    mapping = load_mapping(TOOLS / "sz_decode_mapping.json") or {}
+    n = 0
+    with fixtures["gateway"].open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            raw = json.loads(line).get("raw") or {}
+            decode_from_mapping({p: page_bytes(h) for p, h in raw.items()}, mapping)
+            n += 1
+    return n
+
+
+def stage_search(fixtures: Dict[str, Path], args: argparse.Namespace, scale: int) -> int:
+    from sz_decode_from_ocr_jsonl import find_all_candidates, load_jsonl
+
+    rows = load_jsonl(str(fixtures["sync"]))[: args.search_rows * scale]
+    find_all_candidates(rows, "engine_rpm")
+    return len(rows)
+
+
+def stage_cv(fixtures: Dict[str, Path], args: argparse.Namespace, scale: int) -> int:
+    from sz_decode_cv import run_cv
+    from sz_decode_from_ocr_jsonl import FORMULAS
+    from sz_page_matrix import load_page_matrix
+
+    pm = load_page_matrix(str(fixtures["sync"]))
+    run_cv(pm, 5, FORMULAS, set(), workers=1)
+    return pm.n
+
+
+# nom → (fonction, fixtures utilisées, échelle max)
+STAGES: Dict[str, Tuple[Callable[[Dict[str, Path], argparse.Namespace, int], int], Tuple[str, ...], int]] = {
+    "parse": (stage_parse, ("log",), 100),
+    "sync": (stage_sync, ("log",), 10),
+    "ocr_parse": (stage_ocr_parse, ("sync",), 100),
+    "decode": (stage_decode, ("gateway",), 100),
+    "search": (stage_search, ("sync",), 10),
+    "cv": (stage_cv, ("sync",), 100),
+}
+
+
+def peak_rss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return kb / 1024.0 if sys.platform != "darwin" else kb / (1024.0 * 1024.0)
+
+
+def run_child(args: argparse.Namespace) -> int:
+    fn, kinds, _ = STAGES[args.run_stage]
+    fixtures = {k: Path(p) for k, p in zip(kinds, args.fixture)}
+    t0 = time.perf_counter()
+    rows = fn(fixtures, args, args.scale)
+    wall = time.perf_counter() - t0
+    print(json.dumps({"rows": rows, "wall_s": wall, "peak_rss_mb": peak_rss_mb()}))
+    return 0
+
+
+# --- Parent -----------------------------------------------------------------------------
+
+
+def run_stage(stage: str, scale: int, args: argparse.Namespace) -> Dict[str, Any]:
+    fn, kinds, max_scale = STAGES[stage]
+    res: Dict[str, Any] = {"stage": stage, "scale": scale}
+    if scale > max_scale:
+        res["status"] = "skipped"
+        return res
+    fixtures = [str(scaled_fixture(k, scale, args.cache_dir)) for k in kinds]
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--run-stage", stage, "--scale", str(scale),
+           "--search-rows", str(args.search_rows), "--sync-frames", str(args.sync_frames), "--fixture", *fixtures]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        res["status"] = "timeout"
+        return res
+    if proc.returncode != 0:
+        res["status"] = "error"
+        res["error"] = proc.stderr.strip().splitlines()[-1:] or ["?"]
+        return res
+    m = json.loads(proc.stdout.strip().splitlines()[-1])
+    res.update(
+        status="ok",
+        rows=m["rows"],
+        wall_s=round(m["wall_s"], 4),
+        rows_per_s=round(m["rows"] / m["wall_s"], 1) if m["wall_s"] > 0 else None,
+        peak_rss_mb=round(m["peak_rss_mb"], 1),
+    )
+    return res
+
+
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "-C", str(REPO), "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Lignes de régression (vide si aucune)."""
+    base = {(r["stage"], r["scale"]): r for r in baseline.get("results", []) if r.get("status") == "ok"}
+    regressions: List[str] = []
+    for r in results:
+        b = base.get((r["stage"], r["scale"]))
+        if r.get("status") != "ok" or b is None:
+            continue
+        r["baseline_wall_s"] = b["wall_s"]
+        r["delta_pct"] = round(100.0 * (r["wall_s"] - b["wall_s"]) / b["wall_s"], 1) if b["wall_s"] > 0 else None
+        if r["wall_s"] > b["wall_s"] * (1 + threshold) and r["wall_s"] - b["wall_s"] > NOISE_FLOOR_S:
+            regressions.append(f"{r['stage']} ×{r['scale']}: {b['wall_s']:.3f} s → {r['wall_s']:.3f} s ({r['delta_pct']:+.0f} %)")
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Banc de mesure capture → synchro → OCR → décodage (temps, RSS, lignes/s)")
+    ap.add_argument("--stages", default=",".join(STAGES), help=f"Étapes, séparées par des virgules ({', '.join(STAGES)})")
+    ap.add_argument("--scales", default="1,10,100", help="Facteurs d'agrandissement des fixtures")
+    ap.add_argument("--sync-frames", type=int, default=1000, help="Frames synchronisées par l'étape sync")
+    ap.add_argument("--search-rows", type=int, default=50, help="Trames de l'étape search à l'échelle 1")
+    ap.add_argument("--timeout", type=float, default=300.0, help="Temps max par (étape, échelle), en s")
+    ap.add_argument("--cache-dir", type=Path, default=Path(tempfile.gettempdir()) / "sz_bench", help="Fixtures agrandies")
+    ap.add_argument("--out", type=Path, default=DEFAULT_OUT, help="Résultats JSON")
+    ap.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Référence à comparer (si présente)")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Régression si temps > baseline × (1 + seuil)")
+    ap.add_argument("--save-baseline", action="store_true", help="Écrire aussi les résultats dans --baseline")
+    # Mode enfant (interne)
+    ap.add_argument("--run-stage", help=argparse.SUPPRESS)
+    ap.add_argument("--scale", type=int, default=1, help=argparse.SUPPRESS)
+    ap.add_argument("--fixture", nargs="*", default=[], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_stage:
+        return run_child(args)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"Étapes inconnues: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    missing = [str(p) for k, p in FIXTURES.items() if not p.exists()]
+    if missing:
+        print(f"Fixtures introuvables: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+
+    results: List[Dict[str, Any]] = []
+    print(f"{'étape':10s} {'×':>4s} {'lignes':>9s} {'temps s':>9s} {'lignes/s':>11s} {'RSS Mo':>8s}")
+    for stage in stages:
+        for scale in scales:
+            print(f"# {stage} ×{scale}...", file=sys.stderr)
+            r = run_stage(stage, scale, args)
+            results.append(r)
+            if r["status"] == "ok":
+                print(f"{stage:10s} {scale:4d} {r['rows']:9d} {r['wall_s']:9.3f} {r['rows_per_s'] or 0:11.0f} {r['peak_rss_mb']:8.1f}")
+            else:
+                print(f"{stage:10s} {scale:4d} {r['status']:>9s} {' '.join(r.get('error', []))}")
+
+    regressions: List[str] = []
+    if args.baseline.exists() and not args.save_baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+    doc = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "git": git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "threshold": args.threshold,
+        },
+        "results": results,
+    }
+    args.out.write_text(json.dumps(doc, indent=1) + "\n", encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(doc, indent=1) + "\n", encoding="utf-8")
+    for line in regressions:
+        print(f"RÉGRESSION: {line}")
+    ok = sum(1 for r in results if r["status"] == "ok")
+    base_s = f", référence {args.baseline}" if args.save_baseline else ""
+    if regressions:
+        print(f"ÉCHEC: {len(regressions)} régression(s) > {args.threshold:.0%} → {args.out}")
+        return 1
+    print(f"OK: {ok}/{len(results)} mesures → {args.out}{base_s}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
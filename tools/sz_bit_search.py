@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Recherche de drapeaux / petites énumérations: chaque bit et chaque quartet (nibble) de
+chaque octet des pages 21A0/21A2/21A5/21CD contre des cibles discrètes.
+
+Cibles:
+  - champs OCR à peu de valeurs distinctes (2..--max-levels, ex: gear_ratio)
+  - événements booléens dérivés de l'OCR: engine_running (engine_rpm > 300),
+    moving (speed_kmh > 0), accelerator (accelerator_pct > 0)
+Une cible constante sur la capture (ex: moving si on roule tout le temps) ou présente sur
+moins de --min-rows trames est ignorée.
+
+Score: information mutuelle I(X;Y) en bits, corrigée du biais des petits échantillons
+(Miller-Madow: (|X|-1)(|Y|-1) / (2 n ln 2)), rapportée à H(Y) → nmi dans [0, 1]
+(1 = le bit/quartet détermine entièrement la cible). Pour un bit contre un événement
+booléen, on donne aussi la polarité (bit=1 ↔ vrai, ou inversé) et la précision.
+Bits et quartets sont classés séparément (--top chacun): à 16 niveaux, un quartet porte
+plus d'information qu'un bit à 2 niveaux et évincerait tous les bits d'un classement commun.
+Tous les bits (n × L × 8) et quartets (n × L × 2) sont scorés d'un coup (tables de
+contingence par np.bincount), pas de boucle Python par octet.
+
+Usage:
+  python3 tools/sz_bit_search.py recording/sz_sync_ms_window_ocr.jsonl
+  python3 tools/sz_bit_search.py medias/sz_sync_ocr.jsonl --top 5 --out /tmp/bits.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_page_matrix import PageMatrix, load_page_matrix, np
+from sz_profile import stage
+
+# Événements booléens: nom → (champ OCR, seuil): vrai si valeur > seuil
+EVENTS: Dict[str, Tuple[str, float]] = {
+    "engine_running": ("engine_rpm", 300.0),
+    "moving": ("speed_kmh", 0.0),
+    "accelerator": ("accelerator_pct", 0.0),
+}
+
+
+def discretize(y: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Codes 0..C-1 des valeurs distinctes (y sans NaN)."""
+    _, codes = np.unique(y, return_inverse=True)
+    return codes.astype(np.int64), int(codes.max()) + 1
+
+
+def mutual_information(x: np.ndarray, levels: int, y: np.ndarray, classes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    I(X_k;Y) pour chaque colonne k de x (n, K), valeurs 0..levels-1; y (n,) 0..classes-1.
+    Retourne (mi corrigée Miller-Madow, table de contingence (K, levels, classes)).
+    """
+    n, k = x.shape
+    idx = (x.astype(np.int64) * classes + y[:, None]) + np.arange(k, dtype=np.int64) * (levels * classes)
+    counts = np.bincount(idx.ravel(), minlength=k * levels * classes).reshape(k, levels, classes).astype(np.float64)
+    pxy = counts / n
+    px = pxy.sum(axis=2, keepdims=True)
+    py = pxy.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(pxy > 0, pxy * np.log2(pxy / (px * py)), 0.0)
+    mi = terms.sum(axis=(1, 2))
+    used_x = (px[:, :, 0] > 0).sum(axis=1)
+    used_y = int((py[0, 0, :] > 0).sum())
+    bias = (used_x - 1) * (used_y - 1) / (2.0 * n * math.log(2))
+    return np.maximum(mi - bias, 0.0), counts
+
+
+def entropy(codes: np.ndarray, classes: int) -> float:
+    p = np.bincount(codes, minlength=classes) / len(codes)
+    p = p[p > 0]
+    return float(-(p * np.log2(p)).sum())
+
+
+def build_targets(pm: PageMatrix, max_levels: int) -> Dict[str, np.ndarray]:
+    """Cibles discrètes (valeurs brutes, NaN = absent)."""
+    out: Dict[str, np.ndarray] = {}
+    for f in pm.fields:
+        y = pm.target(f)
+        distinct = np.unique(y[~np.isnan(y)])
+        if 2 <= len(distinct) <= max_levels:
+            out[f] = y
+    for name, (field, thr) in EVENTS.items():
+        if field not in pm.fields:
+            continue
+        y = pm.target(field)
+        ev = np.where(np.isnan(y), np.nan, (y > thr).astype(np.float64))
+        if len(np.unique(ev[~np.isnan(ev)])) == 2:
+            out[name] = ev
+    return out
+
+
+def features(pm: PageMatrix) -> Dict[str, Tuple[np.ndarray, int, List[Tuple[str, int, str]]]]:
+    """kind → (matrice (n, K), nb de niveaux, [(page, offset, label)] par colonne)."""
+    bit_cols: List[np.ndarray] = []
+    bit_meta: List[Tuple[str, int, str]] = []
+    nib_cols: List[np.ndarray] = []
+    nib_meta: List[Tuple[str, int, str]] = []
+    for page, m in pm.pages.items():
+        length = m.shape[1]
+        bits = (m[:, :, None] >> np.arange(8, dtype=np.uint8)) & 1  # (n, L, 8), bit 0 = poids faible
+        bit_cols.append(bits.reshape(pm.n, length * 8))
+        bit_meta.extend((page, off, f"bit{b}") for off in range(length) for b in range(8))
+        nibs = np.stack([m >> 4, m & 0x0F], axis=2)  # (n, L, 2)
+        nib_cols.append(nibs.reshape(pm.n, length * 2))
+        nib_meta.extend((page, off, h) for off in range(length) for h in ("hi", "lo"))
+    return {
+        "bit": (np.concatenate(bit_cols, axis=1), 2, bit_meta),
+        "nibble": (np.concatenate(nib_cols, axis=1), 16, nib_meta),
+    }
+
+
+def rank_for_target(
+    pm: PageMatrix,
+    name: str,
+    y_raw: np.ndarray,
+    feats: Dict[str, Tuple[np.ndarray, int, List[Tuple[str, int, str]]]],
+    top: int,
+    min_rows: int = 30,
+) -> List[Dict[str, Any]]:
+    """Les top meilleurs bits puis les top meilleurs quartets pour la cible (nmi décroissante dans chaque groupe)."""
+    valid = ~np.isnan(y_raw)
+    for page, k in pm.known.items():
+        valid &= k
+    if valid.sum() < min_rows:
+        return []
+    y, classes = discretize(y_raw[valid])
+    h_y = entropy(y, classes)
+    if h_y <= 0:
+        return []
+    out: List[Dict[str, Any]] = []
+    for kind, (x_all, levels, meta) in feats.items():
+        x = x_all[valid]
+        mi, counts = mutual_information(x, levels, y, classes)
+        nmi = mi / h_y
+        for col in np.argsort(-nmi)[:top]:
+            if nmi[col] <= 0:
+                break
+            page, off, label = meta[col]
+            c: Dict[str, Any] = {
+                "target": name,
+                "kind": kind,
+                "page": page,
+                "offset": off,
+                "part": label,
+                "nmi": round(float(nmi[col]), 4),
+                "mi_bits": round(float(mi[col]), 4),
+                "n": int(valid.sum()),
+            }
+            if kind == "bit" and classes == 2:
+                agree = counts[col, 0, 0] + counts[col, 1, 1]  # bit=1 ↔ vrai
+                acc = agree / counts[col].sum()
+                c["polarity"] = "direct" if acc >= 0.5 else "inverse"
+                c["accuracy"] = round(float(max(acc, 1 - acc)), 4)
+            out.append(c)
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Bits/quartets des pages SZ contre cibles discrètes (information mutuelle)")
+    ap.add_argument("jsonl", nargs="?", default="recording/sz_sync_ms_window_ocr.jsonl", help="JSONL de synchro avec OCR")
+    ap.add_argument("--max-levels", type=int, default=8, help="Champ OCR pris comme cible discrète s'il a au plus N valeurs")
+    ap.add_argument("--top", type=int, default=8, help="Candidats affichés par cible, pour les bits et pour les quartets")
+    ap.add_argument("--min-rows", type=int, default=30, help="Ignorer une cible présente sur moins de N trames")
+    ap.add_argument("--limit", type=int, default=0, help="Utiliser seulement les N premières trames (0 = toutes)")
+    ap.add_argument("--out", type=Path, default=None, help="Écrire le classement JSON")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    path = Path(args.jsonl)
+    if not path.exists():
+        print(f"Fichier introuvable: {path}", file=sys.stderr)
+        return 1
+    with stage("matrices") as st:
+        pm = load_page_matrix(str(path), limit=args.limit)
+        st.rows = pm.n
+    if pm.n < 5 or not pm.pages:
+        print(f"Pas assez de trames avec pages dans {path}", file=sys.stderr)
+        return 1
+    targets = build_targets(pm, args.max_levels)
+    with stage("bits/quartets", rows=pm.n):
+        feats = features(pm)
+    n_feats = sum(f[0].shape[1] for f in feats.values())
+    print(f"# {pm.n} trames, {len(targets)} cibles, {n_feats} bits/quartets scorés", file=sys.stderr)
+
+    ranking: Dict[str, List[Dict[str, Any]]] = {}
+    for name, y in targets.items():
+        with stage("information mutuelle", rows=pm.n):
+            ranking[name] = rank_for_target(pm, name, y, feats, args.top, args.min_rows)
+        print(f"{name}:")
+        for i, c in enumerate(ranking[name]):
+            if i == 0 or c["kind"] != ranking[name][i - 1]["kind"]:
+                print(f"  [{'bits' if c['kind'] == 'bit' else 'quartets'}]")
+            extra = f"  {c['polarity']} acc={c['accuracy']:.3f}" if "accuracy" in c else ""
+            print(f"  {c['page']}[{c['offset']:2d}].{c['part']:5s} nmi={c['nmi']:.3f} mi={c['mi_bits']:.3f} n={c['n']}{extra}")
+        if not ranking[name]:
+            print("  (aucun candidat)")
+    if args.out:
+        args.out.write_text(json.dumps({"source": str(path), "targets": ranking}, indent=1) + "\n", encoding="utf-8")
+    dest = f" → {args.out}" if args.out else ""
+    print(f"OK: {len(ranking)} cibles classées{dest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
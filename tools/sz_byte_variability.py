@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Variabilité des octets des pages 21A0/21A2/21A5/21CD sur une capture.
+
+Entrée (format détecté automatiquement):
+  - log de capture ms ([HH:MM:SS.mmm] SEND/RECV, ex: recording/jimny_capture.log): une
+    réponse complète = un échantillon
+  - JSONL de synchro (sz_sync*.jsonl, raw en hex ASCII) ou NDJSON gateway (raw en hex
+    réel): une ligne = un échantillon, mais une page n'est comptée que si son raw change
+    par rapport à la ligne précédente (les lignes de synchro répètent la dernière réponse)
+
+Par page et par octet: nombre de valeurs distinctes, taux de changement entre
+échantillons consécutifs, entropie (bits), monotonie ((hausses - baisses) / changements).
+Par mot 16 bits (offset pair ou impair, comme get_raw16): mêmes stats + autocorrélation
+lag-1, et une classe:
+  const  les deux octets ne changent jamais      → inutile de le scorer
+  noise  change à chaque échantillon, quasi toutes valeurs distinctes, autocorrélation
+         ~0 (compteur bruité, checksum)           → inutile de le scorer
+  signal le reste
+
+L'index JSON (défaut: tools/sz_variability_index.json) est relu par
+sz_decode_from_ocr_jsonl.py --variability-index pour ne pas scorer les mots const/noise.
+Rendu: carte de chaleur texte (stdout) et HTML (--html).
+
+Usage:
+  python3 tools/sz_byte_variability.py recording/jimny_capture.log
+  python3 tools/sz_byte_variability.py recording/sz_sync_ms_window_ocr.jsonl --html /tmp/variability.html
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --variability-index tools/sz_variability_index.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import math
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_compare_decode_vs_ocr import page_bytes
+import sz_profile
+from sz_parse_ms_log import LOG_LINE_RE, parse_ms_log
+from sz_profile import stage
+
+PAGES = ["21A0", "21A2", "21A5", "21CD"]
+DEFAULT_INDEX = Path(__file__).resolve().parent / "sz_variability_index.json"
+NOISE_CHANGE_RATE = 0.95
+NOISE_DISTINCT_RATIO = 0.9
+NOISE_MAX_AUTOCORR = 0.2
+HEAT_CHARS = " .:-=+*#%@"
+
+
+def is_capture_log(path: Path) -> bool:
+    with path.open("r", encoding="utf-8", errors="replace") as f:
+        for _ in range(50):
+            line = f.readline()
+            if not line:
+                break
+            if LOG_LINE_RE.match(line.strip()):
+                return True
+    return False
+
+
+def iter_page_samples(path: Path) -> Iterator[Tuple[str, bytes]]:
+    """(page, octets) pour chaque réponse de la capture, quel que soit le format."""
+    if is_capture_log(path):
+        for _, page, hex_payload in parse_ms_log(path):
+            b = page_bytes(hex_payload)
+            if b:
+                yield page, b
+        return
+    last_raw: Dict[str, str] = {}
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            raw = rec.get("raw") if isinstance(rec, dict) else None
+            if not isinstance(raw, dict):
+                continue
+            for page in PAGES:
+                hx = raw.get(page)
+                if not hx or last_raw.get(page) == hx:
+                    continue
+                last_raw[page] = hx
+                b = page_bytes(hx)
+                if b:
+                    yield page, b
+
+
+def entropy_bits(counts: Counter) -> float:
+    n = sum(counts.values())
+    if n == 0:
+        return 0.0
+    return max(0.0, -sum((c / n) * math.log2(c / n) for c in counts.values()))
+
+
+def series_stats(values: List[int]) -> Dict[str, float]:
+    """distinct / change_rate / entropy / monotonic d'une série d'entiers."""
+    n = len(values)
+    ups = downs = 0
+    for a, b in zip(values, values[1:]):
+        if b > a:
+            ups += 1
+        elif b < a:
+            downs += 1
+    changes = ups + downs
+    return {
+        "distinct": len(set(values)),
+        "change_rate": round(changes / (n - 1), 4) if n > 1 else 0.0,
+        "entropy": round(entropy_bits(Counter(values)), 4),
+        "monotonic": round((ups - downs) / changes, 4) if changes else 0.0,
+    }
+
+
+def autocorr_lag1(values: List[int]) -> float:
+    n = len(values)
+    if n < 3:
+        return 0.0
+    mean = sum(values) / n
+    var = sum((v - mean) ** 2 for v in values)
+    if var == 0:
+        return 1.0
+    cov = sum((values[i] - mean) * (values[i + 1] - mean) for i in range(n - 1))
+    return cov / var
+
+
+def classify_word(stats: Dict[str, float], n: int, autocorr: float, byte_hi: Dict[str, Any], byte_lo: Dict[str, Any]) -> str:
+    if byte_hi["distinct"] <= 1 and byte_lo["distinct"] <= 1:
+        return "const"
+    if (
+        n >= 20
+        and stats["change_rate"] >= NOISE_CHANGE_RATE
+        and stats["distinct"] >= NOISE_DISTINCT_RATIO * n
+        and abs(autocorr) < NOISE_MAX_AUTOCORR
+    ):
+        return "noise"
+    return "signal"
+
+
+def build_index(path: Path) -> Dict[str, Any]:
+    samples: Dict[str, List[bytes]] = {p: [] for p in PAGES}
+    for page, b in iter_page_samples(path):
+        samples[page].append(b)
+    pages_out: Dict[str, Any] = {}
+    for page, rows in samples.items():
+        if not rows:
+            continue
+        # Longueur de référence: la plus fréquente (ignore les réponses tronquées)
+        length = Counter(len(r) for r in rows).most_common(1)[0][0]
+        rows = [r for r in rows if len(r) >= length]
+        n = len(rows)
+        byte_stats: List[Dict[str, Any]] = []
+        for off in range(length):
+            st = series_stats([r[off] for r in rows])
+            st["offset"] = off
+            byte_stats.append(st)
+        word_stats: List[Dict[str, Any]] = []
+        for off in range(length - 1):
+            vals = [(r[off] << 8) | r[off + 1] for r in rows]
+            st = series_stats(vals)
+            ac = autocorr_lag1(vals)
+            st["offset"] = off
+            st["autocorr"] = round(ac, 4)
+            st["class"] = classify_word(st, n, ac, byte_stats[off], byte_stats[off + 1])
+            word_stats.append(st)
+        pages_out[page] = {"samples": n, "length": length, "bytes": byte_stats, "words": word_stats}
+    return {"source": str(path), "pages": pages_out}
+
+
+def load_index(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def pruned_slots(index: Dict[str, Any], classes: Tuple[str, ...] = ("const", "noise")) -> Set[Tuple[str, int]]:
+    """(page, offset) des mots 16 bits à ne pas scorer (classe const ou noise)."""
+    out: Set[Tuple[str, int]] = set()
+    for page, info in (index.get("pages") or {}).items():
+        for w in info.get("words", []):
+            if w.get("class") in classes:
+                out.add((page, int(w["offset"])))
+    return out
+
+
+def heat_char(x: float) -> str:
+    k = min(len(HEAT_CHARS) - 1, int(round(x * (len(HEAT_CHARS) - 1))))
+    return HEAT_CHARS[k]
+
+
+def render_text(index: Dict[str, Any], width: int = 16) -> str:
+    lines = [f"# Taux de changement par octet ('{HEAT_CHARS}' = 0 → 1), source {index.get('source')}"]
+    for page, info in index["pages"].items():
+        words = info["words"]
+        n_const = sum(1 for w in words if w["class"] == "const")
+        n_noise = sum(1 for w in words if w["class"] == "noise")
+        lines.append(f"{page}  {info['samples']} échantillons, {info['length']} octets, mots: {n_const} const, {n_noise} bruit, {len(words) - n_const - n_noise} signal")
+        bs = info["bytes"]
+        for start in range(0, len(bs), width):
+            chunk = bs[start : start + width]
+            heat = "".join(heat_char(b["change_rate"]) for b in chunk)
+            ent = " ".join(f"{b['entropy']:3.1f}" for b in chunk)
+            lines.append(f"  {start:3d} |{heat:<{width}s}|  H {ent}")
+    return "\n".join(lines)
+
+
+def render_html(index: Dict[str, Any], width: int = 16) -> str:
+    parts = [
+        "<!DOCTYPE html><html lang=\"fr\"><head><meta charset=\"utf-8\"><title>Variabilité des pages SZ</title>",
+        "<style>body{font-family:system-ui,sans-serif;background:#1a1a1a;color:#e0e0e0;padding:1rem}"
+        "table{border-collapse:collapse;margin-bottom:1.5rem}td{width:3.2em;height:2.4em;text-align:center;font:11px monospace;border:1px solid #333}"
+        "td.const{color:#666}td.noise{outline:2px solid #c44}th{font:11px monospace;color:#888;padding:0 .4em}</style></head><body>",
+        f"<h1>Variabilité des pages SZ</h1><p>Source: {html.escape(str(index.get('source')))}. Couleur = taux de changement,"
+        " texte = entropie (bits). Bordure rouge: mot classé bruit à cet offset; gris: mot constant.</p>",
+    ]
+    for page, info in index["pages"].items():
+        parts.append(f"<h2>{page} — {info['samples']} échantillons, {info['length']} octets</h2><table>")
+        word_class = {w["offset"]: w["class"] for w in info["words"]}
+        bs = info["bytes"]
+        for start in range(0, len(bs), width):
+            parts.append(f"<tr><th>{start}</th>")
+            for b in bs[start : start + width]:
+                cr = b["change_rate"]
+                hue = 240 - int(240 * cr)
+                cls = word_class.get(b["offset"], "")
+                title = (f"offset {b['offset']}: {b['distinct']} valeurs, changement {cr:.2f}, "
+                         f"entropie {b['entropy']:.2f}, monotonie {b['monotonic']:+.2f}, mot {cls}")
+                parts.append(
+                    f"<td class=\"{cls}\" style=\"background:hsl({hue},70%,{18 + 30 * cr:.0f}%)\" title=\"{html.escape(title)}\">{b['entropy']:.1f}</td>"
+                )
+            parts.append("</tr>")
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Index de variabilité par page/octet (distinct, changement, entropie, monotonie)")
+    ap.add_argument("capture", nargs="?", default="recording/jimny_capture.log", help="Log de capture, JSONL de synchro ou NDJSON gateway")
+    ap.add_argument("--out", type=Path, default=DEFAULT_INDEX, help="Index JSON à écrire")
+    ap.add_argument("--html", type=Path, default=None, help="Carte de chaleur HTML")
+    ap.add_argument("--quiet", action="store_true", help="Pas de carte texte sur stdout")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    path = Path(args.capture)
+    if not path.exists():
+        print(f"Fichier introuvable: {path}", file=sys.stderr)
+        return 1
+    with stage("index"):
+        index = build_index(path)
+    if not index["pages"]:
+        print(f"Aucune page 21A0/21A2/21A5/21CD dans {path}", file=sys.stderr)
+        return 1
+    args.out.write_text(json.dumps(index, indent=1) + "\n", encoding="utf-8")
+    if args.html:
+        args.html.write_text(render_html(index), encoding="utf-8")
+    if not args.quiet:
+        print(render_text(index))
+    total = sum(len(p["words"]) for p in index["pages"].values())
+    pruned = len(pruned_slots(index))
+    html_s = f", HTML {args.html}" if args.html else ""
+    print(f"OK: {args.out} — {pruned}/{total} mots 16 bits écartables (const/bruit){html_s}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
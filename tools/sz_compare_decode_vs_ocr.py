@@ -14,6 +14,11 @@ import sys
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+from sz_sync_db import is_sync_db, load_rows
+
 FIELDS = [
     "desired_idle_speed_rpm",
     "accelerator_pct",
@@ -59,6 +64,33 @@ def extract_page_bytes(raw_hex_ascii: Optional[str]) -> bytes:
         return b""
 
 
+def page_bytes(raw_hex: Optional[str]) -> bytes:
+    """
+    Page brute → bytes, quel que soit le format:
+      - hex ASCII des jsonl de synchro (ex: "36314130..." = "61A0...", suffixe 0D0D3E)
+      - hex réel des NDJSON de la gateway / topic jimny/szviewer/raw (ex: "61A0FFFF...")
+    """
+    if not raw_hex:
+        return b""
+    if raw_hex.startswith("3631"):
+        return extract_page_bytes(raw_hex)
+    try:
+        return bytes.fromhex(raw_hex)
+    except ValueError:
+        return b""
+
+
+def load_mapping(path: Optional[Path] = None) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Charge sz_decode_mapping.json (par défaut à côté de ce script). None si absent ou illisible."""
+    mapping_path = path or (Path(__file__).resolve().parent / "sz_decode_mapping.json")
+    if not mapping_path.exists():
+        return None
+    try:
+        return json.loads(mapping_path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
 def u16(b: bytes, off: int) -> Optional[int]:
     if b is None or off + 1 >= len(b):
         return None
@@ -134,6 +166,8 @@ def decode_from_pages(a0: bytes, a2: bytes, a5: bytes, cd: bytes) -> Dict[str, O
 
 
 def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    if is_sync_db(path):
+        return load_rows(path)
     out = []
     with open(path, "r", encoding="utf-8") as f:
         for line in f:
@@ -191,6 +225,7 @@ def run_comparison(
 
 
 def main() -> None:
+    sz_profile.setup_argv()  # --profile / --profile-out / SZ_PROFILE=1
     jsonl_path = sys.argv[1] if len(sys.argv) > 1 else "medias/sz_sync_ocr.jsonl"
     machine = "--machine" in sys.argv or "-m" in sys.argv
     path = Path(jsonl_path)
@@ -198,20 +233,17 @@ def main() -> None:
         print(f"Fichier introuvable: {path}", file=sys.stderr)
         sys.exit(1)
 
-    mapping_path = Path(__file__).resolve().parent / "sz_decode_mapping.json"
-    mapping: Optional[Dict[str, Dict[str, Any]]] = None
-    if mapping_path.exists():
-        try:
-            mapping = json.loads(mapping_path.read_text(encoding="utf-8"))
-        except Exception:
-            pass
+    mapping = load_mapping()
 
-    rows = load_jsonl(str(path))
+    with stage("chargement jsonl") as st:
+        rows = load_jsonl(str(path))
+        st.rows = len(rows)
     decoder_src = "mapping (sz_decode_mapping.json)" if mapping else "sz_decode.h (codé en dur)"
     if not machine:
         print(f"# {len(rows)} trames — décodeur {decoder_src}, comparé à l'OCR\n")
 
-    mae_by_field = run_comparison(rows, mapping)
+    with stage("comparaison", rows=len(rows)):
+        mae_by_field = run_comparison(rows, mapping)
 
     if not machine:
         print("## Erreur moyenne |décodé − OCR| par champ\n")
@@ -6,8 +6,13 @@ des 20 champs SZ Viewer dans les pages hexadécimales 21A0, 21A2, 21A5, 21CD.
 
 import json
 import sys
+from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+
 def hex_ascii_to_bytes(hex_ascii: str) -> bytes:
     """Convertit une chaîne hex ASCII (ex: "36314130...") en bytes."""
     # Enlève les préfixes/suffixes comme "0D0D3E" (CR CR >)
@@ -132,6 +137,7 @@ def analyze_field(field_name: str, values: List[float], pages: List[bytes], page
     return None
 
 def main():
+    sz_profile.setup_argv()
     if len(sys.argv) < 2:
         print("Usage: python3 sz_decode_analyze.py <sz_sync_ocr.jsonl>")
         sys.exit(1)
@@ -140,11 +146,12 @@ def main():
     
     # Charger toutes les données
     all_data = []
-    with open(jsonl_path, 'r') as f:
+    with stage("chargement jsonl") as st, open(jsonl_path, 'r') as f:
         for line in f:
             data = parse_jsonl_line(line)
             if data and data.get('ocr_ok') and 'raw' in data and 'values' in data:
                 all_data.append(data)
+        st.rows = len(all_data)
     
     if not all_data:
         print("Aucune donnée valide trouvée")
@@ -195,15 +202,16 @@ def main():
     
     # Analyser chaque champ
     results = {}
-    for field in field_values:
-        # Essayer dans chaque page
-        for page_name, pages in [('21A0', pages_21A0), ('21A2', pages_21A2), 
-                                  ('21A5', pages_21A5), ('21CD', pages_21CD)]:
-            result = analyze_field(field, field_values[field], pages, page_name)
-            if result:
-                results[field] = result
-                print(f"{field}: offset={result[0]}, scale={result[1]}, page={result[2]}")
-                break
+    with stage("analyse", rows=len(all_data)):
+        for field in field_values:
+            # Essayer dans chaque page
+            for page_name, pages in [('21A0', pages_21A0), ('21A2', pages_21A2),
+                                      ('21A5', pages_21A5), ('21CD', pages_21CD)]:
+                result = analyze_field(field, field_values[field], pages, page_name)
+                if result:
+                    results[field] = result
+                    print(f"{field}: offset={result[0]}, scale={result[1]}, page={result[2]}")
+                    break
     
     # Générer le code C++
     print("\n// Code C++ généré:")
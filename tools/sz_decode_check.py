@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Vérification sur l'hôte de esp32/sz-mqtt/sz_decode.h contre le décodeur Python.
+
+struct SzData et decodeSzFromPages sont extraits du header (sans Arduino.h ni le helper
+String), compilés avec le compilateur C++ du système ($CXX, sinon c++) dans un petit
+programme qui lit des enregistrements binaires sur stdin (4 × [longueur u16 + octets] pour
+21A0, 21A2, 21A5, 21CD) et écrit les 20 champs en float32. Chaque capture committée est
+rejouée et comparée à decode_from_mapping (sz_compare_decode_vs_ocr.py, en double) avec le
+mapping JSON: |C - Python| ≤ --tol + fixed_tol + 2^-21·(|raw·mult/div| + |add|) (fixed_tol:
+arrondi de la virgule fixe admis pour ce champ, écrit dans le mapping par --fixed-point; puis
+arrondi float32 du calcul embarqué), NaN côté C ⇔ None côté Python.
+
+Captures par défaut: medias/*.jsonl, recording/*.jsonl et recording/jimny_capture.log (une
+ligne par réponse, pages courantes reportées). Code de sortie 1 au premier écart.
+
+Usage:
+  python3 tools/sz_decode_check.py
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --update-decode --fixed-point --write-mapping
+  python3 tools/sz_decode_check.py --tol 1e-4 recording/sz_sync_ms_window_ocr.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_compare_decode_vs_ocr import FIELDS, decode_from_mapping, load_jsonl, load_mapping, page_bytes
+from sz_fixed_point import DEFAULT_TOL
+from sz_parse_ms_log import PAGE_PREFIXES, parse_ms_log
+from sz_profile import stage
+
+REPO = Path(__file__).resolve().parent.parent
+DEFAULT_HEADER = REPO / "esp32" / "sz-mqtt" / "sz_decode.h"
+DEFAULT_MAPPING = Path(__file__).resolve().parent / "sz_decode_mapping.json"
+FLOAT_REL = 2.0**-21  # quelques ulp float32 (2^-24) pour raw * a + b calculé en float
+
+HOST_MAIN = r"""
+int main() {
+  static uint8_t buf[4][4096];
+  size_t len[4];
+  for (;;) {
+    for (int p = 0; p < 4; p++) {
+      uint8_t h[2];
+      if (fread(h, 1, 2, stdin) != 2) return 0;
+      len[p] = (size_t)h[0] | ((size_t)h[1] << 8);
+      if (len[p] > sizeof(buf[p]) || fread(buf[p], 1, len[p], stdin) != len[p]) return 2;
+    }
+    SzData out;
+    decodeSzFromPages(buf[0], len[0], buf[1], len[1], buf[2], len[2], buf[3], len[3], out);
+    const float v[] = {%s};
+    fwrite(v, sizeof(float), sizeof(v) / sizeof(v[0]), stdout);
+  }
+}
+"""
+
+
+def extract_decoder(header: str) -> str:
+    """struct SzData {...}; et decodeSzFromPages(...) {...} du header (accolades appariées)."""
+    parts = []
+    for pattern in (r"struct\s+SzData\s*\{", r"static\s+inline\s+void\s+decodeSzFromPages\s*\("):
+        m = re.search(pattern, header)
+        if not m:
+            raise ValueError(f"introuvable dans le header: {pattern}")
+        i = header.index("{", m.end() - 1 if header[m.end() - 1] == "{" else m.end())
+        depth = 0
+        for j in range(i, len(header)):
+            if header[j] == "{":
+                depth += 1
+            elif header[j] == "}":
+                depth -= 1
+                if depth == 0:
+                    end = j + 1
+                    if header[end : end + 1] == ";":
+                        end += 1
+                    parts.append(header[m.start() : end])
+                    break
+        else:
+            raise ValueError(f"accolades non appariées après: {pattern}")
+    return "\n\n".join(parts)
+
+
+def host_source(header: str) -> str:
+    fields = ", ".join(f"out.{f}" for f in FIELDS)
+    return "\n".join([
+        "#include <cmath>",
+        "#include <cstddef>",
+        "#include <cstdint>",
+        "#include <cstdio>",
+        "",
+        extract_decoder(header),
+        HOST_MAIN % fields,
+    ])
+
+
+def compile_host(source: str, workdir: Path) -> Path:
+    cxx = os.environ.get("CXX") or shutil.which("c++") or shutil.which("g++") or shutil.which("clang++")
+    if not cxx:
+        raise RuntimeError("aucun compilateur C++ ($CXX, c++, g++, clang++)")
+    src, exe = workdir / "sz_decode_host.cpp", workdir / "sz_decode_host"
+    src.write_text(source, encoding="utf-8")
+    r = sz_profile.run([cxx, "-std=c++11", "-O2", "-Wall", "-o", str(exe), str(src)], capture_output=True, text=True)
+    if r.returncode != 0:
+        raise RuntimeError(f"compilation ({cxx}) échouée:\n{r.stderr}")
+    return exe
+
+
+def capture_records(path: Path) -> List[Dict[str, bytes]]:
+    """Pages (21A0..21CD → bytes) par ligne de synchro, ou par réponse du log (pages courantes reportées)."""
+    if path.suffix == ".log":
+        current: Dict[str, bytes] = {}
+        out = []
+        for _ts, page, hex_payload in parse_ms_log(path):
+            current[page] = page_bytes(hex_payload)
+            out.append(dict(current))
+        return out
+    return [{p: page_bytes((r.get("raw") or {}).get(p)) for p in PAGE_PREFIXES} for r in load_jsonl(str(path))]
+
+
+def encode_records(records: Sequence[Dict[str, bytes]]) -> bytes:
+    chunks = []
+    for rec in records:
+        for p in PAGE_PREFIXES:
+            b = rec.get(p) or b""
+            chunks.append(struct.pack("<H", len(b)) + b)
+    return b"".join(chunks)
+
+
+def bound(m: Dict[str, float], value: float, tol: float) -> float:
+    add = m.get("add", 0) or 0
+    return tol + m.get("fixed_tol", 0.0) + FLOAT_REL * (abs(value - add) + abs(add))
+
+
+def compare(
+    records: Sequence[Dict[str, bytes]],
+    decoded: Sequence[float],
+    mapping: Dict[str, Dict[str, float]],
+    tol: float,
+    max_err: Dict[str, float],
+    examples: List[str],
+    name: str,
+) -> int:
+    """Nombre d'écarts C/Python; max_err (par champ) et examples (premiers écarts) mis à jour."""
+    bad = 0
+    n = len(FIELDS)
+    for i, rec in enumerate(records):
+        ref = decode_from_mapping(rec, mapping)
+        for k, field in enumerate(FIELDS):
+            c, py = decoded[i * n + k], ref[field]
+            if py is None or math.isnan(c):
+                ok = py is None and math.isnan(c)
+                err = 0.0 if ok else math.inf
+            else:
+                err = abs(c - py)
+                ok = err <= bound(mapping[field], py, tol)
+            max_err[field] = max(max_err.get(field, 0.0), err)
+            if not ok:
+                bad += 1
+                if len(examples) < 10:
+                    examples.append(f"  {name}#{i} {field}: C={c!r} Python={py!r}")
+    return bad
+
+
+def default_captures() -> List[Path]:
+    paths = sorted((REPO / "medias").glob("*.jsonl")) + sorted((REPO / "recording").glob("*.jsonl"))
+    log = REPO / "recording" / "jimny_capture.log"
+    return paths + ([log] if log.exists() else [])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Compile sz_decode.h sur l'hôte et le compare au décodeur Python sur les captures")
+    ap.add_argument("captures", nargs="*", type=Path, help="JSONL/.sqlite de synchro ou log MIM (défaut: captures committées)")
+    ap.add_argument("--header", type=Path, default=DEFAULT_HEADER, help="Header à vérifier (decodeSzFromPages)")
+    ap.add_argument("--mapping", type=Path, default=DEFAULT_MAPPING, help="Mapping JSON de référence (page, offset, mult, div, add)")
+    ap.add_argument("--tol", type=float, default=DEFAULT_TOL, help="Écart absolu toléré en plus de l'arrondi float32")
+    ap.add_argument("--keep", type=Path, default=None, help="Garder le source C++ et le binaire dans ce dossier")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    captures = args.captures or default_captures()
+    for p in [args.header, args.mapping, *captures]:
+        if not p.exists():
+            print(f"Fichier introuvable: {p}", file=sys.stderr)
+            return 1
+    mapping: Optional[Dict[str, Dict[str, float]]] = load_mapping(args.mapping)
+    if not mapping:
+        print(f"Mapping illisible: {args.mapping}", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.keep or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        try:
+            with stage("compilation"):
+                exe = compile_host(host_source(args.header.read_text(encoding="utf-8")), workdir)
+        except (RuntimeError, ValueError) as e:
+            print(str(e), file=sys.stderr)
+            return 1
+
+        max_err: Dict[str, float] = {}
+        examples: List[str] = []
+        total = bad = 0
+        for path in captures:
+            with stage(f"rejeu {path.name}") as st:
+                records = capture_records(path)
+                st.rows = len(records)
+                r = sz_profile.run([str(exe)], input=encode_records(records), capture_output=True)
+            if r.returncode != 0 or len(r.stdout) != 4 * len(FIELDS) * len(records):
+                print(f"{path}: exécution du décodeur hôte échouée (code {r.returncode})", file=sys.stderr)
+                return 1
+            decoded = struct.unpack(f"<{len(FIELDS) * len(records)}f", r.stdout)
+            n_bad = compare(records, decoded, mapping, args.tol, max_err, examples, path.name)
+            print(f"# {path.name}: {len(records)} lignes, {n_bad} écarts", file=sys.stderr)
+            total += len(records)
+            bad += n_bad
+
+    print("Écart max C/Python par champ:")
+    for field in FIELDS:
+        m = mapping.get(field)
+        desc = f"{m.get('page')}[{m.get('offset')}]" if m else "absent du mapping"
+        print(f"  {field:28s} {max_err.get(field, 0.0):.3g}  ({desc})")
+    if bad:
+        print(f"{bad} écarts sur {total} lignes (tolérance {args.tol:g}):", file=sys.stderr)
+        for line in examples:
+            print(line, file=sys.stderr)
+        return 1
+    print(f"OK: {total} lignes de {len(captures)} captures, {args.header.name} conforme au mapping (tolérance {args.tol:g})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Validation croisée du choix (page, offset, formule) de sz_decode_from_ocr_jsonl.py.
+
+Les trames sont coupées en K blocs contigus dans le temps (pas de tirage aléatoire:
+des trames voisines se ressemblent, un tirage mélangé gonflerait le score). Pour chaque
+pli: sur les K-1 blocs d'entraînement, chaque champ choisit le meilleur candidat comme
+find_best_for_field (formules fixes FORMULAS + fit linéaire scale/offset, sur tous les
+mots des pages sauf SKIP_SLOTS); ce choix est ensuite mesuré sur le bloc tenu à l'écart.
+Le mapping courant (sz_decode_mapping.json) est évalué de la même façon: même (page,
+offset), scale/offset réajustés sur l'entraînement.
+
+Par champ: MAE train / test (moyenne et écart-type sur les plis), MAE test du mapping,
+slot majoritaire et stabilité (nombre de plis qui le choisissent). Un champ dont la
+MAE test dépasse largement la MAE train, ou dont le slot change d'un pli à l'autre,
+est un fit opportuniste: ne pas flasher.
+
+Les plis tournent en parallèle (ProcessPoolExecutor); les matrices de mots et de cibles
+sont passées une fois par processus (initializer). Choix par champ indépendant: pas de
+résolution des conflits (assign_no_conflicts), on mesure la généralisation du fit.
+
+Avec --robust huber|ransac, le choix sur l'entraînement et la MAE test utilisent le score
+robuste de sz_robust_fit.py (MAE sur les lignes en accord). La fraction en accord du bloc
+test est gardée: un pli sous --min-inliers est signalé (« ! accord test »), le slot ne colle
+alors qu'à une partie du bloc tenu à l'écart.
+
+Appelé par: python3 tools/sz_decode_from_ocr_jsonl.py <jsonl> --cv 5 [--workers N] [--robust huber]
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_page_matrix import PageMatrix, linear_fit_mae, np
+
+_W: Optional[np.ndarray] = None
+_SLOTS: List[Tuple[str, int]] = []
+_Y: Optional[np.ndarray] = None
+_MAP_W: Optional[np.ndarray] = None
+_FORMULAS: List[Tuple[float, float, str]] = []
+_ROBUST: Optional[Tuple[str, float]] = None  # (méthode, fraction en accord minimale), sz_robust_fit.py
+
+
+def slot_matrix(pm: PageMatrix, skip: Set[Tuple[str, int]], max_offset: int = 60) -> Tuple[np.ndarray, List[Tuple[str, int]]]:
+    """Mots 16 bits candidats (offsets pairs, comme find_all_candidates) en une matrice (n, K)."""
+    cols: List[np.ndarray] = []
+    slots: List[Tuple[str, int]] = []
+    for page in pm.pages:
+        w = pm.words(page)
+        offsets = [o for o in range(0, min(max_offset, w.shape[1]), 2) if (page, o) not in skip]
+        cols.append(w[:, offsets])
+        slots.extend((page, o) for o in offsets)
+    return np.concatenate(cols, axis=1), slots
+
+
+def mapping_matrix(pm: PageMatrix, mapping: Dict[str, Dict[str, Any]]) -> np.ndarray:
+    """Mot du mapping courant par champ (n, F), NaN si le champ n'a pas de slot."""
+    out = np.full((pm.n, len(pm.fields)), np.nan)
+    for j, f in enumerate(pm.fields):
+        m = mapping.get(f) or {}
+        page, off = m.get("page"), m.get("offset")
+        if page in pm.pages and off is not None and off + 1 < pm.pages[page].shape[1]:
+            out[:, j] = pm.words(page)[:, off]
+    return out
+
+
+def contiguous_folds(n: int, k: int) -> List[np.ndarray]:
+    return np.array_split(np.arange(n), k)
+
+
+def _init_worker(
+    w: np.ndarray,
+    slots: List[Tuple[str, int]],
+    y: np.ndarray,
+    map_w: np.ndarray,
+    formulas: List[Tuple[float, float, str]],
+    robust: Optional[Tuple[str, float]] = None,
+) -> None:
+    global _W, _SLOTS, _Y, _MAP_W, _FORMULAS, _ROBUST
+    _W, _SLOTS, _Y, _MAP_W, _FORMULAS, _ROBUST = w, slots, y, map_w, formulas, robust
+
+
+def _mae(pred: np.ndarray, y: np.ndarray) -> Tuple[float, int, float]:
+    """(MAE, n, fraction en accord); sans --robust MAE simple et fraction 1."""
+    ok = np.isfinite(pred)
+    n = int(ok.sum())
+    if _ROBUST and n:
+        # même score qu'à l'entraînement, sinon une lecture aberrante du bloc test suffit à crier au surapprentissage
+        from sz_robust_fit import display_step, inlier_score
+
+        mae, frac = inlier_score((y - np.where(ok, pred, 0.0))[:, None], ok[:, None], display_step(y))
+        return (float(mae[0]), n, float(frac[0]))
+    return (float(np.abs(pred[ok] - y[ok]).mean()) if n else float("inf"), n, 1.0 if n else 0.0)
+
+
+def choose(w: np.ndarray, y: np.ndarray, use_linear_fit: bool) -> Optional[Tuple[int, str, float, float, float, float]]:
+    """Meilleur (colonne, label, mult, div, add, mae) sur les lignes d'entraînement (y sans NaN)."""
+    if len(y) < 5:
+        return None
+    valid = np.isfinite(w)
+    cnt = valid.sum(axis=0)
+    best: Optional[Tuple[int, str, float, float, float, float]] = None
+    if _ROBUST:
+        from sz_robust_fit import display_step, inlier_score, robust_fit_mae
+
+        method, min_inliers = _ROBUST
+        step = display_step(y)
+    for mult, div, label in _FORMULAS:
+        if _ROBUST:
+            mae, frac = inlier_score(y[:, None] - np.where(valid, w, 0.0) * (mult / div), valid, step)
+            mae = np.where((cnt >= 5) & (frac >= min_inliers), mae, np.inf)
+        else:
+            err = np.where(valid, np.abs(np.where(valid, w, 0.0) * (mult / div) - y[:, None]), 0.0)
+            mae = np.where(cnt >= 5, err.sum(axis=0) / np.maximum(cnt, 1), np.inf)
+        col = int(np.argmin(mae))
+        if np.isfinite(mae[col]) and (best is None or mae[col] < best[5]):
+            best = (col, label, float(mult), float(div), 0.0, float(mae[col]))
+    if use_linear_fit:
+        if _ROBUST:
+            a, b, mae, n, frac = robust_fit_mae(w, y, method)
+            mae = np.where(frac >= min_inliers, mae, np.inf)
+        else:
+            a, b, mae, n = linear_fit_mae(w, y)
+        mae = np.where(n >= 5, mae, np.inf)
+        col = int(np.argmin(mae))
+        if np.isfinite(mae[col]) and (best is None or mae[col] < best[5]):
+            best = (col, "linear", float(a[col]), 1.0, float(b[col]), float(mae[col]))
+    return best
+
+
+def run_fold(task: Tuple[np.ndarray, np.ndarray, bool]) -> Dict[int, Dict[str, Any]]:
+    """Un pli: choix sur train, mesure sur test, pour chaque champ (index de colonne de _Y)."""
+    train_idx, test_idx, use_linear_fit = task
+    out: Dict[int, Dict[str, Any]] = {}
+    for j in range(_Y.shape[1]):
+        y = _Y[:, j]
+        tr = train_idx[~np.isnan(y[train_idx])]
+        te = test_idx[~np.isnan(y[test_idx])]
+        if len(tr) < 5 or len(te) == 0:
+            continue
+        res: Dict[str, Any] = {"n_test": int(len(te))}
+        if np.ptp(y[tr]) == 0:
+            # Cible constante sur l'entraînement: le décodeur sortirait mult=0, add=valeur
+            res.update(slot="const", label="const", train=0.0)
+            res["test"], _, res["test_inliers"] = _mae(np.full(len(te), y[tr][0]), y[te])
+        else:
+            c = choose(_W[tr], y[tr], use_linear_fit)
+            if c is None:
+                continue
+            col, label, mult, div, add, mae_tr = c
+            page, off = _SLOTS[col]
+            res.update(slot=f"{page}[{off}]", label=label, train=mae_tr)
+            res["test"], _, res["test_inliers"] = _mae(_W[te, col] * mult / div + add, y[te])
+        mw = _MAP_W[:, j]
+        if np.isfinite(mw[tr]).sum() >= 5:
+            a, b, mae, _ = linear_fit_mae(mw[tr][:, None], y[tr])
+            if np.isfinite(mae[0]):
+                res["mapping_test"] = _mae(mw[te] * a[0] + b[0], y[te])[0]
+            elif np.ptp(y[tr]) == 0:
+                res["mapping_test"] = _mae(np.full(len(te), y[tr][0]), y[te])[0]
+        out[j] = res
+    return out
+
+
+def run_cv(
+    pm: PageMatrix,
+    k: int,
+    formulas: List[Tuple[float, float, str]],
+    skip: Set[Tuple[str, int]],
+    mapping: Optional[Dict[str, Dict[str, Any]]] = None,
+    use_linear_fit: bool = True,
+    workers: int = 0,
+    robust: Optional[Tuple[str, float]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Résumé par champ: train/test moyens, écart-type test, mapping, slot majoritaire, stabilité."""
+    w, slots = slot_matrix(pm, skip)
+    map_w = mapping_matrix(pm, mapping or {})
+    folds = contiguous_folds(pm.n, k)
+    tasks = []
+    for i, te in enumerate(folds):
+        tr = np.concatenate([f for m, f in enumerate(folds) if m != i])
+        tasks.append((tr, te, use_linear_fit))
+    workers = min(k, workers or os.cpu_count() or 1)
+    init = (w, slots, pm.targets, map_w, formulas, robust)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init) as ex:
+            per_fold = list(ex.map(run_fold, tasks))
+    else:
+        _init_worker(*init)
+        per_fold = [run_fold(t) for t in tasks]
+
+    summary: Dict[str, Dict[str, Any]] = {}
+    for j, field in enumerate(pm.fields):
+        res = [f[j] for f in per_fold if j in f]
+        if not res:
+            continue
+        tests = np.array([r["test"] for r in res])
+        trains = np.array([r["train"] for r in res])
+        slot_counts = Counter(f"{r['slot']} {r['label']}" if r["slot"] != "const" else "const" for r in res)
+        modal, votes = slot_counts.most_common(1)[0]
+        map_tests = [r["mapping_test"] for r in res if "mapping_test" in r]
+        inliers = np.array([r["test_inliers"] for r in res])
+        summary[field] = {
+            "folds": len(res),
+            "train_mae": float(trains.mean()),
+            "test_mae": float(tests.mean()),
+            "test_std": float(tests.std()),
+            "mapping_test_mae": float(np.mean(map_tests)) if map_tests else None,
+            "slot": modal,
+            "stability": votes / len(res),
+            "slots": dict(slot_counts),
+            "test_inliers_min": float(inliers.min()),
+            "weak_folds": int((inliers < robust[1]).sum()) if robust else 0,
+            "min_inliers": robust[1] if robust else None,
+        }
+    return summary
+
+
+def format_report(summary: Dict[str, Dict[str, Any]]) -> List[str]:
+    lines = [f"{'champ':28s} {'train':>9s} {'test':>9s} {'±':>8s} {'mapping':>9s}  slot majoritaire (plis)"]
+    for field, s in summary.items():
+        mp = f"{s['mapping_test_mae']:9.3f}" if s["mapping_test_mae"] is not None else f"{'-':>9s}"
+        flag = ""
+        if s["stability"] < 0.6:
+            flag = "  ! instable"
+        elif s["test_mae"] > 2 * s["train_mae"] + 1e-6 and s["test_mae"] > 0.05:
+            flag = "  ! surapprentissage"
+        if s["weak_folds"]:
+            flag += (f"  ! accord test < {100 * s['min_inliers']:.0f} % sur {s['weak_folds']}/{s['folds']} plis"
+                     f" (min {100 * s['test_inliers_min']:.0f} %)")
+        votes = round(s["stability"] * s["folds"])
+        lines.append(
+            f"{field:28s} {s['train_mae']:9.3f} {s['test_mae']:9.3f} {s['test_std']:8.3f} {mp}  {s['slot']} ({votes}/{s['folds']}){flag}"
+        )
+    return lines
@@ -6,6 +6,11 @@ Approche: comparer les valeurs OCR avec les bytes bruts pour identifier les corr
 
 import json
 import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
 
 def hex_ascii_to_hex(hex_ascii):
     """Convertit hex ASCII (ex: "36314130") en hex réel (ex: "61A0")."""
@@ -96,6 +101,7 @@ def find_value_in_bytes(target_value, bytes_data, tolerance=0.2):
     return None
 
 def main():
+    sz_profile.setup_argv()
     if len(sys.argv) < 2:
         print("Usage: python3 sz_decode_find.py <sz_sync_ocr.jsonl>")
         sys.exit(1)
@@ -104,7 +110,7 @@ def main():
     
     # Charger les données
     frames = []
-    with open(jsonl_path, 'r') as f:
+    with stage("chargement jsonl") as st, open(jsonl_path, 'r') as f:
         for line in f:
             try:
                 data = json.loads(line.strip())
@@ -112,6 +118,7 @@ def main():
                     frames.append(data)
             except:
                 pass
+        st.rows = len(frames)
     
     if len(frames) < 2:
         print("Besoin d'au moins 2 frames")
@@ -141,6 +148,12 @@ def main():
         'requested_in_pressure_mbar', 'engine_rpm'
     ]
     
+    with stage("recherche", rows=len(frames)):
+        results = search_fields(frames, pages_data, field_names)
+    print_decode_code(results)
+
+def search_fields(frames, pages_data, field_names):
+    """Meilleure correspondance (page, offset, échelle, erreur) par champ, affichée au fil de la recherche."""
     results = {}
     
     for field in field_names:
@@ -213,7 +226,9 @@ def main():
             if best_match[3] < max_error:
                 results[field] = best_match
                 print(f"{field:30s} -> {best_match[0]:5s} offset={best_match[1]:3d} scale={best_match[2]:6.2f} error={best_match[3]:.3f}")
-    
+    return results
+
+def print_decode_code(results):
     # Générer le code C++
     print("\n" + "="*70)
     print("// Code C++ pour decodeSzFromPages()")
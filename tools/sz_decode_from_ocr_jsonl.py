@@ -10,6 +10,35 @@ qui minimise l'erreur moyenne |décodé - OCR|. Les formules testées: *0.01, *0
 Usage:
   python3 tools/sz_decode_from_ocr_jsonl.py medias/sz_sync_ocr.jsonl
   python3 tools/sz_decode_from_ocr_jsonl.py medias/sz_sync_ocr.jsonl --update-decode
+  python3 tools/sz_decode_from_ocr_jsonl.py medias/sz_sync_ocr.jsonl --variability-index tools/sz_variability_index.json
+
+--variability-index: index produit par sz_byte_variability.py; les mots 16 bits classés
+const (jamais modifiés) ou noise (bruit sans continuité) ne sont pas scorés.
+
+--cv K: validation croisée sur K blocs contigus (sz_decode_cv.py, numpy): choix du slot
+sur K-1 blocs, MAE sur le bloc restant, stabilité du slot et MAE test du mapping courant.
+Rien n'est écrit dans ce mode.
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --cv 5
+
+--robust huber|ransac: fit et score robustes aux mauvaises lectures OCR (sz_robust_fit.py,
+numpy): coefficients Huber (IRLS) ou RANSAC (graine fixe), MAE sur les lignes en accord,
+fraction en accord affichée par champ; --min-inliers (0.8) écarte les candidats qui
+n'expliquent qu'une partie des lignes. Se combine avec --cv.
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --robust huber
+
+--rational: après le fit, chaque échelle flottante devient la fraction p/q la plus simple
+(fraction continue, p/2^k) qui décode aussi bien, décalage entier compris: (raw·p + c) / q,
+calcul entier exact dans sz_decode.h (sz_rational.py, numpy). --max-den, --rational-tol.
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --robust huber --rational
+
+--fixed-point (avec --update-decode): decodeSzFromPages devient une table (page, offset, M,
+B, 2^-S) et une boucle, valeur = (raw * M + B) * 2^-S en entiers 32 bits, erreur d'arrondi
+≤ --fixed-tol (0.5) pas d'affichage; un champ qui demanderait un produit 64 bits reste en
+flottant. Vérification sur l'hôte par sz_decode_check.py.
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --update-decode --fixed-point --write-mapping
+  python3 tools/sz_decode_check.py
+
+--profile / --profile-out X.json|X.pstats / SZ_PROFILE=1: temps par étape (sz_profile.py).
 """
 
 from __future__ import annotations
@@ -18,7 +47,12 @@ import argparse
 import json
 import sys
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import profiled, stage
+from sz_sync_db import is_sync_db, load_rows
 
 # Candidat: (page, offset, mult, div, add, label, mae, n) — add=0 pour formules scale-only
 Candidate = Tuple[str, int, float, float, float, str, float, int]
@@ -70,6 +104,13 @@ FORMULAS: List[Tuple[float, float, str]] = [
     (25, 10, "raw*2.5"),
 ]
 
+# (page, offset) à ne pas scorer — rempli par --variability-index (mots const/noise)
+SKIP_SLOTS: Set[Tuple[str, int]] = set()
+
+# Recherche robuste (sz_robust_fit.RobustSearch) — posée par --robust, remplace mae_for /
+# linear_fit_for / find_all_candidates par leur version vectorisée à score robuste
+ROBUST: Any = None
+
 
 def extract_page_bytes(raw_hex_ascii: Optional[str]) -> bytes:
     """Convertit le format hex ASCII du jsonl (ex: 36314130... = '61A0') en bytes réels."""
@@ -93,6 +134,9 @@ def extract_page_bytes(raw_hex_ascii: Optional[str]) -> bytes:
 
 
 def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Lignes avec values et raw d'un JSONL de synchro ou d'une base .sqlite (sz_sync_db.py)."""
+    if is_sync_db(path):
+        return [d for d in load_rows(path) if d.get("values") and d.get("raw")]
     out = []
     with open(path, "r", encoding="utf-8") as f:
         for line in f:
@@ -183,6 +227,7 @@ def normalized_correlation(ocr_series: List[float], raw_series: List[float]) ->
     return (max(-1.0, min(1.0, r)), len(pairs))
 
 
+@profiled("candidats par forme")
 def shape_candidates_for_field(
     rows: List[Dict],
     field: str,
@@ -201,6 +246,8 @@ def shape_candidates_for_field(
             payload = extract_page_bytes((row.get("raw") or {}).get(page))
             max_len = max(max_len, len(payload))
         for offset in range(0, min(max_offset, max_len - 1), 2):
+            if (page, offset) in SKIP_SLOTS:
+                continue
             raw_series = get_raw_series(rows, page, offset)
             corr, n = normalized_correlation(ocr_series, raw_series)
             if n >= 5:
@@ -230,6 +277,8 @@ def mae_for(
     use_last_known: bool = True,
 ) -> Tuple[float, int]:
     """Erreur moyenne absolue (avec dernière valeur connue si use_last_known)."""
+    if ROBUST is not None:
+        return ROBUST.mae_for(rows, field, page, offset, mult, div, add)
     err_sum = 0.0
     n = 0
     last_known: Optional[float] = None
@@ -266,6 +315,8 @@ def linear_fit_for(
     use_last_known: bool = True,
 ) -> Optional[Tuple[float, float, float, int]]:
     """Régression linéaire raw -> OCR, puis MAE avec dernière valeur connue."""
+    if ROBUST is not None:
+        return ROBUST.linear_fit_for(rows, field, page, offset)
     raws: List[float] = []
     targets: List[float] = []
     for row in rows:
@@ -325,6 +376,7 @@ def linear_fit_for(
     return (scale, add, mae, n_mae)
 
 
+@profiled("candidats")
 def find_all_candidates(
     rows: List[Dict],
     field: str,
@@ -334,6 +386,8 @@ def find_all_candidates(
     use_linear_fit: bool = True,
 ) -> List[Candidate]:
     """Retourne les top_n meilleurs (page, offset, mult, div, add, label, mae, n) triés par MAE."""
+    if ROBUST is not None:
+        return ROBUST.candidates(rows, field, top_n=top_n, use_linear_fit=use_linear_fit)
     candidates: List[Candidate] = []
     for page in PAGES:
         max_len = 0
@@ -341,6 +395,8 @@ def find_all_candidates(
             payload = extract_page_bytes((row.get("raw") or {}).get(page))
             max_len = max(max_len, len(payload))
         for offset in range(0, min(max_offset, max_len - 1), 2):
+            if (page, offset) in SKIP_SLOTS:
+                continue
             for mult, div, label in FORMULAS:
                 mae, n = mae_for(rows, field, page, offset, mult, div, 0.0)
                 if n < 5:
@@ -512,6 +568,7 @@ def assign_hybrid(
 
 
 def main() -> None:
+    global ROBUST
     ap = argparse.ArgumentParser(description="Dérive le décodeur SZ depuis sz_sync_ocr.jsonl")
     ap.add_argument("jsonl", nargs="?", default="medias/sz_sync_ocr.jsonl", help="Chemin sz_sync_ocr.jsonl")
     ap.add_argument("--update-decode", action="store_true", help="Écrire le décodeur dans sz_decode.h")
@@ -521,7 +578,19 @@ def main() -> None:
     ap.add_argument("--limit", type=int, default=0, help="Utiliser seulement les N premières trames (0 = toutes)")
     ap.add_argument("--by-shape", action="store_true", help="Tout apparier par forme (corrélation normalisée)")
     ap.add_argument("--no-freeze", action="store_true", help="Ne pas geler les champs MAE=0 (tout ré-optimiser par formules)")
+    ap.add_argument("--variability-index", type=Path, default=None, help="Index sz_byte_variability.py: ne pas scorer les mots const/bruit")
+    ap.add_argument("--cv", type=int, default=0, metavar="K", help="Validation croisée sur K blocs contigus (rapport seul, numpy requis)")
+    ap.add_argument("--workers", type=int, default=0, help="Processus pour --cv (0 = nombre de CPU, borné à K)")
+    ap.add_argument("--robust", choices=["huber", "ransac"], default=None, help="Fit robuste aux erreurs OCR (numpy requis)")
+    ap.add_argument("--min-inliers", type=float, default=0.8, help="--robust: fraction minimale de lignes en accord par candidat")
+    ap.add_argument("--fixed-point", action="store_true", help="--update-decode: décodeur en virgule fixe (table, entiers), sz_fixed_point.py")
+    ap.add_argument("--fixed-tol", type=float, default=0.5, help="--fixed-point: erreur d'arrondi maximale par champ, en pas d'affichage")
+    ap.add_argument("--rational", action="store_true", help="Échelles des fits linéaires → fractions p/q exactes (numpy requis)")
+    ap.add_argument("--max-den", type=int, default=1024, help="--rational: dénominateur maximal de l'échelle")
+    ap.add_argument("--rational-tol", type=float, default=0.5, help="--rational: MAE en plus tolérée, en pas d'affichage du champ")
+    sz_profile.add_arguments(ap)
     args = ap.parse_args()
+    sz_profile.setup(args)
 
     path = Path(args.jsonl)
     if not path.exists():
@@ -534,30 +603,83 @@ def main() -> None:
         parts = args.exclude.split(":")
         if len(parts) == 3:
             exclude = (parts[0].strip(), parts[1].strip().upper(), int(parts[2], 10))
-    rows = load_jsonl(str(path))
+    if args.variability_index:
+        if not args.variability_index.exists():
+            print(f"Index introuvable: {args.variability_index}", file=sys.stderr)
+            sys.exit(1)
+        from sz_byte_variability import load_index, pruned_slots
+
+        SKIP_SLOTS.update(pruned_slots(load_index(args.variability_index)))
+        print(f"# {len(SKIP_SLOTS)} mots const/bruit écartés ({args.variability_index})")
+    with stage("chargement jsonl") as st:
+        rows = load_jsonl(str(path))
+        st.rows = len(rows)
     if args.limit > 0:
         rows = rows[: args.limit]
         print(f"# {len(rows)} trames (limit={args.limit}) depuis {path} (linear_fit={use_linear})\n")
     else:
         print(f"# {len(rows)} trames chargées depuis {path} (linear_fit={use_linear})\n")
+    if args.robust:
+        from sz_robust_fit import RobustSearch
+
+        ROBUST = RobustSearch(args.robust, FORMULAS, SKIP_SLOTS, min_inliers=args.min_inliers)
+        print(f"# Fit robuste {args.robust}: MAE sur les lignes en accord, candidats ≥ {100 * args.min_inliers:.0f} % en accord\n")
+
+    if args.cv:
+        if args.cv < 2:
+            print("--cv: il faut au moins 2 plis", file=sys.stderr)
+            sys.exit(1)
+        from sz_decode_cv import format_report, run_cv
+        from sz_page_matrix import build_page_matrix
+
+        mapping_path = Path(__file__).resolve().parent / "sz_decode_mapping.json"
+        mapping = json.loads(mapping_path.read_text(encoding="utf-8")) if mapping_path.exists() else {}
+        with stage("matrices", rows=len(rows)):
+            pm = build_page_matrix(rows)
+        with stage("validation croisée", rows=len(rows)):
+            robust = (args.robust, args.min_inliers) if args.robust else None
+            summary = run_cv(pm, args.cv, FORMULAS, SKIP_SLOTS, mapping, use_linear, args.workers, robust)
+        print(f"# Validation croisée: {args.cv} blocs contigus, choix sur {args.cv - 1}, MAE sur le bloc restant\n")
+        for line in format_report(summary):
+            print(line)
+        stable = sum(1 for s in summary.values() if s["stability"] == 1.0)
+        print(f"\nOK: {len(summary)} champs validés, {stable} avec le même slot sur tous les plis")
+        return
 
-    if getattr(args, "by_shape", False):
-        results = assign_by_shape(rows, use_linear_fit=use_linear, exclude=exclude)
-        print("# Attribution par forme (min/max/amplitude, corrélation séries normalisées)\n")
-    elif not getattr(args, "no_freeze", False):
-        results = assign_hybrid(rows, use_linear_fit=use_linear, exclude=exclude)
-        print("# Champs MAE=0 conservés ; reste optimisé par forme puis formules\n")
-    else:
-        results = assign_no_conflicts(rows, use_linear_fit=use_linear, exclude=exclude)
+    with stage("attribution", rows=len(rows)):
+        if getattr(args, "by_shape", False):
+            results = assign_by_shape(rows, use_linear_fit=use_linear, exclude=exclude)
+            print("# Attribution par forme (min/max/amplitude, corrélation séries normalisées)\n")
+        elif not getattr(args, "no_freeze", False):
+            results = assign_hybrid(rows, use_linear_fit=use_linear, exclude=exclude)
+            print("# Champs MAE=0 conservés ; reste optimisé par forme puis formules\n")
+        else:
+            results = assign_no_conflicts(rows, use_linear_fit=use_linear, exclude=exclude)
+    if args.rational:
+        from sz_rational import rationalize_results
+
+        with stage("fractions", rows=len(rows)):
+            results, report = rationalize_results(rows, results, args.max_den, args.rational_tol, robust=ROBUST is not None, min_inliers=args.min_inliers)
+        print(f"# Échelles rationnelles (q ≤ {args.max_den}, tolérance {args.rational_tol} pas d'affichage):")
+        for line in report:
+            print(line)
+        print()
     for field in FIELDS:
         r = results.get(field)
         if r:
             page, offset, mult, div, add, label, mae, n = r
             add_s = f" + {add}f" if add != 0 else ""
-            print(f"  {field}: page={page} offset={offset} {label}{add_s}  mae={mae:.3f} n={n}")
+            if label == "rational":
+                from sz_rational import label as rational_label
+
+                label, add_s = rational_label((int(mult), int(div), round(add * div))), ""
+            frac = ROBUST.inlier_fraction(field, r) if ROBUST is not None else None
+            inl_s = f" accord={100 * frac:.1f}%" if frac is not None else ""
+            print(f"  {field}: page={page} offset={offset} {label}{add_s}  mae={mae:.3f} n={n}{inl_s}")
         else:
             print(f"  {field}: (aucun fit)")
 
+    fixed_tols: Dict[str, float] = {}
     if args.update_decode:
         decode_path = Path(__file__).resolve().parent.parent / "esp32" / "sz-mqtt" / "sz_decode.h"
         print(f"\n# Génération du décodeur pour {decode_path}")
@@ -567,23 +689,36 @@ def main() -> None:
         gen.append("// Généré par tools/sz_decode_from_ocr_jsonl.py à partir de sz_sync_ocr.jsonl")
         gen.append("// Coller le contenu de decodeSzFromPages (remplacer l’existant) ou appliquer manuellement.")
         gen.append("")
+        if args.fixed_point:
+            from sz_fixed_point import field_tolerances, fixed_point_body
+
+            fixed_tols = field_tolerances(rows, FIELDS, args.fixed_tol)
+            body, floating = fixed_point_body(results, FIELDS, fixed_tols)
+            gen.extend(body)
+            gen.append("")
+            n_fixed = sum(1 for f in FIELDS if results.get(f)) - len(floating)
+            print(f"  Virgule fixe: {n_fixed} champs" + (f", restés en flottant: {', '.join(floating)}" if floating else ""))
         for field in FIELDS:
             r = results.get(field)
-            if not r:
+            if not r or args.fixed_point:
                 continue
             page, offset, mult, div, add, label, mae, n = r
             var = "a0" if page == "21A0" else "a2" if page == "21A2" else "a5" if page == "21A5" else "cd"
             len_var = var + "Len"
-            if add != 0:
-                expr = f"(float)raw * {mult}f + {add}f"
+            if label == "rational":
+                from sz_rational import c_expr
+
+                expr = c_expr((int(mult), int(div), round(add * div)))
+            elif add != 0:
+                expr = f"(float)raw * {float(mult)}f + {float(add)}f"
             elif mult == 1 and div == 1:
                 expr = "(float)raw"
             elif div == 1:
-                expr = f"(float)raw * {mult}f"
+                expr = f"(float)raw * {float(mult)}f"
             elif mult == 1:
-                expr = f"(float)raw / {div}f"
+                expr = f"(float)raw / {float(div)}f"
             else:
-                expr = f"(float)raw * {mult}f / {div}f"
+                expr = f"(float)raw * {float(mult)}f / {float(div)}f"
             gen.append(f"  // {field} (mae={mae:.2f} n={n})")
             gen.append(f"  if ({len_var} > {offset + 1}) {{")
             gen.append(f"    uint16_t raw = ({var}[{offset}] << 8) | {var}[{offset + 1}];")
@@ -594,6 +729,7 @@ def main() -> None:
         out_gen.write_text("\n".join(gen), encoding="utf-8")
         print(f"  Snippet: {out_gen}")
         rewrite_sz_decode_h(decode_path, gen)
+        print("  Vérifier: python3 tools/sz_decode_check.py (avec --write-mapping pour le mapping à jour)")
     if args.write_mapping:
         repo = Path(__file__).resolve().parent.parent
         mapping: Dict[str, Dict[str, Any]] = {}
@@ -603,6 +739,8 @@ def main() -> None:
                 continue
             page, offset, mult, div, add, label, mae, n = r
             mapping[field] = {"page": page, "offset": offset, "mult": mult, "div": div, "add": add, "label": label}
+            if fixed_tols and field in fixed_tols:
+                mapping[field]["fixed_tol"] = fixed_tols[field]  # écart toléré par sz_decode_check.py
         map_path = repo / "tools" / "sz_decode_mapping.json"
         map_path.write_text(json.dumps(mapping, indent=2), encoding="utf-8")
         print(f"  Mapping: {map_path}")
@@ -6,6 +6,11 @@ les valeurs OCR avec les bytes bruts de manière plus exhaustive.
 
 import json
 import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
 
 def hex_ascii_to_hex(hex_ascii):
     if not hex_ascii: return ""
@@ -53,10 +58,11 @@ def find_all_matches(target_value, bytes_data, max_offset=60):
     return sorted(matches, key=lambda x: x[2])[:5]  # Top 5
 
 def main():
+    sz_profile.setup_argv()
     jsonl_path = sys.argv[1] if len(sys.argv) > 1 else 'medias/sz_sync_ocr.jsonl'
     
     frames = []
-    with open(jsonl_path, 'r') as f:
+    with stage("chargement jsonl") as st, open(jsonl_path, 'r') as f:
         for line in f:
             try:
                 data = json.loads(line.strip())
@@ -64,6 +70,7 @@ def main():
                     frames.append(data)
             except:
                 pass
+        st.rows = len(frames)
     
     if len(frames) < 3:
         print("Besoin d'au moins 3 frames")
@@ -79,6 +86,11 @@ def main():
     
     print("Analyse manuelle des champs prioritaires:\n")
     
+    with stage("analyse", rows=len(frames)):
+        analyse_fields(frames, priority_fields)
+
+def analyse_fields(frames, priority_fields):
+    """Affiche, par champ prioritaire, les (page, offset, échelle) retrouvés sur plusieurs frames."""
     for field in priority_fields:
         # Prendre 3 frames avec des valeurs différentes
         values_with_idx = [(i, f['values'].get(field)) for i, f in enumerate(frames) 
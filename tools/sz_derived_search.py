@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Recherche de champs dérivés de deux sources: produit, rapport, différence de deux mots
+16 bits (ou de deux champs déjà décodés par le mapping), puis ajustement linéaire
+value = a * combinaison + b contre l'OCR, classé par MAE.
+
+Cas d'usage: gear_ratio ("Gear ratio (speed/rpm)" dans SZ Viewer) que le fit mono-slot
+actuel ne fait qu'approcher.
+
+Sources:
+  - mots 16 bits aux offsets pairs (comme sz_decode_from_ocr_jsonl.py), moins les mots
+    const/noise de l'index de variabilité (--variability-index, sz_byte_variability.py)
+  - champs décodés avec le mapping (--mapping), pseudo-page "decoded"
+Combinaisons pour chaque paire de sources (A, B): A*B, A/B, B/A, A-B (le signe et
+l'échelle sont absorbés par le fit). Chaque paire de pages est un lot calculé en bloc
+(matrices n × K_A × K_B) dans un processus de --workers; les matrices sont passées une
+fois par processus (initializer), pas à chaque lot.
+
+Une combinaison n'est gardée que si elle est définie (dénominateur non nul) sur au moins
+--min-coverage des trames où l'OCR est présent, sinon un rapport « gagnerait » en
+écartant les lignes difficiles. Le meilleur fit mono-slot est rappelé pour comparaison.
+MAE calculée sur les lignes d'ajustement (in-sample): valider ensuite avec --cv.
+
+Usage:
+  python3 tools/sz_derived_search.py recording/sz_sync_ms_window_ocr.jsonl
+  python3 tools/sz_derived_search.py recording/sz_sync_ms_window_ocr.jsonl --fields gear_ratio,air_flow_request_mgcp --top 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations_with_replacement
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_page_matrix import PageMatrix, linear_fit_mae, load_page_matrix, np
+from sz_profile import stage
+
+DEFAULT_MAPPING = Path(__file__).resolve().parent / "sz_decode_mapping.json"
+DEFAULT_INDEX = Path(__file__).resolve().parent / "sz_variability_index.json"
+MAX_OFFSET = 60
+
+# Source = (matrice (n, K) float64, libellés des colonnes)
+Source = Tuple[np.ndarray, List[str]]
+
+_SOURCES: Dict[str, Source] = {}
+_TARGETS: Dict[str, np.ndarray] = {}
+
+
+def word_sources(pm: PageMatrix, skip: Set[Tuple[str, int]]) -> Dict[str, Source]:
+    out: Dict[str, Source] = {}
+    for page in pm.pages:
+        w = pm.words(page)
+        offsets = [o for o in range(0, min(MAX_OFFSET, w.shape[1]), 2) if (page, o) not in skip]
+        if offsets:
+            out[page] = (w[:, offsets], [f"{page}[{o}]" for o in offsets])
+    return out
+
+
+def decoded_source(pm: PageMatrix, mapping: Dict[str, Dict[str, Any]]) -> Optional[Source]:
+    cols: List[np.ndarray] = []
+    labels: List[str] = []
+    for field, m in mapping.items():
+        page, off = m.get("page"), m.get("offset")
+        if page not in pm.pages or off is None or off + 1 >= pm.pages[page].shape[1]:
+            continue
+        w = pm.words(page)[:, off]
+        cols.append(w * float(m.get("mult", 1.0)) / float(m.get("div", 1.0) or 1.0) + float(m.get("add", 0.0)))
+        labels.append(field)
+    if not cols:
+        return None
+    return (np.stack(cols, axis=1), labels)
+
+
+def combos(xa: np.ndarray, xb: np.ndarray, same: bool) -> List[Tuple[str, np.ndarray]]:
+    """(op, matrice (n, Ka*Kb)) ; colonne i*Kb + j = op(A_i, B_j)."""
+    a = xa[:, :, None]
+    b = xb[:, None, :]
+    n = xa.shape[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = [
+            ("*", (a * b).reshape(n, -1)),
+            ("/", np.where(b != 0, a / b, np.nan).reshape(n, -1)),
+            ("-", (a - b).reshape(n, -1)),
+        ]
+        if not same:  # sur une même source A/B couvre déjà B/A
+            out.insert(2, ("\\", np.where(a != 0, b / a, np.nan).reshape(n, -1)))
+    return out
+
+
+def _init_worker(sources: Dict[str, Source], targets: Dict[str, np.ndarray]) -> None:
+    global _SOURCES, _TARGETS
+    _SOURCES, _TARGETS = sources, targets
+
+
+def score_pair(task: Tuple[str, str, str, int, float, bool]) -> List[Dict[str, Any]]:
+    """Meilleures combinaisons pour (source A, source B, champ cible)."""
+    src_a, src_b, field, top, min_coverage, scale_only = task
+    y_all = _TARGETS[field]
+    rows = ~np.isnan(y_all)
+    y = y_all[rows]
+    xa, la = _SOURCES[src_a]
+    xb, lb = _SOURCES[src_b]
+    xa, xb = xa[rows], xb[rows]
+    same = src_a == src_b
+    kb = len(lb)
+    out: List[Dict[str, Any]] = []
+    for op, x in combos(xa, xb, same):
+        a, b, mae, cnt = linear_fit_mae(x, y, scale_only)
+        mae = np.where(cnt >= min_coverage * len(y), mae, np.inf)
+        if same:  # diagonale (A op A) triviale, et A-B / A*B symétriques
+            i, j = np.divmod(np.arange(x.shape[1]), kb)
+            mae = np.where(j > i if op in ("*", "-") else i != j, mae, np.inf)
+        for col in np.argsort(mae)[:top]:
+            if not np.isfinite(mae[col]):
+                break
+            i, j = divmod(int(col), kb)
+            left, right = (lb[j], la[i]) if op == "\\" else (la[i], lb[j])
+            if field in (left, right):
+                continue
+            shown = "/" if op == "\\" else op
+            out.append({
+                "field": field,
+                "expr": f"{left} {shown} {right}",
+                "a": left,
+                "op": shown,
+                "b": right,
+                "scale": float(a[col]),
+                "add": float(b[col]),
+                "mae": round(float(mae[col]), 4),
+                "n": int(cnt[col]),
+            })
+    return out
+
+
+def best_single(sources: Dict[str, Source], field: str, y_all: np.ndarray) -> Optional[Dict[str, Any]]:
+    rows = ~np.isnan(y_all)
+    best: Optional[Dict[str, Any]] = None
+    for name, (x, labels) in sources.items():
+        if name == "decoded":
+            continue
+        a, b, mae, cnt = linear_fit_mae(x[rows], y_all[rows])
+        col = int(np.argmin(mae))
+        if np.isfinite(mae[col]) and (best is None or mae[col] < best["mae"]):
+            best = {"expr": labels[col], "scale": float(a[col]), "add": float(b[col]), "mae": round(float(mae[col]), 4), "n": int(cnt[col])}
+    return best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Champs dérivés (produit/rapport/différence de deux mots ou champs) classés par MAE")
+    ap.add_argument("jsonl", nargs="?", default="recording/sz_sync_ms_window_ocr.jsonl", help="JSONL de synchro avec OCR")
+    ap.add_argument("--fields", default="gear_ratio", help="Champs cibles, séparés par des virgules")
+    ap.add_argument("--mapping", type=Path, default=DEFAULT_MAPPING, help="Mapping pour la pseudo-page decoded (\"\" = sans)")
+    ap.add_argument("--variability-index", type=Path, default=DEFAULT_INDEX, help="Index sz_byte_variability.py (\"\" = tous les mots)")
+    ap.add_argument("--top", type=int, default=5, help="Combinaisons affichées par champ")
+    ap.add_argument("--min-coverage", type=float, default=0.8, help="Part minimale des lignes OCR où la combinaison est définie")
+    ap.add_argument("--scale-only", action="store_true", help="Fit value = a * combinaison (sans décalage)")
+    ap.add_argument("--workers", type=int, default=0, help="Processus (0 = nombre de CPU)")
+    ap.add_argument("--limit", type=int, default=0, help="Utiliser seulement les N premières trames (0 = toutes)")
+    ap.add_argument("--out", type=Path, default=None, help="Écrire le classement JSON")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    path = Path(args.jsonl)
+    if not path.exists():
+        print(f"Fichier introuvable: {path}", file=sys.stderr)
+        return 1
+    with stage("matrices") as st:
+        pm = load_page_matrix(str(path), limit=args.limit)
+        st.rows = pm.n
+    fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in pm.fields]
+    if unknown:
+        print(f"Champs inconnus: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+
+    skip: Set[Tuple[str, int]] = set()
+    if str(args.variability_index) and args.variability_index.is_file():
+        from sz_byte_variability import load_index, pruned_slots
+
+        skip = pruned_slots(load_index(args.variability_index))
+    sources = word_sources(pm, skip)
+    if str(args.mapping) and args.mapping.is_file():
+        dec = decoded_source(pm, json.loads(args.mapping.read_text(encoding="utf-8")))
+        if dec is not None:
+            sources["decoded"] = dec
+    n_words = sum(len(s[1]) for s in sources.values())
+    pairs = list(combinations_with_replacement(sorted(sources), 2))
+    n_combos = sum(len(sources[a][1]) * len(sources[b][1]) * (3 if a == b else 4) for a, b in pairs)
+    print(f"# {pm.n} trames, {n_words} sources ({len(skip)} mots const/bruit écartés), {len(pairs)} paires, "
+          f"{n_combos} combinaisons par champ", file=sys.stderr)
+
+    targets = {f: pm.target(f) for f in fields}
+    tasks = [(a, b, f, args.top, args.min_coverage, args.scale_only) for f in fields for a, b in pairs]
+    workers = args.workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    with stage("combinaisons", rows=pm.n * len(fields)):
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(sources, targets)) as ex:
+                results = list(ex.map(score_pair, tasks))
+        else:
+            _init_worker(sources, targets)
+            results = [score_pair(t) for t in tasks]
+    elapsed = time.perf_counter() - t0
+
+    ranking: Dict[str, Any] = {}
+    for f in fields:
+        cands = sorted((c for r in results for c in r if c["field"] == f), key=lambda c: c["mae"])[: args.top]
+        single = best_single(sources, f, targets[f])
+        ranking[f] = {"single": single, "derived": cands}
+        print(f"{f}:")
+        if single:
+            print(f"  mono-slot  {single['expr']:36s} mae={single['mae']:.4f}  ({single['scale']:.6g} * x + {single['add']:.6g})")
+        for c in cands:
+            print(f"  dérivé     {c['expr']:36s} mae={c['mae']:.4f}  ({c['scale']:.6g} * x + {c['add']:.6g}) n={c['n']}")
+        if not cands:
+            print("  (aucune combinaison)")
+    if args.out:
+        args.out.write_text(json.dumps({"source": str(path), "fields": ranking}, indent=1) + "\n", encoding="utf-8")
+    dest = f" → {args.out}" if args.out else ""
+    print(f"OK: {len(fields)} champs, {n_combos * len(fields)} combinaisons en {elapsed:.1f} s ({workers} processus){dest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
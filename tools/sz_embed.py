@@ -1,43 +1,208 @@
 #!/usr/bin/env python3
 """
-Génère un fichier C (sz_data.h) à partir de sz_sync_ocr.jsonl
+Génère un fichier C (sz_data.h) à partir de sz_sync_ocr.jsonl (ou d'un NDJSON gateway)
 pour embarquer les données directement dans le sketch ESP32.
 
+Format par défaut: table binaire compacte (un enregistrement de taille fixe par frame),
+au lieu d'une chaîne JSON échappée par ligne:
+
+  uint32_t t_ms;            ms depuis la 1re ligne (log_ts_sec / ts_ms / t_offset_s)
+  uint32_t valid;           bit i = champ i présent (ordre de SZ_DATA_FIELDS)
+  float    values[20];      valeurs (float32, NAN si absent)
+  [--raw] pour chaque page 21A0/21A2/21A5/21CD: uint8_t len; uint8_t bytes[SZ_DATA_<PAGE>_MAX]
+          (page jamais reçue dans la source: SZ_DATA_<PAGE>_MAX = 0, ni len ni octets)
+
+Little-endian (comme l'ESP32). Le sketch lit un enregistrement par memcpy, sans parser de JSON.
+Après génération, le fichier est relu et chaque enregistrement comparé à la source
+(round-trip), puis un budget de taille est affiché (binaire vs JSON, durée de replay
+qui tient dans --budget-kb de flash).
+
 Usage:
     python3 tools/sz_embed.py medias/sz_sync_ocr.jsonl
+    python3 tools/sz_embed.py recording/sz_sync_ms_window_ocr.jsonl --raw --budget-kb 1024
+    python3 tools/sz_embed.py medias/sz_sync_ocr.jsonl --format json   # ancien format (chaînes JSON)
 """
 
+import argparse
 import json
-import sys
+import math
 import os
+import re
+import struct
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_compare_decode_vs_ocr import FIELDS, page_bytes
+from sz_profile import stage
+
+PAGES = ["21A0", "21A2", "21A5", "21CD"]
+HEADER_FMT = "<II"
+
 
 def escape_c_string(s):
     """Échappe une chaîne pour l'utiliser dans un littéral C."""
     return s.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 sz_embed.py <input.jsonl> [output.h]")
-        sys.exit(1)
-    
-    input_file = sys.argv[1]
-    if len(sys.argv) >= 3:
-        output_file = sys.argv[2]
-    else:
-        # Par défaut: génère dans le dossier du sketch
-        output_file = os.path.join(os.path.dirname(os.path.dirname(input_file)), 
-                                   'esp32', 'sz-replay-mqtt', 'sz_data.h')
-    
+
+def load_lines(input_file):
     lines = []
     with open(input_file, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
             if line:
                 lines.append(line)
-    
-    print(f"Lecture de {len(lines)} lignes depuis {input_file}")
-    
-    # Génère le fichier C
+    return lines
+
+
+def record_from_line(line):
+    """(t_s, values[20] ou None, pages{page: bytes}) depuis une ligne sync OCR ou gateway."""
+    d = json.loads(line)
+    src = d.get("values") if isinstance(d.get("values"), dict) else d
+    values = []
+    for f in FIELDS:
+        v = src.get(f)
+        values.append(float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else None)
+    if isinstance(d.get("ts_ms"), (int, float)) and "log_ts_sec" not in d:
+        t = d["ts_ms"] / 1000.0
+    else:
+        t = d.get("log_ts_sec", d.get("t_offset_s"))
+    raw = d.get("raw") or {}
+    pages = {p: page_bytes(raw.get(p)) for p in PAGES}
+    return t, values, pages
+
+
+def build_records(lines, with_raw):
+    """Enregistrements binaires + tailles max par page."""
+    parsed = [record_from_line(l) for l in lines]
+    page_max = {p: (max((len(pg[p]) for _, _, pg in parsed), default=0) if with_raw else 0) for p in PAGES}
+    t0 = next((t for t, _, _ in parsed if t is not None), None)
+    records = []
+    for i, (t, values, pages) in enumerate(parsed):
+        if t is None or t0 is None:
+            t_ms = i * 500  # pas d'horodatage: période du sketch (REPLAY_PERIOD_MS)
+        else:
+            t_ms = max(0, int(round((t - t0) * 1000)))
+        valid = 0
+        floats = []
+        for i_f, v in enumerate(values):
+            if v is not None and not math.isnan(v):
+                valid |= 1 << i_f
+                floats.append(v)
+            else:
+                floats.append(float("nan"))
+        rec = struct.pack(HEADER_FMT, t_ms & 0xFFFFFFFF, valid) + struct.pack("<%df" % len(FIELDS), *floats)
+        if with_raw:
+            for p in PAGES:
+                if not page_max[p]:
+                    continue  # page absente de toute la source: ni longueur ni octets (cf. record_size)
+                b = pages[p][: page_max[p]]
+                rec += bytes([len(b)]) + b + bytes(page_max[p] - len(b))
+        records.append(rec)
+    return parsed, records, page_max
+
+
+def record_size(page_max):
+    return struct.calcsize(HEADER_FMT) + 4 * len(FIELDS) + sum(1 + page_max[p] for p in PAGES if page_max[p])
+
+
+def write_binary_header(output_file, records, page_max, with_raw, source):
+    rec_size = record_size(page_max)
+    blob = b"".join(records)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("// Fichier généré automatiquement par tools/sz_embed.py\n")
+        f.write("// Ne pas modifier manuellement !\n")
+        f.write(f"// Source: {source}\n\n")
+        f.write("#ifndef SZ_DATA_H\n#define SZ_DATA_H\n\n")
+        f.write("#include <stdint.h>\n#include <string.h>\n\n")
+        f.write("#define SZ_DATA_FORMAT_BINARY 1\n")
+        f.write(f"#define SZ_DATA_LINE_COUNT {len(records)}\n")
+        f.write(f"#define SZ_DATA_FIELD_COUNT {len(FIELDS)}\n")
+        f.write(f"#define SZ_DATA_RAW_PAGES {1 if with_raw else 0}\n")
+        for p in PAGES:
+            f.write(f"#define SZ_DATA_{p}_MAX {page_max[p]}\n")
+        f.write(f"#define SZ_DATA_RECORD_SIZE {rec_size}\n\n")
+        f.write("// Ordre des champs = bits de `valid` et indices de `values`\n")
+        f.write("static const char* const SZ_DATA_FIELDS[SZ_DATA_FIELD_COUNT] = {\n")
+        f.write(",\n".join(f'  "{name}"' for name in FIELDS))
+        f.write("\n};\n\n")
+        f.write("// Enregistrement décodé (lu par memcpy depuis sz_data_bin, little-endian)\n")
+        f.write("struct __attribute__((packed)) SzDataRecord {\n")
+        f.write("  uint32_t t_ms;   // ms depuis le début de la capture\n")
+        f.write("  uint32_t valid;  // bit i = values[i] présent\n")
+        f.write("  float values[SZ_DATA_FIELD_COUNT];\n")
+        if with_raw:
+            for p in PAGES:
+                if page_max[p]:
+                    f.write(f"  uint8_t len{p};\n  uint8_t raw{p}[SZ_DATA_{p}_MAX];\n")
+        f.write("};\n\n")
+        f.write("// Table binaire (stockée en flash, pas en RAM)\n")
+        f.write("static const uint8_t sz_data_bin[SZ_DATA_LINE_COUNT * SZ_DATA_RECORD_SIZE] = {\n")
+        for i in range(0, len(blob), 16):
+            chunk = blob[i : i + 16]
+            f.write("  " + ", ".join(f"0x{b:02X}" for b in chunk) + ",\n")
+        f.write("};\n\n")
+        f.write("static inline void szDataRead(uint16_t idx, SzDataRecord& out) {\n")
+        f.write("  memcpy(&out, sz_data_bin + (size_t)idx * SZ_DATA_RECORD_SIZE, sizeof(SzDataRecord));\n")
+        f.write("}\n\n")
+        f.write("#endif // SZ_DATA_H\n")
+
+
+def verify_binary_header(output_file, parsed, page_max, with_raw):
+    """Relit le .h généré et compare chaque enregistrement à la source. Retourne le nb d'erreurs."""
+    text = Path(output_file).read_text(encoding='utf-8')
+    m = re.search(r"sz_data_bin\[[^\]]*\] = \{(.*?)\};", text, re.S)
+    if not m:
+        return 1
+    blob = bytes(int(x, 16) for x in re.findall(r"0x([0-9A-F]{2})", m.group(1)))
+    rec_size = record_size(page_max)
+    errors = 0
+    if len(blob) != rec_size * len(parsed):
+        print(f"  ERREUR taille: {len(blob)} != {rec_size} × {len(parsed)}", file=sys.stderr)
+        return 1
+    n_vals = len(FIELDS)
+    for i, (_, values, pages) in enumerate(parsed):
+        rec = blob[i * rec_size : (i + 1) * rec_size]
+        _, valid = struct.unpack_from(HEADER_FMT, rec, 0)
+        floats = struct.unpack_from("<%df" % n_vals, rec, 8)
+        for i_f, v in enumerate(values):
+            present = bool(valid >> i_f & 1)
+            if (v is not None) != present:
+                errors += 1
+            elif v is not None and floats[i_f] != struct.unpack("<f", struct.pack("<f", v))[0]:
+                errors += 1
+        if with_raw:
+            pos = 8 + 4 * n_vals
+            for p in PAGES:
+                if not page_max[p]:
+                    continue
+                n = rec[pos]
+                if rec[pos + 1 : pos + 1 + n] != pages[p][: page_max[p]]:
+                    errors += 1
+                pos += 1 + page_max[p]
+    return errors
+
+
+def report_budget(lines, parsed, records, page_max, budget_kb):
+    """Budget flash: JSON échappé (ancien format) vs table binaire, durée de replay qui tient."""
+    json_bytes = sum(len(escape_c_string(l)) + 1 + 4 for l in lines)  # chaîne + \0 + pointeur
+    rec_size = record_size(page_max)
+    bin_bytes = rec_size * len(records)
+    times = [t for t, _, _ in parsed if t is not None]
+    period = (times[-1] - times[0]) / (len(times) - 1) if len(times) > 1 and times[-1] > times[0] else 0.5
+    budget = budget_kb * 1024
+    print(f"  Enregistrement: {rec_size} octets ({len(records)} enregistrements)")
+    print(f"  Binaire: {bin_bytes} octets ({bin_bytes / 1024:.1f} Ko) — JSON: {json_bytes} octets ({json_bytes / 1024:.1f} Ko), gain ×{json_bytes / max(bin_bytes, 1):.1f}")
+    fit_bin = budget // rec_size
+    fit_json = int(budget / (json_bytes / max(len(lines), 1)))
+    print(f"  Budget {budget_kb} Ko: {fit_bin} enregistrements (~{fit_bin * period / 60:.1f} min à {period:.3f} s/ligne) vs {fit_json} en JSON (~{fit_json * period / 60:.1f} min)")
+    if bin_bytes > budget:
+        print(f"  ATTENTION: la table dépasse le budget ({bin_bytes / 1024:.1f} Ko > {budget_kb} Ko)")
+
+
+def write_json_header(output_file, lines):
+    """Ancien format: une chaîne JSON échappée par ligne."""
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("// Fichier généré automatiquement par tools/sz_embed.py\n")
         f.write("// Ne pas modifier manuellement !\n\n")
@@ -46,17 +211,55 @@ def main():
         f.write("// Tableau des lignes JSONL (stocké en flash, pas en RAM)\n")
         f.write("// Note: ESP32 stocke automatiquement les const char* en flash\n")
         f.write("static const char* const sz_data_lines[SZ_DATA_LINE_COUNT] = {\n")
-        
         for i, line in enumerate(lines):
             escaped = escape_c_string(line)
             comma = "," if i < len(lines) - 1 else ""
             f.write(f'  "{escaped}"{comma}\n')
-        
         f.write("};\n\n")
         f.write("#endif // SZ_DATA_H\n")
-    
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Génère sz_data.h (table binaire ou chaînes JSON) pour sz-replay-mqtt")
+    ap.add_argument("input", help="sz_sync_ocr.jsonl ou NDJSON gateway")
+    ap.add_argument("output", nargs="?", help="Fichier .h (défaut: esp32/sz-replay-mqtt/sz_data.h)")
+    ap.add_argument("--format", choices=["bin", "json"], default="bin", help="bin = table compacte (défaut), json = ancien format")
+    ap.add_argument("--raw", action="store_true", help="Inclure les octets bruts des pages (publiés sur jimny/szviewer/raw)")
+    ap.add_argument("--budget-kb", type=float, default=1024, help="Budget flash pour le rapport de taille (Ko)")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    input_file = args.input
+    if args.output:
+        output_file = args.output
+    else:
+        # Par défaut: génère dans le dossier du sketch
+        output_file = os.path.join(os.path.dirname(os.path.dirname(input_file)),
+                                   'esp32', 'sz-replay-mqtt', 'sz_data.h')
+
+    lines = load_lines(input_file)
+    print(f"Lecture de {len(lines)} lignes depuis {input_file}")
+
+    if args.format == "json":
+        write_json_header(output_file, lines)
+        print(f"✓ Généré: {output_file}")
+        print(f"  {len(lines)} lignes, ~{sum(len(l) for l in lines)} caractères")
+        return
+
+    with stage("enregistrements", rows=len(lines)):
+        parsed, records, page_max = build_records(lines, args.raw)
+    with stage("écriture"):
+        write_binary_header(output_file, records, page_max, args.raw, input_file)
+    with stage("round-trip", rows=len(lines)):
+        errors = verify_binary_header(output_file, parsed, page_max, args.raw)
     print(f"✓ Généré: {output_file}")
-    print(f"  {len(lines)} lignes, ~{sum(len(l) for l in lines)} caractères")
+    report_budget(lines, parsed, records, page_max, args.budget_kb)
+    if errors:
+        print(f"ERREUR round-trip: {errors} écarts entre la table et la source", file=sys.stderr)
+        sys.exit(1)
+    print(f"  Round-trip OK ({len(records)} enregistrements relus identiques)")
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Décodeur en virgule fixe pour sz_decode.h (sz_decode_from_ocr_jsonl.py --update-decode --fixed-point).
+
+Chaque champ raw * mult / div + add devient (raw * M + B) * 2^-S, avec M, B et le produit sur
+32 bits (|M|·65535 + |B| < 2^31) et S choisi par champ. Retenu si l'erreur d'arrondi de M et B
+reste sous la tolérance du champ pour tout raw 0..65535: une fraction (--fixed-tol, 0.5) de son
+pas d'affichage OCR (sz_robust_fit.display_step), toujours le cas pour les échelles dyadiques
+(raw*8, raw*0.25, (raw - 2760) / 8...). Sinon le champ garde (float)raw * a + b: un produit
+64 bits passerait par les routines int64 de libgcc sur Xtensa, plus lentes que le FPU de
+l'ESP32-S3.
+
+Erreur d'arrondi bornée par (65535·|M - a·2^S| + |B - b·2^S|) / 2^S, a = mult / div, b = add;
+2^-S est exact en float, la seule autre erreur est la conversion entier → float finale (2^-24
+relatif, comme le calcul flottant). Le corps généré est une table (page, offset, M, B, 2^-S,
+champ) parcourue par une boucle, suivie des blocs if des champs restés en flottant.
+
+Vérification sur l'hôte: python3 tools/sz_decode_check.py (compile sz_decode.h avec le
+compilateur C++ du système, le rejoue sur les captures et compare au décodeur Python).
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_STEP_FRAC = 0.5
+DEFAULT_TOL = 1e-4  # champ sans pas d'affichage connu (absent de l'OCR)
+RAW_MAX = 65535
+INT32_MAX = 2**31 - 1
+MAX_SHIFT = 62
+PAGE_INDEX = {"21A0": 0, "21A2": 1, "21A5": 2, "21CD": 3}
+
+
+class FixedParams(NamedTuple):
+    shift: int
+    mul: int
+    add: int
+    err: float  # borne de l'erreur d'arrondi de M et B, unités du champ
+
+
+def _at_shift(a: float, b: float, s: int) -> Tuple[int, int, float]:
+    scale = float(2**s)
+    m, c = round(a * scale), round(b * scale)
+    return m, c, (RAW_MAX * abs(m - a * scale) + abs(c - b * scale)) / scale
+
+
+def fixed_params(mult: float, div: float, add: float, tol: float = DEFAULT_TOL) -> Optional[FixedParams]:
+    """(S, M, B, erreur) sur 32 bits pour raw * mult / div + add, ou None si rien ne tient sous tol."""
+    a, b = mult / div, add
+    best: Optional[FixedParams] = None
+    for s in range(MAX_SHIFT + 1):
+        m, c, err = _at_shift(a, b, s)
+        if RAW_MAX * abs(m) + abs(c) > INT32_MAX:
+            break
+        if best is None or err < best.err:
+            best = FixedParams(s, m, c, err)
+        if err == 0:
+            break
+    if best is not None and best.err <= tol:
+        return best
+    return None
+
+
+def field_tolerances(rows: List[dict], fields: Sequence[str], frac: float = DEFAULT_STEP_FRAC) -> Dict[str, float]:
+    """Tolérance par champ: frac × pas d'affichage de sa série OCR (champs sans valeur OCR absents)."""
+    from sz_page_matrix import build_page_matrix, np
+    from sz_robust_fit import display_step
+
+    pm = build_page_matrix(rows)
+    tols: Dict[str, float] = {}
+    for field in fields:
+        if field in pm.fields and np.isfinite(pm.target(field)).any():
+            tols[field] = frac * display_step(pm.target(field))
+    return tols
+
+
+def fixed_point_body(results: Dict[str, Sequence], fields: Sequence[str], tols: Dict[str, float]) -> Tuple[List[str], List[str]]:
+    """
+    Corps de decodeSzFromPages (table + boucle) pour results (champ → (page, offset, mult, div,
+    add, label, mae, n)); rend aussi les champs restés en flottant (aucun (S, M, B) 32 bits sous
+    tols[champ], DEFAULT_TOL si absent).
+    """
+    rows: List[str] = []
+    floating: List[str] = []
+    fallback: List[str] = []
+    for field in fields:
+        r = results.get(field)
+        if not r:
+            continue
+        page, offset, mult, div, add, label, mae, n = r
+        tol = tols.get(field, DEFAULT_TOL)
+        p = fixed_params(mult, div, add, tol)
+        if p is None or page not in PAGE_INDEX:
+            floating.append(field)
+            var = {"21A0": "a0", "21A2": "a2", "21A5": "a5", "21CD": "cd"}.get(page, "a0")
+            fallback += [
+                f"  if ({var}Len > {offset + 1}) {{  // {field}: pas de virgule fixe 32 bits sous {tol:g}",
+                f"    uint16_t raw = ({var}[{offset}] << 8) | {var}[{offset + 1}];",
+                f"    out.{field} = (float)raw * {float(mult) / float(div)!r}f + {float(add)!r}f;",
+                "  }",
+            ]
+            continue
+        if label == "rational":
+            from sz_rational import label as rational_label
+
+            label = rational_label((int(mult), int(div), round(add * div)))
+        rows.append(
+            f"    {{{PAGE_INDEX[page]}, {offset}, {p.mul}, {p.add}, {2.0 ** -p.shift!r}f, &SzData::{field}}},"
+            f"  // {field}: {label} (raw*{float(mult) / float(div):.9g} {float(add):+.9g}) S={p.shift} err≤{p.err:.1e} (tol {tol:g})"
+        )
+    if not rows:
+        return fallback, floating
+    lines = [
+        "  // Virgule fixe (tools/sz_fixed_point.py): valeur = (raw * mul + add) * 2^-S, tout sur 32 bits.",
+        "  // Tolérance par champ: une fraction de son pas d'affichage OCR.",
+        "  struct SzFixedField {",
+        "    uint8_t page;    // 0 = 21A0, 1 = 21A2, 2 = 21A5, 3 = 21CD",
+        "    uint8_t offset;  // octet de poids fort (trame complète, 0 = 61)",
+        "    int32_t mul;",
+        "    int32_t add;",
+        "    float scale;     // 2^-S, exact",
+        "    float SzData::*dst;",
+        "  };",
+        "  static const SzFixedField kFields[] = {",
+        *rows,
+        "  };",
+        "  const uint8_t* const bufs[4] = {a0, a2, a5, cd};",
+        "  const size_t lens[4] = {a0Len, a2Len, a5Len, cdLen};",
+        "  for (const SzFixedField& f : kFields) {",
+        "    if (lens[f.page] <= (size_t)f.offset + 1) continue;",
+        "    const int32_t raw = ((int32_t)bufs[f.page][f.offset] << 8) | bufs[f.page][f.offset + 1];",
+        "    out.*f.dst = (float)(raw * f.mul + f.add) * f.scale;",
+        "  }",
+    ]
+    if fallback:
+        lines.append("")
+        lines.extend(fallback)
+    return lines, floating
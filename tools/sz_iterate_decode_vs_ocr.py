@@ -13,12 +13,16 @@ Usage:
 from __future__ import annotations
 
 import json
-import subprocess
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+
 
 def main() -> None:
+    sz_profile.setup_argv()  # SZ_PROFILE est transmis aux sous-processus (profil de chaque run)
     jsonl = sys.argv[1] if len(sys.argv) > 1 else "medias/sz_sync_ocr.jsonl"
     max_iter = 10
     mae_threshold = 0.001
@@ -48,12 +52,13 @@ def main() -> None:
         ]
         if exclude_str:
             cmd_opt.extend(["--exclude", exclude_str])
-        r = subprocess.run(cmd_opt, cwd=str(repo), capture_output=True, text=True)
+        with stage(f"itération {it + 1}"):
+            r = sz_profile.run(cmd_opt, cwd=str(repo), capture_output=True, text=True)
         if r.returncode != 0:
             print(r.stderr or r.stdout, file=sys.stderr)
             sys.exit(1)
 
-        r2 = subprocess.run(
+        r2 = sz_profile.run(
             [sys.executable, str(tools / "sz_compare_decode_vs_ocr.py"), str(jsonl_path), "--machine"],
             cwd=str(repo),
             capture_output=True,
@@ -100,7 +105,7 @@ def main() -> None:
         print(f"  Exclure candidat pour {worst_field}: {page} offset {offset}")
 
     print("\n# Comparaison détaillée (décodé vs OCR):")
-    subprocess.run(
+    sz_profile.run(
         [sys.executable, str(tools / "sz_compare_decode_vs_ocr.py"), str(jsonl_path)],
         cwd=str(repo),
     )
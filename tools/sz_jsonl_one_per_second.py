@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """
 À partir de medias/sz_sync_ocr.jsonl (une ligne par frame), produit un jsonl
-avec **une ligne par seconde** (log_hhmmss), en gardant une seule frame
-représentative par seconde. Ainsi raw et OCR correspondent au même instant,
+avec **une ligne par seconde** de log, en gardant une seule frame
+représentative par seconde. La seconde vient de log_hhmmss (sz_sync.py) ou, à défaut,
+de int(log_ts_sec) (sz_sync_ms.py); sans aucune ligne horodatée, code de sortie 1. Ainsi raw et OCR correspondent au même instant,
 ce qui évite de comparer les mêmes trames à plusieurs OCR différents et
 réduit le biais sur la MAE (décodé vs OCR).
 
@@ -17,7 +18,26 @@ import argparse
 import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+
+
+def log_second(r: Dict[str, Any]) -> Optional[int]:
+    """Seconde de log d'une ligne (depuis minuit): log_hhmmss, sinon int(log_ts_sec)."""
+    hms = r.get("log_hhmmss")
+    if isinstance(hms, str) and hms.count(":") == 2:
+        try:
+            h, m, s = (int(x) for x in hms.split(":"))
+            return h * 3600 + m * 60 + s
+        except ValueError:
+            pass
+    ts = r.get("log_ts_sec")
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return int(ts)
+    return None
 
 
 def main() -> None:
@@ -26,7 +46,9 @@ def main() -> None:
     ap.add_argument("-o", "--out", default="medias/sz_sync_ocr_1s.jsonl", help="Sortie jsonl (une ligne par seconde)")
     ap.add_argument("--first", action="store_true", help="Garder la première frame de chaque seconde (défaut: première)")
     ap.add_argument("--middle", action="store_true", help="Garder la frame du milieu de chaque seconde")
+    sz_profile.add_arguments(ap)
     args = ap.parse_args()
+    sz_profile.setup(args)
 
     path = Path(args.jsonl)
     if not path.exists():
@@ -34,7 +56,7 @@ def main() -> None:
         sys.exit(1)
 
     rows: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as f:
+    with stage("chargement jsonl") as st, path.open("r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
@@ -43,19 +65,23 @@ def main() -> None:
                 rows.append(json.loads(line))
             except json.JSONDecodeError:
                 continue
+        st.rows = len(rows)
 
-    # Grouper par log_hhmmss
-    by_sec: Dict[str, List[Dict[str, Any]]] = {}
+    # Grouper par seconde de log
+    by_sec: Dict[int, List[Dict[str, Any]]] = {}
     for r in rows:
-        sec = r.get("log_hhmmss")
-        if not sec:
+        sec = log_second(r)
+        if sec is None:
             continue
         by_sec.setdefault(sec, []).append(r)
+    if not by_sec:
+        print(f"Aucune ligne avec log_hhmmss ou log_ts_sec dans {path} ({len(rows)} lignes)", file=sys.stderr)
+        sys.exit(1)
 
     # Une ligne par seconde: prendre la première ou la frame du milieu
     out_rows: List[Dict[str, Any]] = []
-    for hhmmss in sorted(by_sec.keys()):
-        group = by_sec[hhmmss]
+    for sec in sorted(by_sec.keys()):
+        group = by_sec[sec]
         if args.middle:
             idx = len(group) // 2
         else:
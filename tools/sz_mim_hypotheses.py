@@ -15,6 +15,11 @@ import sys
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+from sz_sync_db import is_sync_db, load_rows
+
 # Champs SZ Viewer (ordre d'affichage)
 FIELDS = [
     "desired_idle_speed_rpm",
@@ -75,6 +80,8 @@ def extract_page_bytes(raw_hex_ascii: Optional[str]) -> bytes:
 
 
 def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    if is_sync_db(path):
+        return [d for d in load_rows(path) if d.get("values") and (d.get("raw") or d.get("ocr_ok"))]
     out = []
     with open(path, "r", encoding="utf-8") as f:
         for line in f:
@@ -148,12 +155,15 @@ def test_hypothesis(
 
 
 def main() -> None:
+    sz_profile.setup_argv()
     jsonl_path = sys.argv[1] if len(sys.argv) > 1 else "medias/sz_sync_ocr.jsonl"
     if not Path(jsonl_path).exists():
         print(f"Fichier non trouvé: {jsonl_path}", file=sys.stderr)
         sys.exit(1)
 
-    rows = load_jsonl(jsonl_path)
+    with stage("chargement jsonl") as st:
+        rows = load_jsonl(jsonl_path)
+        st.rows = len(rows)
     print(f"# {len(rows)} trames chargées depuis {jsonl_path}\n")
 
     # 1) Min/Max par champ (valeurs affichées OCR)
@@ -189,12 +199,13 @@ def main() -> None:
         print("  Hypothèse: affichage 64.02% lu comme 6402 → utiliser raw/100 pour 21A2 bytes 4-5.\n")
 
     # 3) Tester les hypothèses définies
-    print("\n## Erreur moyenne (décodé vs OCR) par hypothèse\n")
-    for field, page, offset, formulas in HYPOTHESES:
-        for scale, name in formulas:
-            err, n = test_hypothesis(rows, field, page, offset, scale, name)
-            if n > 0:
-                print(f"  {field} ({page} off={offset}) {name}: err_moy={err:.2f} n={n}")
+    with stage("hypothèses", rows=len(rows)):
+        print("\n## Erreur moyenne (décodé vs OCR) par hypothèse\n")
+        for field, page, offset, formulas in HYPOTHESES:
+            for scale, name in formulas:
+                err, n = test_hypothesis(rows, field, page, offset, scale, name)
+                if n > 0:
+                    print(f"  {field} ({page} off={offset}) {name}: err_moy={err:.2f} n={n}")
 
     # 4) Plages attendues pour validation
     print("\n## Plages attendues (pour valider les formules)\n")
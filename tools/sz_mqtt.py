@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Client MQTT 3.1.1 minimal (QoS 0) + broker local de substitution, sans dépendance.
+
+Côté Python, on n'a besoin que de publier / s'abonner en QoS 0 sur `jimny/#`
+(comme la gateway ESP32 avec PubSubClient). Ce module évite d'ajouter paho-mqtt
+et permet de tester l'ingestion et le replay sans broker externe:
+
+  - MqttClient : connect / subscribe / publish / loop (thread de lecture optionnel)
+  - LocalBroker : broker TCP en mémoire (QoS 0, jokers + et #), pour les tests
+
+Contre-pression: les envois sont bloquants (sendall). Si un abonné ne lit plus
+(file pleine côté ingestion), le broker local bloque sur cet abonné, donc sur
+l'éditeur: le débit s'aligne sur le consommateur au lieu de remplir la mémoire.
+
+Usage (broker local seul, ex. pour tester la gateway ou le replay):
+  python3 tools/sz_mqtt.py --port 1883
+"""
+
+from __future__ import annotations
+
+import argparse
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+MessageCallback = Callable[[str, bytes], None]
+
+
+def encode_remaining_length(n: int) -> bytes:
+    """Longueur restante MQTT (varint 7 bits, max 4 octets)."""
+    out = bytearray()
+    while True:
+        byte = n % 128
+        n //= 128
+        if n:
+            byte |= 0x80
+        out.append(byte)
+        if not n:
+            return bytes(out)
+
+
+def encode_str(s: Union[str, bytes]) -> bytes:
+    b = s.encode("utf-8") if isinstance(s, str) else s
+    return struct.pack("!H", len(b)) + b
+
+
+def packet(header: int, body: bytes) -> bytes:
+    return bytes([header]) + encode_remaining_length(len(body)) + body
+
+
+def read_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connexion MQTT fermée")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_packet(sock: socket.socket) -> Tuple[int, bytes]:
+    """Lit un paquet complet: (octet d'en-tête, corps)."""
+    header = read_exact(sock, 1)[0]
+    mult = 1
+    length = 0
+    for _ in range(4):
+        byte = read_exact(sock, 1)[0]
+        length += (byte & 0x7F) * mult
+        if not byte & 0x80:
+            break
+        mult *= 128
+    return header, read_exact(sock, length) if length else b""
+
+
+def parse_publish(header: int, body: bytes) -> Tuple[str, bytes]:
+    """Topic + payload d'un PUBLISH (QoS 1/2: on saute l'identifiant de paquet)."""
+    tlen = struct.unpack("!H", body[:2])[0]
+    topic = body[2 : 2 + tlen].decode("utf-8", errors="replace")
+    pos = 2 + tlen
+    if (header >> 1) & 0x03:
+        pos += 2
+    return topic, body[pos:]
+
+
+def topic_matches(filt: str, topic: str) -> bool:
+    """Filtre MQTT avec jokers: `+` (un niveau) et `#` (reste de l'arborescence)."""
+    f_parts = filt.split("/")
+    t_parts = topic.split("/")
+    for i, f in enumerate(f_parts):
+        if f == "#":
+            return True
+        if i >= len(t_parts):
+            return False
+        if f != "+" and f != t_parts[i]:
+            return False
+    return len(f_parts) == len(t_parts)
+
+
+class MqttClient:
+    """Client MQTT 3.1.1 QoS 0 (publish/subscribe), bloquant, thread-safe en écriture."""
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 1883,
+        client_id: str = "jimny-py",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        keepalive: int = 60,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.username = username
+        self.password = password
+        self.keepalive = keepalive
+        self.sock: Optional[socket.socket] = None
+        self._wlock = threading.Lock()
+        self._pid = 0
+        self._reader: Optional[threading.Thread] = None
+        self._closing = False
+
+    def connect(self, timeout: float = 10.0) -> None:
+        sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        flags = 0x02  # clean session
+        payload = encode_str(self.client_id)
+        if self.username is not None:
+            flags |= 0x80
+            payload += encode_str(self.username)
+            if self.password is not None:
+                flags |= 0x40
+                payload += encode_str(self.password)
+        body = encode_str("MQTT") + bytes([4, flags]) + struct.pack("!H", self.keepalive) + payload
+        sock.sendall(packet(CONNECT, body))
+        header, ack = read_packet(sock)
+        if header & 0xF0 != CONNACK or len(ack) < 2 or ack[1] != 0:
+            sock.close()
+            raise ConnectionError(f"CONNACK refusé ({ack.hex() if ack else 'vide'})")
+        sock.settimeout(None)
+        self.sock = sock
+        self._closing = False
+
+    def _send(self, data: bytes) -> None:
+        if self.sock is None:
+            raise ConnectionError("client MQTT non connecté")
+        with self._wlock:
+            self.sock.sendall(data)
+
+    def publish(self, topic: str, payload: Union[str, bytes], retain: bool = False) -> None:
+        body = payload.encode("utf-8") if isinstance(payload, str) else payload
+        self._send(packet(PUBLISH | (0x01 if retain else 0), encode_str(topic) + body))
+
+    def subscribe(self, topic_filter: str) -> None:
+        self._pid = (self._pid % 0xFFFF) + 1
+        body = struct.pack("!H", self._pid) + encode_str(topic_filter) + b"\x00"
+        self._send(packet(SUBSCRIBE | 0x02, body))
+
+    def ping(self) -> None:
+        self._send(bytes([PINGREQ, 0]))
+
+    def loop_forever(self, on_message: MessageCallback) -> None:
+        """Lit les paquets entrants jusqu'à fermeture; on_message(topic, payload) pour chaque PUBLISH."""
+        assert self.sock is not None
+        try:
+            while True:
+                header, body = read_packet(self.sock)
+                if header & 0xF0 == PUBLISH:
+                    topic, payload = parse_publish(header, body)
+                    on_message(topic, payload)
+        except (ConnectionError, OSError):
+            if not self._closing:
+                raise
+
+    def loop_start(self, on_message: MessageCallback) -> threading.Thread:
+        """Lecture dans un thread (daemon). on_message peut bloquer: c'est la contre-pression."""
+        def run() -> None:
+            try:
+                self.loop_forever(on_message)
+            except (ConnectionError, OSError):
+                pass  # fin du thread = connexion perdue (is_alive() côté appelant)
+
+        self._reader = threading.Thread(target=run, daemon=True)
+        self._reader.start()
+        return self._reader
+
+    def close(self) -> None:
+        self._closing = True
+        if self.sock is None:
+            return
+        try:
+            self._send(bytes([DISCONNECT, 0]))
+        except OSError:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.sock = None
+
+
+class _BrokerHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        broker: LocalBroker = self.server.broker  # type: ignore[attr-defined]
+        sock: socket.socket = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        wlock = threading.Lock()
+        try:
+            header, _ = read_packet(sock)
+            if header & 0xF0 != CONNECT:
+                return
+            sock.sendall(bytes([CONNACK, 2, 0, 0]))
+            while True:
+                header, body = read_packet(sock)
+                kind = header & 0xF0
+                if kind == PUBLISH:
+                    topic, payload = parse_publish(header, body)
+                    broker.route(topic, payload)
+                elif kind == SUBSCRIBE:
+                    pid = body[:2]
+                    pos = 2
+                    granted = bytearray()
+                    while pos < len(body):
+                        flen = struct.unpack("!H", body[pos : pos + 2])[0]
+                        filt = body[pos + 2 : pos + 2 + flen].decode("utf-8", errors="replace")
+                        pos += 2 + flen + 1
+                        broker.add_subscription(sock, wlock, filt)
+                        granted.append(0)
+                    with wlock:
+                        sock.sendall(packet(SUBACK, pid + bytes(granted)))
+                elif kind == PINGREQ:
+                    with wlock:
+                        sock.sendall(bytes([PINGRESP, 0]))
+                elif kind == DISCONNECT:
+                    return
+        except (ConnectionError, OSError):
+            return
+        finally:
+            broker.remove_client(sock)
+
+
+class _BrokerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalBroker:
+    """Broker MQTT local (QoS 0) pour les tests d'ingestion / replay. Démarre dans un thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = _BrokerServer((host, port), _BrokerHandler)
+        self._server.broker = self  # type: ignore[attr-defined]
+        self._subs: Dict[socket.socket, Tuple[threading.Lock, List[str]]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.routed = 0
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def add_subscription(self, sock: socket.socket, wlock: threading.Lock, filt: str) -> None:
+        with self._lock:
+            self._subs.setdefault(sock, (wlock, []))[1].append(filt)
+
+    def remove_client(self, sock: socket.socket) -> None:
+        with self._lock:
+            self._subs.pop(sock, None)
+
+    def route(self, topic: str, payload: bytes) -> None:
+        with self._lock:
+            targets = [(s, wl) for s, (wl, filts) in self._subs.items() if any(topic_matches(f, topic) for f in filts)]
+        if not targets:
+            return
+        data = packet(PUBLISH, encode_str(topic) + payload)
+        for sock, wlock in targets:
+            try:
+                with wlock:
+                    sock.sendall(data)
+            except OSError:
+                self.remove_client(sock)
+        self.routed += 1
+
+    def start(self) -> "LocalBroker":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Broker MQTT local (QoS 0) pour tests jimny/#")
+    ap.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute")
+    ap.add_argument("--port", type=int, default=1883, help="Port d'écoute")
+    args = ap.parse_args()
+    broker = LocalBroker(args.host, args.port).start()
+    print(f"Broker local sur {args.host}:{broker.port} (Ctrl+C pour arrêter)", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(5)
+            print(f"# {broker.routed} messages routés", file=sys.stderr)
+    except KeyboardInterrupt:
+        broker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Service d'ingestion MQTT: s'abonne à `jimny/#` (topics de la gateway ESP32:
+jimny/szviewer, jimny/szviewer/raw, jimny/status, jimny/dtc) et archive les
+messages sur disque, par jour et par topic:
+
+  <out-dir>/<YYYY-MM-DD>/jimny_szviewer.ndjson       (même format que medias/*.json)
+  <out-dir>/<YYYY-MM-DD>/jimny_szviewer_raw.ndjson   (+ "decoded" via sz_decode_mapping.json)
+  <out-dir>/<YYYY-MM-DD>/jimny_status.ndjson, jimny_dtc.ndjson
+
+Chaque ligne archivée = le JSON reçu + `rx_ts` (epoch réception). Les pages brutes
+(`raw` ou topic .../raw) sont décodées avec le mapping courant (rechargé s'il change).
+
+Écriture par lots (group commit): un thread d'écriture vide la file par lots de
+--batch-size messages ou toutes les --batch-ms ms, puis un seul flush + fsync par
+fichier touché. Mémoire bornée: la file fait au plus --max-queue messages; quand
+elle est pleine, le thread MQTT se bloque (contre-pression TCP jusqu'à l'éditeur),
+ou, avec --drop-when-full, le message est compté comme perdu.
+
+Métriques (débit d'ingestion, lag réception→commit, profondeur de file, pertes: file pleine
+et messages > 64 Kio comptés à part): ligne périodique sur stderr et JSON sur
+http://<host>:<metrics-port>/metrics. Un seul fichier ouvert par topic: celui du jour
+précédent est fermé au premier message du jour suivant.
+
+Usage:
+  python3 tools/sz_mqtt_ingest.py --host srv.lpb.ovh --user van --password ... --out-dir archive
+  python3 tools/sz_mqtt_ingest.py --self-test medias/jimny-2026-02-19-decheterrie-jard.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_compare_decode_vs_ocr import decode_from_mapping, load_mapping, page_bytes
+from sz_mqtt import LocalBroker, MqttClient
+from sz_mqtt_replay import publish_file
+
+PAGES = ("21A0", "21A2", "21A5", "21CD")
+MAX_PAYLOAD = 64 * 1024
+
+# Élément de file: (t_monotonic réception, epoch réception, topic, payload)
+Item = Tuple[float, float, str, bytes]
+
+
+def archive_day(dt: Any, rx_wall: float) -> str:
+    """Jour d'archive (YYYY-MM-DD): celui du champ datetime du payload s'il est une date valide, sinon la réception.
+
+    Le jour devient un nom de dossier sous --out-dir: rien d'autre qu'une vraie date n'y passe.
+    """
+    if isinstance(dt, str):
+        try:
+            return datetime.strptime(dt[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(rx_wall).strftime("%Y-%m-%d")
+
+
+class IngestMetrics:
+    """Compteurs partagés thread MQTT / thread d'écriture / serveur HTTP."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.t_start = time.monotonic()
+        self.received = 0
+        self.committed = 0
+        self.dropped = 0  # file pleine (--drop-when-full)
+        self.oversized = 0  # payload > MAX_PAYLOAD
+        self.invalid = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self.lag_last_ms = 0.0
+        self.lag_max_ms = 0.0
+        self.lag_sum_ms = 0.0
+        self.rate_ewma = 0.0
+        self._rate_t = time.monotonic()
+        self._rate_n = 0
+
+    def on_commit(self, n: int, nbytes: int, lags_ms: List[float]) -> None:
+        with self.lock:
+            self.committed += n
+            self.batches += 1
+            self.bytes_written += nbytes
+            if lags_ms:
+                self.lag_last_ms = lags_ms[-1]
+                self.lag_max_ms = max(self.lag_max_ms, max(lags_ms))
+                self.lag_sum_ms += sum(lags_ms)
+            now = time.monotonic()
+            self._rate_n += n
+            dt = now - self._rate_t
+            if dt >= 1.0:
+                inst = self._rate_n / dt
+                self.rate_ewma = inst if self.rate_ewma == 0 else 0.7 * self.rate_ewma + 0.3 * inst
+                self._rate_t, self._rate_n = now, 0
+
+    def snapshot(self, queue_depth: int) -> Dict[str, Any]:
+        with self.lock:
+            elapsed = max(1e-9, time.monotonic() - self.t_start)
+            return {
+                "received": self.received,
+                "committed": self.committed,
+                "dropped": self.dropped,
+                "oversized": self.oversized,
+                "invalid": self.invalid,
+                "batches": self.batches,
+                "bytes_written": self.bytes_written,
+                "queue_depth": queue_depth,
+                "ingest_rate_msg_s": round(self.rate_ewma or self.committed / elapsed, 1),
+                "avg_rate_msg_s": round(self.committed / elapsed, 1),
+                "lag_last_ms": round(self.lag_last_ms, 2),
+                "lag_avg_ms": round(self.lag_sum_ms / self.committed, 2) if self.committed else 0.0,
+                "lag_max_ms": round(self.lag_max_ms, 2),
+                "uptime_s": round(elapsed, 1),
+            }
+
+
+class Ingestor:
+    """File bornée + thread d'écriture par lots vers l'archive."""
+
+    def __init__(
+        self,
+        out_dir: Path,
+        *,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        batch_ms: float = 200.0,
+        drop_when_full: bool = False,
+        fsync: bool = True,
+    ) -> None:
+        self.out_dir = out_dir
+        self.q: "queue.Queue[Optional[Item]]" = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.batch_s = batch_ms / 1000.0
+        self.drop_when_full = drop_when_full
+        self.fsync = fsync
+        self.metrics = IngestMetrics()
+        self._files: Dict[str, Tuple[Path, IO[str]]] = {}  # topic → fichier du jour courant
+        self._mapping: Optional[Dict[str, Dict[str, Any]]] = None
+        self._mapping_mtime = 0.0
+        self._mapping_path = Path(__file__).resolve().parent / "sz_decode_mapping.json"
+        self._writer = threading.Thread(target=self._run, daemon=True)
+
+    # --- côté MQTT ---
+    def on_message(self, topic: str, payload: bytes) -> None:
+        with self.metrics.lock:
+            self.metrics.received += 1
+        if len(payload) > MAX_PAYLOAD:
+            with self.metrics.lock:
+                self.metrics.oversized += 1
+            return
+        item: Item = (time.monotonic(), time.time(), topic, payload)
+        if self.drop_when_full:
+            try:
+                self.q.put_nowait(item)
+            except queue.Full:
+                with self.metrics.lock:
+                    self.metrics.dropped += 1
+        else:
+            self.q.put(item)  # bloque si pleine → contre-pression
+
+    # --- côté écriture ---
+    def start(self) -> "Ingestor":
+        self._writer.start()
+        return self
+
+    def stop(self) -> None:
+        self.q.put(None)
+        self._writer.join()
+        for _, f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _current_mapping(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        try:
+            mtime = self._mapping_path.stat().st_mtime
+        except OSError:
+            return self._mapping
+        if mtime != self._mapping_mtime:
+            self._mapping = load_mapping(self._mapping_path)
+            self._mapping_mtime = mtime
+        return self._mapping
+
+    def _file_for(self, topic: str, day: str) -> IO[str]:
+        """Fichier ouvert du topic pour ce jour; celui du jour précédent est fermé (un seul ouvert par topic)."""
+        path = self.out_dir / day / (topic.replace("/", "_") + ".ndjson")
+        cur = self._files.get(topic)
+        if cur is not None and cur[0] == path:
+            return cur[1]
+        if cur is not None:
+            cur[1].flush()
+            if self.fsync:
+                os.fsync(cur[1].fileno())
+            cur[1].close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = path.open("a", encoding="utf-8")
+        self._files[topic] = (path, f)
+        return f
+
+    def _record(self, topic: str, payload: bytes, rx_wall: float, mapping: Optional[Dict[str, Dict[str, Any]]]) -> Optional[Tuple[str, str]]:
+        """(jour, ligne json) ou None si payload illisible."""
+        text = payload.decode("utf-8", errors="replace")
+        try:
+            rec = json.loads(text)
+        except json.JSONDecodeError:
+            rec = {"text": text}  # ex: jimny/status publié en texte brut
+        if not isinstance(rec, dict):
+            return None
+        rec["rx_ts"] = round(rx_wall, 3)
+        raw = rec.get("raw") if isinstance(rec.get("raw"), dict) else (rec if topic.endswith("/raw") else None)
+        if mapping and raw and any(raw.get(p) for p in PAGES):
+            pages = {p: page_bytes(raw.get(p)) for p in PAGES}
+            rec["decoded"] = decode_from_mapping(pages, mapping)
+        return archive_day(rec.get("datetime"), rx_wall), json.dumps(rec, ensure_ascii=False)
+
+    def _commit(self, batch: List[Item]) -> None:
+        mapping = self._current_mapping()
+        touched: Dict[int, IO[str]] = {}
+        nbytes = 0
+        invalid = 0
+        for _, rx_wall, topic, payload in batch:
+            rec = self._record(topic, payload, rx_wall, mapping)
+            if rec is None:
+                invalid += 1
+                continue
+            day, line = rec
+            f = self._file_for(topic, day)
+            f.write(line + "\n")
+            nbytes += len(line) + 1
+            touched[id(f)] = f
+        touched = {k: f for k, f in touched.items() if not f.closed}  # changement de jour dans le lot: déjà fsync'é
+        for f in touched.values():
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        now = time.monotonic()
+        lags = [(now - t_rx) * 1000.0 for t_rx, _, _, _ in batch]
+        if invalid:
+            with self.metrics.lock:
+                self.metrics.invalid += invalid
+        self.metrics.on_commit(len(batch), nbytes, lags)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            try:
+                first = self.q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if first is None:
+                break
+            batch: List[Item] = [first]
+            deadline = time.monotonic() + self.batch_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+
+def serve_metrics(ingestor: Ingestor, host: str, port: int) -> ThreadingHTTPServer:
+    """GET /metrics → JSON des métriques d'ingestion."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = json.dumps(ingestor.metrics.snapshot(ingestor.q.qsize())).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    srv = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+
+def format_metrics(m: Dict[str, Any]) -> str:
+    return (
+        f"# ingest: {m['committed']}/{m['received']} msg, {m['ingest_rate_msg_s']} msg/s, "
+        f"lag {m['lag_last_ms']} ms (max {m['lag_max_ms']}), file {m['queue_depth']}, "
+        f"pertes {m['dropped']} (file pleine) + {m['oversized']} (trop gros)"
+    )
+
+
+def self_test(args: argparse.Namespace, ndjson: Path) -> int:
+    """Broker local + ingestion + replay du NDJSON au débit max; vérifie que tout est archivé."""
+    broker = LocalBroker().start()
+    ingestor = Ingestor(
+        Path(args.out_dir), max_queue=args.max_queue, batch_size=args.batch_size,
+        batch_ms=args.batch_ms, drop_when_full=args.drop_when_full, fsync=not args.no_fsync,
+    ).start()
+    sub = MqttClient("127.0.0.1", broker.port, "jimny-ingest-test")
+    sub.connect()
+    sub.subscribe(args.topic)
+    sub.loop_start(ingestor.on_message)
+    time.sleep(0.2)  # laisser le SUBSCRIBE arriver au broker
+    pub = MqttClient("127.0.0.1", broker.port, "jimny-replay-test")
+    pub.connect()
+    n_pub, dt_pub = publish_file(pub, ndjson)
+    pub.close()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        m = ingestor.metrics.snapshot(ingestor.q.qsize())
+        if m["committed"] + m["dropped"] + m["oversized"] >= n_pub:
+            break
+        time.sleep(0.05)
+    sub.close()
+    ingestor.stop()
+    broker.stop()
+    m = ingestor.metrics.snapshot(0)
+    print(f"# replay: {n_pub} messages en {dt_pub:.3f} s ({n_pub / max(dt_pub, 1e-9):.0f} msg/s)")
+    print(json.dumps(m, indent=2))
+    ok = m["committed"] + m["dropped"] + m["oversized"] == n_pub
+    print(f"{'OK' if ok else 'ERREUR'}: {m['committed']} archivés / {n_pub} publiés → {args.out_dir}")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Ingestion MQTT jimny/# → archive NDJSON (écriture par lots)")
+    ap.add_argument("--host", default="localhost", help="Broker MQTT")
+    ap.add_argument("--port", type=int, default=1883, help="Port MQTT")
+    ap.add_argument("--user", default=None, help="Utilisateur MQTT")
+    ap.add_argument("--password", default=None, help="Mot de passe MQTT")
+    ap.add_argument("--client-id", default="jimny-ingest-py", help="Client id MQTT")
+    ap.add_argument("--topic", default="jimny/#", help="Filtre d'abonnement")
+    ap.add_argument("--out-dir", default="archive", help="Dossier d'archive (un sous-dossier par jour)")
+    ap.add_argument("--max-queue", type=int, default=10000, help="Taille max de la file (mémoire bornée)")
+    ap.add_argument("--batch-size", type=int, default=500, help="Messages max par écriture groupée")
+    ap.add_argument("--batch-ms", type=float, default=200.0, help="Attente max avant écriture d'un lot (ms)")
+    ap.add_argument("--drop-when-full", action="store_true", help="Perdre (et compter) au lieu de bloquer si file pleine")
+    ap.add_argument("--no-fsync", action="store_true", help="flush sans fsync à chaque lot")
+    ap.add_argument("--metrics-host", default="127.0.0.1", help="Adresse du endpoint /metrics")
+    ap.add_argument("--metrics-port", type=int, default=0, help="Port HTTP /metrics (0 = désactivé)")
+    ap.add_argument("--stats-every", type=float, default=10.0, help="Ligne de métriques sur stderr toutes les N s")
+    ap.add_argument("--local-broker", action="store_true", help="Démarrer un broker local sur --port (tests)")
+    ap.add_argument("--self-test", metavar="NDJSON", help="Broker local + replay du fichier au débit max, puis arrêt")
+    args = ap.parse_args()
+
+    if args.self_test:
+        path = Path(args.self_test)
+        if not path.exists():
+            print(f"Fichier introuvable: {path}", file=sys.stderr)
+            return 1
+        return self_test(args, path)
+
+    broker = LocalBroker(args.host, args.port).start() if args.local_broker else None
+    ingestor = Ingestor(
+        Path(args.out_dir), max_queue=args.max_queue, batch_size=args.batch_size,
+        batch_ms=args.batch_ms, drop_when_full=args.drop_when_full, fsync=not args.no_fsync,
+    ).start()
+    metrics_srv = serve_metrics(ingestor, args.metrics_host, args.metrics_port) if args.metrics_port else None
+
+    client = MqttClient(args.host, args.port, args.client_id, args.user, args.password)
+    last_ping = time.monotonic()
+    try:
+        while True:
+            try:
+                client.connect()
+                client.subscribe(args.topic)
+                print(f"Abonné à '{args.topic}' sur {args.host}:{args.port} → {args.out_dir}", file=sys.stderr)
+                reader = client.loop_start(ingestor.on_message)
+                while reader.is_alive():
+                    reader.join(timeout=args.stats_every)
+                    if time.monotonic() - last_ping > client.keepalive / 2:
+                        client.ping()
+                        last_ping = time.monotonic()
+                    print(format_metrics(ingestor.metrics.snapshot(ingestor.q.qsize())), file=sys.stderr)
+                raise ConnectionError("connexion perdue")
+            except (ConnectionError, OSError) as e:
+                print(f"[MQTT] {e} → reconnexion dans 5 s", file=sys.stderr)
+                client.close()
+                time.sleep(5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+        ingestor.stop()
+        if metrics_srv:
+            metrics_srv.shutdown()
+        if broker:
+            broker.stop()
+    print(format_metrics(ingestor.metrics.snapshot(0)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
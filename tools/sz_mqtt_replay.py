@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Rejoue un enregistrement NDJSON/JSONL sur les topics MQTT `jimny/...`, comme la gateway:
+
+  - NDJSON gateway (ex: medias/jimny-2026-02-19-decheterrie-jard.json): ligne publiée
+    telle quelle sur `jimny/szviewer` (+ `jimny/szviewer/raw` si `raw` présent)
+  - JSONL de synchro OCR (ex: recording/sz_sync_ms_window_ocr.jsonl): `values` aplaties
+    et pages hex ASCII converties en hex réel, puis mêmes topics
+
+Timing: l'écart entre messages d'origine (ts_ms, log_ts_sec ou t_offset_s) est conservé,
+divisé par --speed (1 = temps réel, 10 = 10×, 0 = débit max). Plusieurs véhicules simulés
+(--vehicles N) rejouent en parallèle, chacun avec son client MQTT et un champ `vehicle_id`.
+Pendant les longs silences de l'enregistrement, chaque client envoie un PINGREQ toutes les
+keepalive / 2 s (30 s) pour ne pas être déconnecté par le broker.
+En fin de replay: messages/s atteints (total et par véhicule) et retard max sur l'horaire.
+
+Usage:
+  python3 tools/sz_mqtt_replay.py medias/jimny-2026-02-19-decheterrie-jard.json --host localhost
+  python3 tools/sz_mqtt_replay.py recording/sz_sync_ms_window_ocr.jsonl --speed 10
+  python3 tools/sz_mqtt_replay.py medias/jimny-2026-02-19-decheterrie-jard.json --speed 0 --vehicles 20 --loop 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_compare_decode_vs_ocr import page_bytes
+from sz_mqtt import MqttClient
+
+TOPIC_SZ = "jimny/szviewer"
+TOPIC_RAW = "jimny/szviewer/raw"
+PAGES = ("21A0", "21A2", "21A5", "21CD")
+# Période par défaut quand la ligne n'a pas d'horodatage (comme REPLAY_PERIOD_MS du sketch sz-replay-mqtt)
+DEFAULT_PERIOD_S = 0.5
+
+# Message préparé: (t relatif en s, topic, payload JSON sans l'accolade ouvrante)
+Message = Tuple[float, str, bytes]
+
+
+def record_time_s(rec: Dict[str, Any]) -> Optional[float]:
+    """Horodatage d'origine d'une ligne (s), selon le format."""
+    if isinstance(rec.get("ts_ms"), (int, float)):
+        return rec["ts_ms"] / 1000.0
+    for key in ("log_ts_sec", "t_offset_s"):
+        if isinstance(rec.get(key), (int, float)):
+            return float(rec[key])
+    return None
+
+
+def sync_to_gateway(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Ligne de synchro OCR → JSON au format gateway (valeurs à plat, raw en hex réel)."""
+    out: Dict[str, Any] = {"app": "SZ Replay (py)", "mode": "replay"}
+    for k in ("frame_idx", "log_ts_sec", "log_hhmmss"):
+        if k in rec:
+            out[k] = rec[k]
+    out.update(rec.get("values") or {})
+    raw = rec.get("raw") or {}
+    out["raw"] = {p: page_bytes(raw.get(p)).hex().upper() for p in PAGES}
+    return out
+
+
+def iter_messages(path: Path) -> Iterator[Tuple[Optional[float], str, bytes]]:
+    """(t d'origine en s ou None, topic, payload) pour chaque ligne du fichier."""
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(rec, dict):
+                continue
+            t = record_time_s(rec)
+            if isinstance(rec.get("values"), dict):
+                rec = sync_to_gateway(rec)
+                line = json.dumps(rec, ensure_ascii=False)
+            yield t, TOPIC_SZ, line.encode("utf-8")
+            raw = rec.get("raw")
+            if isinstance(raw, dict):
+                dbg: Dict[str, Any] = {"ts_ms": rec.get("ts_ms"), "datetime": rec.get("datetime")}
+                dbg.update(raw)
+                yield t, TOPIC_RAW, json.dumps(dbg, ensure_ascii=False).encode("utf-8")
+
+
+def load_messages(path: Path) -> List[Message]:
+    """Charge et prépare tout le fichier (sérialisé une fois, partagé entre véhicules)."""
+    out: List[Message] = []
+    t0: Optional[float] = None
+    last_rel = 0.0
+    n_lines = 0
+    for t, topic, payload in iter_messages(path):
+        if topic == TOPIC_SZ:
+            n_lines += 1
+        if t is None:
+            rel = (n_lines - 1) * DEFAULT_PERIOD_S
+        else:
+            if t0 is None:
+                t0 = t
+            rel = t - t0
+            if rel < last_rel:  # horloge qui recule (reboot gateway, minuit): on garde l'ordre
+                t0 -= last_rel - rel
+                rel = last_rel
+        last_rel = rel
+        out.append((rel, topic, payload))
+    return out
+
+
+def publish_file(client: MqttClient, path: Path) -> Tuple[int, float]:
+    """Publie tout le fichier sans attente. Retourne (messages, durée en s)."""
+    t0 = time.perf_counter()
+    n = 0
+    for _, topic, payload in iter_messages(path):
+        client.publish(topic, payload)
+        n += 1
+    return n, time.perf_counter() - t0
+
+
+class VehicleReplay(threading.Thread):
+    """Un véhicule simulé: son client MQTT, son vehicle_id, son horloge de replay."""
+
+    def __init__(self, vehicle_id: str, messages: List[Message], client: MqttClient, speed: float, loops: int, start_delay: float) -> None:
+        super().__init__(daemon=True)
+        self.vehicle_id = vehicle_id
+        self.messages = messages
+        self.client = client
+        self.speed = speed
+        self.loops = loops
+        self.start_delay = start_delay
+        self.sent = 0
+        self.late_max_s = 0.0
+        self.elapsed_s = 0.0
+        self.error: Optional[str] = None
+        self._last_packet = time.perf_counter()
+
+    def _sleep_until(self, target: float) -> None:
+        """Attend jusqu'à target (perf_counter); PINGREQ si rien n'est parti depuis keepalive / 2, comme sz_mqtt_ingest."""
+        while True:
+            now = time.perf_counter()
+            if now >= target:
+                return
+            ping_at = self._last_packet + self.client.keepalive / 2
+            if now >= ping_at:
+                self.client.ping()
+                self._last_packet = now
+                continue
+            time.sleep(min(target, ping_at) - now)
+
+    def run(self) -> None:
+        prefix = b'{"vehicle_id":"' + self.vehicle_id.encode("utf-8") + b'",'
+        span = self.messages[-1][0] + DEFAULT_PERIOD_S if self.messages else 0.0
+        t_start = time.perf_counter()
+        try:
+            if self.start_delay > 0:
+                self._sleep_until(t_start + self.start_delay)
+                t_start = time.perf_counter()
+            for k in range(self.loops):
+                for rel, topic, payload in self.messages:
+                    if self.speed > 0:
+                        target = t_start + (k * span + rel) / self.speed
+                        delay = target - time.perf_counter()
+                        if delay > 0:
+                            self._sleep_until(target)
+                        else:
+                            self.late_max_s = max(self.late_max_s, -delay)
+                    body = prefix + payload[1:] if payload[:1] == b"{" else payload
+                    self.client.publish(topic, body)
+                    self._last_packet = time.perf_counter()
+                    self.sent += 1
+        except (ConnectionError, OSError) as e:
+            self.error = str(e)
+        self.elapsed_s = time.perf_counter() - t_start
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Replay NDJSON/JSONL → MQTT jimny/... (timing conservé, multi-véhicules)")
+    ap.add_argument("ndjson", help="NDJSON gateway ou JSONL de synchro (sz_sync*_ocr.jsonl)")
+    ap.add_argument("--host", default="localhost", help="Broker MQTT")
+    ap.add_argument("--port", type=int, default=1883, help="Port MQTT")
+    ap.add_argument("--user", default=None, help="Utilisateur MQTT")
+    ap.add_argument("--password", default=None, help="Mot de passe MQTT")
+    ap.add_argument("--client-id", default="jimny-replay-py", help="Préfixe du client id MQTT")
+    ap.add_argument("--speed", type=float, default=1.0, help="Facteur de vitesse (1 = temps réel, 10 = 10×, 0 = débit max)")
+    ap.add_argument("--vehicles", type=int, default=1, help="Nombre de véhicules simulés en parallèle")
+    ap.add_argument("--stagger", type=float, default=0.0, help="Décalage de départ entre véhicules (s)")
+    ap.add_argument("--loop", type=int, default=1, help="Nombre de passes sur le fichier")
+    ap.add_argument("--no-raw", action="store_true", help="Ne pas publier jimny/szviewer/raw")
+    args = ap.parse_args()
+
+    path = Path(args.ndjson)
+    if not path.exists():
+        print(f"Fichier introuvable: {path}", file=sys.stderr)
+        return 1
+    messages = load_messages(path)
+    if args.no_raw:
+        messages = [m for m in messages if m[1] != TOPIC_RAW]
+    if not messages:
+        print(f"Aucun message dans {path}", file=sys.stderr)
+        return 1
+    speed_s = "max" if args.speed <= 0 else f"{args.speed:g}×"
+    print(f"# {len(messages)} messages ({messages[-1][0]:.1f} s d'origine), {args.vehicles} véhicule(s), vitesse {speed_s}", file=sys.stderr)
+
+    vehicles: List[VehicleReplay] = []
+    try:
+        for v in range(args.vehicles):
+            vid = f"sim-{v + 1:02d}" if args.vehicles > 1 else "sim"
+            client = MqttClient(args.host, args.port, f"{args.client_id}-{vid}", args.user, args.password)
+            client.connect()
+            vehicles.append(VehicleReplay(vid, messages, client, args.speed, max(1, args.loop), v * args.stagger))
+        t0 = time.perf_counter()
+        for vr in vehicles:
+            vr.start()
+        for vr in vehicles:
+            vr.join()
+        wall = time.perf_counter() - t0
+    finally:
+        for vr in vehicles:
+            vr.client.close()
+
+    total = sum(vr.sent for vr in vehicles)
+    for vr in vehicles:
+        rate = vr.sent / vr.elapsed_s if vr.elapsed_s > 0 else 0.0
+        err = f"  ERREUR: {vr.error}" if vr.error else ""
+        print(f"  {vr.vehicle_id}: {vr.sent} msg en {vr.elapsed_s:.3f} s ({rate:.0f} msg/s, retard max {vr.late_max_s * 1000:.1f} ms){err}")
+    print(f"OK: {total} messages publiés en {wall:.3f} s ({total / wall if wall > 0 else 0:.0f} msg/s)")
+    return 1 if any(vr.error for vr in vehicles) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,26 +6,68 @@ dans un jsonl de synchro (ex: `medias/sz_sync.jsonl`).
 Dépendances:
  - ffmpeg (pour crop + amélioration contraste)
  - tesseract (OCR), langues: eng (installé sur macOS homebrew)
+ - optionnel: tesserocr + Pillow (pip install tesserocr pillow). Le moteur tesseract est alors
+   chargé une fois par thread et l'image recadrée lui est passée en mémoire (sortie PNG de
+   ffmpeg sur stdout), au lieu d'un processus tesseract (démarrage + modèle LSTM) par frame.
+   --ocr-backend auto (défaut) utilise tesserocr s'il s'importe, sinon la CLI; même texte,
+   même extract_values. La latence moyenne / médiane par frame lue est affichée en fin de run.
+   --compare-backends: les frames de --in passent dans les deux moteurs (rien n'est écrit),
+   latences de chacun et écarts de texte / de valeurs; code 1 si une valeur diffère.
 
 Sortie:
- - un nouveau fichier jsonl (par défaut `medias/sz_sync_ocr.jsonl`)
+ - un nouveau fichier jsonl (par défaut `medias/sz_sync_ocr.jsonl`), ou une base de synchro
+   normalisée si --out finit par .sqlite / .db (sz_sync_db.py); --in accepte les deux formats
 
 Note:
  - UI SZ Viewer est en anglais, donc OCR en `eng` suffit.
  - On garde une approche robuste: parsing par regex sur les labels connus.
+ - --profile / SZ_PROFILE=1: temps ffmpeg / tesseract / parsing par frame (sz_profile.py).
+ - --cache DIR: texte OCR mis en cache par frame (sha256 du PNG + paramètres de ocr_frame):
+   une frame déjà lue n'est plus repassée dans ffmpeg/tesseract, même si la synchro change
+   (autre ancrage) ou si extract_values évolue. La clé inclut le moteur (api / cli) et la
+   version de tesseract; --refresh-cache relit tout et réécrit les entrées.
+ - Relecture sélective: la même reconnaissance sort aussi le TSV tesseract (confiance par mot).
+   Seules les cellules dont le nombre a une confiance < --retry-conf (70) ou sort de sa plage
+   physique (FIELD_RANGES, ex. 6402 pour 64.02 %) sont relues, découpées seules et agrandies /
+   seuillées (RETRY_VARIANTS, --psm 7). Valeurs corrigées dans `values`, détail dans
+   `ocr_retry` ({champ: [1re lecture, relue, confiance]}); taux et coût affichés en fin de run.
+   --no-retry: une seule lecture, sans TSV.
+ - Lignes avec `crop` (sz_sync_ms.py --dedupe): la frame est déjà la zone du tableau en gris,
+   ocr_frame ne la recadre pas une seconde fois.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
 import re
+import statistics
 import subprocess
+import sys
 import tempfile
+import threading
+import time
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+from sz_sync_db import open_sync_writer, read_sync
+
+try:
+    import tesserocr
+    from PIL import Image
+except ImportError:  # tesserocr / Pillow non installés: CLI tesseract
+    tesserocr = None  # type: ignore[assignment]
+    Image = None  # type: ignore[assignment]
+
+BACKENDS = ("auto", "api", "cli")
+TESS_LANG = "eng"
+TESS_PSM = 6  # bloc de texte uniforme (--psm 6)
 
 LABEL_MAP = {
     "Desired idle speed": "desired_idle_speed_rpm",
@@ -53,7 +95,72 @@ NUM_RE = re.compile(r"([-+]?\d+(?:\.\d+)?)")
 
 
 def run(cmd: list[str]) -> str:
-    return subprocess.check_output(cmd, text=True)
+    return sz_profile.check_output(cmd, text=True)
+
+
+_backend = "cli"
+_local = threading.local()
+_engine_versions: Dict[str, str] = {}
+
+
+def set_backend(name: str) -> str:
+    """Choisit le moteur OCR (auto: api si tesserocr s'importe); rend le moteur effectif."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"moteur OCR inconnu: {name} ({', '.join(BACKENDS)})")
+    if name == "api" and tesserocr is None:
+        raise ValueError("--ocr-backend api: tesserocr / Pillow non installés (pip install tesserocr pillow)")
+    _backend = "api" if name == "api" or (name == "auto" and tesserocr is not None) else "cli"
+    return _backend
+
+
+def engine_id() -> str:
+    """Moteur effectif et version de tesseract (ex. 'api tesseract 5.3.4'), pour les clés de cache."""
+    version = _engine_versions.get(_backend)
+    if version is None:
+        if _backend == "api":
+            out = tesserocr.tesseract_version()
+        else:
+            try:
+                p = subprocess.run(["tesseract", "--version"], capture_output=True, text=True)
+                out = p.stdout.strip() or p.stderr  # tesseract < 4.1 écrit sa version sur stderr
+            except OSError:
+                out = ""
+        version = out.strip().splitlines()[0] if out.strip() else "tesseract ?"
+        _engine_versions[_backend] = version
+    return f"{_backend} {version}"
+
+
+def _tess_api() -> Any:
+    """Moteur tesserocr du thread courant, créé (modèle chargé) au premier appel."""
+    api = getattr(_local, "api", None)
+    if api is None:
+        with stage("chargement tesseract"):
+            api = tesserocr.PyTessBaseAPI(lang=TESS_LANG, psm=tesserocr.PSM(TESS_PSM))
+        _local.api = api
+    return api
+
+
+def _ocr_image(frame_path: Path, vf: str, psm: int = TESS_PSM, tsv: bool = False) -> Tuple[str, str]:
+    """ffmpeg (filtre vf) puis tesseract: (texte, TSV mots + confiances si tsv, sinon "")."""
+    ffmpeg = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", str(frame_path), "-vf", vf]
+    if _backend == "api":
+        png = sz_profile.check_output(ffmpeg + ["-f", "image2pipe", "-c:v", "png", "-"])
+        api = _tess_api()
+        with stage("tesseract (api)"):
+            api.SetPageSegMode(tesserocr.PSM(psm))
+            api.SetImage(Image.open(BytesIO(png)))
+            return api.GetUTF8Text(), api.GetTSVText(0) if tsv else ""
+    with tempfile.TemporaryDirectory(prefix="szocr_") as td:
+        out_png = Path(td) / "crop.png"
+        sz_profile.check_call(ffmpeg + [str(out_png)])
+        if not tsv:
+            return run(["tesseract", str(out_png), "stdout", "-l", TESS_LANG, "--psm", str(psm)]), ""
+        # une seule reconnaissance, deux sorties: out.txt et out.tsv
+        base = Path(td) / "out"
+        sz_profile.check_call(["tesseract", str(out_png), str(base), "-l", TESS_LANG, "--psm", str(psm), "txt", "tsv"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return (base.with_suffix(".txt").read_text(encoding="utf-8"), base.with_suffix(".tsv").read_text(encoding="utf-8"))
 
 
 def ocr_frame(
@@ -65,29 +172,220 @@ def ocr_frame(
     crop_y: int = 280,
     contrast: float = 2.2,
     brightness: float = 0.05,
-) -> str:
+    tsv: bool = False,
+) -> Any:
     """
     Retourne le texte OCR pour la zone du tableau SZ Viewer (intégralité des 2 colonnes, 20 lignes).
+    tsv=True: (texte, TSV tesseract avec boîte et confiance de chaque mot, même reconnaissance).
     """
-    with tempfile.TemporaryDirectory(prefix="szocr_") as td:
-        out_png = Path(td) / "crop.png"
-        vf = f"crop={crop_w}:{crop_h}:{crop_x}:{crop_y},format=gray,eq=contrast={contrast}:brightness={brightness}"
-        subprocess.check_call(
-            [
-                "ffmpeg",
-                "-hide_banner",
-                "-loglevel",
-                "error",
-                "-y",
-                "-i",
-                str(frame_path),
-                "-vf",
-                vf,
-                str(out_png),
-            ]
+    vf = f"crop={crop_w}:{crop_h}:{crop_x}:{crop_y},format=gray,eq=contrast={contrast}:brightness={brightness}"
+    txt, words = _ocr_image(frame_path, vf, tsv=tsv)
+    return (txt, words) if tsv else txt
+
+
+# Plages physiques plausibles par champ (hors plage → cellule relue)
+FIELD_RANGES: Dict[str, Tuple[float, float]] = {
+    "desired_idle_speed_rpm": (500.0, 2000.0),
+    "accelerator_pct": (0.0, 100.0),
+    "intake_c": (-50.0, 150.0),
+    "battery_v": (6.0, 18.0),
+    "fuel_temp_c": (-40.0, 150.0),
+    "bar_pressure_kpa": (50.0, 110.0),
+    "bar_pressure_mmhg": (375.0, 825.0),
+    "abs_pressure_mbar": (200.0, 3500.0),
+    "air_flow_estimate_mgcp": (0.0, 2000.0),
+    "air_flow_request_mgcp": (0.0, 2000.0),
+    "speed_kmh": (0.0, 250.0),
+    "rail_pressure_bar": (0.0, 2500.0),
+    "rail_pressure_control_bar": (0.0, 2500.0),
+    "desired_egr_position_pct": (0.0, 100.0),
+    "gear_ratio": (0.0, 50.0),
+    "egr_position_pct": (0.0, 100.0),
+    "engine_temp_c": (-40.0, 150.0),
+    "engine_rpm": (0.0, 6000.0),
+    "air_temp_c": (-40.0, 80.0),
+    "requested_in_pressure_mbar": (200.0, 3500.0),
+}
+
+DEFAULT_RETRY_CONF = 70.0
+# Prétraitements de relecture d'une cellule, essayés dans l'ordre (agrandissement, seuil fixe)
+RETRY_VARIANTS: Tuple[Dict[str, Any], ...] = (
+    {"scale": 3},
+    {"scale": 3, "threshold": 128},
+    {"scale": 2, "contrast": 3.0, "brightness": 0.0},
+)
+CELL_PAD = (4, 4, 12, 4)  # gauche, haut, droite, bas (px)
+
+Word = Tuple[str, float, int, int, int, int]  # texte, confiance, left, top, width, height
+
+
+def parse_tsv(tsv: str) -> List[List[Word]]:
+    """Mots (niveau 5) du TSV tesseract, regroupés par ligne dans l'ordre de lecture."""
+    lines: Dict[Tuple[str, ...], List[Word]] = {}
+    for row in tsv.splitlines()[1:]:
+        c = row.split("\t")
+        if len(c) < 12 or c[0] != "5" or not c[11].strip():
+            continue
+        try:
+            w: Word = (c[11], float(c[10]), int(c[6]), int(c[7]), int(c[8]), int(c[9]))
+        except ValueError:
+            continue
+        lines.setdefault(tuple(c[1:5]), []).append(w)
+    return list(lines.values())
+
+
+def field_cells(tsv: str) -> Dict[str, Tuple[float, Tuple[int, int, int, int]]]:
+    """
+    Champ → (confiance min. des mots du nombre, boîte x, y, w, h du nombre dans l'image OCR).
+    Même lecture que extract_values, sur le texte reconstruit depuis le TSV.
+    """
+    text_parts: List[str] = []
+    spans: List[Tuple[int, int, Word]] = []
+    pos = 0
+    for line in parse_tsv(tsv):
+        for k, w in enumerate(line):
+            if k:
+                text_parts.append(" ")
+                pos += 1
+            spans.append((pos, pos + len(w[0]), w))
+            text_parts.append(w[0])
+            pos += len(w[0])
+        text_parts.append("\n")
+        pos += 1
+    out: Dict[str, Tuple[float, Tuple[int, int, int, int]]] = {}
+    for field, (_, a, b) in _extract("".join(text_parts)).items():
+        ws = [w for s, e, w in spans if s < b and e > a]
+        if not ws:
+            continue
+        x0, y0 = min(w[2] for w in ws), min(w[3] for w in ws)
+        x1, y1 = max(w[2] + w[4] for w in ws), max(w[3] + w[5] for w in ws)
+        out[field] = (min(w[1] for w in ws), (x0, y0, x1 - x0, y1 - y0))
+    return out
+
+
+def plausible(field: str, v: Optional[float]) -> bool:
+    lo_hi = FIELD_RANGES.get(field)
+    return v is not None and (lo_hi is None or lo_hi[0] <= v <= lo_hi[1])
+
+
+_retry_stats: Dict[str, float] = {"frames": 0, "cells": 0, "fixed": 0, "calls": 0, "failed": 0, "s": 0.0}
+
+
+def retry_cell(
+    frame_path: Path,
+    box: Tuple[int, int, int, int],
+    kw: Dict[str, Any],
+    field: str,
+    min_conf: float,
+) -> Tuple[Optional[float], float, int]:
+    """
+    Relit une cellule (boîte dans l'image OCR) avec les prétraitements RETRY_VARIANTS, une ligne
+    (--psm 7). Rend (valeur, confiance, appels OCR): la première lecture plausible et assez sûre,
+    sinon la plus sûre des plausibles, sinon (None, 0, appels).
+    """
+    p = {**ocr_frame.__kwdefaults__, **kw}
+    x, y, w, h = box
+    l, t, r, b = CELL_PAD
+    cx, cy = max(p["crop_x"] + x - l, 0), max(p["crop_y"] + y - t, 0)
+    best: Tuple[Optional[float], float] = (None, 0.0)
+    calls = 0
+    for var in RETRY_VARIANTS:
+        vf = (
+            f"crop={w + l + r}:{h + t + b}:{cx}:{cy},format=gray,"
+            f"eq=contrast={var.get('contrast', p['contrast'])}:brightness={var.get('brightness', p['brightness'])}"
         )
-        txt = run(["tesseract", str(out_png), "stdout", "-l", "eng", "--psm", "6"])
-        return txt
+        if var.get("scale", 1) != 1:
+            vf += f",scale=iw*{var['scale']}:ih*{var['scale']}:flags=lanczos"
+        if var.get("threshold") is not None:
+            vf += f",lut=c0='if(gt(val,{var['threshold']}),255,0)'"
+        calls += 1
+        try:
+            _, tsv = _ocr_image(frame_path, vf, psm=7, tsv=True)
+        except (subprocess.CalledProcessError, OSError, RuntimeError):  # ffmpeg / tesseract en échec, RuntimeError: tesserocr
+            _retry_stats["failed"] += 1
+            continue
+        words = [wd for line in parse_tsv(tsv) for wd in line if NUM_RE.search(wd[0])]
+        if not words:
+            continue
+        m = NUM_RE.search(words[0][0])
+        v, conf = float(m.group(1)), min(wd[1] for wd in words)
+        if not plausible(field, v):
+            continue
+        if conf >= min_conf:
+            return v, conf, calls
+        if conf > best[1]:
+            best = (v, conf)
+    return best[0], best[1], calls
+
+
+def ocr_frame_values(
+    frame_path: Path, retry_conf: Optional[float] = DEFAULT_RETRY_CONF, **kw: Any
+) -> Tuple[str, Dict[str, List[float]]]:
+    """
+    (texte OCR, relectures {champ: [valeur, confiance]}). Sans retry_conf: texte seul. Sinon le
+    TSV de la même reconnaissance donne la confiance de chaque nombre; les cellules sous
+    retry_conf ou hors FIELD_RANGES sont relues seules (retry_cell), le reste ne coûte rien de plus.
+    """
+    if retry_conf is None:
+        return ocr_frame(frame_path, **kw), {}
+    txt, tsv = ocr_frame(frame_path, tsv=True, **kw)
+    vals = extract_values(txt)
+    retries: Dict[str, List[float]] = {}
+    done: Dict[Tuple[int, int, int, int], Tuple[Optional[float], float]] = {}  # une relecture par boîte
+    with stage("relecture cellules"):
+        for field, (conf, box) in field_cells(tsv).items():
+            if field not in vals or (conf >= retry_conf and plausible(field, vals[field])):
+                continue
+            if box not in done:
+                t0 = time.perf_counter()
+                v, c, calls = retry_cell(frame_path, box, kw, field, retry_conf)
+                done[box] = (v, c)
+                _retry_stats["s"] += time.perf_counter() - t0
+                _retry_stats["cells"] += 1
+                _retry_stats["calls"] += calls
+            v, c = done[box]
+            if v is not None and (c > conf or not plausible(field, vals[field])):
+                retries[field] = [v, round(c, 1)]
+                _retry_stats["fixed"] += v != vals[field]
+    _retry_stats["frames"] += bool(done)
+    return txt, retries
+
+
+def frame_cache_key(frame_path: Path, retry_conf: Optional[float] = None, **kw: Any) -> str:
+    """sha256 du PNG + moteur OCR (engine_id) + paramètres effectifs de ocr_frame (crop, contraste...) et de relecture."""
+    h = hashlib.sha256(frame_path.read_bytes())
+    h.update(engine_id().encode("utf-8"))
+    h.update(json.dumps({**ocr_frame.__kwdefaults__, **kw}, sort_keys=True).encode("utf-8"))
+    if retry_conf is not None:
+        h.update(json.dumps([retry_conf, RETRY_VARIANTS, FIELD_RANGES, CELL_PAD], sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def precropped_kwargs(crop: Optional[str]) -> Dict[str, int]:
+    """Paramètres ocr_frame pour une frame déjà recadrée (crop W:H:X:Y du JSONL de synchro)."""
+    if not crop:
+        return {}
+    w, h = (int(v) for v in str(crop).split(":")[:2])
+    return {"crop_w": w, "crop_h": h, "crop_x": 0, "crop_y": 0}
+
+
+def ocr_frame_cached(
+    frame_path: Path, cache_dir: Optional[Path], retry_conf: Optional[float] = None, refresh: bool = False, **kw: Any
+) -> Tuple[str, Dict[str, List[float]], bool]:
+    """(texte OCR, relectures, trouvé en cache). Sans cache_dir: ocr_frame_values simple; refresh: relire et réécrire."""
+    if cache_dir is None:
+        return (*ocr_frame_values(frame_path, retry_conf, **kw), False)
+    key = frame_cache_key(frame_path, retry_conf, **kw)
+    path = cache_dir / key[:2] / f"{key}.json"
+    if path.exists() and not refresh:
+        d = json.loads(path.read_text(encoding="utf-8"))
+        return d["text"], d.get("retries") or {}, True
+    txt, retries = ocr_frame_values(frame_path, retry_conf, **kw)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"text": txt, "retries": retries}, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+    return txt, retries, False
 
 
 def parse_value_with_unit(s: str) -> Optional[Tuple[float, str]]:
@@ -108,10 +406,15 @@ def extract_values(ocr_text: str) -> Dict[str, float]:
     Retourne un dict field->value (float) pour les champs reconnus.
     Gestion des labels présents deux fois (Bar.pressure, Engine).
     """
+    return {k: v for k, (v, _, _) in _extract(ocr_text).items()}
+
+
+def _extract(ocr_text: str) -> Dict[str, Tuple[float, int, int]]:
+    """extract_values avec, par champ, la position (début, fin) du nombre lu dans le texte."""
     # Normalisation légère (garde les lignes, mais on parse par regex global)
     t = ocr_text.replace("\u00b0", "°")
 
-    found: Dict[str, float] = {}
+    found: Dict[str, Tuple[float, int, int]] = {}
     bar_seen = 0
     engine_seen = 0
 
@@ -133,69 +436,186 @@ def extract_values(ocr_text: str) -> Dict[str, float]:
             if not pv:
                 continue
             val, unit = pv
+            num = NUM_RE.search(rest)
+            a = m.start(1) + len(m.group(1)) - len(m.group(1).lstrip()) + num.start()
+            cell = (val, a, a + num.end() - num.start())
 
             if isinstance(mapped, tuple):
                 if label == "Bar.pressure":
                     if "kPa" in unit and "bar_pressure_kpa" not in found:
-                        found[mapped[0]] = val
+                        found[mapped[0]] = cell
                         bar_seen += 1
                     elif "mmHg" in unit and "bar_pressure_mmhg" not in found:
-                        found[mapped[1]] = val
+                        found[mapped[1]] = cell
                         bar_seen += 1
                 elif label == "Engine":
                     # UI: "Engine" apparaît 2 fois (colonne droite), ligne 7 = temp, ligne 10 = rpm
                     # 1ère occurrence → engine_temp_c, 2e → engine_rpm
                     if engine_seen == 0:
-                        found[mapped[0]] = val
+                        found[mapped[0]] = cell
                         engine_seen += 1
                     elif engine_seen == 1:
-                        found[mapped[1]] = val
+                        found[mapped[1]] = cell
                         engine_seen += 1
                 else:
                     # fallback: 1ère cible
                     if mapped[0] not in found:
-                        found[mapped[0]] = val
+                        found[mapped[0]] = cell
             else:
-                found[mapped] = val
+                found[mapped] = cell
 
     return found
 
 
+def _latency_text(lat: List[float]) -> str:
+    return (
+        f"{1000.0 * statistics.fmean(lat):.1f} ms/frame (médiane {1000.0 * statistics.median(lat):.1f} ms,"
+        f" 1re {1000.0 * lat[0]:.1f} ms)"
+    )
+
+
+def compare_backends(inp: Path, limit: int = 0, max_examples: int = 10) -> int:
+    """
+    Lit les mêmes frames avec la CLI tesseract puis tesserocr (ordre alterné d'une frame à
+    l'autre, sans cache ni relecture) et compare texte et extract_values. Affiche la latence
+    moyenne / médiane de chaque moteur et les premiers écarts (ligne de texte, champ); code de
+    sortie 1 si une valeur diffère ou si un moteur échoue.
+    """
+    if tesserocr is None:
+        print("--compare-backends: tesserocr / Pillow non installés (pip install tesserocr pillow)", file=sys.stderr)
+        return 1
+    lat: Dict[str, List[float]] = {"cli": [], "api": []}
+    n = text_diff = value_diff = errors = 0
+    examples: List[str] = []
+    for rec in read_sync(inp):
+        frame = Path(rec["frame"])
+        kw = precropped_kwargs(rec.get("crop"))
+        texts: Dict[str, str] = {}
+        for backend in ("cli", "api") if n % 2 == 0 else ("api", "cli"):
+            set_backend(backend)
+            try:
+                with stage(f"ocr {backend}"):
+                    t0 = time.perf_counter()
+                    texts[backend] = ocr_frame(frame, **kw)
+                    lat[backend].append(time.perf_counter() - t0)
+            except Exception as e:
+                errors += 1
+                if len(examples) < max_examples:
+                    examples.append(f"  {frame.name}: erreur {backend}: {e}")
+        n += 1
+        if len(texts) == 2:
+            if texts["cli"] != texts["api"]:
+                text_diff += 1
+                a, b = texts["cli"].splitlines(), texts["api"].splitlines()
+                k = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+                if len(examples) < max_examples:
+                    examples.append(f"  {frame.name} ligne {k + 1}: cli={(a[k:] or [''])[0]!r} api={(b[k:] or [''])[0]!r}")
+            v_cli, v_api = extract_values(texts["cli"]), extract_values(texts["api"])
+            diff = [f for f in sorted(set(v_cli) | set(v_api)) if v_cli.get(f) != v_api.get(f)]
+            value_diff += bool(diff)
+            for f in diff:
+                if len(examples) < max_examples:
+                    examples.append(f"  {frame.name} {f}: cli={v_cli.get(f)!r} api={v_api.get(f)!r}")
+        if limit and n >= limit:
+            break
+
+    for backend in ("cli", "api"):
+        if lat[backend]:
+            print(f"# {backend}: {len(lat[backend])} frames lues, {_latency_text(lat[backend])}", file=sys.stderr)
+    if lat["cli"] and lat["api"] and statistics.median(lat["api"]) > 0:
+        print(f"# médiane cli / api: ×{statistics.median(lat['cli']) / statistics.median(lat['api']):.1f}", file=sys.stderr)
+    print(f"# {text_diff}/{n} frames au texte différent, {value_diff}/{n} aux valeurs différentes, {errors} erreurs",
+          file=sys.stderr)
+    for line in examples:
+        print(line, file=sys.stderr)
+    if value_diff or errors:
+        return 1
+    print(f"OK: {n} frames, mêmes valeurs cli / api ({text_diff} textes différents)")
+    return 0
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="inp", default="medias/sz_sync.jsonl", help="Input jsonl")
-    ap.add_argument("--out", dest="out", default="medias/sz_sync_ocr.jsonl", help="Output jsonl")
+    ap.add_argument("--in", dest="inp", default="medias/sz_sync.jsonl", help="Input jsonl (ou .sqlite)")
+    ap.add_argument("--out", dest="out", default="medias/sz_sync_ocr.jsonl", help="Output jsonl (ou .sqlite)")
     ap.add_argument("--limit", type=int, default=0, help="Limiter à N frames (0 = toutes)")
+    ap.add_argument("--cache", type=Path, default=None, help="Dossier de cache du texte OCR par frame")
+    ap.add_argument("--refresh-cache", action="store_true", help="--cache: relire toutes les frames et réécrire leur entrée")
+    ap.add_argument("--ocr-backend", choices=BACKENDS, default="auto",
+                    help="api: tesserocr en mémoire (moteur chargé une fois), cli: un tesseract par frame, auto: api si installé")
+    ap.add_argument("--retry-conf", type=float, default=DEFAULT_RETRY_CONF,
+                    help="Relire seules les cellules de confiance tesseract < N (0-100) ou hors plage physique")
+    ap.add_argument("--no-retry", action="store_true", help="Une seule lecture par frame (pas de TSV ni de relecture)")
+    ap.add_argument("--compare-backends", action="store_true",
+                    help="Lire les frames de --in avec la CLI et tesserocr, comparer latences et valeurs (rien n'est écrit)")
+    sz_profile.add_arguments(ap)
     args = ap.parse_args()
+    sz_profile.setup(args)
+    try:
+        backend = set_backend(args.ocr_backend)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
 
     inp = Path(args.inp)
+    if args.compare_backends:
+        return compare_backends(inp, args.limit)
     out = Path(args.out)
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    n = 0
-    with inp.open("r", encoding="utf-8") as r, out.open("w", encoding="utf-8") as w:
-        for line in r:
-            if not line.strip():
-                continue
-            rec = json.loads(line)
+    retry_conf = None if args.no_retry else args.retry_conf
+    n = hits = retried_frames = 0
+    latencies: list[float] = []
+    with stage("ocr frames") as st, open_sync_writer(out, source=str(inp)) as w:
+        for rec in read_sync(inp):
             frame = Path(rec["frame"])
 
             try:
-                txt = ocr_frame(frame)
-                vals = extract_values(txt)
+                t0 = time.perf_counter()
+                txt, retries, hit = ocr_frame_cached(frame, args.cache, retry_conf, args.refresh_cache, **precropped_kwargs(rec.get("crop")))
+                hits += hit
+                if not hit:
+                    latencies.append(time.perf_counter() - t0)
+                with stage("extraction valeurs"):
+                    vals = extract_values(txt)
                 rec.setdefault("values", {})
                 for k, v in vals.items():
                     rec["values"][k] = v
+                if retries:
+                    # [lu au 1er passage, relu, confiance de la relecture]
+                    rec["ocr_retry"] = {k: [vals.get(k), v, c] for k, (v, c) in retries.items()}
+                    for k, (v, _) in retries.items():
+                        rec["values"][k] = v
+                    retried_frames += 1
                 rec["ocr_ok"] = True
             except Exception as e:
                 rec["ocr_ok"] = False
                 rec["ocr_error"] = str(e)
 
-            w.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            w.add(rec)
             n += 1
+            st.rows = n
             if args.limit and n >= args.limit:
                 break
 
+    if args.cache:
+        print(f"# cache OCR: {hits}/{n} frames déjà lues ({args.cache})", file=sys.stderr)
+    if latencies:
+        print(f"# OCR ({backend}): {len(latencies)} frames lues, {_latency_text(latencies)}", file=sys.stderr)
+    if retry_conf is not None and latencies:
+        st_r = _retry_stats
+        read = len(latencies)
+        cost = 100.0 * st_r["s"] / sum(latencies) if sum(latencies) > 0 else 0.0
+        print(
+            f"# relecture (confiance < {retry_conf:g} ou hors plage): {int(st_r['frames'])}/{read} frames lues"
+            f" ({100.0 * st_r['frames'] / read:.1f} %), {int(st_r['cells'])} cellules, {int(st_r['fixed'])} valeurs changées,"
+            f" {int(st_r['calls'])} OCR en plus, {st_r['s']:.2f} s ({cost:.1f} % du temps OCR)",
+            file=sys.stderr,
+        )
+    if _retry_stats["failed"]:
+        print(f"# relecture: {int(_retry_stats['failed'])} OCR en échec (ffmpeg / tesseract), variantes ignorées", file=sys.stderr)
+    if retried_frames:
+        print(f"# {retried_frames}/{n} frames avec au moins une cellule relue (champ ocr_retry)", file=sys.stderr)
     print(f"OK: wrote {out} ({n} lines)")
     return 0
 
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Recherche du décodeur en ligne: statistiques suffisantes mises à jour ligne par ligne.
+
+sz_decode_from_ocr_jsonl.py (mae_for / linear_fit_for) reparcourt toutes les lignes pour
+chaque candidat; une ligne OCR de plus = toute la recherche à refaire. Ici, chaque slot
+(champ, page, offset u16 big-endian) garde des cumuls, mis à jour en O(slots) (numpy) à
+chaque ligne de synchro:
+
+  - n, moyennes de x (mot brut) et y (OCR), co-moments Σ(x-x̄)², Σ(x-x̄)(y-ȳ), Σ(y-ȳ)²
+    (forme de Welford des sommes Σx, Σy, Σx², Σxy, Σy², stable sur des mots ~65535)
+    → régression y ≈ a·x + b à tout instant, RMSE exacte
+  - Σ|y - k·x| pour chaque formule fixe de FORMULAS (raw/10, raw*8...): MAE exacte
+  - MAE du fit linéaire approchée par RMSE × √(2/π) (résidus gaussiens): la vraie Σ|err|
+    dépend de coefficients qui bougent à chaque ligne. Sur la fenêtre 17:52:51–17:53:08, le
+    meilleur slot ainsi classé est celui de la recherche exacte pour 15 champs sur 18; une
+    Σ|err| mesurée avec les coefficients d'avant chaque ligne (« prequential ») n'en trouvait que 6
+
+Les candidats classés (même 8-uplet que find_all_candidates) sont disponibles à tout
+moment: le décodeur s'affine pendant que sz_ocr.py écrit le JSONL.
+
+Seul le type u16 big-endian est suivi: c'est le seul que savent lire le mapping
+(sz_decode_mapping.json) et sz_decode.h.
+
+Usage:
+  python3 tools/sz_online_fit.py recording/sz_sync_ms_window_ocr.jsonl
+  python3 tools/sz_ocr.py --in recording/sz_sync_ms.jsonl --out /tmp/ocr.jsonl &
+  python3 tools/sz_online_fit.py /tmp/ocr.jsonl --follow --every 50     # classement toutes les 50 lignes
+  python3 tools/sz_online_fit.py recording/sz_sync_ms_window_ocr.sqlite --write-mapping /tmp/mapping.json
+
+Nécessite numpy (comme sz_page_matrix.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_decode_from_ocr_jsonl import FIELDS, FORMULAS, PAGES, Candidate, extract_page_bytes, target_ocr_value
+from sz_page_matrix import np
+from sz_parse_ms_log import follow_lines
+from sz_profile import stage
+from sz_sync_db import is_sync_db, read_sync
+
+MIN_N = 5  # comme find_all_candidates / linear_fit_for
+
+
+class OnlineFitter:
+    """Cumuls par slot (champ × (page, offset)), tableaux (F, S) et (F, S, formules)."""
+
+    def __init__(
+        self,
+        fields: Sequence[str] = FIELDS,
+        pages: Sequence[str] = PAGES,
+        max_offset: int = 60,
+        formulas: Sequence[Tuple[float, float, str]] = FORMULAS,
+        skip_slots: Optional[Set[Tuple[str, int]]] = None,
+    ) -> None:
+        self.fields = list(fields)
+        self.slots = [(p, o) for p in pages for o in range(0, max_offset, 2) if (p, o) not in (skip_slots or set())]
+        self.formulas = list(formulas)
+        self.k = np.array([m / d for m, d, _ in formulas], dtype=np.float64)
+        self._page_slots = {p: np.array([i for i, (q, _) in enumerate(self.slots) if q == p]) for p in pages}
+        self._page_offsets = {p: np.array([o for q, o in self.slots if q == p]) for p in pages}
+        self._last: Dict[str, bytes] = {}
+        shape = (len(self.fields), len(self.slots))
+        self.n = np.zeros(shape)
+        self.mx = np.zeros(shape)
+        self.my = np.zeros(shape)
+        self.mxx = np.zeros(shape)
+        self.mxy = np.zeros(shape)
+        self.myy = np.zeros(shape)
+        self.abs_err = np.zeros(shape + (len(self.formulas),))
+        self.rows = 0
+
+    def _words(self, row: Dict[str, Any]) -> np.ndarray:
+        """Mot u16 à chaque slot (NaN si la page manque ou est trop courte); dernière page vue retenue."""
+        x = np.full(len(self.slots), np.nan)
+        raw = row.get("raw") or {}
+        for p, idx in self._page_slots.items():
+            b = extract_page_bytes(raw.get(p)) or self._last.get(p, b"")
+            if not b or not len(idx):
+                continue
+            self._last[p] = b
+            a = np.frombuffer(b, dtype=np.uint8).astype(np.float64)
+            offs = self._page_offsets[p]
+            ok = offs + 1 < len(a)
+            x[idx[ok]] = a[offs[ok]] * 256.0 + a[offs[ok] + 1]
+        return x
+
+    def _targets(self, row: Dict[str, Any]) -> np.ndarray:
+        values = row.get("values") or {}
+        y = np.full(len(self.fields), np.nan)
+        for j, f in enumerate(self.fields):
+            v = values.get(f)
+            if v is not None:
+                t = target_ocr_value(f, v)
+                if t is not None:
+                    y[j] = t
+        return y
+
+    def fit(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(a, b, ok) par slot: régression sur les lignes vues (ok: n ≥ 5 et x non constant)."""
+        safe = np.maximum(self.n, 1.0)
+        ok = (self.n >= MIN_N) & (self.mxx / safe >= 1e-15)
+        a = np.where(ok, self.mxy / np.where(ok, self.mxx, 1.0), 0.0)
+        return a, self.my - a * self.mx, ok
+
+    def update(self, row: Dict[str, Any]) -> None:
+        """Ajoute une ligne de synchro (raw + values) à tous les slots."""
+        self.rows += 1
+        x, y = self._words(row), self._targets(row)
+        m = ~np.isnan(y)[:, None] & ~np.isnan(x)[None, :]
+        if not m.any():
+            return
+        X = np.where(m, x[None, :], 0.0)
+        Y = np.where(m, y[:, None], 0.0)
+        # Welford (sommes centrées), seulement là où la ligne compte
+        n1 = self.n + m
+        safe = np.maximum(n1, 1.0)
+        dx = np.where(m, X - self.mx, 0.0)
+        dy = np.where(m, Y - self.my, 0.0)
+        self.mx += dx / safe
+        self.my += dy / safe
+        self.mxx += dx * np.where(m, X - self.mx, 0.0)
+        self.mxy += dx * np.where(m, Y - self.my, 0.0)
+        self.myy += dy * np.where(m, Y - self.my, 0.0)
+        self.n = n1
+        self.abs_err += np.where(m[..., None], np.abs(Y[..., None] - X[..., None] * self.k), 0.0)
+
+    def update_many(self, rows: Iterable[Dict[str, Any]]) -> int:
+        k = 0
+        for row in rows:
+            self.update(row)
+            k += 1
+        return k
+
+    def candidates(self, field: str, top_n: int = 5, use_linear_fit: bool = True) -> List[Candidate]:
+        """Top top_n (page, offset, mult, div, add, label, mae, n) par MAE, comme find_all_candidates."""
+        j = self.fields.index(field)
+        n = self.n[j]
+        out: List[Candidate] = []
+        for s in np.nonzero(n >= MIN_N)[0]:
+            page, offset = self.slots[s]
+            cnt = int(n[s])
+            for q, (mult, div, label) in enumerate(self.formulas):
+                out.append((page, offset, mult, div, 0.0, label, float(self.abs_err[j, s, q] / cnt), cnt))
+        if use_linear_fit:
+            a, b, ok = self.fit()
+            sse = np.maximum(self.myy[j] - self.mxy[j] ** 2 / np.where(ok[j], self.mxx[j], 1.0), 0.0)
+            mae = np.sqrt(sse / np.maximum(n, 1.0)) * math.sqrt(2.0 / math.pi)
+            for s in np.nonzero(ok[j])[0]:
+                page, offset = self.slots[s]
+                out.append((page, offset, float(a[j, s]), 1.0, float(b[j, s]), "linear", float(mae[s]), int(n[s])))
+        out.sort(key=lambda c: (c[6], -c[7]))
+        return out[:top_n]
+
+    def rmse(self, field: str, page: str, offset: int) -> Optional[float]:
+        """RMSE exacte du fit linéaire du slot (depuis les co-moments)."""
+        j, s = self.fields.index(field), self.slots.index((page, offset))
+        if self.n[j, s] < MIN_N or self.mxx[j, s] <= 0:
+            return None
+        sse = max(self.myy[j, s] - self.mxy[j, s] ** 2 / self.mxx[j, s], 0.0)
+        return math.sqrt(sse / self.n[j, s])
+
+    def assign(self, use_linear_fit: bool = True, top_n: int = 20) -> Dict[str, Candidate]:
+        """Un (page, offset) par champ, champs les mieux expliqués servis d'abord (assign_no_conflicts)."""
+        by_field = {f: self.candidates(f, top_n, use_linear_fit) for f in self.fields}
+        order = sorted(self.fields, key=lambda f: (by_field[f][0][6], -by_field[f][0][7]) if by_field[f] else (math.inf, 0))
+        used: Set[Tuple[str, int]] = set()
+        out: Dict[str, Candidate] = {}
+        for f in order:
+            for c in by_field[f]:
+                if (c[0], c[1]) not in used:
+                    used.add((c[0], c[1]))
+                    out[f] = c
+                    break
+        return out
+
+
+def follow_rows(path: Path, follow: bool) -> Iterator[Dict[str, Any]]:
+    """Lignes JSON d'un JSONL, y compris celles écrites après le lancement si follow."""
+    for line in follow_lines(path, from_start=True, stop_at_eof=not follow):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+def report(fitter: OnlineFitter, results: Dict[str, Candidate]) -> List[str]:
+    lines = []
+    for f in fitter.fields:
+        c = results.get(f)
+        if c:
+            page, offset, mult, div, add, label, mae, n = c
+            add_s = f" + {add:g}" if add else ""
+            lines.append(f"  {f}: page={page} offset={offset} {label} ({mult:g}/{div:g}{add_s})  mae={mae:.3f} n={n}")
+        else:
+            lines.append(f"  {f}: (aucun fit)")
+    return lines
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Recherche du décodeur en ligne (cumuls par slot, classement à tout instant)")
+    ap.add_argument("sync", type=Path, help="JSONL (ou .sqlite) de synchro avec values OCR")
+    ap.add_argument("--follow", action="store_true", help="Suivre le JSONL pendant que sz_ocr.py l'écrit (Ctrl-C pour finir)")
+    ap.add_argument("--every", type=int, default=0, help="Afficher le classement toutes les N lignes (0 = à la fin)")
+    ap.add_argument("--no-linear-fit", action="store_true", help="Formules fixes seulement")
+    ap.add_argument("--write-mapping", type=Path, default=None, help="Écrire le mapping (format sz_decode_mapping.json)")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    if not args.sync.exists() and not args.follow:
+        print(f"Fichier introuvable: {args.sync}", file=sys.stderr)
+        return 1
+    if args.follow and is_sync_db(args.sync):
+        print("--follow: suivre le JSONL écrit par sz_ocr.py (la base .sqlite n'est écrite qu'à la fin)", file=sys.stderr)
+        return 1
+    use_linear = not args.no_linear_fit
+    fitter = OnlineFitter()
+    rows = read_sync(args.sync) if is_sync_db(args.sync) else follow_rows(args.sync, args.follow)
+    busy = 0.0  # temps de mise à jour seul (hors attente de nouvelles lignes)
+    try:
+        with stage("mise à jour", rows=0) as st:
+            for row in rows:
+                if not row.get("values") or not row.get("raw"):
+                    continue
+                t0 = time.perf_counter()
+                fitter.update(row)
+                busy += time.perf_counter() - t0
+                st.rows = fitter.rows
+                if args.every and fitter.rows % args.every == 0:
+                    print(f"# {fitter.rows} lignes ({1000.0 * busy / fitter.rows:.2f} ms/ligne)", file=sys.stderr)
+                    for line in report(fitter, fitter.assign(use_linear)):
+                        print(f"#{line}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    if not fitter.rows:
+        print(f"Aucune ligne avec raw et values dans {args.sync}", file=sys.stderr)
+        return 1
+    with stage("classement"):
+        results = fitter.assign(use_linear)
+    print(f"# {fitter.rows} lignes, {len(fitter.slots)} slots × {len(fitter.fields)} champs, {1000.0 * busy / fitter.rows:.2f} ms/ligne de mise à jour\n")
+    for line in report(fitter, results):
+        print(line)
+    if args.write_mapping:
+        mapping = {
+            f: {"page": c[0], "offset": c[1], "mult": c[2], "div": c[3], "add": c[4], "label": c[5]}
+            for f, c in ((f, results.get(f)) for f in fitter.fields)
+            if c
+        }
+        args.write_mapping.parent.mkdir(parents=True, exist_ok=True)
+        args.write_mapping.write_text(json.dumps(mapping, indent=2), encoding="utf-8")
+        print(f"  Mapping: {args.write_mapping}")
+    print(f"\nOK: {len(results)} champs décodés après {fitter.rows} lignes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
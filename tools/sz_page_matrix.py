@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Matrices numpy des pages SZ et des valeurs OCR d'un JSONL de synchro, pour les recherches
+vectorisées (sz_bit_search.py, sz_derived_search.py, sz_decode_from_ocr_jsonl.py --cv).
+
+Même sémantique que sz_decode_from_ocr_jsonl.py (mae_for / get_raw_series):
+  - pages: octets de la trame complète (indice 0 = 61, 1 = A0...), une ligne par trame;
+    si la trame n'a pas la page (ou une page tronquée), on garde les derniers octets
+    connus (known = False tant qu'aucune page complète n'a été vue)
+  - targets: valeur OCR normalisée (target_ocr_value), NaN si l'OCR manque — pas de
+    rétention: une ligne sans OCR ne compte pas dans l'erreur
+
+Nécessite numpy (pip install numpy), contrairement au reste de tools/.
+
+Usage (bibliothèque):
+  from sz_page_matrix import build_page_matrix, load_page_matrix
+  pm = load_page_matrix("recording/sz_sync_ms_window_ocr.jsonl")
+  w = pm.words("21A0")            # (n, L-1) float64, u16 big-endian à chaque offset
+  y = pm.target("engine_rpm")     # (n,) float64, NaN si pas d'OCR
+  a, b, mae, n = linear_fit_mae(w[~np.isnan(y)], y[~np.isnan(y)])   # fit par colonne
+"""
+
+from __future__ import annotations
+
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:  # les autres outils restent utilisables sans numpy
+    raise ImportError("sz_page_matrix nécessite numpy (pip install numpy)") from e
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_decode_from_ocr_jsonl import FIELDS, PAGES, extract_page_bytes, load_jsonl, target_ocr_value
+
+
+class PageMatrix:
+    """Octets des pages (rétention dernière trame) + cibles OCR, une ligne par trame."""
+
+    def __init__(
+        self,
+        pages: Dict[str, np.ndarray],
+        known: Dict[str, np.ndarray],
+        targets: np.ndarray,
+        t_s: np.ndarray,
+        fields: List[str],
+    ) -> None:
+        self.pages = pages
+        self.known = known
+        self.targets = targets
+        self.t_s = t_s
+        self.fields = fields
+        self.n = int(targets.shape[0])
+        self._words: Dict[str, np.ndarray] = {}
+
+    def words(self, page: str) -> np.ndarray:
+        """u16 big-endian à chaque offset (n, L-1), NaN tant que la page n'est pas connue."""
+        w = self._words.get(page)
+        if w is None:
+            b = self.pages[page].astype(np.float64)
+            w = b[:, :-1] * 256.0 + b[:, 1:]
+            w[~self.known[page]] = np.nan
+            self._words[page] = w
+        return w
+
+    def target(self, field: str) -> np.ndarray:
+        return self.targets[:, self.fields.index(field)]
+
+    def subset(self, idx: np.ndarray) -> "PageMatrix":
+        """Sous-ensemble de lignes (ex: un pli de validation croisée)."""
+        return PageMatrix(
+            {p: m[idx] for p, m in self.pages.items()},
+            {p: k[idx] for p, k in self.known.items()},
+            self.targets[idx],
+            self.t_s[idx],
+            self.fields,
+        )
+
+
+def build_page_matrix(rows: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> PageMatrix:
+    fields = list(fields or FIELDS)
+    n = len(rows)
+    payloads: Dict[str, List[bytes]] = {p: [] for p in PAGES}
+    for row in rows:
+        raw = row.get("raw") or {}
+        for p in PAGES:
+            payloads[p].append(extract_page_bytes(raw.get(p)))
+    pages: Dict[str, np.ndarray] = {}
+    known: Dict[str, np.ndarray] = {}
+    for p, lst in payloads.items():
+        lengths = Counter(len(b) for b in lst if b)
+        if not lengths:
+            continue
+        length = lengths.most_common(1)[0][0]
+        m = np.zeros((n, length), dtype=np.uint8)
+        k = np.zeros(n, dtype=bool)
+        last: Optional[bytes] = None
+        for i, b in enumerate(lst):
+            if len(b) >= length:
+                last = b[:length]
+            if last is not None:
+                m[i] = np.frombuffer(last, dtype=np.uint8)
+                k[i] = True
+        pages[p] = m
+        known[p] = k
+    targets = np.full((n, len(fields)), np.nan)
+    t_s = np.arange(n, dtype=np.float64)
+    for i, row in enumerate(rows):
+        values = row.get("values") or {}
+        for j, f in enumerate(fields):
+            v = values.get(f)
+            if v is not None:
+                t = target_ocr_value(f, v)
+                if t is not None:
+                    targets[i, j] = t
+        t_off = row.get("t_offset_s")
+        if isinstance(t_off, (int, float)):
+            t_s[i] = float(t_off)
+    return PageMatrix(pages, known, targets, t_s, fields)
+
+
+def load_page_matrix(path: str, limit: int = 0) -> PageMatrix:
+    rows = load_jsonl(path)
+    if limit > 0:
+        rows = rows[:limit]
+    return build_page_matrix(rows)
+
+
+def linear_fit_mae(x: np.ndarray, y: np.ndarray, scale_only: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit y ≈ a*x + b colonne par colonne (x: (n, K), NaN = ligne ignorée; y: (n,) sans NaN).
+    Deux passes (centrage) pour rester stable sur des produits de mots ~1e9.
+    Retourne (a, b, mae, n) par colonne; mae = inf si la colonne ou y (sur les lignes
+    couvertes) est constante.
+    """
+    m = np.isfinite(x)
+    cnt = m.sum(axis=0).astype(np.float64)
+    safe = np.maximum(cnt, 1.0)
+    xz = np.where(m, x, 0.0)
+    yz = np.where(m, y[:, None], 0.0)
+    if scale_only:
+        sxx = (xz * xz).sum(axis=0)
+        a = np.where(sxx > 0, (xz * yz).sum(axis=0) / np.where(sxx > 0, sxx, 1.0), np.nan)
+        b = np.zeros_like(a)
+    else:
+        mx = xz.sum(axis=0) / safe
+        my = yz.sum(axis=0) / safe
+        dx = np.where(m, x - mx, 0.0)
+        dy = np.where(m, y[:, None] - my, 0.0)
+        var = (dx * dx).sum(axis=0)
+        # y constant sur les lignes couvertes: n'importe quelle colonne « colle » (a = 0)
+        ok = (var > 1e-12 * np.maximum(mx * mx, 1.0) * safe) & ((dy * dy).sum(axis=0) > 0)
+        a = np.where(ok, (dx * dy).sum(axis=0) / np.where(ok, var, 1.0), np.nan)
+        b = my - a * mx
+    err = np.where(m, np.abs(a * np.where(m, x, 0.0) + b - y[:, None]), 0.0)
+    mae = np.where(np.isfinite(a) & (cnt > 0), err.sum(axis=0) / safe, np.inf)
+    return a, b, mae, cnt
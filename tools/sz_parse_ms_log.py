@@ -4,14 +4,21 @@ Parse un log MIM avec timestamps à la milliseconde ([HH:MM:SS.mmm] SEND: / RECV
 Produit la liste des réponses complètes 21A0, 21A2, 21A5, 21CD avec leur timestamp.
 
 Une réponse est complète quand les fragments RECV concaténés contiennent 0D0D3E (fin ELM).
+ResponseAssembler + follow_lines permettent le même traitement sur un log en cours
+d'écriture (voir tools/sz_tail_decode.py).
 """
 
 from __future__ import annotations
 
+import os
 import re
 import sys
+import time
 from pathlib import Path
-from typing import Generator, List, Optional, Tuple
+from typing import Generator, Optional, Tuple
+
+import sz_profile
+from sz_profile import stage
 
 LOG_LINE_RE = re.compile(r"^\[(\d{2}:\d{2}:\d{2}\.\d{3})\]\s+(SEND|RECV):\s*(.*)\s*$")
 PAGE_PREFIXES = ("21A0", "21A2", "21A5", "21CD")
@@ -27,61 +34,141 @@ def hhmmss_ms_to_sec(s: str) -> float:
     return int(h) * 3600 + int(m) * 60 + int(sec) + ms / 1000.0
 
 
+class ResponseAssembler:
+    """
+    Réassemblage incrémental des réponses 21A0/21A2/21A5/21CD, ligne par ligne.
+
+    Même logique que parse_ms_log, mais utilisable sur un log en cours d'écriture:
+    feed(ligne) retourne (timestamp_sec, page, hex_payload) dès que le fragment
+    RECV contenant 0D0D3E arrive, sinon None.
+    """
+
+    def __init__(self) -> None:
+        self.current_page: Optional[str] = None
+        self.current_hex = ""
+
+    def feed(self, line: str) -> Optional[Tuple[float, str, str]]:
+        m = LOG_LINE_RE.match(line.strip())
+        if not m:
+            return None
+        ts_str, kind, payload = m.group(1), m.group(2), (m.group(3) or "").strip()
+
+        if kind == "SEND":
+            cmd = payload.upper()
+            self.current_page = None
+            for p in PAGE_PREFIXES:
+                if cmd.startswith(p):
+                    self.current_page = p
+                    break
+            self.current_hex = ""
+            return None
+        if not self.current_page:
+            return None
+        # RECV: hex (en majuscules dans le log)
+        hex_part = payload.replace(" ", "").upper()
+        if not hex_part:
+            return None
+        # On ne cherche le marqueur que dans la partie nouvelle (+ chevauchement)
+        search_from = max(0, len(self.current_hex) - len(END_MARKER) + 1)
+        self.current_hex += hex_part
+        idx = self.current_hex.find(END_MARKER, search_from)
+        if idx < 0:
+            return None
+        # Réponse complète : tout jusqu'à et y compris 0D0D3E
+        out = (hhmmss_ms_to_sec(ts_str), self.current_page, self.current_hex[: idx + len(END_MARKER)])
+        self.current_page = None
+        self.current_hex = ""
+        return out
+
+
 def parse_ms_log(log_path: Path) -> Generator[Tuple[float, str, str], None, None]:
     """
     Pour chaque réponse complète (21A0/21A2/21A5/21CD), yield (timestamp_sec, page, hex_payload).
     """
-    current_page: Optional[str] = None
-    current_hex: List[str] = []
-    last_ts_sec: float = 0.0
-
+    asm = ResponseAssembler()
     with log_path.open("r", encoding="utf-8", errors="replace") as f:
         for line in f:
-            m = LOG_LINE_RE.match(line.strip())
-            if not m:
-                continue
-            ts_str, kind, payload = m.group(1), m.group(2), (m.group(3) or "").strip()
-            ts_sec = hhmmss_ms_to_sec(ts_str)
-
-            if kind == "SEND":
-                cmd = payload.upper()
-                page = None
-                for p in PAGE_PREFIXES:
-                    if cmd.startswith(p):
-                        page = p
-                        break
-                if page:
-                    current_page = page
-                    current_hex = []
-                else:
-                    current_page = None
-                    current_hex = []
-            elif kind == "RECV" and current_page:
-                # RECV: hex (en majuscules dans le log)
-                hex_part = payload.replace(" ", "").upper()
-                if not hex_part:
+            resp = asm.feed(line)
+            if resp is not None:
+                yield resp
+
+
+def follow_lines(
+    log_path: Path,
+    from_start: bool = False,
+    poll_s: float = 0.005,
+    stop_at_eof: bool = False,
+) -> Generator[str, None, None]:
+    """
+    Suit un log en cours d'écriture (comme `tail -F`): yield chaque ligne complète.
+
+    - ligne partielle (écriture en cours): gardée en tampon jusqu'à la fin de ligne
+    - rotation (nouveau fichier au même chemin) ou troncature: on termine l'ancien
+      fichier puis on reprend le nouveau au début
+    - fichier absent: on attend qu'il apparaisse
+    """
+    f = None
+    ino = None
+    partial = b""
+    first_open = True
+    try:
+        while True:
+            if f is None:
+                try:
+                    f = log_path.open("rb")
+                except FileNotFoundError:
+                    if stop_at_eof:
+                        return
+                    time.sleep(poll_s)
                     continue
-                current_hex.append(hex_part)
-                last_ts_sec = ts_sec
-                full = "".join(current_hex)
-                if END_MARKER in full:
-                    # Réponse complète : tout jusqu'à et y compris 0D0D3E
-                    idx = full.index(END_MARKER) + len(END_MARKER)
-                    payload_hex = full[:idx]
-                    yield (last_ts_sec, current_page, payload_hex)
-                    current_page = None
-                    current_hex = []
+                ino = os.fstat(f.fileno()).st_ino
+                if first_open and not from_start:
+                    f.seek(0, os.SEEK_END)
+                first_open = False
+                partial = b""
+            chunk = f.read(65536)
+            if chunk:
+                data = partial + chunk
+                lines = data.split(b"\n")
+                partial = lines.pop()
+                for raw in lines:
+                    yield raw.decode("utf-8", errors="replace")
+                continue
+            # Fin de fichier: rotation ou troncature ?
+            try:
+                st = os.stat(log_path)
+                rotated = st.st_ino != ino
+                truncated = st.st_size < f.tell()
+            except FileNotFoundError:
+                rotated, truncated = True, False
+            if rotated or truncated:
+                if partial:
+                    yield partial.decode("utf-8", errors="replace")
+                f.close()
+                f = None
+                continue
+            if stop_at_eof:
+                if partial:
+                    yield partial.decode("utf-8", errors="replace")
+                return
+            time.sleep(poll_s)
+    finally:
+        if f is not None:
+            f.close()
 
 
 def main() -> int:
+    sz_profile.setup_argv()  # --profile / --profile-out / SZ_PROFILE=1
     log_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("recording/jimny_capture.log")
     if not log_path.exists():
         print(f"Fichier introuvable: {log_path}", file=sys.stderr)
         return 1
     n = 0
-    for ts_sec, page, hex_payload in parse_ms_log(log_path):
-        n += 1
-        print(f"{ts_sec:.3f}\t{page}\t{len(hex_payload)}")
+    with stage("parse log") as st:
+        for ts_sec, page, hex_payload in parse_ms_log(log_path):
+            n += 1
+            print(f"{ts_sec:.3f}\t{page}\t{len(hex_payload)}")
+        st.rows = n
     print(f"# {n} réponses complètes", file=sys.stderr)
     return 0
 
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Chaîne complète vidéo → synchro → OCR → décodeur → comparaison, avec cache des étapes.
+
+Chaque étape a une clé: sha256 de ses paramètres, des fichiers qu'elle lit (contenu), du
+code de l'outil appelé et des modules de tools/ qu'il importe (tool_files), et des clés des
+étapes amont. Ses sorties sont rangées sous
+<cache>/<étape>/<clé>/; une étape dont la clé existe déjà n'est pas relancée.
+
+  frames   ffmpeg (vidéo, --fps, --video-start-sec, --video-duration)   [sauté avec --frames]
+  sync     sz_sync_ms.py --frames <frames> (log, ancrage, fenêtre)
+  ocr      sz_ocr.py --cache <cache>/ocr_frames: le texte OCR est aussi en cache par frame
+           (sha256 du PNG, moteur et version de tesseract), donc un nouvel ancrage relance
+           l'étape sans relancer tesseract; --force ocr relit toutes les frames (--refresh-cache)
+  1s       sz_jsonl_one_per_second.py (échoue si aucune ligne)           [--one-per-second]
+  decode   sz_decode_from_ocr_jsonl.py (+ --decode-args)
+  compare  sz_compare_decode_vs_ocr.py avec tools/sz_decode_mapping.json (hash du mapping)
+
+Changer --anchor-log ne ré-extrait pas les frames; changer le mapping ne relance que compare.
+--select-frames (sz_select_frames.py): une frame par état brut distinct, choisie d'après le log
+et l'ancrage avant extraction; l'étape frames dépend alors aussi du log et de l'ancrage.
+Les hash des gros fichiers (vidéo) sont mémorisés par (chemin, taille, mtime) dans
+<cache>/hashes.json. Le cache peut être effacé à tout moment (rm -r .sz_cache).
+
+Usage:
+  python3 tools/sz_pipeline.py --video recording/2026-02-21_17-50-47.mp4 --fps 30 --anchor-log 17:52:51 --video-start-sec 125 --video-duration 17 --out-dir recording/pipeline
+  python3 tools/sz_pipeline.py --frames recording/2026-02-21_17-50-47_frames_125_17 --fps 30 --anchor-log 17:52:51.040 --out-dir recording/pipeline
+  python3 tools/sz_pipeline.py ... --until ocr            # s'arrêter après l'OCR
+  python3 tools/sz_pipeline.py ... --force decode         # relancer decode (et l'aval) malgré le cache
+  python3 tools/sz_pipeline.py ... --decode-args "--limit 150 --variability-index tools/sz_variability_index.json" --write-mapping
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import json
+import math
+import os
+import shlex
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_ocr
+import sz_profile
+from sz_ocr import BACKENDS
+from sz_parse_ms_log import hhmmss_ms_to_sec
+from sz_profile import stage
+from sz_select_frames import add_arguments as add_select_arguments
+
+TOOLS = Path(__file__).resolve().parent
+REPO = TOOLS.parent
+DEFAULT_CACHE = REPO / ".sz_cache"
+MAPPING = TOOLS / "sz_decode_mapping.json"
+STAGES = ["frames", "sync", "ocr", "1s", "decode", "compare"]
+CACHE_VERSION = 1
+
+
+class HashCache:
+    """sha256 de fichiers, mémorisé par (chemin absolu, taille, mtime_ns)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.memo: Dict[str, List[Any]] = {}
+        self.dirty = False
+        if path.exists():
+            try:
+                self.memo = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.memo = {}
+
+    def digest(self, p: Path) -> str:
+        p = p.resolve()
+        st = p.stat()
+        m = self.memo.get(str(p))
+        if m and m[0] == st.st_size and m[1] == st.st_mtime_ns:
+            return m[2]
+        h = hashlib.sha256()
+        with p.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self.memo[str(p)] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        self.dirty = True
+        return h.hexdigest()
+
+    def dir_digest(self, d: Path, pattern: str) -> str:
+        """Empreinte d'un dossier de frames: noms, tailles, mtimes (pas le contenu: l'OCR a son propre cache)."""
+        h = hashlib.sha256()
+        for p in sorted(d.glob(pattern)):
+            st = p.stat()
+            h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def save(self) -> None:
+        if self.dirty:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.memo, indent=0) + "\n", encoding="utf-8")
+
+
+class Runner:
+    def __init__(self, cache_dir: Path, force: Set[str]) -> None:
+        self.cache_dir = cache_dir
+        self.force = force
+        self.hashes = HashCache(cache_dir / "hashes.json")
+        self.report: List[Tuple[str, str, bool, float]] = []  # (étape, clé, en cache, secondes)
+
+    def key(self, name: str, params: Dict[str, Any], files: Dict[str, Path], upstream: Dict[str, str]) -> str:
+        doc = {
+            "v": CACHE_VERSION,
+            "stage": name,
+            "params": params,
+            "files": {k: self.hashes.digest(p) for k, p in sorted(files.items())},
+            "upstream": upstream,
+        }
+        return hashlib.sha256(json.dumps(doc, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def run(self, name: str, key: str, produce: Callable[[Path], None]) -> Path:
+        """Dossier des sorties de l'étape; produce(tmp) n'est appelé qu'en l'absence d'entrée en cache."""
+        entry = self.cache_dir / name / key
+        done = entry / "meta.json"
+        if done.exists() and name not in self.force:
+            self.report.append((name, key, True, 0.0))
+            print(f"# {name}: en cache ({key})", file=sys.stderr)
+            return entry
+        if entry.exists():
+            shutil.rmtree(entry)
+        tmp = entry.with_name(f"{key}.tmp{os.getpid()}")
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+        print(f"# {name}: exécution ({key})", file=sys.stderr)
+        t0 = time.perf_counter()
+        try:
+            with stage(name):
+                produce(tmp)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        elapsed = time.perf_counter() - t0
+        (tmp / "meta.json").write_text(json.dumps({"stage": name, "key": key, "seconds": round(elapsed, 3),
+                                                   "created": time.strftime("%Y-%m-%d %H:%M:%S")}) + "\n", encoding="utf-8")
+        tmp.rename(entry)
+        self.report.append((name, key, False, elapsed))
+        return entry
+
+
+def tool(script: str, *args: Any, stdout: Optional[Path] = None) -> None:
+    """Lance un outil de tools/ (même interpréteur); stdout capturé dans un fichier si demandé."""
+    cmd = [sys.executable, str(TOOLS / script)] + [str(a) for a in args]
+    if stdout is None:
+        sz_profile.run(cmd, check=True, stdout=sys.stderr)
+        return
+    with stdout.open("w", encoding="utf-8") as fh:
+        sz_profile.run(cmd, check=True, stdout=fh)
+
+
+def tool_files(*scripts: str) -> Dict[str, Path]:
+    """Les scripts et, de proche en proche, les modules de tools/ qu'ils importent (y compris dans les fonctions)."""
+    out: Dict[str, Path] = {}
+    todo = list(scripts)
+    while todo:
+        name = todo.pop()
+        path = TOOLS / name
+        if f"tool:{name}" in out or not path.is_file():
+            continue
+        out[f"tool:{name}"] = path
+        for node in ast.walk(ast.parse(path.read_bytes(), filename=str(path))):
+            if isinstance(node, ast.Import):
+                todo += [f"{a.name}.py" for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                todo.append(f"{node.module}.py")
+    return out
+
+
+def extra_files(extra: List[str]) -> Dict[str, Path]:
+    """Les arguments libres qui désignent un fichier existant comptent dans la clé (contenu)."""
+    return {f"arg:{a}": Path(a) for a in extra if not a.startswith("-") and Path(a).is_file()}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Chaîne vidéo → synchro → OCR → décodeur → comparaison, étapes en cache")
+    ap.add_argument("--log", type=Path, default=REPO / "recording" / "jimny_capture.log", help="Log MIM [HH:MM:SS.mmm] SEND/RECV")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--video", type=Path, help="Screencast MP4 (étape frames)")
+    src.add_argument("--frames", type=Path, help="Dossier de frames déjà extraites (frame_*.png)")
+    ap.add_argument("--fps", type=float, default=30.0, help="FPS d'extraction et d'ancrage")
+    ap.add_argument("--video-start-sec", type=float, default=None, help="Début du segment vidéo (s)")
+    ap.add_argument("--video-duration", type=float, default=None, help="Durée du segment vidéo (s)")
+    ap.add_argument("--anchor-frame", type=int, default=1, help="Index 1-based de la frame d'ancrage")
+    ap.add_argument("--anchor-log", required=True, help="Instant log de la frame d'ancrage (ex. 17:52:51)")
+    ap.add_argument("--start-log", default=None, help="Début fenêtre log (avec --end-log)")
+    ap.add_argument("--end-log", default=None, help="Fin fenêtre log")
+    ap.add_argument("--limit", type=int, default=0, help="Limiter synchro et OCR à N frames (0 = toutes)")
+    ap.add_argument("--select-frames", action="store_true", help="Une frame par état brut distinct (extraction et OCR réduits)")
+    add_select_arguments(ap)
+    ap.add_argument("--ocr-backend", choices=BACKENDS, default="auto", help="Moteur OCR de sz_ocr.py (auto: tesserocr si installé)")
+    ap.add_argument("--one-per-second", action="store_true", help="Étape 1s: une frame par seconde de log (log_hhmmss, ou log_ts_sec des synchros ms) avant le décodeur")
+    ap.add_argument("--decode-args", default="", help="Arguments passés à sz_decode_from_ocr_jsonl.py (entre guillemets)")
+    ap.add_argument("--write-mapping", action="store_true", help="Le décodeur écrit tools/sz_decode_mapping.json (restauré depuis le cache si besoin)")
+    ap.add_argument("--until", choices=STAGES, default="compare", help="Dernière étape à exécuter")
+    ap.add_argument("--force", default="", help="Étapes à relancer malgré le cache (ex: ocr,decode; 'all')")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE, help="Dossier du cache")
+    ap.add_argument("--out-dir", type=Path, default=None, help="Copier les sorties (sync.jsonl, ocr.jsonl, decode.txt, compare.txt) ici")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    for p, what in ((args.log, "Log"), (args.video, "Vidéo"), (args.frames, "Dossier de frames")):
+        if p is not None and not p.exists():
+            print(f"{what} introuvable: {p}", file=sys.stderr)
+            return 1
+    force = set(STAGES) if args.force.strip() == "all" else {s.strip() for s in args.force.split(",") if s.strip()}
+    unknown = force - set(STAGES)
+    if unknown:
+        print(f"--force: étapes inconnues {', '.join(sorted(unknown))} (connues: {', '.join(STAGES)})", file=sys.stderr)
+        return 1
+    refresh_ocr = "ocr" in force  # demandé explicitement: relire aussi les frames déjà en cache
+    # Forcer une étape invalide l'aval: ses sorties peuvent changer sans que sa clé change
+    for i, s in enumerate(STAGES):
+        if s in force:
+            force.update(STAGES[i + 1:])
+    last = STAGES.index(args.until)
+    select_args = ["--redraw-ms", str(args.redraw_ms), "--select-pages", args.select_pages, "--pick", args.pick]
+    runner = Runner(args.cache_dir.resolve(), force)
+    outputs: Dict[str, Path] = {}
+
+    def wanted(name: str) -> bool:
+        return STAGES.index(name) <= last
+
+    try:
+        # frames
+        if args.video:
+            vparams: Dict[str, Any] = {"fps": args.fps, "start": args.video_start_sec, "duration": args.video_duration}
+            vfiles = {"video": args.video}
+            if args.select_frames:
+                if not args.video_duration:
+                    print("--select-frames avec --video: indiquer --video-duration", file=sys.stderr)
+                    return 1
+                vparams.update(select=select_args, anchor_frame=args.anchor_frame, anchor_log=args.anchor_log)
+                vfiles["log"] = args.log
+            fkey = runner.key("frames", vparams, {**vfiles, **tool_files("sz_sync_ms.py")}, {})
+
+            def do_frames(tmp: Path) -> None:
+                from sz_select_frames import parse_pages, select_frame_indices
+                from sz_sync_ms import build_events, extract_frames_from_video
+
+                indices = None
+                if args.select_frames:
+                    indices = select_frame_indices(
+                        build_events(args.log), hhmmss_ms_to_sec(args.anchor_log), args.anchor_frame, args.fps,
+                        int(math.ceil(args.video_duration * args.fps)), args.redraw_ms, parse_pages(args.select_pages), args.pick,
+                    )
+                extract_frames_from_video(args.video, tmp / "frames", args.fps, args.video_start_sec, args.video_duration, indices)
+
+            frames_dir = runner.run("frames", fkey, do_frames) / "frames"
+        else:
+            frames_dir = args.frames.resolve()
+            fkey = hashlib.sha256(runner.hashes.dir_digest(frames_dir, "frame_*.png").encode("utf-8")).hexdigest()[:16]
+        if not wanted("sync"):
+            return finish(runner, args, outputs)
+
+        # sync
+        sparams = {"fps": args.fps, "anchor_frame": args.anchor_frame, "anchor_log": args.anchor_log,
+                   "start_log": args.start_log, "end_log": args.end_log, "limit": args.limit,
+                   "select": select_args if args.select_frames else None}
+        skey = runner.key("sync", sparams, {"log": args.log, **tool_files("sz_sync_ms.py")}, {"frames": fkey})
+
+        def do_sync(tmp: Path) -> None:
+            extra = ["--start-log", args.start_log, "--end-log", args.end_log] if args.start_log or args.end_log else []
+            if args.select_frames:
+                extra += ["--select-frames", *select_args]
+            tool("sz_sync_ms.py", "--log", args.log, "--frames", frames_dir, "--fps", args.fps,
+                 "--anchor-frame", args.anchor_frame, "--anchor-log", args.anchor_log, "--limit", args.limit,
+                 *extra, "--out", tmp / "sync.jsonl")
+
+        outputs["sync.jsonl"] = runner.run("sync", skey, do_sync) / "sync.jsonl"
+        if not wanted("ocr"):
+            return finish(runner, args, outputs)
+
+        # ocr
+        sz_ocr.set_backend(args.ocr_backend)
+        okey = runner.key("ocr", {"limit": args.limit, "engine": sz_ocr.engine_id()}, tool_files("sz_ocr.py"), {"sync": skey})
+
+        def do_ocr(tmp: Path) -> None:
+            refresh = ["--refresh-cache"] if refresh_ocr else []
+            tool("sz_ocr.py", "--in", outputs["sync.jsonl"], "--out", tmp / "ocr.jsonl", "--limit", args.limit,
+                 "--ocr-backend", args.ocr_backend, "--cache", runner.cache_dir / "ocr_frames", *refresh)
+
+        outputs["ocr.jsonl"] = runner.run("ocr", okey, do_ocr) / "ocr.jsonl"
+        decode_in, decode_key = outputs["ocr.jsonl"], okey
+
+        # 1s
+        if args.one_per_second and wanted("1s"):
+            key1 = runner.key("1s", {}, tool_files("sz_jsonl_one_per_second.py"), {"ocr": okey})
+
+            def do_1s(tmp: Path) -> None:
+                tool("sz_jsonl_one_per_second.py", outputs["ocr.jsonl"], "-o", tmp / "ocr_1s.jsonl")
+                with (tmp / "ocr_1s.jsonl").open("r", encoding="utf-8") as fh:
+                    if not any(line.strip() for line in fh):
+                        raise RuntimeError("1s: aucune ligne en sortie (ni log_hhmmss ni log_ts_sec ?)")
+
+            outputs["ocr_1s.jsonl"] = runner.run("1s", key1, do_1s) / "ocr_1s.jsonl"
+            decode_in, decode_key = outputs["ocr_1s.jsonl"], key1
+        if not wanted("decode"):
+            return finish(runner, args, outputs)
+
+        # decode
+        dargs = shlex.split(args.decode_args) + (["--write-mapping"] if args.write_mapping else [])
+        dfiles = {**tool_files("sz_decode_from_ocr_jsonl.py"), **extra_files(dargs)}
+        cv = any(a == "--cv" or a.startswith("--cv=") for a in dargs)
+        if MAPPING.exists() and (cv or not args.write_mapping):
+            # --cv lit le mapping courant (MAE test); sans --cv, --write-mapping l'écrit sans le lire
+            dfiles["mapping"] = MAPPING
+        dkey = runner.key("decode", {"args": dargs}, dfiles, {"in": decode_key})
+
+        def do_decode(tmp: Path) -> None:
+            tool("sz_decode_from_ocr_jsonl.py", decode_in, *dargs, stdout=tmp / "decode.txt")
+            if args.write_mapping:
+                shutil.copyfile(MAPPING, tmp / "sz_decode_mapping.json")
+
+        dentry = runner.run("decode", dkey, do_decode)
+        outputs["decode.txt"] = dentry / "decode.txt"
+        cached_mapping = dentry / "sz_decode_mapping.json"
+        if args.write_mapping and cached_mapping.exists() and (
+            not MAPPING.exists() or MAPPING.read_bytes() != cached_mapping.read_bytes()
+        ):
+            shutil.copyfile(cached_mapping, MAPPING)
+            print(f"# decode: {MAPPING} restauré depuis le cache", file=sys.stderr)
+        if not wanted("compare"):
+            return finish(runner, args, outputs)
+
+        # compare
+        cfiles = tool_files("sz_compare_decode_vs_ocr.py")
+        if MAPPING.exists():
+            cfiles["mapping"] = MAPPING
+        ckey = runner.key("compare", {}, cfiles, {"in": decode_key})
+
+        def do_compare(tmp: Path) -> None:
+            tool("sz_compare_decode_vs_ocr.py", decode_in, stdout=tmp / "compare.txt")
+
+        outputs["compare.txt"] = runner.run("compare", ckey, do_compare) / "compare.txt"
+    except Exception as e:  # CalledProcessError (outil en échec), OSError
+        print(f"Étape en échec: {e}", file=sys.stderr)
+        runner.hashes.save()
+        return 1
+    return finish(runner, args, outputs)
+
+
+def finish(runner: Runner, args: argparse.Namespace, outputs: Dict[str, Path]) -> int:
+    runner.hashes.save()
+    if args.out_dir:
+        args.out_dir.mkdir(parents=True, exist_ok=True)
+        for name, p in outputs.items():
+            shutil.copyfile(p, args.out_dir / name)
+    cached = sum(1 for r in runner.report if r[2])
+    ran = [f"{name} {sec:.1f} s" for name, _, hit, sec in runner.report if not hit]
+    dest = f" → {args.out_dir}" if args.out_dir else f" ({runner.cache_dir})"
+    print(f"OK: {len(runner.report)} étapes, {cached} en cache" + (f", exécutées: {', '.join(ran)}" if ran else "") + dest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Instrumentation commune des outils tools/: où passe le temps d'un run.
+
+  - étapes imbriquées: with stage("ocr", rows=n): ... (temps mur, lignes/s); pile par thread,
+    bind_stage(fn) pour qu'un pool de threads s'imbrique sous l'étape qui le lance (durées
+    cumulées: des étapes parallèles peuvent dépasser leur parente)
+  - sous-processus (ffmpeg, tesseract...): run() / check_output() / check_call() mesurent
+    chaque appel, agrégé par exécutable
+  - pic mémoire: ru_maxrss du processus et des enfants
+  - --profile-out X.json: trace Chrome (chrome://tracing, https://ui.perfetto.dev)
+  - --profile-out X.pstats: cProfile complet (python3 -m pstats X.pstats), top 25 sur stderr avec --profile
+
+Activation: --profile (résumé sur stderr en fin de run) ou variable d'environnement
+SZ_PROFILE=1 (coût: un perf_counter par étape). SZ_PROFILE=/tmp/run.json ou .pstats ajoute
+le fichier correspondant. Désactivé, stage() rend un contexte vide et run() appelle
+subprocess directement.
+
+Couverture: tous les outils batch de tools/ appellent setup() (add_arguments + setup avec
+argparse, setup_argv() pour ceux qui lisent sys.argv directement: sz_compare_decode_vs_ocr,
+sz_parse_ms_log, sz_decode_analyze/find/manual, sz_iterate_decode_vs_ocr, sz_mim_hypotheses).
+Ne sont pas instrumentés: les services qui tournent jusqu'à Ctrl-C (sz_mqtt_ingest, sz_mqtt,
+sz_mqtt_replay, sz_replay_server, sz_tail_decode, logger_jimny) et sz_bench, qui chronomètre
+lui-même chaque étape.
+
+Usage (dans un outil):
+  import sz_profile
+  from sz_profile import profiled, stage
+  sz_profile.add_arguments(ap)
+  args = ap.parse_args()
+  sz_profile.setup(args)
+  with stage("parse log") as st:
+      events = build_events(log_path)
+      st.rows = len(events)
+  sz_profile.run(["ffmpeg", ...], check=True)
+
+  sz_profile.setup_argv()         # outil sans argparse: retire --profile de sys.argv
+
+  @profiled("candidats")          # fonction chaude appelée depuis plusieurs étapes
+  def find_all_candidates(...): ...
+
+  with stage("extraction"), ThreadPoolExecutor() as ex:
+      ex.map(bind_stage(one), jobs)  # étapes des threads sous « extraction » (pile par thread)
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+ENV_VAR = "SZ_PROFILE"
+
+
+class Span:
+    __slots__ = ("name", "path", "start", "dur", "rows", "kind", "tid")
+
+    def __init__(self, name: str, path: Tuple[str, ...], start: float, kind: str = "stage") -> None:
+        self.name = name
+        self.path = path
+        self.start = start
+        self.dur = 0.0
+        self.rows = 0
+        self.kind = kind
+        self.tid = threading.get_ident()
+
+
+_NULL_SPAN = Span("", (), 0.0)
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.summary = False
+        self.outputs: List[Path] = []
+        self.t0 = time.perf_counter()
+        self.spans: List[Span] = []
+        self._local = threading.local()  # pile d'étapes par thread (extractions ffmpeg parallèles)
+        self._cprof: Any = None
+        self._done = False
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0, kind: str = "stage") -> Iterator[Span]:
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(name)
+        sp = Span(name, tuple(stack), time.perf_counter(), kind)
+        sp.rows = rows
+        try:
+            yield sp
+        finally:
+            sp.dur = time.perf_counter() - sp.start
+            stack.pop()
+            self.spans.append(sp)
+
+    def bind(self, fn: Any) -> Any:
+        """fn, exécutée dans un autre thread, avec la pile d'étapes du thread appelant à cet instant."""
+        if not self.enabled:
+            return fn
+        parent = list(self._local.__dict__.get("stack", ()))
+
+        @functools.wraps(fn)
+        def wrapper(*a: Any, **kw: Any) -> Any:
+            saved = self._local.__dict__.get("stack")
+            self._local.stack = list(parent)
+            try:
+                return fn(*a, **kw)
+            finally:
+                if saved is None:
+                    del self._local.stack
+                else:
+                    self._local.stack = saved
+
+        return wrapper
+
+    def _subprocess(self, fn: Any, cmd: List[str], **kw: Any) -> Any:
+        if not self.enabled:
+            return fn(cmd, **kw)
+        with self.stage(Path(str(cmd[0])).name, kind="subprocess"):
+            return fn(cmd, **kw)
+
+    def start(self, summary: bool, outputs: List[Path]) -> None:
+        self.enabled = True
+        self.summary = self.summary or summary
+        self.outputs.extend(o for o in outputs if o not in self.outputs)
+        if self._cprof is None and any(o.suffix in (".pstats", ".prof") for o in self.outputs):
+            import cProfile
+
+            self._cprof = cProfile.Profile()
+            self._cprof.enable()
+
+    def peak_rss_mb(self) -> Tuple[float, float]:
+        """Pic RSS (Mo) du processus et des sous-processus terminés."""
+        if resource is None:
+            return 0.0, 0.0
+        unit = 1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0  # octets sur macOS, Ko sur Linux
+        return (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+        )
+
+    def summary_lines(self) -> List[str]:
+        """Arbre des étapes (cumul par chemin, ordre de première apparition) puis sous-processus."""
+        total = time.perf_counter() - self.t0
+        agg: Dict[Tuple[str, ...], List[float]] = {}  # path → [appels, secondes, lignes, début]
+        for sp in self.spans:
+            a = agg.setdefault(sp.path, [0, 0.0, 0, sp.start])
+            a[0] += 1
+            a[1] += sp.dur
+            a[2] += sp.rows
+            a[3] = min(a[3], sp.start)
+        lines = [f"profil: {total:.3f} s au total"]
+        for path, (calls, sec, rows, _) in sorted(agg.items(), key=lambda kv: (kv[1][3], len(kv[0]))):
+            label = "  " * (len(path) - 1) + path[-1]
+            pct = 100.0 * sec / total if total > 0 else 0.0
+            extra = f" ×{int(calls)}" if calls > 1 else ""
+            if rows:
+                extra += f"  {int(rows)} lignes, {rows / sec:.0f}/s" if sec > 0 else f"  {int(rows)} lignes"
+            lines.append(f"  {label:36s} {sec:9.3f} s {pct:5.1f} %{extra}")
+        subs: Dict[str, List[float]] = {}
+        for sp in self.spans:
+            if sp.kind == "subprocess":
+                s = subs.setdefault(sp.name, [0, 0.0])
+                s[0] += 1
+                s[1] += sp.dur
+        for name, (calls, sec) in sorted(subs.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"  sous-processus {name}: {int(calls)} appels, {sec:.3f} s, {1000.0 * sec / calls:.1f} ms/appel")
+        own, children = self.peak_rss_mb()
+        if own:
+            lines.append(f"  pic RSS: {own:.1f} Mo" + (f" (sous-processus: {children:.1f} Mo)" if subs else ""))
+        return lines
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": Path(sys.argv[0]).name}}
+        ]
+        tids: Dict[int, int] = {}
+        for sp in sorted(self.spans, key=lambda s: s.start):
+            ev: Dict[str, Any] = {
+                "name": sp.name,
+                "cat": sp.kind,
+                "ph": "X",
+                "pid": pid,
+                "tid": tids.setdefault(sp.tid, len(tids)),
+                "ts": round((sp.start - self.t0) * 1e6, 1),
+                "dur": round(sp.dur * 1e6, 1),
+            }
+            if sp.rows:
+                ev["args"] = {"rows": sp.rows}
+            events.append(ev)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def finish(self) -> None:
+        if not self.enabled or self._done:
+            return
+        self._done = True
+        if self._cprof is not None:
+            self._cprof.disable()
+        for out in self.outputs:
+            try:
+                out.parent.mkdir(parents=True, exist_ok=True)
+                if out.suffix in (".pstats", ".prof"):
+                    self._cprof.dump_stats(str(out))
+                else:
+                    out.write_text(json.dumps(self.chrome_trace()) + "\n", encoding="utf-8")
+                print(f"# profil → {out}", file=sys.stderr)
+            except OSError as e:
+                print(f"# profil non écrit ({out}): {e}", file=sys.stderr)
+        if self.summary:
+            for line in self.summary_lines():
+                print(f"# {line}", file=sys.stderr)
+            if self._cprof is not None:
+                import io
+                import pstats
+
+                buf = io.StringIO()
+                pstats.Stats(self._cprof, stream=buf).sort_stats("cumulative").print_stats(25)
+                for line in buf.getvalue().splitlines():
+                    if line.strip():
+                        print(f"# {line}", file=sys.stderr)
+
+
+PROF = Profiler()
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--profile", action="store_true", help=f"Temps par étape, sous-processus, lignes/s et pic mémoire sur stderr (ou {ENV_VAR}=1)")
+    ap.add_argument("--profile-out", type=Path, action="append", default=[],
+                    help="Écrire le profil: X.json (trace Chrome) ou X.pstats (cProfile); répétable")
+
+
+def setup(args: Optional[argparse.Namespace] = None) -> Profiler:
+    """Active le profil selon --profile / --profile-out / SZ_PROFILE; résumé écrit à la sortie du processus."""
+    env = os.environ.get(ENV_VAR, "").strip()
+    summary = bool(getattr(args, "profile", False))
+    outputs: List[Path] = list(getattr(args, "profile_out", None) or [])
+    if env and env != "0":
+        summary = True
+        if env.endswith((".json", ".pstats", ".prof")):
+            outputs.append(Path(env))
+    if summary or outputs:
+        PROF.start(summary, outputs)
+        atexit.register(PROF.finish)
+    return PROF
+
+
+def setup_argv() -> Profiler:
+    """Outils sans argparse (lecture directe de sys.argv): retire --profile / --profile-out X de sys.argv, puis setup()."""
+    ap = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    add_arguments(ap)
+    args, rest = ap.parse_known_args(sys.argv[1:])
+    sys.argv[1:] = rest
+    return setup(args)
+
+
+def stage(name: str, rows: int = 0) -> Any:
+    """Étape nommée (imbricable); fixer .rows sur l'objet rendu pour le débit."""
+    return PROF.stage(name, rows)
+
+
+def bind_stage(fn: Any) -> Any:
+    """Pour un pool de threads: ex.map(bind_stage(fn), ...) imbrique les étapes des workers sous l'étape courante."""
+    return PROF.bind(fn)
+
+
+def profiled(name: Optional[str] = None) -> Any:
+    """Décorateur: chaque appel est une étape (nom de la fonction par défaut)."""
+
+    def deco(fn: Any) -> Any:
+        @functools.wraps(fn)
+        def wrapper(*a: Any, **kw: Any) -> Any:
+            if not PROF.enabled:
+                return fn(*a, **kw)
+            with PROF.stage(name or fn.__name__):
+                return fn(*a, **kw)
+
+        return wrapper
+
+    return deco
+
+
+def run(cmd: List[str], **kw: Any) -> subprocess.CompletedProcess:
+    return PROF._subprocess(subprocess.run, cmd, **kw)
+
+
+def check_output(cmd: List[str], **kw: Any) -> Any:
+    return PROF._subprocess(subprocess.check_output, cmd, **kw)
+
+
+def check_call(cmd: List[str], **kw: Any) -> int:
+    return PROF._subprocess(subprocess.check_call, cmd, **kw)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Échelles rationnelles exactes pour sz_decode_from_ocr_jsonl.py --rational.
+
+Un fit linéaire rend des flottants (×0.0961061 + 22.25, ×7.6190476...) que sz_decode.h
+recopie tels quels; l'échelle réelle du calculateur est presque toujours une fraction simple
+(800/105 = 160/21 pour le régime dans medias/verify_rpm_decode.py, ×0.125 = 1/8 et non ×8
+dans l'historique de FEATURES.md). Après le fit, chaque échelle a est remplacée par la
+fraction p/q la plus simple qui décode aussi bien:
+
+  - candidats: réduites et semi-réduites du développement en fraction continue de a
+    (meilleures approximations, q ≤ --max-den), plus p/2^k (division = décalage)
+  - décalage entier c (en 1/q): la formule devient (raw·p + c) / q, calcul entier exact
+    sur l'ESP32 puis une seule division (ou multiplication exacte par 2^-k); q est au
+    besoin multiplié (×2, ×5, ×10...) pour que c/q tombe sur le décalage
+  - rescoring contre l'OCR, toutes les fractions d'un champ en une matrice (lignes ×
+    candidats, numpy): c = médiane(q·y - p·x) arrondie, puis MAE
+  - gardée: la plus simple (⌈log2 q⌉ le plus petit, puissance de 2 à égalité, puis |p|)
+    dont la MAE dépasse celle du fit flottant d'au plus --rational-tol pas d'affichage
+    (0.5) ou 2 %, et dont l'échelle reste à 3 écarts-types de la pente du fit (ou à --rational-tol
+    pas d'affichage sur la plage des raw); sinon le fit flottant reste. Un fit dont la MAE dépasse
+    10 pas d'affichage est laissé tel quel. Avec --robust, MAE et fraction en accord de
+    sz_robust_fit.inlier_score, comme les autres candidats: une fraction sous --min-inliers
+    est écartée
+
+Usage:
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --robust huber --rational
+  #   engine_temp_c: ×0.0987357 -268.685 → (raw - 2793) / 9  mae 0.085 → 0.095
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+from fractions import Fraction
+from pathlib import Path
+from typing import Callable, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_page_matrix import np
+
+DEFAULT_MAX_DEN = 1024
+DEFAULT_TOL_STEPS = 0.5
+REL_TOL = 0.02
+SCALE_SIGMAS = 3.0  # écart d'échelle toléré en écarts-types de la pente du fit
+MAX_MAE_STEPS = 10.0  # fit flottant au-delà: trop imprécis pour en tirer une échelle exacte
+OFFSET_MULTIPLIERS = (1, 2, 4, 5, 8, 10, 16, 20, 25, 50, 100, 1000)
+MAX_TOTAL_DEN = 100000
+
+# (p, q, c): valeur = (raw·p + c) / q
+Rational = Tuple[int, int, int]
+
+
+def continued_fraction(x: float, max_terms: int = 24) -> List[int]:
+    """Termes a0; a1, a2... de x (arrêt quand le reste est négligeable)."""
+    terms: List[int] = []
+    fr = Fraction(x)
+    for _ in range(max_terms):
+        a = math.floor(fr)
+        terms.append(a)
+        fr -= a
+        if fr == 0 or fr < Fraction(1, 10**12):
+            break
+        fr = 1 / fr
+    return terms
+
+
+def best_approximations(x: float, max_den: int) -> List[Fraction]:
+    """Réduites et semi-réduites de x de dénominateur ≤ max_den (meilleures approximations)."""
+    out: List[Fraction] = []
+    p0, q0, p1, q1 = 0, 1, 1, 0  # h(-2)/k(-2), h(-1)/k(-1)
+    for a in continued_fraction(x):
+        # semi-réduites (a/2 < m < a), puis la réduite (m = a)
+        for m in range(max(1, (a + 1) // 2), a + 1):
+            p, q = m * p1 + p0, m * q1 + q0
+            if q > max_den:
+                break
+            out.append(Fraction(p, q))
+        p, q = a * p1 + p0, a * q1 + q0
+        if q > max_den:
+            break
+        p0, q0, p1, q1 = p1, q1, p, q
+    return out
+
+
+def scale_candidates(a: float, max_den: int = DEFAULT_MAX_DEN) -> List[Fraction]:
+    """Fractions candidates pour l'échelle a: fraction continue + p/2^k."""
+    if not math.isfinite(a) or a == 0:
+        return []
+    sign = -1 if a < 0 else 1
+    cands: Set[Fraction] = set(best_approximations(abs(a), max_den))
+    k = 0
+    while (1 << k) <= max_den:
+        p = round(abs(a) * (1 << k))
+        if p:
+            cands.add(Fraction(p, 1 << k))
+        k += 1
+    return sorted((sign * f for f in cands), key=lambda f: (f.denominator, abs(f.numerator)))
+
+
+def is_pow2(q: int) -> bool:
+    return q > 0 and q & (q - 1) == 0
+
+
+def complexity(r: Rational) -> Tuple[int, bool, int, int]:
+    p, q, c = r
+    return ((q - 1).bit_length(), not is_pow2(q), abs(p), abs(c))  # ⌈log2 q⌉: 8 passe avant 7
+
+
+def expand(fracs: List[Fraction]) -> List[Tuple[int, int]]:
+    """(p, q) de chaque fraction, aussi avec q multiplié pour que le décalage entier c/q soit assez fin."""
+    out = []
+    seen: Set[Tuple[int, int]] = set()
+    for f in fracs:
+        for m in OFFSET_MULTIPLIERS:
+            pq = (f.numerator * m, f.denominator * m)
+            if pq[1] <= MAX_TOTAL_DEN and pq not in seen:
+                seen.add(pq)
+                out.append(pq)
+    return out
+
+
+# score: résidus (n, C) → (MAE, fraction de lignes comptées) par colonne
+Score = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def plain_mae(r: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.abs(r).mean(axis=0), np.ones(r.shape[1:])
+
+
+def rescore(x: np.ndarray, y: np.ndarray, pq: List[Tuple[int, int]], score: Score = plain_mae) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Décalage entier optimal c (médiane, arrondi), score et fraction de chaque (p, q), en une matrice (n, C)."""
+    p = np.array([v[0] for v in pq], dtype=np.float64)
+    q = np.array([v[1] for v in pq], dtype=np.float64)
+    c = np.round(np.median(y[:, None] * q - x[:, None] * p, axis=0))
+    mae, frac = score(y[:, None] - (x[:, None] * p + c) / q)
+    return c, mae, frac
+
+
+def scale_bound(x: np.ndarray, y: np.ndarray, a: float, b: float, step: float, tol_steps: float = DEFAULT_TOL_STEPS) -> float:
+    """
+    Écart |p/q - a| admis: SCALE_SIGMAS écarts-types de la pente (bruit robuste 1.4826·médiane |r|),
+    ou tol_steps pas d'affichage sur toute la plage des raw, le plus large des deux.
+    """
+    r = y - (a * x + b)
+    sxx = float(np.sum((x - x.mean()) ** 2))
+    sigma = 1.4826 * float(np.median(np.abs(r))) / math.sqrt(sxx) if sxx > 0 else math.inf
+    span = float(np.ptp(x))
+    drift = tol_steps * step / span if span > 0 else math.inf
+    return max(SCALE_SIGMAS * sigma, drift)
+
+
+def rationalize(
+    x: np.ndarray,
+    y: np.ndarray,
+    a: float,
+    b: float,
+    step: float,
+    max_den: int = DEFAULT_MAX_DEN,
+    tol_steps: float = DEFAULT_TOL_STEPS,
+    score: Score = plain_mae,
+    min_frac: float = 0.0,
+) -> Optional[Tuple[Rational, float, float]]:
+    """
+    Fraction la plus simple pour le fit y ≈ a·x + b (x, y sans NaN): ((p, q, c), mae, mae du fit
+    flottant), ou None si aucune ne tient dans la tolérance. Seules les fractions proches de a
+    (scale_bound) sont essayées: la MAE seule laisserait passer une échelle fausse de 20 % sur un
+    fit médiocre. min_frac: fraction minimale de lignes
+    comptées par score (robuste: en accord) pour qu'une fraction soit retenue.
+    """
+    bound = scale_bound(x, y, a, b, step, tol_steps) if len(y) else 0.0
+    pq = [v for v in expand(scale_candidates(a, max_den)) if abs(v[0] / v[1] - a) <= bound]
+    if not pq or len(y) == 0:
+        return None
+    ref = float(score((y - (a * x + b))[:, None])[0][0])
+    c, mae, frac = rescore(x, y, pq, score)
+    limit = ref + max(tol_steps * step, REL_TOL * ref)
+    ok = [i for i in range(len(pq)) if mae[i] <= limit and frac[i] >= min_frac]
+    if not ok:
+        return None
+    best = min(ok, key=lambda i: (complexity((pq[i][0], pq[i][1], int(c[i]))), mae[i]))
+    p, q = pq[best]
+    return (p, q, int(c[best])), float(mae[best]), ref
+
+
+def label(r: Rational) -> str:
+    p, q, c = r
+    num = ("-" if p < 0 else "") + ("raw" if abs(p) == 1 else f"raw·{abs(p)}") + (f" {'+' if c > 0 else '-'} {abs(c)}" if c else "")
+    if q == 1:
+        return num
+    return f"({num}) / {q}" if c else f"{num} / {q}"
+
+
+def c_expr(r: Rational, raw: str = "raw") -> str:
+    """Expression C: produit entier exact, puis une division (ou ×2^-k exact)."""
+    p, q, c = r
+    big = 65535 * abs(p) + abs(c) >= 2**31
+    cast = f"(int64_t){raw}" if big else f"(int32_t){raw}"
+    num = cast if p == 1 else f"-{cast}" if p == -1 else f"{cast} * {p}"
+    if c:
+        num += f" {'+' if c > 0 else '-'} {abs(c)}"
+    if q == 1:
+        return f"(float)({num})"
+    if is_pow2(q):
+        return f"(float)({num}) * {1.0 / q!r}f"  # 2^-k exact en float
+    return f"(float)({num}) / {q}.0f"
+
+
+def rationalize_results(
+    rows: List[dict],
+    results: dict,
+    max_den: int = DEFAULT_MAX_DEN,
+    tol_steps: float = DEFAULT_TOL_STEPS,
+    robust: bool = False,
+    min_inliers: float = 0.0,
+) -> Tuple[dict, List[str]]:
+    """
+    Remplace les candidats « linear » de results (champ → 8-uplet) par leur forme rationnelle
+    (page, offset, p, q, c/q, "rational", mae, n); rend aussi une ligne de rapport par champ.
+    robust: score de sz_robust_fit.inlier_score (MAE sur les lignes en accord, comme les autres
+    candidats robustes) au lieu de la MAE simple; une fraction sous min_inliers est écartée.
+    """
+    from sz_page_matrix import build_page_matrix
+    from sz_robust_fit import display_step, inlier_score
+
+    pm = build_page_matrix(rows)
+    out = dict(results)
+    report: List[str] = []
+    for field, cand in results.items():
+        page, offset, mult, div, add, lab, mae, n = cand
+        if lab != "linear" or mult == 0 or page not in pm.pages or offset + 1 >= pm.pages[page].shape[1]:
+            continue
+        x, y = pm.words(page)[:, offset], pm.target(field)
+        keep = np.isfinite(x) & np.isfinite(y)
+        x, y = x[keep], y[keep]
+        step = display_step(y)
+        if len(y) == 0 or abs(mult / div) * np.ptp(x) < 1e-3 * step:
+            continue  # échelle nulle à l'arrondi près (champ constant): rien à convertir
+        score: Score = plain_mae
+        min_frac = 0.0
+        if robust:
+            # même score que la recherche robuste: MAE en accord, fraction en accord ≥ --min-inliers
+            score = lambda r, step=step: inlier_score(r, np.ones(r.shape, dtype=bool), step)  # noqa: E731
+            min_frac = min_inliers
+        ref = float(score((y - (mult / div * x + add))[:, None])[0][0])
+        if ref > MAX_MAE_STEPS * step:
+            report.append(f"  {field}: ×{mult / div:.6g} {add:+.6g} gardé (fit trop imprécis: mae {ref:.3g} = {ref / step:.0f} pas d'affichage)")
+            continue
+        res = rationalize(x, y, mult / div, add, step, max_den, tol_steps, score, min_frac)
+        if res is None:
+            floor = f", ≥ {100 * min_frac:.0f} % en accord" if min_frac else ""
+            report.append(f"  {field}: ×{mult / div:.6g} {add:+.6g} gardé (aucune fraction q ≤ {max_den} dans la tolérance{floor})")
+            continue
+        (p, q, c), mae_r, ref = res
+        out[field] = (page, offset, p, q, c / q, "rational", mae_r, n)
+        report.append(f"  {field}: ×{mult / div:.6g} {add:+.6g} → {label((p, q, c))}  mae {ref:.3f} → {mae_r:.3f}")
+    return out, report
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Serveur HTTP pour sz_viewer_replay.html sur de gros enregistrements (JSONL/NDJSON).
+
+Au lieu de télécharger et découper tout le fichier dans le navigateur, le serveur
+construit un index (offset de début de ligne + horodatage) et ne sert que la
+fenêtre demandée autour de la tête de lecture:
+
+  GET /api/index?file=/recording/sz_sync_ms_window_ocr.jsonl
+      → {"lines", "bytes", "t0_ms", "t1_ms", "t_ms": [...]}  (un temps par ligne)
+  GET /api/window?file=...&from=100&to=355      (lignes [from, to[)
+  GET /api/window?file=...&t0=64400000&t1=64460000  (temps en ms, même base que t_ms)
+      → lignes brutes du fichier (NDJSON), en-têtes X-Sz-Lines / X-Sz-Bytes; seules les
+        lignes indexées (objets JSON) sont envoyées, la k-ième est la ligne from + k
+  GET /medias/fichier.json  avec `Range: bytes=a-b` ou `Range: lines=a-b`
+      → 206 Partial Content (Content-Range), le reste en fichier statique
+
+Horodatage d'une ligne: ts_ms (NDJSON gateway), sinon log_ts_sec ou t_offset_s
+(JSONL de synchro), sinon ligne précédente + 500 ms. Les temps sont rendus
+croissants (horloge qui recule = même temps que la ligne précédente).
+
+L'index est gardé en mémoire et dans un fichier voisin `.<nom>.szidx` (taille +
+mtime vérifiés). Si le fichier a seulement grandi (ingestion en cours), seules
+les nouvelles lignes sont indexées. Réponses compressées en gzip si le client
+l'accepte.
+
+Usage:
+  python3 tools/sz_replay_server.py                 # racine = dépôt, port 8000
+  → http://localhost:8000/medias/sz_viewer_replay.html
+  → http://localhost:8000/medias/sz_viewer_replay.html?file=../recording/sz_sync_ms_window_ocr.jsonl
+  python3 tools/sz_replay_server.py --root /data/jimny --port 8080
+  python3 tools/sz_replay_server.py --build recording/sz_sync_ms_window_ocr.jsonl   # index seul
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import gzip
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_mqtt_replay import DEFAULT_PERIOD_S, record_time_s
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+INDEX_MAGIC = b"SZIDX2\0\0"
+# magic, taille du fichier, mtime_ns, octets indexés, nombre de lignes; puis offsets, fins de ligne (u64) et temps (f64)
+INDEX_HEADER = struct.Struct("<8sQQQQ")
+RECORDING_SUFFIXES = (".json", ".jsonl", ".ndjson")
+GZIP_MIN_BYTES = 1024
+MAX_WINDOW_LINES = 20000
+RANGE_RE = re.compile(r"^(bytes|lines)=(\d*)-(\d*)$")
+
+
+class LineIndex:
+    """Offsets de début de ligne + temps (ms) d'un enregistrement JSONL/NDJSON."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.offsets = array("Q")  # début de chaque ligne indexée
+        self.ends = array("Q")  # fin (exclue, \n compris) de chaque ligne indexée
+        self.times_ms = array("d")  # temps croissant de chaque ligne
+        self.end = 0  # octet après la dernière ligne indexée
+        self.size = 0
+        self.mtime_ns = 0
+        self.lock = threading.Lock()
+
+    @property
+    def sidecar(self) -> Path:
+        return self.path.with_name("." + self.path.name + ".szidx")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def line_end(self, i: int) -> int:
+        """Octet après la ligne i (fin exclue)."""
+        return self.ends[i]
+
+    def read_lines(self, i0: int, i1: int) -> bytes:
+        """Lignes indexées [i0, i1[ seulement: les lignes sautées (vides, invalides, non-objets) entre deux
+        lignes indexées sont retirées, pour que la k-ième ligne envoyée soit la ligne i0 + k."""
+        start = self.offsets[i0]
+        span = read_span(self.path, start, self.ends[i1 - 1])
+        if all(self.offsets[k + 1] == self.ends[k] for k in range(i0, i1 - 1)):
+            return span if span.endswith(b"\n") else span + b"\n"
+        parts = []
+        for k in range(i0, i1):
+            line = span[self.offsets[k] - start : self.ends[k] - start]
+            parts.append(line if line.endswith(b"\n") else line + b"\n")
+        return b"".join(parts)
+
+    def load_sidecar(self) -> bool:
+        try:
+            with self.sidecar.open("rb") as f:
+                magic, size, mtime_ns, end, n = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                if magic != INDEX_MAGIC:
+                    return False
+                offsets = array("Q")
+                ends = array("Q")
+                times = array("d")
+                offsets.fromfile(f, n)
+                ends.fromfile(f, n)
+                times.fromfile(f, n)
+        except (OSError, EOFError, struct.error):
+            return False
+        self.offsets, self.ends, self.times_ms = offsets, ends, times
+        self.size, self.mtime_ns, self.end = size, mtime_ns, end
+        return True
+
+    def save_sidecar(self) -> None:
+        tmp = self.sidecar.with_suffix(".tmp")
+        try:
+            with tmp.open("wb") as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, self.size, self.mtime_ns, self.end, len(self.offsets)))
+                self.offsets.tofile(f)
+                self.ends.tofile(f)
+                self.times_ms.tofile(f)
+            os.replace(tmp, self.sidecar)
+        except OSError:
+            pass  # dossier en lecture seule: index en mémoire uniquement
+
+    def scan(self, start: int) -> None:
+        """Indexe les lignes complètes à partir de l'octet `start` (début de ligne)."""
+        last_t = self.times_ms[-1] if self.times_ms else None
+        with self.path.open("rb") as f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                complete = line.endswith(b"\n")
+                body = line.strip()
+                rec = None
+                if body:
+                    try:
+                        rec = json.loads(body)
+                    except ValueError:
+                        rec = None
+                if not complete and rec is None:
+                    break  # ligne partielle en fin de fichier (écriture en cours)
+                if isinstance(rec, dict):
+                    t = record_time_s(rec)
+                    if t is None:
+                        t_ms = (last_t + DEFAULT_PERIOD_S * 1000.0) if last_t is not None else 0.0
+                    else:
+                        t_ms = t * 1000.0
+                    if last_t is not None and t_ms < last_t:
+                        t_ms = last_t
+                    self.offsets.append(pos)
+                    self.ends.append(pos + len(line))
+                    self.times_ms.append(t_ms)
+                    last_t = t_ms
+                pos += len(line)
+        self.end = pos
+
+    def refresh(self) -> bool:
+        """Met l'index à jour si le fichier a changé. Retourne True si l'index venait du cache."""
+        st = self.path.stat()
+        with self.lock:
+            if st.st_size == self.size and st.st_mtime_ns == self.mtime_ns:
+                return True
+            if not self.offsets and self.load_sidecar():
+                if st.st_size == self.size and st.st_mtime_ns == self.mtime_ns:
+                    return True
+            if self.size and st.st_size > self.size and self.end <= st.st_size:
+                self.scan(self.end)  # fichier qui grandit: on reprend où on s'était arrêté
+            else:
+                self.offsets, self.ends, self.times_ms, self.end = array("Q"), array("Q"), array("d"), 0
+                self.scan(0)
+            self.size, self.mtime_ns = st.st_size, st.st_mtime_ns
+            self.save_sidecar()
+            return False
+
+    def lines_for_time(self, t0_ms: float, t1_ms: float) -> Tuple[int, int]:
+        """Lignes [i0, i1[ dont le temps est dans [t0_ms, t1_ms]."""
+        return bisect.bisect_left(self.times_ms, t0_ms), bisect.bisect_right(self.times_ms, t1_ms)
+
+    def summary(self) -> Dict[str, object]:
+        n = len(self.offsets)
+        return {
+            "file": self.path.name,
+            "lines": n,
+            "bytes": self.end,
+            "t0_ms": self.times_ms[0] if n else None,
+            "t1_ms": self.times_ms[-1] if n else None,
+            "t_ms": [round(t) for t in self.times_ms],
+        }
+
+
+_indexes: Dict[Path, LineIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path: Path) -> Tuple[LineIndex, bool]:
+    with _indexes_lock:
+        idx = _indexes.get(path)
+        if idx is None:
+            idx = _indexes[path] = LineIndex(path)
+    cached = idx.refresh()
+    return idx, cached
+
+
+def read_span(path: Path, start: int, end: int) -> bytes:
+    with path.open("rb") as f:
+        f.seek(start)
+        return f.read(max(0, end - start))
+
+
+def parse_range(header: str, total: int) -> Optional[Tuple[str, int, int]]:
+    """`bytes=a-b` / `lines=a-b` / `bytes=-n` → (unité, début, fin incluse), None si invalide."""
+    m = RANGE_RE.match(header.strip())
+    if not m:
+        return None
+    unit, a, b = m.group(1), m.group(2), m.group(3)
+    if not a and not b:
+        return None
+    if not a:  # suffixe: les n derniers
+        n = int(b)
+        if n == 0:
+            return None
+        return unit, max(0, total - n), total - 1
+    start = int(a)
+    end = min(int(b), total - 1) if b else total - 1
+    if start >= total or end < start:
+        return None
+    return unit, start, end
+
+
+class ReplayHandler(SimpleHTTPRequestHandler):
+    server_version = "SzReplay/1.0"
+
+    def log_message(self, format: str, *args: object) -> None:
+        if not self.server.quiet:  # type: ignore[attr-defined]
+            super().log_message(format, *args)
+
+    def resolve(self, url_path: str) -> Optional[Path]:
+        """Chemin URL → fichier sous la racine (None si hors racine ou absent)."""
+        root = Path(self.directory).resolve()
+        p = (root / unquote(url_path).lstrip("/")).resolve()
+        if p != root and root not in p.parents:
+            return None
+        return p if p.is_file() else None
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        use_gzip = len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", "")
+        if use_gzip:
+            body = gzip.compress(body, compresslevel=5)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Accept-Ranges", "bytes, lines")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_json(self, obj: object, status: int = HTTPStatus.OK) -> None:
+        self.send_body(status, json.dumps(obj, separators=(",", ":")).encode("utf-8"), "application/json")
+
+    def send_lines(self, idx: LineIndex, i0: int, i1: int, status: int, extra: Optional[Dict[str, str]] = None) -> None:
+        """Envoie les lignes indexées [i0, i1[ (octets bruts de chaque ligne)."""
+        n = len(idx)
+        i0 = max(0, min(i0, n))
+        i1 = max(i0, min(i1, n, i0 + MAX_WINDOW_LINES))
+        if i1 > i0:
+            start, end = idx.offsets[i0], idx.line_end(i1 - 1)
+            body = idx.read_lines(i0, i1)
+        else:
+            start = end = idx.offsets[i0] if i0 < n else idx.end
+            body = b""
+        headers = {
+            "X-Sz-Lines": f"{i0}-{i1}/{n}",
+            "X-Sz-Bytes": f"{start}-{end}/{idx.size}",
+        }
+        headers.update(extra or {})
+        self.send_body(status, body, "application/x-ndjson", headers)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path in ("/api/index", "/api/window"):
+            self.handle_api(url.path, parse_qs(url.query))
+            return
+        rng = self.headers.get("Range")
+        if rng:
+            path = self.resolve(url.path)
+            if path is not None:
+                self.handle_range(path, rng)
+                return
+        super().do_GET()
+
+    def handle_api(self, endpoint: str, q: Dict[str, list]) -> None:
+        name = (q.get("file") or [""])[0]
+        path = self.resolve(name) if name else None
+        if path is None or path.suffix.lower() not in RECORDING_SUFFIXES:
+            self.send_json({"error": f"fichier introuvable: {name}"}, HTTPStatus.NOT_FOUND)
+            return
+        t_build = time.perf_counter()
+        idx, cached = get_index(path)
+        if endpoint == "/api/index":
+            out = idx.summary()
+            out["cached"] = cached
+            out["build_ms"] = round((time.perf_counter() - t_build) * 1000, 1)
+            self.send_json(out)
+            return
+        try:
+            if "t0" in q or "t1" in q:
+                t0 = float(q["t0"][0]) if "t0" in q else float("-inf")
+                t1 = float(q["t1"][0]) if "t1" in q else float("inf")
+                i0, i1 = idx.lines_for_time(t0, t1)
+            else:
+                i0 = int((q.get("from") or ["0"])[0])
+                i1 = int((q.get("to") or [str(len(idx))])[0])
+        except ValueError:
+            self.send_json({"error": "paramètres invalides (from/to ou t0/t1)"}, HTTPStatus.BAD_REQUEST)
+            return
+        self.send_lines(idx, i0, i1, HTTPStatus.OK)
+
+    def handle_range(self, path: Path, header: str) -> None:
+        if header.strip().startswith("lines="):
+            if path.suffix.lower() not in RECORDING_SUFFIXES:
+                self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                return
+            idx, _ = get_index(path)
+            r = parse_range(header, len(idx))
+            if r is None:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"lines */{len(idx)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            _, a, b = r
+            b = min(b, a + MAX_WINDOW_LINES - 1)
+            self.send_lines(idx, a, b + 1, HTTPStatus.PARTIAL_CONTENT, {"Content-Range": f"lines {a}-{b}/{len(idx)}"})
+            return
+        size = path.stat().st_size
+        r = parse_range(header, size)
+        if r is None:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        _, a, b = r
+        body = read_span(path, a, b + 1)
+        # Pas de gzip sur un Range d'octets: les offsets portent sur le fichier d'origine
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", self.guess_type(str(path)))
+        self.send_header("Content-Range", f"bytes {a}-{b}/{size}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+
+def make_server(root: Path, host: str = "127.0.0.1", port: int = 8000, quiet: bool = False) -> ThreadingHTTPServer:
+    handler = lambda *a, **kw: ReplayHandler(*a, directory=str(root), **kw)  # noqa: E731
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.quiet = quiet  # type: ignore[attr-defined]
+    return httpd
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Serveur HTTP indexé (fenêtres par temps/lignes, Range, gzip) pour sz_viewer_replay.html")
+    ap.add_argument("--root", type=Path, default=REPO_ROOT, help="Racine servie (défaut: dépôt)")
+    ap.add_argument("--host", default="127.0.0.1", help="Adresse d'écoute")
+    ap.add_argument("--port", type=int, default=8000, help="Port HTTP")
+    ap.add_argument("--quiet", action="store_true", help="Pas de log par requête")
+    ap.add_argument("--build", nargs="+", type=Path, metavar="FICHIER", help="Construit/rafraîchit l'index des fichiers puis quitte")
+    args = ap.parse_args()
+
+    if args.build:
+        for p in args.build:
+            if not p.is_file():
+                print(f"Fichier introuvable: {p}", file=sys.stderr)
+                return 1
+            t0 = time.perf_counter()
+            idx, cached = get_index(p.resolve())
+            dt = time.perf_counter() - t0
+            span = (idx.times_ms[-1] - idx.times_ms[0]) / 1000.0 if len(idx) else 0.0
+            src = "cache" if cached else "construit"
+            print(f"OK: {p} → {len(idx)} lignes, {idx.end} octets, {span:.1f} s ({src} en {dt * 1000:.1f} ms) → {idx.sidecar.name}")
+        return 0
+
+    root = args.root.resolve()
+    if not root.is_dir():
+        print(f"Racine introuvable: {root}", file=sys.stderr)
+        return 1
+    httpd = make_server(root, args.host, args.port, args.quiet)
+    print(f"Serveur replay sur http://{args.host}:{httpd.server_address[1]}/medias/sz_viewer_replay.html (racine {root})", file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Ajustement robuste raw → OCR pour sz_decode_from_ocr_jsonl.py --robust (numpy, tous les slots à la fois).
+
+Une seule mauvaise lecture OCR (6402 pour 64.02, un chiffre manqué) tire la régression
+linear_fit_for loin de la vraie droite, et une formule fixe juste perd sa place à cause
+d'une grosse erreur. Jusqu'ici: nettoyage à la main, ou la boucle d'exclusion de
+sz_iterate_decode_vs_ocr.py. Ici, chaque champ est ajusté sur la matrice des mots u16
+(n lignes × K slots, sz_page_matrix / sz_decode_cv.slot_matrix) en quelques opérations
+numpy par itération, pour tous les slots ensemble:
+
+  huber   moindres carrés repondérés (IRLS): poids min(1, c·s/|r|), c = 1.345, échelle s
+          = 1.4826 · médiane |r| (plancher: pas d'affichage du champ), 20 itérations au plus
+  ransac  droites par paires de lignes tirées (graine fixe: même résultat à chaque run), la
+          plus soutenue par slot (à 2 pas d'affichage près: l'arrondi des deux lignes
+          tirées), puis moindres carrés sur ses lignes d'accord. Un seuil tiré du fit
+          ordinaire (3 s) laissait entrer les lignes décalées dans le temps: 21A0[14] de
+          battery_v sortait ×0.00096 + 0.51 au lieu de raw/1000
+
+Score commun à tous les candidats (formules fixes comme fits): une ligne est « en accord »
+si |r| ≤ max(3 s, pas d'affichage) avec s = 1.4826 · médiane |r|; MAE sur ces lignes, et
+fraction de lignes en accord. Un candidat en dessous de --min-inliers (0.8) est écarté:
+sans ce garde-fou, un slot qui colle sur la moitié des lignes gagnerait en ignorant l'autre.
+Le pas d'affichage (1, 0.1, 0.01...) vient des décimales des valeurs OCR du champ.
+
+Usage:
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --robust huber
+  python3 tools/sz_decode_from_ocr_jsonl.py recording/sz_sync_ms_window_ocr.jsonl --robust ransac --cv 5
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_decode_cv import slot_matrix
+from sz_page_matrix import build_page_matrix, np
+
+METHODS = ("huber", "ransac")
+MAD_SCALE = 1.4826  # médiane |r| → écart-type pour un bruit gaussien
+HUBER_C = 1.345
+HUBER_ITERS = 20
+RANSAC_TRIALS = 256
+RANSAC_SEED = 0
+RANSAC_CHUNK = 32  # tirages par paquet au plus
+RANSAC_BUDGET = 32 << 20  # octets d'un tableau (T, n, Kc) de résidus float64
+RANSAC_TOL_STEPS = 2.0
+INLIER_K = 3.0
+DEFAULT_MIN_INLIERS = 0.8
+
+Candidate = Tuple[str, int, float, float, float, str, float, int]
+
+
+def display_step(y: np.ndarray) -> float:
+    """Pas d'affichage d'une série OCR: 1 pour des entiers, 0.01 pour 64.02..."""
+    v = y[np.isfinite(y)]
+    for d in range(4):
+        s = v * 10.0**d
+        if np.all(np.abs(s - np.round(s)) < 1e-6):
+            return 10.0**-d
+    return 1e-3
+
+
+def abs_median(r: np.ndarray, m: np.ndarray) -> np.ndarray:
+    """Médiane de |r| sur l'axe 0, lignes m seulement (NaN si colonne vide)."""
+    a = np.sort(np.where(m, np.abs(r), np.inf), axis=0)
+    cnt = m.sum(axis=0)
+    lo = np.take_along_axis(a, np.maximum((cnt - 1) // 2, 0)[None], axis=0)[0]
+    hi = np.take_along_axis(a, np.minimum(cnt // 2, a.shape[0] - 1)[None], axis=0)[0]
+    return np.where(cnt > 0, (lo + hi) / 2.0, np.nan)
+
+
+def weighted_fit(x: np.ndarray, y: np.ndarray, w: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """y ≈ a*x + b par colonne, poids w (n, K) (x NaN = poids nul); a = NaN si x constant."""
+    m = np.isfinite(x)
+    w = np.where(m, w, 0.0)
+    sw = w.sum(axis=0)
+    safe = np.maximum(sw, 1e-300)
+    xz = np.where(m, x, 0.0)
+    mx = (w * xz).sum(axis=0) / safe
+    my = (w * y[:, None]).sum(axis=0) / safe
+    dx = np.where(m, xz - mx, 0.0)
+    var = (w * dx * dx).sum(axis=0)
+    ok = (sw > 0) & (var > 1e-12 * np.maximum(mx * mx, 1.0) * safe)
+    a = np.where(ok, (w * dx * (y[:, None] - my)).sum(axis=0) / np.where(ok, var, 1.0), np.nan)
+    return a, my - a * mx
+
+
+def residuals(x: np.ndarray, y: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return y[:, None] - (a * np.where(np.isfinite(x), x, 0.0) + b)
+
+
+def huber_fit(x: np.ndarray, y: np.ndarray, step: float, c: float = HUBER_C, iters: int = HUBER_ITERS) -> Tuple[np.ndarray, np.ndarray]:
+    """IRLS Huber, tous les slots (colonnes de x) à la fois; départ: moindres carrés."""
+    m = np.isfinite(x)
+    a, b = weighted_fit(x, y, m.astype(np.float64))
+    for _ in range(iters):
+        r = residuals(x, y, a, b)
+        s = np.maximum(MAD_SCALE * abs_median(r, m), step)
+        w = np.where(m, np.minimum(1.0, c * s / np.maximum(np.abs(r), 1e-300)), 0.0)
+        a1, b1 = weighted_fit(x, y, w)
+        done = np.allclose(a1, a, rtol=1e-9, atol=0.0, equal_nan=True) and np.allclose(b1, b, rtol=1e-9, atol=1e-12, equal_nan=True)
+        a, b = a1, b1
+        if done:
+            break
+    return a, b
+
+
+def ransac_fit(
+    x: np.ndarray,
+    y: np.ndarray,
+    step: float,
+    trials: int = RANSAC_TRIALS,
+    seed: int = RANSAC_SEED,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Droite la plus soutenue par slot parmi `trials` paires de lignes, puis moindres carrés sur son accord."""
+    # les mêmes paires pour tous les slots: résidus (T, n, Kc) par paquet de T tirages et Kc slots,
+    # bornés à RANSAC_BUDGET octets (100 000 lignes × 120 slots: 1 tirage, 41 slots à la fois)
+    n, k = x.shape
+    m = np.isfinite(x)
+    xz = np.where(m, x, 0.0)
+    a0, b0 = weighted_fit(x, y, m.astype(np.float64))  # repli si aucune paire utilisable
+    thr = RANSAC_TOL_STEPS * step
+    rng = np.random.default_rng(seed)
+    pi, pj = rng.integers(0, n, trials), rng.integers(0, n, trials)
+    best_key = np.full(k, -np.inf)
+    best_a, best_b = np.full(k, np.nan), np.full(k, np.nan)
+    norm = n * thr * (1.0 + 1e-9)
+    kc = max(1, min(k, RANSAC_BUDGET // (8 * n)))
+    chunk = max(1, min(RANSAC_CHUNK, RANSAC_BUDGET // (8 * n * kc)))
+    for c0 in range(0, k, kc):
+        cs = slice(c0, c0 + kc)
+        xc, xzc, mc = x[:, cs], xz[:, cs], m[:, cs]
+        cols = np.arange(xc.shape[1])
+        for t0 in range(0, trials, chunk):
+            i, j = pi[t0 : t0 + chunk], pj[t0 : t0 + chunk]
+            dx = xc[j] - xc[i]  # (T, Kc), NaN si un mot manque
+            ok = np.isfinite(dx) & (dx != 0)
+            a = np.where(ok, (y[j] - y[i])[:, None] / np.where(ok, dx, 1.0), np.nan)
+            b = y[i][:, None] - a * xzc[i]
+            r = np.abs(a[:, None, :] * xzc[None] + b[:, None, :] - y[None, :, None])  # (T, n, Kc)
+            inl = mc[None] & (r <= thr)
+            # plus de lignes d'accord d'abord, puis plus petite Σ|r| sur ces lignes (< 1 après normalisation)
+            key = inl.sum(axis=1) - np.where(inl, r, 0.0).sum(axis=1) / norm
+            key = np.where(ok, key, -np.inf)
+            t = np.argmax(key, axis=0)
+            better = key[t, cols] > best_key[cs]
+            best_key[cs] = np.where(better, key[t, cols], best_key[cs])
+            best_a[cs] = np.where(better, a[t, cols], best_a[cs])
+            best_b[cs] = np.where(better, b[t, cols], best_b[cs])
+    found = np.isfinite(best_a)
+    inl = m & (np.abs(residuals(x, y, np.where(found, best_a, 0.0), np.where(found, best_b, 0.0))) <= thr)
+    a, b = weighted_fit(x, y, inl.astype(np.float64))
+    keep = found & np.isfinite(a)
+    return np.where(keep, a, a0), np.where(keep, b, b0)
+
+
+def inlier_score(r: np.ndarray, m: np.ndarray, step: float, k: float = INLIER_K) -> Tuple[np.ndarray, np.ndarray]:
+    """(MAE sur les lignes en accord, fraction en accord) par colonne; r et m de même forme (n, ...)."""
+    thr = np.maximum(k * MAD_SCALE * abs_median(r, m), step)
+    inl = m & (np.abs(r) <= thr)
+    n_in = inl.sum(axis=0)
+    cnt = m.sum(axis=0)
+    mae = np.where(n_in > 0, np.where(inl, np.abs(r), 0.0).sum(axis=0) / np.maximum(n_in, 1), np.inf)
+    return mae, n_in / np.maximum(cnt, 1)
+
+
+def robust_fit_mae(x: np.ndarray, y: np.ndarray, method: str = "huber") -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Comme sz_page_matrix.linear_fit_mae (x: (n, K) NaN = ligne ignorée; y: (n,) sans NaN),
+    coefficients robustes: (a, b, mae sur les lignes en accord, n, fraction en accord).
+    """
+    step = display_step(y)
+    m = np.isfinite(x)
+    if method == "ransac":
+        a, b = ransac_fit(x, y, step)
+    else:
+        a, b = huber_fit(x, y, step)
+    mae, frac = inlier_score(residuals(x, y, np.where(np.isfinite(a), a, 0.0), np.where(np.isfinite(b), b, 0.0)), m, step)
+    fit = np.isfinite(a)
+    return a, b, np.where(fit, mae, np.inf), m.sum(axis=0).astype(np.float64), np.where(fit, frac, 0.0)
+
+
+class RobustSearch:
+    """
+    Recherche des candidats (mêmes 8-uplets que find_all_candidates) avec le score robuste.
+    Les matrices sont construites une fois par liste de lignes, les fits une fois par champ.
+    """
+
+    def __init__(
+        self,
+        method: str,
+        formulas: Sequence[Tuple[float, float, str]],
+        skip: Set[Tuple[str, int]],
+        min_inliers: float = DEFAULT_MIN_INLIERS,
+        max_offset: int = 60,
+    ) -> None:
+        if method not in METHODS:
+            raise ValueError(f"méthode robuste inconnue: {method} ({', '.join(METHODS)})")
+        self.method = method
+        self.formulas = list(formulas)
+        self.skip = skip
+        self.min_inliers = min_inliers
+        self.max_offset = max_offset
+        self.inliers: Dict[Tuple[str, str, int, str], float] = {}  # (champ, page, offset, label) → fraction
+        self._rows: Optional[List[Dict]] = None
+        self._fields: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def _prepare(self, rows: List[Dict]) -> None:
+        if rows is self._rows:
+            return
+        self._rows = rows
+        self.pm = build_page_matrix(rows)
+        self.w, self.slots = slot_matrix(self.pm, self.skip, self.max_offset)
+        self._index = {s: i for i, s in enumerate(self.slots)}
+        self._fields = {}
+        self.inliers = {}
+
+    def _field(self, rows: List[Dict], field: str) -> Optional[Dict[str, np.ndarray]]:
+        self._prepare(rows)
+        if field not in self._fields:
+            y_all = self.pm.target(field)
+            rows_y = ~np.isnan(y_all)
+            if rows_y.sum() < 5:
+                return None
+            x, y = self.w[rows_y], y_all[rows_y]
+            step = display_step(y)
+            m = np.isfinite(x)
+            f_mae, f_frac = self._score_formulas(x, y, m, step)
+            a, b, l_mae, cnt, l_frac = robust_fit_mae(x, y, self.method)
+            self._fields[field] = {
+                "cnt": cnt, "f_mae": f_mae, "f_frac": f_frac, "a": a, "b": b, "l_mae": l_mae, "l_frac": l_frac, "step": np.array(step)
+            }
+        return self._fields[field]
+
+    def _score_formulas(self, x: np.ndarray, y: np.ndarray, m: np.ndarray, step: float) -> Tuple[np.ndarray, np.ndarray]:
+        """inlier_score de chaque formule fixe sur chaque slot: (K, formules), par blocs de slots."""
+        # résidus (n, Kc, formules) bornés à RANSAC_BUDGET octets, comme ransac_fit (abs_median en trie une copie)
+        n, k = x.shape
+        kf = np.array([mult / div for mult, div, _ in self.formulas])
+        f_mae, f_frac = np.empty((k, len(kf))), np.empty((k, len(kf)))
+        kc = max(1, RANSAC_BUDGET // (8 * max(n, 1) * max(len(kf), 1)))
+        for c0 in range(0, k, kc):
+            cs = slice(c0, c0 + kc)
+            r = y[:, None, None] - np.where(m[:, cs], x[:, cs], 0.0)[..., None] * kf  # (n, Kc, formules)
+            f_mae[cs], f_frac[cs] = inlier_score(r, np.broadcast_to(m[:, cs, None], r.shape), step)
+        return f_mae, f_frac
+
+    def candidates(self, rows: List[Dict], field: str, top_n: int = 5, use_linear_fit: bool = True) -> List[Candidate]:
+        """Top top_n par MAE en accord, fraction en accord ≥ min_inliers."""
+        fit = self._field(rows, field)
+        if fit is None:
+            return []
+        out: List[Candidate] = []
+        cnt = fit["cnt"]
+        for s in np.nonzero(cnt >= 5)[0]:
+            page, offset = self.slots[s]
+            n = int(cnt[s])
+            for q, (mult, div, label) in enumerate(self.formulas):
+                if fit["f_frac"][s, q] >= self.min_inliers:
+                    out.append((page, offset, mult, div, 0.0, label, float(fit["f_mae"][s, q]), n))
+                    self.inliers[(field, page, offset, label)] = float(fit["f_frac"][s, q])
+            if use_linear_fit and np.isfinite(fit["a"][s]) and fit["l_frac"][s] >= self.min_inliers:
+                out.append((page, offset, float(fit["a"][s]), 1.0, float(fit["b"][s]), "linear", float(fit["l_mae"][s]), n))
+                self.inliers[(field, page, offset, "linear")] = float(fit["l_frac"][s])
+        out.sort(key=lambda c: (c[6], -c[7]))
+        return out[:top_n]
+
+    def _column(self, rows: List[Dict], field: str, page: str, offset: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(x, y) d'un slot hors de la matrice des candidats (ex: PRIORITY_CANDIDATES, slot écarté)."""
+        self._prepare(rows)
+        if page not in self.pm.pages or offset + 1 >= self.pm.pages[page].shape[1]:
+            return None
+        y = self.pm.target(field)
+        keep = ~np.isnan(y)
+        return self.pm.words(page)[keep, offset][:, None], y[keep]
+
+    def linear_fit_for(self, rows: List[Dict], field: str, page: str, offset: int) -> Optional[Tuple[float, float, float, int]]:
+        """Comme linear_fit_for: (scale, add, mae, n), coefficients et MAE robustes; None sous min_inliers."""
+        fit = self._field(rows, field)
+        s = self._index.get((page, offset))
+        if fit is not None and s is not None:
+            a, b, mae, n, frac = fit["a"][s], fit["b"][s], fit["l_mae"][s], fit["cnt"][s], fit["l_frac"][s]
+        else:
+            col = self._column(rows, field, page, offset)
+            if col is None or len(col[1]) < 5:
+                return None
+            a, b, mae, n, frac = (v[0] for v in robust_fit_mae(col[0], col[1], self.method))
+        if n < 5 or not np.isfinite(a) or frac < self.min_inliers:
+            return None
+        self.inliers[(field, page, offset, "linear")] = float(frac)
+        return (float(a), float(b), float(mae), int(n))
+
+    def _fixed(self, rows: List[Dict], field: str, page: str, offset: int, mult: float, div: float, add: float) -> Tuple[float, int, float]:
+        """(MAE en accord, n, fraction en accord) de raw * mult / div + add sur un slot."""
+        col = self._column(rows, field, page, offset)
+        if col is None:
+            return (float("inf"), 0, 0.0)
+        x, y = col
+        m = np.isfinite(x)
+        if not m.any():
+            return (float("inf"), 0, 0.0)
+        r = y[:, None] - (np.where(m, x, 0.0) * mult / div + add)
+        mae, frac = inlier_score(r, m, display_step(y))
+        return (float(mae[0]), int(m.sum()), float(frac[0]))
+
+    def mae_for(self, rows: List[Dict], field: str, page: str, offset: int, mult: float, div: float, add: float = 0.0) -> Tuple[float, int]:
+        """Comme mae_for: (MAE en accord, n) d'une formule fixe sur un slot."""
+        mae, n, frac = self._fixed(rows, field, page, offset, mult, div, add)
+        if n:
+            self.inliers[(field, page, offset, self._label(mult, div))] = frac
+        return (mae, n)
+
+    def _label(self, mult: float, div: float) -> str:
+        for fm, fd, label in self.formulas:
+            if fm == mult and fd == div:
+                return label
+        return f"raw*{mult:g}/{div:g}"
+
+    def inlier_fraction(self, field: str, c: Candidate) -> Optional[float]:
+        """Fraction en accord d'un candidat rendu par la recherche, ou recalculée (ex: forme rationnelle)."""
+        frac = self.inliers.get((field, c[0], c[1], c[5]))
+        if frac is None and self._rows is not None:
+            _, n, frac = self._fixed(self._rows, field, c[0], c[1], c[2], c[3], c[4])
+            if not n:
+                return None
+        return frac
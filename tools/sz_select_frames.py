@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Sélection des frames à OCRiser d'après l'arrivée des pages dans le log.
+
+À 30 fps, une réponse 21A0/21A2/21A5/21CD arrive toutes les ~250 ms: une quinzaine de
+frames consécutives montrent le même état brut et l'OCR les relit toutes. Ici, chaque
+état distinct (une page dont le contenu change) est représenté par UNE frame: la première
+dont l'instant log tombe après l'arrivée + le délai de redessin de SZ Viewer (--redraw-ms),
+et avant le changement suivant (+ redessin). Un état plus court qu'une frame n'a pas de
+frame propre: il est sauté (la frame mélangerait deux états).
+
+  --select-pages 21A2   (défaut) un état par arrivée de 21A2 modifiée, soit une frame par
+                        cycle de scrutation; 'all' = chaque page modifiée (≈4× plus de frames)
+  --pick middle         frame du milieu de l'intervalle stable au lieu de la première
+
+Fenêtre 17:52:51–17:53:08 (510 frames à 30 fps): 19 frames gardées (÷27) avec 21A2,
+73 (÷7) avec all; MAE décodé/OCR équivalente à celle de toutes les frames.
+
+Utilisé par sz_sync_ms.py --select-frames (avant extraction: ffmpeg ne sort que ces frames)
+et seul, sur un JSONL de synchro déjà produit (log_ts_sec par ligne):
+  python3 tools/sz_select_frames.py recording/sz_sync_ms_window_ocr.jsonl --out /tmp/sel.jsonl
+  python3 tools/sz_compare_decode_vs_ocr.py /tmp/sel.jsonl      # même MAE que sur toutes les frames
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_parse_ms_log import PAGE_PREFIXES, parse_ms_log
+from sz_profile import stage
+from sz_sync_db import read_sync, write_rows
+
+DEFAULT_LOG = Path(__file__).resolve().parent.parent / "recording" / "jimny_capture.log"
+DEFAULT_REDRAW_MS = 100.0
+DEFAULT_PAGES = "21A2"
+
+
+def state_changes(events: Sequence[Tuple[float, str, str]], pages: Optional[Sequence[str]] = None) -> List[float]:
+    """Instants (s) où le contenu d'une des pages suivies change (events triés par instant)."""
+    last: Dict[str, str] = {}
+    out: List[float] = []
+    for ts, page, hex_payload in events:
+        if pages and page not in pages:
+            continue
+        if last.get(page) != hex_payload:
+            last[page] = hex_payload
+            if not out or ts > out[-1]:
+                out.append(ts)
+    return out
+
+
+def select_positions(
+    changes: Sequence[float],
+    frame_times: Sequence[float],
+    redraw_s: float = DEFAULT_REDRAW_MS / 1000.0,
+    pick: str = "first",
+) -> List[int]:
+    """Indices (dans frame_times, trié) des frames retenues: au plus une par état stable."""
+    keep: List[int] = []
+    for k, c in enumerate(changes):
+        lo = c + redraw_s
+        hi = changes[k + 1] + redraw_s if k + 1 < len(changes) else float("inf")
+        i = bisect.bisect_left(frame_times, lo)
+        j = bisect.bisect_left(frame_times, hi)
+        if i >= j:
+            continue  # état plus court qu'une frame
+        if hi == float("inf"):
+            j = i + 1  # dernier état: pas de fin connue, première frame
+        keep.append(i if pick == "first" else (i + j - 1) // 2)
+    return keep
+
+
+def select_frame_indices(
+    events: Sequence[Tuple[float, str, str]],
+    anchor_ts_sec: float,
+    anchor_frame: int,
+    fps: float,
+    n_frames: int,
+    redraw_ms: float = DEFAULT_REDRAW_MS,
+    pages: Optional[Sequence[str]] = None,
+    pick: str = "first",
+) -> List[int]:
+    """Index 1-based (frame_%05d) parmi 1..n_frames, instant log = ancrage + (i - anchor_frame) / fps."""
+    times = [anchor_ts_sec + (i - anchor_frame) / fps for i in range(1, n_frames + 1)]
+    pos = select_positions(state_changes(events, pages), times, redraw_ms / 1000.0, pick)
+    return [p + 1 for p in pos]
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--redraw-ms", type=float, default=DEFAULT_REDRAW_MS, help="Délai arrivée page → écran redessiné (ms)")
+    ap.add_argument("--select-pages", default=DEFAULT_PAGES, help="Pages dont un changement crée un état (ex: 21A2,21A0 ou all)")
+    ap.add_argument("--pick", choices=["first", "middle"], default="first", help="Frame retenue dans l'intervalle stable")
+
+
+def parse_pages(s: str) -> Optional[List[str]]:
+    if s.strip().lower() == "all":
+        return None
+    pages = [p.strip().upper() for p in s.split(",") if p.strip()]
+    bad = [p for p in pages if p not in PAGE_PREFIXES]
+    if bad:
+        raise ValueError(f"pages inconnues: {', '.join(bad)} (connues: {', '.join(PAGE_PREFIXES)})")
+    return pages or None
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Garde une frame par état brut distinct (arrivée des pages dans le log)")
+    ap.add_argument("jsonl", help="JSONL (ou .sqlite) de synchro (sz_sync_ms.py, avec log_ts_sec)")
+    ap.add_argument("--log", type=Path, default=DEFAULT_LOG, help="Log [HH:MM:SS.mmm] SEND/RECV")
+    ap.add_argument("--out", type=Path, required=True, help="JSONL (ou .sqlite) réduit")
+    add_arguments(ap)
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    path = Path(args.jsonl)
+    for p in (path, args.log):
+        if not p.exists():
+            print(f"Fichier introuvable: {p}", file=sys.stderr)
+            return 1
+    try:
+        pages = parse_pages(args.select_pages)
+    except ValueError as e:
+        print(f"--select-pages: {e}", file=sys.stderr)
+        return 1
+    with stage("chargement") as st:
+        rows = [r for r in read_sync(path) if isinstance(r.get("log_ts_sec"), (int, float))]
+        st.rows = len(rows)
+    if not rows:
+        print(f"Aucune ligne avec log_ts_sec dans {path}", file=sys.stderr)
+        return 1
+    rows.sort(key=lambda r: r["log_ts_sec"])
+    with stage("parse log") as st:
+        events = sorted(parse_ms_log(args.log), key=lambda e: e[0])
+        st.rows = len(events)
+    changes = state_changes(events, pages)
+    keep = select_positions(changes, [r["log_ts_sec"] for r in rows], args.redraw_ms / 1000.0, args.pick)
+    write_rows(args.out, (rows[i] for i in keep), source=str(path))
+    t0, t1 = rows[0]["log_ts_sec"], rows[-1]["log_ts_sec"]
+    n_states = sum(1 for c in changes if t0 <= c <= t1)
+    ratio = len(rows) / len(keep) if keep else 0.0
+    print(f"# {n_states} états distincts sur la fenêtre, {len(keep)} frames gardées sur {len(rows)} (÷{ratio:.1f})", file=sys.stderr)
+    print(f"OK: {len(keep)} lignes → {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,10 +38,15 @@ from __future__ import annotations
 import argparse
 import json
 import re
+import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_profile import stage
+
 
 LOG_LINE_RE = re.compile(r"^\[(\d{2}:\d{2}:\d{2})\]\s+(send|RECV):\s+(.*)\s*$")
 
@@ -161,7 +166,9 @@ def main() -> int:
     ap.add_argument("--fps", type=float, default=2.0, help="FPS utilisé pour extraire les frames (ex: 2)")
     ap.add_argument("--anchor-frame", type=int, default=1, help="Index 1-based de la frame qui correspond à l'heure d'ancrage")
     ap.add_argument("--anchor-hhmmss", required=True, help="Heure log (HH:MM:SS) correspondant à anchor-frame (ex: 17:36:53)")
+    sz_profile.add_arguments(ap)
     args = ap.parse_args()
+    sz_profile.setup(args)
 
     trames_path = Path(args.trames)
     frames_dir = Path(args.frames)
@@ -171,7 +178,8 @@ def main() -> int:
     if not frames:
         raise SystemExit(f"Aucune frame trouvée dans {frames_dir}")
 
-    per_sec = parse_trames(trames_path)
+    with stage("parse trames"):
+        per_sec = parse_trames(trames_path)
     mapping = build_frame_mapping(frames, args.fps, args.anchor_frame, args.anchor_hhmmss)
 
     # 20 champs attendus (null par défaut)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Format de synchro normalisé (SQLite) au lieu du JSONL qui recopie les 4 pages brutes
+(hex ASCII de l'hex ASCII) sur chaque frame.
+
+À 30 fps, une réponse 21A0/21A2/21A5/21CD reste affichée ~250 ms: la même trame est
+répétée sur une dizaine de lignes, d'où ~800 Ko pour 17 s. Ici:
+
+  responses (id, page, ts, payload)   une ligne par réponse du log référencée (payload = octets
+                                      de la réponse ASCII, 0D0D3E compris: moitié de l'hex)
+  frames    (id, dir, name, frame_idx, t_offset_s, log_ts_sec, r21A0, r21A2, r21A5, r21CD,
+             v_<champ>…, extra)       ids des réponses affichées, une colonne REAL par valeur OCR,
+                                      autres champs de la ligne (ocr_ok, window, pts_s...) en JSON
+  dirs      (id, path)                dossiers des frames (le chemin n'est pas répété)
+  meta      (key, value)              version du format, source
+
+Un fichier .sqlite / .db est accepté partout où un JSONL de synchro l'est (load_rows rend les
+mêmes dicts que le JSONL, hex de chaque réponse reconstruit une seule fois):
+sz_decode_from_ocr_jsonl.py, sz_compare_decode_vs_ocr.py, sz_mim_hypotheses.py,
+sz_select_frames.py, sz_ocr.py (--in / --out) et sz_sync_ms.py --out x.sqlite.
+
+Usage:
+  python3 tools/sz_sync_db.py recording/sz_sync_ms_window_ocr.jsonl --out /tmp/sync.sqlite --log recording/jimny_capture.log
+  python3 tools/sz_sync_db.py /tmp/sync.sqlite --out /tmp/sync.jsonl      # retour au JSONL
+  python3 tools/sz_decode_from_ocr_jsonl.py /tmp/sync.sqlite --cv 5
+
+Sans --log, l'instant des réponses d'un JSONL est inconnu (ts NULL) et les réponses sont
+dédoublonnées par contenu.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_parse_ms_log import PAGE_PREFIXES, parse_ms_log
+from sz_profile import stage
+
+FORMAT_VERSION = "1"
+DB_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+FRAME_COLUMNS = ("frame_idx", "t_offset_s", "log_ts_sec")
+TS_TOLERANCE_S = 0.0005  # log_ts_sec est arrondi à la ms
+# Champs OCR, ordre de VALUES_TEMPLATE (sz_sync_ms.py)
+FIELDS = (
+    "desired_idle_speed_rpm",
+    "accelerator_pct",
+    "intake_c",
+    "battery_v",
+    "fuel_temp_c",
+    "bar_pressure_kpa",
+    "bar_pressure_mmhg",
+    "abs_pressure_mbar",
+    "air_flow_estimate_mgcp",
+    "air_flow_request_mgcp",
+    "speed_kmh",
+    "rail_pressure_bar",
+    "rail_pressure_control_bar",
+    "desired_egr_position_pct",
+    "gear_ratio",
+    "egr_position_pct",
+    "engine_temp_c",
+    "air_temp_c",
+    "requested_in_pressure_mbar",
+    "engine_rpm",
+)
+REF_COLUMNS = tuple(f"r{p}" for p in PAGE_PREFIXES)
+VALUE_COLUMNS = tuple(f"v_{f}" for f in FIELDS)
+KEYS_EXTRA = "_keys"  # clés de la ligne source, dans l'ordre, quand iter_rows ne les rendrait pas telles quelles
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS responses (id INTEGER PRIMARY KEY, page TEXT NOT NULL, ts REAL, payload BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS dirs (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    dir INTEGER REFERENCES dirs(id), name TEXT, frame_idx INTEGER, t_offset_s REAL, log_ts_sec REAL,
+    {", ".join(f"{c} INTEGER REFERENCES responses(id)" for c in REF_COLUMNS)},
+    {", ".join(f"{c} REAL" for c in VALUE_COLUMNS)},
+    extra TEXT
+);
+"""
+
+
+def is_sync_db(path: Any) -> bool:
+    return Path(str(path)).suffix.lower() in DB_SUFFIXES
+
+
+def default_keys(extra: Dict[str, Any]) -> List[str]:
+    """Clés d'une ligne relue sans _keys: colonnes de frames, raw, values puis le reste de extra."""
+    return ["frame", *FRAME_COLUMNS, "raw", "values"] + [k for k in extra if k not in ("values", KEYS_EXTRA)]
+
+
+class SyncDbWriter:
+    """
+    Écrit des lignes de synchro (dicts du JSONL) dans un fichier SQLite.
+    events (parse_ms_log): donne l'instant de chaque réponse référencée; sans events, on
+    reprend raw_ts des lignes lues d'une autre base, sinon ts NULL.
+    """
+
+    def __init__(self, path: Path, events: Optional[Sequence[Tuple[float, str, str]]] = None, source: str = "") -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+        self.db.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)", [("format", FORMAT_VERSION), ("source", source)]
+        )
+        self.ids: Dict[Tuple[str, Optional[float], str], int] = {}
+        self.dir_ids: Dict[str, int] = {}
+        # page → hex → instants triés des réponses de ce contenu
+        self.times: Dict[str, Dict[str, List[float]]] = {}
+        for ts, page, hex_payload in events or ():
+            self.times.setdefault(page, {}).setdefault(hex_payload, []).append(ts)
+        for by_hex in self.times.values():
+            for ts_list in by_hex.values():
+                ts_list.sort()
+        self.n_frames = 0
+        self._pending: List[Tuple[Any, ...]] = []
+
+    def _response_ts(self, page: str, raw_hex: str, at: Optional[float]) -> Optional[float]:
+        """Dernière réponse de ce contenu à l'instant de la frame (celle qu'affiche la ligne)."""
+        ts_list = self.times.get(page, {}).get(raw_hex)
+        if not ts_list:
+            return None
+        if at is None:
+            return ts_list[0]
+        k = bisect.bisect_right(ts_list, at + TS_TOLERANCE_S)
+        return ts_list[k - 1] if k else ts_list[0]
+
+    def response_id(self, page: str, raw_hex: Optional[str], ts: Optional[float]) -> Optional[int]:
+        if not raw_hex:
+            return None
+        key = (page, ts, raw_hex)
+        rid = self.ids.get(key)
+        if rid is None:
+            try:
+                payload: Any = bytes.fromhex(raw_hex)
+            except ValueError:
+                payload = raw_hex  # pas de l'hex: gardé tel quel (TEXT)
+            cur = self.db.execute("INSERT INTO responses (page, ts, payload) VALUES (?, ?, ?)", (page, ts, payload))
+            rid = self.ids[key] = int(cur.lastrowid)
+        return rid
+
+    def dir_id(self, path: str) -> int:
+        did = self.dir_ids.get(path)
+        if did is None:
+            cur = self.db.execute("INSERT INTO dirs (path) VALUES (?)", (path,))
+            did = self.dir_ids[path] = int(cur.lastrowid)
+        return did
+
+    def add(self, rec: Dict[str, Any]) -> None:
+        raw = rec.get("raw") or {}
+        raw_ts = rec.get("raw_ts") or {}
+        at = rec.get("log_ts_sec")
+        refs = []
+        for page in PAGE_PREFIXES:
+            h = raw.get(page)
+            ts = raw_ts.get(page) if page in raw_ts else (self._response_ts(page, h, at) if h else None)
+            refs.append(self.response_id(page, h, ts))
+        vals = rec.get("values") or {}
+        extra = {k: v for k, v in rec.items() if k not in FRAME_COLUMNS and k not in ("frame", "raw", "raw_ts", "values")}
+        other = {k: v for k, v in vals.items() if k not in FIELDS}
+        if other:
+            extra["values"] = other
+        keys = [k for k in rec if k != "raw_ts"]
+        if keys != default_keys(extra):
+            extra[KEYS_EXTRA] = keys  # colonnes absentes de la ligne, ou autre ordre (log_hhmmss avant raw...)
+        frame = rec.get("frame")
+        if frame is None:
+            loc: Tuple[Optional[int], Optional[str]] = (None, None)
+        else:
+            d, _, name = str(frame).rpartition("/")
+            loc = (self.dir_id(d), name)
+        self._pending.append(
+            loc
+            + tuple(rec.get(c) for c in FRAME_COLUMNS)
+            + tuple(refs)
+            + tuple(vals.get(f) for f in FIELDS)
+            + (json.dumps(extra, ensure_ascii=False, separators=(",", ":")) if extra else None,)
+        )
+        self.n_frames += 1
+        if len(self._pending) >= 1000:
+            self._flush()
+
+    def _flush(self) -> None:
+        cols = ("dir", "name") + FRAME_COLUMNS + REF_COLUMNS + VALUE_COLUMNS + ("extra",)
+        self.db.executemany(
+            f"INSERT INTO frames ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", self._pending
+        )
+        self._pending = []
+
+    def close(self) -> None:
+        self._flush()
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self) -> "SyncDbWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class SyncJsonlWriter:
+    """Même interface que SyncDbWriter, une ligne JSON par frame (raw_ts n'est pas écrit)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = self.path.open("w", encoding="utf-8")
+        self.n_frames = 0
+
+    def add(self, rec: Dict[str, Any]) -> None:
+        if "raw_ts" in rec:
+            rec = {k: v for k, v in rec.items() if k != "raw_ts"}
+        self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.n_frames += 1
+
+    def close(self) -> None:
+        self.f.close()
+
+    def __enter__(self) -> "SyncJsonlWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def open_sync_writer(path: Any, events: Optional[Sequence[Tuple[float, str, str]]] = None, source: str = "") -> Any:
+    """Sortie de synchro selon l'extension: base normalisée (.sqlite/.db) ou JSONL."""
+    return SyncDbWriter(Path(path), events, source) if is_sync_db(path) else SyncJsonlWriter(Path(path))
+
+
+def write_rows(path: Path, rows: Iterable[Dict[str, Any]], events: Optional[Sequence[Tuple[float, str, str]]] = None, source: str = "") -> int:
+    with open_sync_writer(path, events, source) as w:
+        for rec in rows:
+            w.add(rec)
+        return w.n_frames
+
+
+def iter_rows(path: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Lignes au format du JSONL de synchro (frame, frame_idx, t_offset_s, log_ts_sec, raw, values, …)
+    plus raw_ts (instant de chaque réponse). Les clés absentes de la ligne source ne sont pas
+    rendues (pas de "log_ts_sec": null pour une synchro à la seconde) et l'ordre d'origine est
+    gardé: la conversion JSONL → SQLite → JSONL redonne le fichier à l'identique.
+    """
+    db = sqlite3.connect(f"file:{Path(str(path))}?mode=ro", uri=True)
+    try:
+        # hex (majuscules, comme sz_sync_ms.py) reconstruit une fois par réponse
+        responses: Dict[int, Tuple[str, Optional[float]]] = {
+            rid: (payload.hex().upper() if isinstance(payload, bytes) else payload, ts)
+            for rid, ts, payload in db.execute("SELECT id, ts, payload FROM responses")
+        }
+        dirs = dict(db.execute("SELECT id, path FROM dirs"))
+        cols = ", ".join(("dir", "name") + FRAME_COLUMNS + REF_COLUMNS + VALUE_COLUMNS + ("extra",))
+        n_f, n_r = 2 + len(FRAME_COLUMNS), 2 + len(FRAME_COLUMNS) + len(REF_COLUMNS)
+        for row in db.execute(f"SELECT {cols} FROM frames ORDER BY id"):
+            d = dirs.get(row[0])
+            rec: Dict[str, Any] = {"frame": f"{d}/{row[1]}" if d else row[1]}
+            rec.update(zip(FRAME_COLUMNS, row[2:n_f]))
+            refs = row[n_f:n_r]
+            rec["raw"] = {p: responses[r][0] if r is not None else None for p, r in zip(PAGE_PREFIXES, refs)}
+            rec["raw_ts"] = {p: responses[r][1] for p, r in zip(PAGE_PREFIXES, refs) if r is not None}
+            rec["values"] = dict(zip(FIELDS, row[n_r:-1]))
+            if row[-1]:
+                extra = json.loads(row[-1])
+                keys = extra.pop(KEYS_EXTRA, None)
+                rec["values"].update(extra.pop("values", {}))
+                rec.update(extra)
+                if keys is not None:
+                    raw_ts = rec["raw_ts"]
+                    rec = {k: rec[k] for k in keys if k in rec}
+                    rec["raw_ts"] = raw_ts
+            yield rec
+    finally:
+        db.close()
+
+
+def load_rows(path: Any) -> List[Dict[str, Any]]:
+    return list(iter_rows(path))
+
+
+def read_sync(path: Any) -> Iterator[Dict[str, Any]]:
+    """Lignes d'un JSONL de synchro ou d'une base SQLite (même forme)."""
+    if is_sync_db(path):
+        yield from iter_rows(path)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Convertit une synchro JSONL ↔ SQLite normalisée (réponses + frames)")
+    ap.add_argument("src", type=Path, help="JSONL de synchro ou base .sqlite")
+    ap.add_argument("--out", type=Path, required=True, help="Sortie .sqlite/.db ou .jsonl")
+    ap.add_argument("--log", type=Path, default=None, help="Log [HH:MM:SS.mmm] SEND/RECV: instant de chaque réponse")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    for p in (args.src, args.log):
+        if p is not None and not p.exists():
+            print(f"Fichier introuvable: {p}", file=sys.stderr)
+            return 1
+    events = sorted(parse_ms_log(args.log), key=lambda e: e[0]) if args.log else None
+    t0 = time.perf_counter()
+    with stage("conversion") as st:
+        n = write_rows(args.out, read_sync(args.src), events, source=str(args.src))
+        st.rows = n
+    dt = time.perf_counter() - t0
+    t1 = time.perf_counter()
+    with stage("relecture") as st:
+        reread = sum(1 for _ in read_sync(args.out))
+        st.rows = reread
+    load_ms = 1000.0 * (time.perf_counter() - t1)
+    size_in, size_out = args.src.stat().st_size, args.out.stat().st_size
+    print(
+        f"# {n} frames en {dt:.2f} s; {size_in / 1024:.0f} Ko → {size_out / 1024:.0f} Ko"
+        f" (÷{size_in / size_out:.1f}); relecture {reread} lignes en {load_ms:.0f} ms",
+        file=sys.stderr,
+    )
+    print(f"OK: {n} lignes → {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,24 +11,53 @@ Entrées :
   - Vidéo (MP4) ou dossier de frames déjà extraites
 
 Sortie : jsonl (une ligne par frame) avec raw par page et values à null (à remplir par sz_ocr).
+--out x.sqlite: synchro normalisée (sz_sync_db.py), chaque réponse stockée une fois avec son instant.
 
 Usage:
   python3 tools/sz_sync_ms.py --log recording/jimny_capture.log --video recording/2026-02-21_17-50-47.mp4 --fps 30 --anchor-frame 1 --anchor-log 17:52:51 --video-start-sec 125 --video-duration 17 --out recording/sz_sync_ms_window.jsonl
   python3 tools/sz_sync_ms.py --log recording/jimny_capture.log --frames recording/frames --fps 30 --anchor-frame 1 --anchor-log 17:52:51 --out recording/sz_sync_ms.jsonl
+
+--select-frames: ne garder qu'une frame par état brut distinct (sz_select_frames.py, arrivée
+des pages + --redraw-ms); avec --video, ffmpeg n'extrait que ces frames (÷~27 à 30 fps).
+  python3 tools/sz_sync_ms.py --log recording/jimny_capture.log --video recording/2026-02-21_17-50-47.mp4 --fps 30 --anchor-log 17:52:51 --video-start-sec 125 --video-duration 17 --select-frames --out recording/sz_sync_ms_window_sel.jsonl
+
+Plusieurs fenêtres en une passe (--video-start-log = instant log de la seconde 0 de la vidéo):
+chaque fenêtre est extraite par un ffmpeg distinct (recherche par image clé côté entrée, -ss
+avant -i, puis découpe exacte), en parallèle (--workers), dans un seul JSONL (champ window).
+  python3 tools/sz_sync_ms.py --video recording/2026-02-21_17-50-47.mp4 --fps 30 --video-start-log 17:50:46 --windows 17:52:51-17:53:08,17:54:10-17:54:30 --out recording/sz_sync_ms_windows.jsonl
+  python3 tools/sz_sync_ms.py --video recording/2026-02-21_17-50-47.mp4 --fps 30 --video-start-log 17:50:46 --accel-windows --select-frames --out recording/sz_sync_ms_accel.jsonl
+--dedupe (avec --video): ffmpeg ne garde que les frames dont la zone du tableau (crop gris de
+sz_ocr.ocr_frame) a changé (mpdecimate); chaque frame gardée a son PTS réel et le nombre de
+frames qu'elle représente (frames.json à côté des PNG, champs pts_s / frames / crop du JSONL).
+log_ts_sec vient alors du PTS. Les PNG sont déjà recadrés: sz_ocr.py ne recadre pas deux fois.
+--accel-windows: une fenêtre par accélération du log (vitesse décodée avec le mapping, gain
+≥ --accel-min-gain km/h), élargie de --accel-pad secondes.
+
+--profile / --profile-out X.json|X.pstats / SZ_PROFILE=1: temps par étape, ffmpeg compris (sz_profile.py).
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import math
+import os
+import re
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 # Permettre l'import quand on lance depuis la racine du repo
 sys.path.insert(0, str(Path(__file__).resolve().parent))
+import sz_profile
+from sz_compare_decode_vs_ocr import decode_from_mapping, load_mapping, page_bytes
 from sz_parse_ms_log import hhmmss_ms_to_sec, parse_ms_log
+from sz_profile import stage
+from sz_select_frames import add_arguments as add_select_arguments
+from sz_select_frames import parse_pages, select_frame_indices
+from sz_sync_db import open_sync_writer
 
 VALUES_TEMPLATE = {
     "desired_idle_speed_rpm": None,
@@ -70,27 +99,259 @@ def latest_raw_per_page_at(events: List[Tuple[float, str, str]], at_sec: float)
     return out
 
 
+FRAME_INFO = "frames.json"
+SHOWINFO_RE = re.compile(r"\bn:\s*\d+\s+pts:\s*-?\d+\s+pts_time:\s*(-?[\d.]+(?:e-?\d+)?)")
+
+
+def default_crop() -> str:
+    """Zone du tableau lue par l'OCR (paramètres par défaut de sz_ocr.ocr_frame), en W:H:X:Y."""
+    from sz_ocr import ocr_frame
+
+    d = ocr_frame.__kwdefaults__
+    return f"{d['crop_w']}:{d['crop_h']}:{d['crop_x']}:{d['crop_y']}"
+
+
+def load_frame_info(frames_dir: Path) -> Dict[str, Any]:
+    """frames.json écrit par l'extraction --dedupe ({} si absent)."""
+    p = frames_dir / FRAME_INFO
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
 def extract_frames_from_video(
     video_path: Path,
     out_dir: Path,
     fps: float,
     start_sec: Optional[float] = None,
     duration_sec: Optional[float] = None,
+    indices: Optional[List[int]] = None,
+    dedupe_crop: Optional[str] = None,
+    dedupe_params: str = "",
 ) -> List[Path]:
-    """Extrait les frames (optionnellement un segment [start_sec, start_sec+duration_sec])."""
+    """
+    Extrait les frames (optionnellement un segment [start_sec, start_sec+duration_sec]).
+    indices: n'écrire que ces frames (1-based, numérotation de l'extraction complète).
+    dedupe_crop (W:H:X:Y): sortie recadrée en gris, doublons retirés par mpdecimate
+    (dedupe_params: ex. "hi=768:lo=320:frac=0.33"); le nom frame_%05d garde le numéro
+    de l'extraction complète (PTS × fps + 1), PTS et nombre de frames représentées
+    sont écrits dans frames.json.
+
+    -ss avant -i: ffmpeg saute à l'image clé précédente sans décoder le début de la vidéo,
+    puis (accurate_seek, défaut en transcodage) jette les frames jusqu'à start_sec exact;
+    les horodatages repartent de 0 au début du segment, -t compte depuis start_sec.
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
     out_pattern = str(out_dir / "frame_%05d.png")
-    cmd = [
-        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
-        "-i", str(video_path),
-    ]
+    # showinfo (PTS des frames gardées) écrit au niveau info
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "info" if dedupe_crop else "error", "-y"]
     if start_sec is not None and start_sec > 0:
         cmd.extend(["-ss", str(start_sec)])
+    cmd.extend(["-i", str(video_path)])
     if duration_sec is not None and duration_sec > 0:
         cmd.extend(["-t", str(duration_sec)])
-    cmd.extend(["-vf", f"fps={fps}", out_pattern])
-    subprocess.run(cmd, check=True)
-    return sorted(out_dir.glob("frame_*.png"))
+    if indices is None and dedupe_crop is None:
+        cmd.extend(["-vf", f"fps={fps}", out_pattern])
+        sz_profile.run(cmd, check=True)
+        return sorted(out_dir.glob("frame_*.png"))
+    if indices is not None and not indices:
+        return []
+    filters = [f"fps={fps}"]
+    if indices is not None:
+        # select compte les frames après fps= à partir de 0
+        filters.append("select='" + "+".join(f"eq(n\\,{i - 1})" for i in indices) + "'")
+    if dedupe_crop is not None:
+        filters += [f"crop={dedupe_crop}", "format=gray", "mpdecimate" + (f"={dedupe_params}" if dedupe_params else ""), "showinfo"]
+    # sortie numérotée 1..K puis renommée d'après indices ou PTS
+    tmp_pattern = str(out_dir / "sel_%05d.png")
+    cmd.extend(["-vf", ",".join(filters), "-vsync", "vfr" if dedupe_crop else "0", tmp_pattern])
+    if dedupe_crop is not None:
+        res = sz_profile.run(cmd, check=True, stderr=subprocess.PIPE, text=True)
+        pts = [float(m.group(1)) for m in SHOWINFO_RE.finditer(res.stderr)]
+        return _name_deduped(out_dir, fps, pts, dedupe_crop, duration_sec)
+    sz_profile.run(cmd, check=True)
+    out: List[Path] = []
+    for k, i in enumerate(indices, start=1):
+        src = out_dir / f"sel_{k:05d}.png"
+        if src.exists():
+            dst = out_dir / f"frame_{i:05d}.png"
+            src.replace(dst)
+            out.append(dst)
+    return out
+
+
+def _name_deduped(out_dir: Path, fps: float, pts: List[float], crop: str, duration_sec: Optional[float]) -> List[Path]:
+    """sel_K.png → frame_<PTS×fps+1>.png, frames.json (PTS, nombre de frames représentées)."""
+    numbers = [int(round(t * fps)) + 1 for t in pts]
+    total = int(math.ceil(duration_sec * fps)) if duration_sec else None
+    info: Dict[str, Any] = {"fps": fps, "crop": crop, "frames": {}}
+    out: List[Path] = []
+    for k, (t, i) in enumerate(zip(pts, numbers), start=1):
+        src = out_dir / f"sel_{k:05d}.png"
+        if not src.exists():
+            continue
+        dst = out_dir / f"frame_{i:05d}.png"
+        src.replace(dst)
+        nxt = numbers[k] if k < len(numbers) else (total + 1 if total else None)
+        info["frames"][dst.name] = {"pts_s": round(t, 6), "count": max(nxt - i, 1) if nxt else None}
+        out.append(dst)
+    (out_dir / FRAME_INFO).write_text(json.dumps(info) + "\n", encoding="utf-8")
+    return out
+
+
+def extract_windows(
+    video_path: Path,
+    fps: float,
+    windows: List[Tuple[float, float, Path, Optional[List[int]]]],
+    workers: int = 0,
+    dedupe_crop: Optional[str] = None,
+    dedupe_params: str = "",
+) -> List[List[Path]]:
+    """Fenêtres (début vidéo s, durée s, dossier, indices) extraites en parallèle, un ffmpeg par fenêtre."""
+    workers = max(1, min(len(windows), workers or os.cpu_count() or 1))
+
+    def one(w: Tuple[float, float, Path, Optional[List[int]]]) -> List[Path]:
+        start, dur, out_dir, indices = w
+        return extract_frames_from_video(video_path, out_dir, fps, start_sec=start, duration_sec=dur, indices=indices,
+                                         dedupe_crop=dedupe_crop, dedupe_params=dedupe_params)
+
+    if workers == 1:
+        return [one(w) for w in windows]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(sz_profile.bind_stage(one), windows))
+
+
+def clock_to_sec(s: str) -> float:
+    """HH:MM:SS[.fff] saisi en ligne de commande → secondes depuis minuit (17:54:10.5 → 64450.5).
+
+    Contrairement à hhmmss_ms_to_sec (horodatages du log, toujours 3 chiffres de ms), la partie
+    décimale est lue comme une fraction de seconde.
+    """
+    h, m, sec = s.strip().split(":")
+    v = float(sec)
+    if not math.isfinite(v) or not 0 <= v < 60:
+        raise ValueError(f"secondes invalides: {sec!r}")
+    return int(h) * 3600 + int(m) * 60 + v
+
+
+def parse_windows(spec: str) -> List[Tuple[float, float]]:
+    """'17:52:51-17:53:08,17:54:10.5-17:54:30' → [(64371.0, 17.0), (64450.5, 19.5)] (début log s, durée s)."""
+    out: List[Tuple[float, float]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        a, sep, b = part.partition("-")
+        try:
+            t0, t1 = clock_to_sec(a), clock_to_sec(b) if sep else None
+        except ValueError:
+            t0 = t1 = None
+        if t0 is None or t1 is None or t1 <= t0:
+            raise ValueError(f"fenêtre invalide: {part!r} (attendu HH:MM:SS[.fff]-HH:MM:SS[.fff])")
+        out.append((t0, t1 - t0))
+    return out
+
+
+def accel_windows(
+    events: List[Tuple[float, str, str]],
+    mapping: Dict[str, Dict[str, Any]],
+    min_gain_kmh: float = 10.0,
+    pad_s: float = 2.0,
+    tol_kmh: float = 1.0,
+) -> List[Tuple[float, float]]:
+    """
+    Accélérations du log: montée de vitesse (speed_kmh décodé avec le mapping) d'au moins
+    min_gain_kmh, du creux au sommet (une baisse de plus de tol_kmh termine la montée).
+    Retourne [(début log s, durée s)] élargies de pad_s, fusionnées si elles se chevauchent.
+    """
+    m = mapping.get("speed_kmh")
+    if not m:
+        return []
+    sub = {"speed_kmh": m}
+    series: List[Tuple[float, float]] = []
+    for ts, page, hex_payload in events:
+        if page == m.get("page"):
+            v = decode_from_mapping({page: page_bytes(hex_payload)}, sub).get("speed_kmh")
+            if v is not None:
+                series.append((ts, v))
+    found: List[Tuple[float, float]] = []
+    if not series:
+        return found
+    low = peak = series[0]
+    for t, v in series[1:]:
+        if v >= peak[1]:
+            peak = (t, v)
+        elif v < peak[1] - tol_kmh:
+            if peak[1] - low[1] >= min_gain_kmh:
+                found.append((low[0] - pad_s, peak[0] + pad_s))
+            low = peak = (t, v)
+        if v < low[1]:
+            low = peak = (t, v)
+    if peak[1] - low[1] >= min_gain_kmh:
+        found.append((low[0] - pad_s, peak[0] + pad_s))
+    merged: List[Tuple[float, float]] = []
+    for a, b in found:
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return [(a, b - a) for a, b in merged]
+
+
+def sync_records(
+    frame_paths: List[Path],
+    events: List[Tuple[float, str, str]],
+    anchor_ts_sec: float,
+    anchor_frame: int,
+    fps: float,
+    start_sec: Optional[float] = None,
+    end_sec: Optional[float] = None,
+    frame_info: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Une ligne de synchro par frame (instant log = ancrage + (i - anchor_frame) / fps).
+    frame_info (frames.json de --dedupe): instant tiré du PTS réel de la frame.
+    """
+    per_frame = (frame_info or {}).get("frames") or {}
+    for pos, fp in enumerate(frame_paths, start=1):
+        i = frame_number(fp, pos)
+        fi = per_frame.get(fp.name)
+        t_offset = fi["pts_s"] - (anchor_frame - 1) / fps if fi else (i - anchor_frame) / fps
+        log_ts_sec = anchor_ts_sec + t_offset
+        if start_sec is not None and end_sec is not None:
+            if log_ts_sec < start_sec or log_ts_sec > end_sec:
+                continue
+        rec: Dict[str, Any] = {
+            "frame": str(fp.resolve()),
+            "frame_idx": i,
+            "t_offset_s": t_offset,
+            "log_ts_sec": round(log_ts_sec, 3),
+            "raw": latest_raw_per_page_at(events, log_ts_sec),
+            "values": dict(VALUES_TEMPLATE),
+        }
+        if fi:
+            rec.update(pts_s=fi["pts_s"], frames=fi["count"], crop=frame_info["crop"])
+        yield rec
+
+
+def video_duration_sec(video_path: Path) -> Optional[float]:
+    """Durée (s) via ffprobe, None si indisponible."""
+    try:
+        out = sz_profile.check_output(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(video_path)], text=True
+        )
+        return float(out.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def frame_number(path: Path, default: int) -> int:
+    """Index 1-based lu dans frame_%05d.png (default si le nom ne suit pas ce format)."""
+    m = re.search(r"frame_(\d+)", path.stem)
+    return int(m.group(1)) if m else default
 
 
 def main() -> int:
@@ -100,32 +361,75 @@ def main() -> int:
     ap.add_argument("--frames", help="Dossier de frames existantes (frame_*.png)")
     ap.add_argument("--fps", type=float, default=30.0, help="FPS du screencast (ex. 30) pour ancrage et extraction")
     ap.add_argument("--anchor-frame", type=int, default=1, help="Index 1-based de la frame d'ancrage")
-    ap.add_argument("--anchor-log", required=True, help="Instant log correspondant (ex. 17:52:51)")
+    ap.add_argument("--anchor-log", help="Instant log correspondant (ex. 17:52:51); requis hors --windows / --accel-windows")
     ap.add_argument("--start-log", help="Début fenêtre log (ex. 17:52:51) — ne garder que les frames dans [start-log, end-log]")
     ap.add_argument("--end-log", help="Fin fenêtre log (ex. 17:53:08)")
     ap.add_argument("--video-start-sec", type=float, default=None, help="Extraire la vidéo à partir de cette seconde (ex. 125 pour 17:52:51 si vidéo commence à 17:50:46)")
     ap.add_argument("--video-duration", type=float, default=None, help="Durée en secondes à extraire (ex. 17 pour 17:52:51→17:53:08)")
-    ap.add_argument("--out", default="recording/sz_sync_ms.jsonl", help="Sortie jsonl")
+    ap.add_argument("--out", default="recording/sz_sync_ms.jsonl", help="Sortie jsonl (ou .sqlite: format normalisé)")
     ap.add_argument("--limit", type=int, default=0, help="Limiter à N frames (0 = toutes)")
+    ap.add_argument("--video-start-log", help="Instant log de la seconde 0 de la vidéo (ex. 17:50:46), pour --windows")
+    ap.add_argument("--windows", help="Fenêtres log à extraire: HH:MM:SS-HH:MM:SS[,...]")
+    ap.add_argument("--accel-windows", action="store_true", help="Une fenêtre par accélération trouvée dans le log")
+    ap.add_argument("--accel-min-gain", type=float, default=10.0, help="Gain de vitesse minimal d'une accélération (km/h)")
+    ap.add_argument("--accel-pad", type=float, default=2.0, help="Marge avant/après chaque accélération (s)")
+    ap.add_argument("--workers", type=int, default=0, help="Extractions ffmpeg simultanées (0 = nombre de CPU)")
+    ap.add_argument("--dedupe", action="store_true", help="Retirer les frames identiques dans la zone du tableau (mpdecimate, PTS conservés)")
+    ap.add_argument("--dedupe-crop", default=None, help="Zone comparée W:H:X:Y (défaut: crop de sz_ocr.ocr_frame)")
+    ap.add_argument("--dedupe-params", default="", help="Options mpdecimate (ex: hi=768:lo=320:frac=0.33)")
+    ap.add_argument("--select-frames", action="store_true", help="Une frame par état brut distinct (sz_select_frames.py)")
+    add_select_arguments(ap)
+    sz_profile.add_arguments(ap)
     args = ap.parse_args()
+    sz_profile.setup(args)
 
     log_path = Path(args.log)
     if not log_path.exists():
         print(f"Log introuvable: {log_path}", file=sys.stderr)
         return 1
 
-    anchor_ts_sec = hhmmss_ms_to_sec(args.anchor_log)
+    multi = bool(args.windows or args.accel_windows)
+    if multi and not (args.video and args.video_start_log):
+        print("--windows / --accel-windows: indiquer --video et --video-start-log", file=sys.stderr)
+        return 1
+    if not multi and not args.anchor_log:
+        print("Indiquer --anchor-log (ou --windows / --accel-windows avec --video-start-log)", file=sys.stderr)
+        return 1
+    anchor_ts_sec = hhmmss_ms_to_sec(args.anchor_log) if args.anchor_log else 0.0
     start_sec = hhmmss_ms_to_sec(args.start_log) if args.start_log else None
     end_sec = hhmmss_ms_to_sec(args.end_log) if args.end_log else None
     if (args.start_log or args.end_log) and (start_sec is None or end_sec is None):
         print("Indiquer --start-log et --end-log ensemble.", file=sys.stderr)
         return 1
 
-    events = build_events(log_path)
+    with stage("lecture log") as st:
+        events = build_events(log_path)
+        st.rows = len(events)
     if not events:
         print("Aucune réponse 21A0/21A2/21A5/21CD dans le log.", file=sys.stderr)
         return 1
 
+    try:
+        select_pages = parse_pages(args.select_pages)
+    except ValueError as e:
+        print(f"--select-pages: {e}", file=sys.stderr)
+        return 1
+
+    def selected(n_frames: int, anchor_ts: float = anchor_ts_sec, anchor_frame: int = args.anchor_frame) -> List[int]:
+        idx = select_frame_indices(events, anchor_ts, anchor_frame, args.fps, n_frames,
+                                   args.redraw_ms, select_pages, args.pick)
+        print(f"# sélection: {len(idx)} frames sur {n_frames} (÷{n_frames / max(1, len(idx)):.1f})", file=sys.stderr)
+        return idx
+
+    dedupe_crop = (args.dedupe_crop or default_crop()) if args.dedupe else None
+    if dedupe_crop and not args.video:
+        print("--dedupe s'applique à l'extraction: indiquer --video", file=sys.stderr)
+        return 1
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if multi:
+        return sync_windows(args, events, out_path, selected, dedupe_crop)
+
     if args.video:
         video_path = Path(args.video)
         if not video_path.exists():
@@ -135,11 +439,29 @@ def main() -> int:
             frames_dir = video_path.parent / (video_path.stem + f"_frames_{int(args.video_start_sec)}_{int(args.video_duration)}")
         else:
             frames_dir = video_path.parent / (video_path.stem + "_frames")
-        frame_paths = extract_frames_from_video(
-            video_path, frames_dir, args.fps,
-            start_sec=args.video_start_sec,
-            duration_sec=args.video_duration,
-        )
+        indices: Optional[List[int]] = None
+        if args.select_frames:
+            duration = args.video_duration
+            if not duration:
+                total = video_duration_sec(video_path)
+                if total is None:
+                    print("--select-frames: durée vidéo inconnue (ffprobe absent?), indiquer --video-duration", file=sys.stderr)
+                    return 1
+                duration = total - (args.video_start_sec or 0.0)
+            frames_dir = frames_dir.with_name(frames_dir.name + "_sel")
+            indices = selected(int(math.ceil(duration * args.fps)))
+        if dedupe_crop:
+            frames_dir = frames_dir.with_name(frames_dir.name + "_dedup")
+        with stage("extraction frames") as st:
+            frame_paths = extract_frames_from_video(
+                video_path, frames_dir, args.fps,
+                start_sec=args.video_start_sec,
+                duration_sec=args.video_duration,
+                indices=indices,
+                dedupe_crop=dedupe_crop,
+                dedupe_params=args.dedupe_params,
+            )
+            st.rows = len(frame_paths)
         print(f"Frames extraites: {len(frame_paths)} dans {frames_dir}", file=sys.stderr)
     elif args.frames:
         frames_dir = Path(args.frames)
@@ -147,38 +469,92 @@ def main() -> int:
         if not frame_paths:
             print(f"Aucune frame_*.png dans {frames_dir}", file=sys.stderr)
             return 1
+        if args.select_frames:
+            by_number = {frame_number(fp, k): fp for k, fp in enumerate(frame_paths, start=1)}
+            frame_paths = [by_number[i] for i in selected(max(by_number)) if i in by_number]
     else:
         print("Indiquer --video ou --frames", file=sys.stderr)
         return 1
 
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-
-    written = 0
-    with out_path.open("w", encoding="utf-8") as w:
-        for i, fp in enumerate(frame_paths, start=1):
-            if args.limit and i > args.limit:
-                break
-            # Instant log pour cette frame : anchor + (i - anchor_frame) / fps
-            log_ts_sec = anchor_ts_sec + (i - args.anchor_frame) / args.fps
-            if start_sec is not None and end_sec is not None:
-                if log_ts_sec < start_sec or log_ts_sec > end_sec:
-                    continue
-            raw = latest_raw_per_page_at(events, log_ts_sec)
-            rec = {
-                "frame": str(fp.resolve()),
-                "frame_idx": i,
-                "t_offset_s": (i - args.anchor_frame) / args.fps,
-                "log_ts_sec": round(log_ts_sec, 3),
-                "raw": raw,
-                "values": dict(VALUES_TEMPLATE),
-            }
-            w.write(json.dumps(rec, ensure_ascii=False) + "\n")
-            written += 1
+    if args.limit:
+        frame_paths = frame_paths[: args.limit]
+    with stage("synchro frames") as st:
+        written = 0
+        with open_sync_writer(out_path, events, source=str(args.log)) as w:
+            for rec in sync_records(frame_paths, events, anchor_ts_sec, args.anchor_frame, args.fps, start_sec, end_sec,
+                                    load_frame_info(frames_dir)):
+                w.add(rec)
+                written += 1
+        st.rows = written
 
     print(f"OK: {written} lignes → {out_path}")
     return 0
 
 
+def sync_windows(
+    args: argparse.Namespace,
+    events: List[Tuple[float, str, str]],
+    out_path: Path,
+    selected: Any,
+    dedupe_crop: Optional[str] = None,
+) -> int:
+    """--windows / --accel-windows: extraction parallèle des fenêtres, un seul JSONL (champ window)."""
+    video_path = Path(args.video)
+    if not video_path.exists():
+        print(f"Vidéo introuvable: {video_path}", file=sys.stderr)
+        return 1
+    try:
+        video0 = clock_to_sec(args.video_start_log)
+    except ValueError:
+        print(f"--video-start-log invalide: {args.video_start_log}", file=sys.stderr)
+        return 1
+    windows: List[Tuple[float, float]] = []
+    if args.windows:
+        try:
+            windows.extend(parse_windows(args.windows))
+        except ValueError as e:
+            print(f"--windows: {e}", file=sys.stderr)
+            return 1
+    if args.accel_windows:
+        mapping = load_mapping() or {}
+        found = accel_windows(events, mapping, args.accel_min_gain, args.accel_pad)
+        if not found and "speed_kmh" not in mapping:
+            print("--accel-windows: speed_kmh absent du mapping (tools/sz_decode_mapping.json)", file=sys.stderr)
+            return 1
+        print(f"# {len(found)} accélérations (gain ≥ {args.accel_min_gain:g} km/h) dans le log", file=sys.stderr)
+        windows.extend(found)
+    windows = sorted((max(ws, video0), dur - max(0.0, video0 - ws)) for ws, dur in windows)
+    windows = [(round(ws, 3), round(dur, 3)) for ws, dur in windows if dur > 0]
+    if not windows:
+        print("Aucune fenêtre à extraire", file=sys.stderr)
+        return 1
+
+    jobs: List[Tuple[float, float, Path, Optional[List[int]]]] = []
+    for ws, dur in windows:
+        vstart = round(ws - video0, 3)
+        suffix = ("_sel" if args.select_frames else "") + ("_dedup" if dedupe_crop else "")
+        frames_dir = video_path.parent / (video_path.stem + f"_frames_{vstart:g}_{dur:g}" + suffix)
+        indices = selected(int(math.ceil(dur * args.fps)), ws, 1) if args.select_frames else None
+        jobs.append((vstart, dur, frames_dir, indices))
+    with stage("extraction fenêtres") as st:
+        per_window = extract_windows(video_path, args.fps, jobs, args.workers, dedupe_crop, args.dedupe_params)
+        st.rows = sum(len(p) for p in per_window)
+    print(f"Frames extraites: {sum(len(p) for p in per_window)} dans {len(jobs)} fenêtres", file=sys.stderr)
+
+    with stage("synchro frames") as st:
+        written = 0
+        with open_sync_writer(out_path, events, source=str(args.log)) as w:
+            for k, ((ws, dur), paths, job) in enumerate(zip(windows, per_window, jobs), start=1):
+                for rec in sync_records(paths, events, ws, 1, args.fps, frame_info=load_frame_info(job[2])):
+                    if args.limit and written >= args.limit:
+                        break
+                    rec["window"] = k
+                    w.add(rec)
+                    written += 1
+        st.rows = written
+    print(f"OK: {written} lignes ({len(windows)} fenêtres) → {out_path}")
+    return 0
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Génère des captures synthétiques aussi longues que voulu, avec vérité terrain connue.
+
+Apprentissage (sur recording/jimny_capture.log + tools/sz_decode_mapping.json):
+  - timing: pour chaque réponse 21A0/21A2/21A5/21CD observée, délai SEND → 1er fragment,
+    délais entre fragments, taille de chaque fragment, pause avant la requête suivante;
+    rejoués tels quels (tirage avec remise d'une réponse réelle de la même page)
+  - signaux: chaque champ du mapping est décodé sur toute la capture puis modélisé en
+    AR(1) par réponse de sa page (moyenne, φ, σ du résidu, bornes min/max observées)
+  - octets hors mapping: les pages réelles sont rejouées en boucle (mêmes valeurs, même
+    dynamique), seuls les mots du mapping sont réécrits
+
+Sortie, en un passage et en mémoire constante:
+  --log       [HH:MM:SS.mmm] SEND/RECV (même format que jimny_capture.log)
+  --sync      JSONL de synchro (format sz_sync_ms.py) à --fps, values = vérité terrain,
+              ocr_ok = true: fixture pour sz_decode_from_ocr_jsonl.py sans OCR
+  --gateway   NDJSON gateway (une ligne par cycle des 4 pages, raw en hex réel)
+La vérité terrain est le décodage des pages écrites avec le mapping (valeur quantifiée sur
+le mot 16 bits), donc un décodeur parfait retrouve exactement les values: oracle pour la
+recherche de candidats et pour --cv.
+
+Usage:
+  python3 tools/sz_synth_capture.py --duration 2h --log /tmp/synth.log --sync /tmp/synth_sync.jsonl --gateway /tmp/synth_gw.json
+  python3 tools/sz_synth_capture.py --frames 100000 --fps 2 --sync /tmp/synth_100k.jsonl --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_compare_decode_vs_ocr import FIELDS, decode_from_mapping, load_mapping, page_bytes
+import sz_profile
+from sz_parse_ms_log import END_MARKER, LOG_LINE_RE, PAGE_PREFIXES, hhmmss_ms_to_sec, parse_ms_log
+from sz_profile import stage
+
+DEFAULT_LOG = Path(__file__).resolve().parent.parent / "recording" / "jimny_capture.log"
+DEFAULT_MAPPING = Path(__file__).resolve().parent / "sz_decode_mapping.json"
+
+# Réponse réelle: (délai SEND→1er fragment ms, [(délai depuis fragment précédent ms, nb caractères hex ASCII)], pause avant SEND suivant ms)
+Timing = Tuple[float, List[Tuple[float, int]], float]
+
+
+def fmt_hhmmss_ms(sec: float) -> str:
+    ms = int(round(sec * 1000)) % 86400000
+    h, rem = divmod(ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def parse_duration(s: str) -> float:
+    """'90', '90s', '15m', '2h' → secondes."""
+    s = s.strip().lower()
+    mult = {"s": 1.0, "m": 60.0, "h": 3600.0}.get(s[-1:], None)
+    return float(s[:-1]) * mult if mult else float(s)
+
+
+def learn_timing(log_path: Path) -> Dict[str, List[Timing]]:
+    """Timing de chaque réponse complète, par page."""
+    out: Dict[str, List[Timing]] = {p: [] for p in PAGE_PREFIXES}
+    page: Optional[str] = None
+    t_send = t_prev = 0.0
+    first = 0.0
+    frags: List[Tuple[float, int]] = []
+    pending: Optional[Tuple[str, float, List[Tuple[float, int]], float]] = None  # attend le SEND suivant
+    with log_path.open("r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            m = LOG_LINE_RE.match(line.strip())
+            if not m:
+                continue
+            t = hhmmss_ms_to_sec(m.group(1))
+            kind, payload = m.group(2), (m.group(3) or "").replace(" ", "").upper()
+            if kind == "SEND":
+                if pending is not None:
+                    p, fd, fr, t_end = pending
+                    out[p].append((fd, fr, max(0.0, (t - t_end) * 1000.0)))
+                    pending = None
+                cmd = payload
+                page = next((p for p in PAGE_PREFIXES if cmd.startswith(p)), None)
+                t_send = t_prev = t
+                frags = []
+                continue
+            if page is None or not payload:
+                continue
+            if not frags:
+                first = (t - t_send) * 1000.0
+                frags.append((0.0, len(payload)))
+            else:
+                frags.append(((t - t_prev) * 1000.0, len(payload)))
+            t_prev = t
+            if END_MARKER in payload:
+                pending = (page, first, frags, t)
+                page = None
+    return {p: v for p, v in out.items() if v}
+
+
+class Ar1:
+    """x_t = mu + phi (x_{t-1} - mu) + N(0, sigma), borné à [lo, hi]."""
+
+    def __init__(self, series: List[float]) -> None:
+        n = len(series)
+        self.mu = sum(series) / n
+        self.lo, self.hi = min(series), max(series)
+        var = sum((x - self.mu) ** 2 for x in series)
+        cov = sum((series[i] - self.mu) * (series[i + 1] - self.mu) for i in range(n - 1))
+        self.phi = min(0.999, max(0.0, cov / var)) if var > 0 else 1.0
+        resid = [series[i + 1] - self.mu - self.phi * (series[i] - self.mu) for i in range(n - 1)]
+        self.sigma = math.sqrt(sum(r * r for r in resid) / len(resid)) if resid else 0.0
+        self.x = series[0]
+
+    def step(self, rng: random.Random) -> float:
+        x = self.mu + self.phi * (self.x - self.mu) + (rng.gauss(0.0, self.sigma) if self.sigma > 0 else 0.0)
+        self.x = min(self.hi, max(self.lo, x))
+        return self.x
+
+    def describe(self) -> Dict[str, float]:
+        return {"mu": round(self.mu, 4), "phi": round(self.phi, 4), "sigma": round(self.sigma, 4), "lo": self.lo, "hi": self.hi}
+
+
+def learn_signals(log_path: Path, mapping: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, List[bytes]], Dict[str, Ar1]]:
+    """Pages réelles par page (gabarits rejoués) + modèle AR(1) par champ décodable."""
+    pages: Dict[str, List[bytes]] = {p: [] for p in PAGE_PREFIXES}
+    series: Dict[str, List[float]] = {}
+    for _, page, hex_payload in parse_ms_log(log_path):
+        b = page_bytes(hex_payload)
+        if not b:
+            continue
+        pages[page].append(b)
+        sub = {f: m for f, m in mapping.items() if m.get("page") == page}
+        for f, v in decode_from_mapping({page: b}, sub).items():
+            if v is not None:
+                series.setdefault(f, []).append(v)
+    models = {f: Ar1(s) for f, s in series.items() if len(s) >= 3}
+    return {p: v for p, v in pages.items() if v}, models
+
+
+def encode_field(buf: bytearray, m: Dict[str, Any], value: float) -> None:
+    """Écrit le mot 16 bits qui décode au plus près de value (inverse de decode_from_mapping)."""
+    mult = float(m.get("mult", 1.0))
+    div = float(m.get("div", 1.0)) or 1.0
+    if mult == 0:
+        return  # champ constant (ex: intake_c): rien à encoder, le gabarit reste
+    raw = int(round((value - float(m.get("add", 0.0))) * div / mult))
+    raw = min(0xFFFF, max(0, raw))
+    off = int(m["offset"])
+    if off + 1 < len(buf):
+        buf[off] = raw >> 8
+        buf[off + 1] = raw & 0xFF
+
+
+def ascii_hex(b: bytes) -> str:
+    """Octets → texte hex de l'ELM → hex ASCII tel qu'écrit dans le log."""
+    return b.hex().upper().encode("ascii").hex().upper()
+
+
+class Generator:
+    def __init__(self, timing: Dict[str, List[Timing]], templates: Dict[str, List[bytes]], models: Dict[str, Ar1],
+                 mapping: Dict[str, Dict[str, Any]], rng: random.Random) -> None:
+        self.timing = timing
+        self.templates = templates
+        self.models = models
+        self.mapping = mapping
+        self.rng = rng
+        self.order = [p for p in PAGE_PREFIXES if p in templates and p in timing]
+        self.tpl_idx = {p: 0 for p in self.order}
+        self.fields_by_page: Dict[str, List[str]] = {}
+        for f, m in mapping.items():
+            if m.get("page") in templates and f in models:
+                self.fields_by_page.setdefault(m["page"], []).append(f)
+
+    def next_page(self, page: str) -> bytes:
+        lst = self.templates[page]
+        buf = bytearray(lst[self.tpl_idx[page] % len(lst)])
+        self.tpl_idx[page] += 1
+        for f in self.fields_by_page.get(page, []):
+            encode_field(buf, self.mapping[f], self.models[f].step(self.rng))
+        return bytes(buf)
+
+    def response_lines(self, page: str, b: bytes, t_send: float) -> Tuple[List[Tuple[float, str]], float, float]:
+        """Lignes (t, texte) de la requête et de ses fragments; retourne aussi t de fin et t du SEND suivant."""
+        first, frags, gap = self.rng.choice(self.timing[page])
+        text = ascii_hex(b) + "0D0D3E"
+        lines = [(t_send, f"SEND: {page} 1")]
+        t = t_send + first / 1000.0
+        pos = 0
+        for i, (dt, n) in enumerate(frags):
+            t += dt / 1000.0
+            chunk = text[pos:] if i == len(frags) - 1 else text[pos : pos + n]
+            pos += len(chunk)
+            if chunk:
+                lines.append((t, f"RECV: {chunk}"))
+        if pos < len(text):  # gabarit de timing plus court que la page: on termine d'un bloc
+            lines.append((t, f"RECV: {text[pos:]}"))
+        return lines, t, t + gap / 1000.0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Captures synthétiques (log SEND/RECV, synchro JSONL, NDJSON gateway) avec vérité terrain")
+    ap.add_argument("--learn-log", type=Path, default=DEFAULT_LOG, help="Log réel dont on apprend timing et dynamique")
+    ap.add_argument("--mapping", type=Path, default=DEFAULT_MAPPING, help="Mapping (champs générés et encodés)")
+    ap.add_argument("--duration", default="10m", help="Durée simulée (ex: 90s, 15m, 2h)")
+    ap.add_argument("--frames", type=int, default=0, help="Nombre de lignes de synchro voulu (prioritaire sur --duration)")
+    ap.add_argument("--fps", type=float, default=2.0, help="Frames/s du JSONL de synchro")
+    ap.add_argument("--start", default="08:00:00.000", help="Heure de début du log")
+    ap.add_argument("--date", default="2026-02-19", help="Date des lignes gateway")
+    ap.add_argument("--seed", type=int, default=1, help="Graine aléatoire (sortie reproductible)")
+    ap.add_argument("--log", type=Path, default=None, help="Log [HH:MM:SS.mmm] SEND/RECV à écrire")
+    ap.add_argument("--sync", type=Path, default=None, help="JSONL de synchro à écrire (values = vérité terrain)")
+    ap.add_argument("--gateway", type=Path, default=None, help="NDJSON gateway à écrire")
+    ap.add_argument("--model-out", type=Path, default=None, help="Écrire le modèle appris (JSON) pour inspection")
+    sz_profile.add_arguments(ap)
+    args = ap.parse_args()
+    sz_profile.setup(args)
+
+    if not (args.log or args.sync or args.gateway or args.model_out):
+        print("Indiquer au moins une sortie: --log, --sync, --gateway ou --model-out", file=sys.stderr)
+        return 1
+    if not args.learn_log.exists():
+        print(f"Log introuvable: {args.learn_log}", file=sys.stderr)
+        return 1
+    mapping = load_mapping(args.mapping)
+    if not mapping:
+        print(f"Mapping introuvable ou illisible: {args.mapping}", file=sys.stderr)
+        return 1
+
+    with stage("apprentissage"):
+        timing = learn_timing(args.learn_log)
+        templates, models = learn_signals(args.learn_log, mapping)
+    if not timing or not templates:
+        print(f"Aucune réponse 21A0/21A2/21A5/21CD dans {args.learn_log}", file=sys.stderr)
+        return 1
+    print(f"# appris: {sum(len(v) for v in timing.values())} réponses, {len(models)} champs AR(1)", file=sys.stderr)
+    if args.model_out:
+        args.model_out.write_text(json.dumps({
+            "source": str(args.learn_log),
+            "responses": {p: len(v) for p, v in timing.items()},
+            "fields": {f: m.describe() for f, m in models.items()},
+        }, indent=1) + "\n", encoding="utf-8")
+
+    duration = args.frames / args.fps if args.frames else parse_duration(args.duration)
+    t0 = hhmmss_ms_to_sec(args.start)
+    if t0 + duration >= 86400:
+        print("# attention: la capture passe minuit, les horodatages HH:MM:SS repartent à 00:00", file=sys.stderr)
+    day0 = datetime.strptime(args.date, "%Y-%m-%d")
+    rng = random.Random(args.seed)
+    gen = Generator(timing, templates, models, mapping, rng)
+
+    log_f: Optional[IO[str]] = args.log.open("w", encoding="utf-8") if args.log else None
+    sync_f: Optional[IO[str]] = args.sync.open("w", encoding="utf-8") if args.sync else None
+    gw_f: Optional[IO[str]] = args.gateway.open("w", encoding="utf-8") if args.gateway else None
+    latest_hex: Dict[str, Optional[str]] = {p: None for p in PAGE_PREFIXES}
+    latest_bytes: Dict[str, bytes] = {}
+    truth: Dict[str, Optional[float]] = {f: None for f in FIELDS}
+    n_frames = n_resp = n_gw = 0
+    frame_dt = 1.0 / args.fps
+    next_frame = 0.0
+    max_frames = args.frames or int(duration * args.fps) + 1
+
+    def emit_frames(until_rel: float) -> None:
+        nonlocal n_frames, next_frame
+        while sync_f and next_frame <= until_rel and n_frames < max_frames:
+            n_frames += 1
+            rec = {
+                "frame": f"synthetic/frame_{n_frames:06d}.png",
+                "frame_idx": n_frames,
+                "t_offset_s": round(next_frame, 3),
+                "log_ts_sec": round((t0 + next_frame) % 86400.0, 3),
+                "raw": dict(latest_hex),
+                "values": dict(truth),
+                "ocr_ok": True,
+            }
+            sync_f.write(json.dumps(rec) + "\n")
+            next_frame = n_frames * frame_dt
+
+    with stage("génération") as st:
+        try:
+            if log_f:
+                log_f.write(f"\n--- Nouvelle Capture : {fmt_hhmmss_ms(t0)} ---\n")
+            t_rel = 0.0
+            while t_rel < duration:
+                for page in gen.order:
+                    b = gen.next_page(page)
+                    lines, t_end, t_next = gen.response_lines(page, b, t0 + t_rel)
+                    emit_frames(t_end - t0 - 1e-9)
+                    if log_f:
+                        for t, text in lines:
+                            log_f.write(f"[{fmt_hhmmss_ms(t)}] {text}\n")
+                    latest_hex[page] = ascii_hex(b) + "0D0D3E"
+                    latest_bytes[page] = b
+                    sub = {f: m for f, m in mapping.items() if m.get("page") == page}
+                    decoded = decode_from_mapping({page: b}, sub)
+                    truth.update((f, decoded[f]) for f in sub)
+                    n_resp += 1
+                    t_rel = t_next - t0
+                if gw_f:
+                    rec = {"app": "SZ→MQTT Gateway", "ver": "synthetic", "ts_ms": int(t_rel * 1000),
+                           "datetime": (day0 + timedelta(seconds=t0 + t_rel)).strftime("%Y-%m-%d %H:%M:%S")}
+                    rec.update(truth)
+                    rec["raw"] = {p: b.hex().upper() for p, b in latest_bytes.items()}
+                    gw_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    n_gw += 1
+                if args.frames and n_frames >= max_frames:
+                    break
+            emit_frames(duration)
+        finally:
+            for fh in (log_f, sync_f, gw_f):
+                if fh:
+                    fh.close()
+        st.rows = n_resp
+
+    outs = [f"{n_resp} réponses → {args.log}" if args.log else "",
+            f"{n_frames} frames → {args.sync}" if args.sync else "",
+            f"{n_gw} lignes gateway → {args.gateway}" if args.gateway else ""]
+    print(f"OK: {duration:.0f} s simulées · " + " · ".join(o for o in outs if o))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Décodage en direct d'un log de capture en cours d'écriture (jimny_capture.log).
+
+Suit le fichier comme `tail -F` (lignes partielles, rotation, troncature), réassemble
+les réponses 21A0/21A2/21A5/21CD au fil de l'eau et, dès qu'un fragment RECV contient
+0D0D3E, décode la page avec le mapping courant (tools/sz_decode_mapping.json, rechargé
+s'il change). Une ligne JSON par réponse complète, à plat comme la gateway:
+
+  {"log_ts_sec": 64371.038, "log_hhmmss": "17:52:51.038", "page": "21A0", "lag_ms": 3.2,
+   "engine_rpm": 843.0, ..., "speed_kmh": null}
+
+Sortie sur stdout (NDJSON) ou en datagrammes UDP (--udp 127.0.0.1:9999).
+lag_ms = heure locale d'émission - horodatage du log (capture sur la même machine),
+c'est le retard de bout en bout; le temps de traitement seul est suivi à part.
+Stats p50/p95/max sur stderr toutes les --stats-every secondes et en fin.
+
+Usage:
+  python3 tools/sz_tail_decode.py recording/jimny_capture.log
+  python3 tools/sz_tail_decode.py recording/jimny_capture.log --udp 127.0.0.1:9999
+  python3 tools/sz_tail_decode.py recording/jimny_capture.log --from-start --once   # fichier terminé
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sz_compare_decode_vs_ocr import FIELDS, decode_from_mapping, load_mapping, page_bytes
+from sz_parse_ms_log import ResponseAssembler, follow_lines
+
+DEFAULT_MAPPING = Path(__file__).resolve().parent / "sz_decode_mapping.json"
+
+
+def sec_to_hhmmss_ms(sec: float) -> str:
+    ms = int(round(sec * 1000))
+    h, rem = divmod(ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def local_sec_since_midnight() -> float:
+    now = datetime.now()
+    return now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+class LiveDecoder:
+    """Dernières pages reçues + valeurs décodées; seuls les champs de la page reçue sont recalculés."""
+
+    def __init__(self, mapping_path: Path) -> None:
+        self.mapping_path = mapping_path
+        self.mapping: Dict[str, Dict[str, Any]] = {}
+        self.mapping_mtime = 0.0
+        self.fields_by_page: Dict[str, List[str]] = {}
+        self.pages: Dict[str, bytes] = {}
+        self.values: Dict[str, Optional[float]] = {f: None for f in FIELDS}
+        self.reload_mapping()
+
+    def reload_mapping(self) -> None:
+        """Recharge le mapping si le fichier a changé (ex: --write-mapping pendant la capture)."""
+        try:
+            mtime = self.mapping_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime == self.mapping_mtime:
+            return
+        mapping = load_mapping(self.mapping_path)
+        if mapping is None:
+            return
+        self.mapping, self.mapping_mtime = mapping, mtime
+        self.fields_by_page = {}
+        for f in FIELDS:
+            page = (mapping.get(f) or {}).get("page")
+            if page:
+                self.fields_by_page.setdefault(page, []).append(f)
+        # Nouveau mapping: on redécode tout ce qu'on a déjà
+        self.values.update(decode_from_mapping(self.pages, self.mapping))
+
+    def update(self, page: str, hex_payload: str) -> Dict[str, Optional[float]]:
+        self.pages[page] = page_bytes(hex_payload)
+        fields = self.fields_by_page.get(page, [])
+        if fields:
+            sub = {f: self.mapping[f] for f in fields}
+            decoded = decode_from_mapping(self.pages, sub)
+            for f in fields:
+                self.values[f] = decoded[f]
+        return self.values
+
+
+class LagStats:
+    def __init__(self) -> None:
+        self.lag_ms: List[float] = []
+        self.proc_ms: List[float] = []
+        self.n = 0
+
+    def add(self, lag_ms: float, proc_ms: float) -> None:
+        self.n += 1
+        self.lag_ms.append(lag_ms)
+        self.proc_ms.append(proc_ms)
+
+    def report(self, label: str) -> str:
+        lag = sorted(self.lag_ms)
+        proc = sorted(self.proc_ms)
+        return (
+            f"{label}: {self.n} réponses · lag p50 {percentile(lag, 0.5):.1f} ms, p95 {percentile(lag, 0.95):.1f} ms, "
+            f"max {lag[-1] if lag else 0.0:.1f} ms · traitement p50 {percentile(proc, 0.5) * 1000:.0f} µs, "
+            f"max {proc[-1] * 1000 if proc else 0.0:.0f} µs"
+        )
+
+    def reset_window(self) -> None:
+        self.lag_ms, self.proc_ms = [], []
+
+
+def parse_udp(target: str) -> Tuple[str, int]:
+    host, _, port = target.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Suit un log de capture et décode les pages SZ en direct (stdout ou UDP)")
+    ap.add_argument("log", nargs="?", default="recording/jimny_capture.log", help="Log [HH:MM:SS.mmm] SEND/RECV")
+    ap.add_argument("--mapping", type=Path, default=DEFAULT_MAPPING, help="Mapping JSON (rechargé s'il change)")
+    ap.add_argument("--from-start", action="store_true", help="Traiter le contenu existant (défaut: seulement les nouvelles lignes)")
+    ap.add_argument("--once", action="store_true", help="S'arrêter à la fin du fichier (pas de suivi)")
+    ap.add_argument("--udp", default=None, metavar="HOST:PORT", help="Envoyer chaque ligne JSON en datagramme UDP au lieu de stdout")
+    ap.add_argument("--poll-ms", type=float, default=5.0, help="Période de scrutation du fichier (ms)")
+    ap.add_argument("--stats-every", type=float, default=10.0, help="Stats de lag sur stderr toutes les N s (0 = seulement en fin)")
+    args = ap.parse_args()
+
+    log_path = Path(args.log)
+    if args.once and not log_path.exists():
+        print(f"Fichier introuvable: {log_path}", file=sys.stderr)
+        return 1
+    decoder = LiveDecoder(args.mapping)
+    if not decoder.mapping:
+        print(f"Mapping introuvable ou illisible: {args.mapping}", file=sys.stderr)
+        return 1
+
+    sock = None
+    udp_addr = None
+    if args.udp:
+        udp_addr = parse_udp(args.udp)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    out = sys.stdout
+
+    asm = ResponseAssembler()
+    total = LagStats()
+    window = LagStats()
+    last_stats = time.monotonic()
+    last_mapping_check = last_stats
+    print(f"# suivi de {log_path} ({'depuis le début' if args.from_start else 'nouvelles lignes'})", file=sys.stderr)
+    try:
+        for line in follow_lines(log_path, from_start=args.from_start, poll_s=args.poll_ms / 1000.0, stop_at_eof=args.once):
+            t_read = time.perf_counter()
+            resp = asm.feed(line)
+            now = time.monotonic()
+            if now - last_mapping_check > 1.0:
+                decoder.reload_mapping()
+                last_mapping_check = now
+            if args.stats_every > 0 and now - last_stats >= args.stats_every and window.n:
+                print(window.report("# lag"), file=sys.stderr)
+                window.reset_window()
+                last_stats = now
+            if resp is None:
+                continue
+            ts_sec, page, hex_payload = resp
+            values = decoder.update(page, hex_payload)
+            lag_ms = ((local_sec_since_midnight() - ts_sec) % 86400.0) * 1000.0
+            rec: Dict[str, Any] = {
+                "log_ts_sec": ts_sec,
+                "log_hhmmss": sec_to_hhmmss_ms(ts_sec),
+                "page": page,
+                "lag_ms": round(lag_ms, 1),
+            }
+            rec.update(values)
+            payload = json.dumps(rec, ensure_ascii=False)
+            if sock is not None:
+                sock.sendto(payload.encode("utf-8"), udp_addr)
+            else:
+                out.write(payload + "\n")
+                out.flush()
+            proc_ms = (time.perf_counter() - t_read) * 1000.0
+            total.add(lag_ms, proc_ms)
+            window.add(lag_ms, proc_ms)
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        return 0
+    finally:
+        if sock is not None:
+            sock.close()
+    print(f"OK: {total.report('total')}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())